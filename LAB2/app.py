@@ -1,6 +1,11 @@
 from flask import Flask, Response
 from prometheus_client import CollectorRegistry, Gauge, generate_latest
+import os
 import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from obslab.request_metrics import RequestMetrics  # noqa: E402
 
 app = Flask(__name__)
 registry = CollectorRegistry()
@@ -9,6 +14,9 @@ registry = CollectorRegistry()
 temperature = Gauge('app_temperature_celsius', 'Temperatura del sistema', registry=registry)
 cpu_usage = Gauge('app_cpu_usage_percent', 'Uso de CPU', registry=registry)
 
+# Requests atendidos, latencia y requests en curso por ruta/método/status
+RequestMetrics(app, registry)
+
 @app.route('/metrics')
 def metrics():
     temperature.set(random.uniform(20.0, 35.0))
@@ -16,4 +24,4 @@ def metrics():
     return Response(generate_latest(registry), mimetype='text/plain')
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8081)
\ No newline at end of file
+    app.run(host='0.0.0.0', port=8081)
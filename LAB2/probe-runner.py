@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+probe-runner.py
+
+Sondea una lista grande de targets con los módulos de blackdox.yml (http_2xx,
+tcp_connect, icmp) desde un solo proceso asyncio y expone todo en un único
+/metrics en caché, en lugar de un scrape de /probe por target.
+
+Archivo de targets, una línea por target:
+    http_2xx     http://localhost:8081/metrics   instance=python_app
+    tcp_connect  localhost:9115
+    icmp         10.0.0.12
+
+Uso:
+    python3 probe-runner.py --targets targets.txt --interval 30 --concurrency 500
+    python3 probe-runner.py --targets targets.txt --once      # una ronda a stdout
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from obslab.probes import ProbeRunner, load_modules, load_targets  # noqa: E402
+
+DEFAULT_CONFIG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "blackdox.yml")
+
+
+async def serve(runner, host, port, interval):
+    server = await asyncio.start_server(runner.handle_http, host, port)
+    print(f"Métricas en http://{host}:{port}/metrics ({len(runner.targets)} targets cada {interval:g}s)")
+    async with server:
+        await runner.run_forever(interval)
+
+
+async def run_once(runner):
+    start = time.perf_counter()
+    probes = await runner.run_round()
+    sys.stdout.write(runner.exposition.decode("utf-8"))
+    ok = sum(p.success for p in probes)
+    print(f"# {ok}/{len(probes)} probes OK en {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Probe runner asyncio con los módulos del blackbox exporter")
+    parser.add_argument("--config", default=DEFAULT_CONFIG, help="Archivo de módulos del blackbox exporter")
+    parser.add_argument("--targets", required=True, help="Archivo con '<módulo> <target> [label=valor ...]' por línea")
+    parser.add_argument("--concurrency", type=int, default=200, help="Probes simultáneos como máximo")
+    parser.add_argument("--interval", type=float, default=30.0, help="Segundos entre rondas")
+    parser.add_argument("--listen", default="0.0.0.0", help="Dirección del endpoint /metrics")
+    parser.add_argument("--port", type=int, default=9116, help="Puerto del endpoint /metrics")
+    parser.add_argument("--once", action="store_true", help="Ejecuta una sola ronda e imprime las métricas")
+    args = parser.parse_args()
+
+    modules = load_modules(args.config)
+    runner = ProbeRunner(modules, load_targets(args.targets, modules), args.concurrency)
+    try:
+        if args.once:
+            asyncio.run(run_once(runner))
+        else:
+            asyncio.run(serve(runner, args.listen, args.port, args.interval))
+    except KeyboardInterrupt:
+        print("Probe runner detenido")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+request-benchmark.py
+
+Compara requests/s de una app Flask como la de app.py en tres variantes:
+
+    sin-metricas     la app tal cual
+    request-metrics  con obslab.request_metrics.RequestMetrics
+    prometheus       instrumentación "ingenua" con Counter/Histogram/Gauge
+                     de prometheus_client en before/after_request
+
+Por omisión llama a la app WSGI en el mismo proceso (mide el costo de la
+instrumentación sin ruido de red). Con --http levanta el servidor de
+werkzeug y genera carga con varios hilos cliente.
+
+Uso:
+    python3 request-benchmark.py --requests 50000
+    python3 request-benchmark.py --http --requests 5000 --clients 8
+"""
+
+import argparse
+import http.client
+import logging
+import os
+import sys
+import threading
+import time
+
+from flask import Flask, g, request
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from werkzeug.serving import make_server
+from werkzeug.test import EnvironBuilder
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from obslab.request_metrics import RequestMetrics  # noqa: E402
+
+PATHS = ["/", "/items/1", "/items/2", "/items/3", "/error"]
+
+
+def build_app(variant):
+    app = Flask(__name__)
+    registry = CollectorRegistry()
+
+    @app.route("/")
+    def index():
+        return "ok"
+
+    @app.route("/items/<int:item_id>")
+    def item(item_id):
+        return {"id": item_id}
+
+    @app.route("/error")
+    def error():
+        return "error", 500
+
+    if variant == "request-metrics":
+        RequestMetrics(app, registry)
+    elif variant == "prometheus":
+        labels = ["route", "method", "status"]
+        requests = Counter("http_requests", "Requests", labels, registry=registry)
+        latency = Histogram("http_request_duration_seconds", "Latencia", labels, registry=registry)
+        in_flight = Gauge("http_requests_in_flight", "En curso", ["route", "method"], registry=registry)
+
+        @app.before_request
+        def start():
+            g.start = time.perf_counter()
+            g.route = request.url_rule.rule if request.url_rule else "<unmatched>"
+            in_flight.labels(g.route, request.method).inc()
+
+        @app.after_request
+        def finish(response):
+            status = str(response.status_code)
+            in_flight.labels(g.route, request.method).dec()
+            requests.labels(g.route, request.method, status).inc()
+            latency.labels(g.route, request.method, status).observe(time.perf_counter() - g.start)
+            return response
+
+    return app, registry
+
+
+def run_wsgi(app, total):
+    environs = [EnvironBuilder(path=path).get_environ() for path in PATHS]
+
+    def start_response(status, headers, exc_info=None):
+        pass
+
+    start = time.perf_counter()
+    for i in range(total):
+        for _ in app.wsgi_app(dict(environs[i % len(environs)]), start_response):
+            pass
+    return total / (time.perf_counter() - start)
+
+
+def run_http(app, total, clients):
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)  # sin log de acceso por request
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+    per_client = total // clients
+
+    def client():
+        for i in range(per_client):
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+            conn.request("GET", PATHS[i % len(PATHS)])
+            conn.getresponse().read()
+            conn.close()
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    return per_client * clients / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la instrumentación de requests de LAB2")
+    parser.add_argument("--requests", type=int, default=30000, help="Requests por variante")
+    parser.add_argument("--http", action="store_true", help="Carga real sobre HTTP (servidor de werkzeug)")
+    parser.add_argument("--clients", type=int, default=8, help="Hilos cliente con --http")
+    parser.add_argument("--repeat", type=int, default=3, help="Rondas alternando variantes; se informa la mejor")
+    args = parser.parse_args()
+
+    variants = ("sin-metricas", "request-metrics", "prometheus")
+    apps = {variant: build_app(variant) for variant in variants}
+    results = dict.fromkeys(variants, 0.0)
+    for _ in range(args.repeat):
+        for variant in variants:
+            app, _ = apps[variant]
+            if args.http:
+                rate = run_http(app, args.requests, args.clients)
+            else:
+                run_wsgi(app, 1000)  # calentamiento
+                rate = run_wsgi(app, args.requests)
+            results[variant] = max(results[variant], rate)
+
+    for variant in variants:
+        rate = results[variant]
+        scrape_start = time.perf_counter()
+        generate_latest(apps[variant][1])
+        scrape_ms = (time.perf_counter() - scrape_start) * 1000
+        print(f"{variant:<16} {rate:>10,.0f} req/s  {1e6 / rate:>7.1f} µs/req  (scrape {scrape_ms:.2f} ms)")
+
+    base = 1e6 / results["sin-metricas"]
+    for variant in ("request-metrics", "prometheus"):
+        print(f"costo de {variant}: {1e6 / results[variant] - base:+.1f} µs/req")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,11 +15,15 @@ from prometheus_client import (
     Counter,
     Histogram,
     Summary,
-    push_to_gateway,
 )
+import argparse
+import os
 import random
+import sys
 import time
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from obslab.sinks import add_sink_arguments, build_sinks  # noqa: E402
 
 PUSHGATEWAY_URL = "http://localhost:9091"
 registry = CollectorRegistry()
@@ -79,25 +83,40 @@ processing_time_summary = Summary(
 
 
 # ===========================
-# LOOP PRINCIPAL
+# DESTINOS (Pushgateway + opcionales)
 # ===========================
-while True:
-    # GAUGE
-    temperature.set(random.uniform(20.0, 35.0))
-    cpu_usage.set(random.uniform(0, 100))
-
-    # COUNTER
-    request_counter.inc(random.randint(1, 5))
-    if random.random() < 0.2:
-        error_counter.inc()
-
-    # HISTOGRAM
-    request_latency_hist.observe(random.uniform(0.05, 3.0))
-
-    # SUMMARY
-    processing_time_summary.observe(random.uniform(0.01, 1.5))
+parser = argparse.ArgumentParser(description="Envía métricas de ejemplo al Pushgateway")
+parser.add_argument("--pushgateway", default=PUSHGATEWAY_URL, help="Pushgateway URL ('' para desactivar el push)")
+add_sink_arguments(parser)
+args = parser.parse_args()
+sinks = build_sinks(args, replace=True)
 
-    # PUSH AL PUSHGATEWAY
-    push_to_gateway(PUSHGATEWAY_URL, job="app_metrics_job", registry=registry)
 
-    time.sleep(5)
+# ===========================
+# LOOP PRINCIPAL
+# ===========================
+try:
+    while True:
+        # GAUGE
+        temperature.set(random.uniform(20.0, 35.0))
+        cpu_usage.set(random.uniform(0, 100))
+
+        # COUNTER
+        request_counter.inc(random.randint(1, 5))
+        if random.random() < 0.2:
+            error_counter.inc()
+
+        # HISTOGRAM
+        request_latency_hist.observe(random.uniform(0.05, 3.0))
+
+        # SUMMARY
+        processing_time_summary.observe(random.uniform(0.01, 1.5))
+
+        # PUSH AL PUSHGATEWAY (y destinos adicionales)
+        for sink in sinks:
+            sink.push(registry, "app_metrics_job", None)
+
+        time.sleep(5)
+finally:
+    for sink in sinks:
+        sink.close()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+bucket-tune.py
+
+Propone buckets para los histogramas de los business cases a partir de los
+valores observados (ver obslab/bucket_tuning.py): la menor cantidad de
+límites con la que ``histogram_quantile`` queda dentro de ``--target-error``
+para los cuantiles 0.5/0.9/0.95/0.99 y los que usan los dashboards.
+
+Por defecto corre los simuladores ``--cycles`` ciclos y registra cada
+``observe()``. Con ``--capture`` usa los buckets de una captura
+(``business-case-N.py --capture DIR``), que solo permiten proponer límites tan
+finos como los que ya había: se elige un subconjunto de ellos y el error se
+mide contra esa resolución. ``--apply`` escribe la propuesta en
+``business-case-N.py``.
+
+Uso:
+    python3 bucket-tune.py
+    python3 bucket-tune.py --case 1 --target-error 0.02
+    python3 bucket-tune.py --capture /tmp/cap --apply
+"""
+
+import argparse
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from obslab.bucket_tuning import (DEFAULT_QUANTILES, apply_buckets, dashboard_quantiles,  # noqa: E402
+                                  error_groups, format_buckets, max_error, propose_buckets,
+                                  record_observations, samples_from_buckets)
+from obslab.dashboards import load_dashboard  # noqa: E402
+from obslab.scenarios import CASES, LAB4_DIR, Scenario, dashboard_path  # noqa: E402
+
+
+def observe_run(case, cycles):
+    """``{métrica: (buckets actuales, [muestras por serie])}`` corriendo el simulador."""
+    with record_observations() as (observed, current):
+        scenario = Scenario(case)
+        for _ in range(cycles):
+            scenario.step()
+    return {name: ([b for b in current[name] if math.isfinite(b)], list(series.values()))
+            for name, series in observed.items()}
+
+
+def observe_capture(path, case):
+    """Lo mismo a partir de la última muestra de cada ``_bucket`` de la captura."""
+    from obslab.capture import CaptureReader
+
+    reader = CaptureReader(path)
+    last = reader.last_values()
+    job = CASES[case][0]
+    buckets = {}
+    for i, (name, labels) in enumerate(reader.series):
+        if not name.endswith("_bucket") or labels.get("job") != job or math.isnan(last[i]):
+            continue
+        key = tuple(sorted((k, v) for k, v in labels.items() if k != "le"))
+        buckets.setdefault(name[:-len("_bucket")], {}).setdefault(key, []).append((float(labels["le"]), last[i]))
+    found = {}
+    for name, series in buckets.items():
+        bounds = sorted({le for points in series.values() for le, _ in points if math.isfinite(le)})
+        found[name] = (bounds, [samples_from_buckets(points) for points in series.values()])
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Propone buckets de histogramas según los datos observados")
+    parser.add_argument("--case", type=int, action="append", choices=sorted(CASES),
+                        help="Business case a analizar (repetible; por defecto todos)")
+    parser.add_argument("--cycles", type=int, default=200, help="Ciclos de simulación a observar")
+    parser.add_argument("--capture", help="Directorio de captura a usar en lugar de correr los simuladores")
+    parser.add_argument("--target-error", type=float, default=0.05,
+                        help="Error relativo máximo de histogram_quantile (por defecto 0.05)")
+    parser.add_argument("--quantiles", type=lambda s: [float(q) for q in s.split(",")],
+                        default=list(DEFAULT_QUANTILES), help="Cuantiles a cuidar, separados por coma")
+    parser.add_argument("--min-buckets", type=int, default=4,
+                        help="Límites mínimos de la propuesta, aunque menos alcancen para el error objetivo")
+    parser.add_argument("--apply", action="store_true", help="Escribe los buckets propuestos en business-case-N.py")
+    args = parser.parse_args()
+
+    total_before = total_after = 0
+    for case in args.case or sorted(CASES):
+        from_dashboard = dashboard_quantiles(load_dashboard(dashboard_path(case)))
+        found = observe_capture(args.capture, case) if args.capture else observe_run(case, args.cycles)
+        print(f"📊 business case {case}")
+        if not found:
+            print("   sin observaciones de histogramas\n")
+            continue
+        for name, (current, series) in sorted(found.items()):
+            quantiles = sorted(set(args.quantiles) | from_dashboard.get(name, set()))
+            # Con una captura no se sabe nada más fino que los buckets que ya había
+            proposal, error = propose_buckets(series, quantiles, args.target_error,
+                                              candidates=current if args.capture else None,
+                                              min_buckets=args.min_buckets)
+            # Los mismos grupos que mide la propuesta (por serie y sumados), para comparar
+            current_error = max_error(error_groups(series), current, quantiles) if current else math.nan
+            # Series por histograma: un _bucket por límite más +Inf, _sum y _count
+            before = (len(current) + 3) * len(series)
+            after = (len(proposal) + 3) * len(series)
+            total_before += before
+            total_after += after
+            print(f"   {name} ({len(series)} serie(s), cuantiles {', '.join(f'{q:g}' for q in quantiles)})")
+            print(f"      actual:    {format_buckets(current)}  error {current_error:.1%}")
+            print(f"      propuesto: {format_buckets(proposal)}  error {error:.1%}")
+            print(f"      series: {before} -> {after}")
+            if len(proposal) < args.min_buckets:
+                print(f"      ⚠️  solo {len(proposal)} límite(s) posibles: no alcanza --min-buckets {args.min_buckets}"
+                      + (", no se aplica" if args.apply else ""))
+            elif args.apply:
+                path = os.path.join(LAB4_DIR, f"business-case-{case}.py")
+                if apply_buckets(path, name, proposal):
+                    print(f"      ✏️  aplicado en {os.path.basename(path)}")
+                else:
+                    print(f"      ⚠️  no se encontró Histogram('{name}', ...) en {os.path.basename(path)}")
+        print()
+    print(f"Series de histogramas (una instancia por caso): {total_before} -> {total_after}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,13 @@
 #!/usr/bin/env python3
+import os
+import sys
 import time
 import random
 import argparse
-from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, pushadd_to_gateway
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from obslab.sinks import add_sink_arguments, build_sinks  # noqa: E402
 
 def build_registry(registry):
     # 1. Transacciones y Negocio Central
@@ -71,115 +76,120 @@ def build_registry(registry):
         "db_query_time_seconds", "Latencia de consultas DB", buckets=[0.001, 0.005, 0.01, 0.05], registry=registry
     )
 
+    # Estado persistente para Gauges que no son de infra (ej. NPL)
+    registry.npl_value = 0.025 # Inicializamos NPL
+
     return registry
 
+CHANNELS = ["web", "mobile", "api"]
+ATM_DEVICES = [f"ATM-{i:03d}" for i in range(1, 4)]
+CREDIT_TYPES = ["personal", "hipotecario", "auto"]
+API_SERVICES = ["accounts", "payments", "auth"]
+
+def simulate(registry):
+    # --- 1. Transacciones y Negocio Central ---
+    for ch in CHANNELS:
+        attempts = random.randint(100, 500)
+        successes = int(attempts * random.uniform(0.95, 0.995))
+        failures = attempts - successes
+
+        # Transferencias
+        registry.bank_transaction_total.labels(type="transfer", status="success", channel=ch).inc(successes)
+        registry.bank_transaction_total.labels(type="transfer", status="failed", channel=ch).inc(failures)
+        registry.bank_transaction_value_total.labels(type="transfer").inc(successes * random.randint(1000, 50000))
+
+        # Apertura de cuentas (Simulado como un evento batch o menos frecuente)
+        if random.random() < 0.1:
+            registry.bank_new_accounts_total.labels(product="checking").inc(1)
+
+        # Latencia de pagos interbancarios (simulando un worker)
+        for _ in range(random.randint(0, 5)):
+            registry.bank_payments_processing_time_seconds.observe(random.uniform(0.1, 5.0))
+
+    # --- 2. Originación de Crédito y Riesgo ---
+    for ctype in CREDIT_TYPES:
+        applications = random.randint(1, 10)
+        approved = int(applications * random.uniform(0.5, 0.8))
+        registry.credit_application_total.labels(product_type=ctype).inc(applications)
+        registry.credit_application_approved_total.labels(product_type=ctype).inc(approved)
+
+        for _ in range(applications):
+            registry.credit_application_latency_seconds.observe(random.uniform(10, 600))
+
+    # NPL (se simula un pequeño cambio que se "push" de un proceso diario)
+    registry.npl_value += random.uniform(-0.0005, 0.0005)
+    registry.bank_npl_ratio.set(round(registry.npl_value, 4))
+
+    # --- 3. Cajeros Automáticos (ATM) ---
+    for device in ATM_DEVICES:
+        # Estado y Cash Level (Gauges)
+        status = 1 if random.random() > 0.1 else 0 # 10% de probabilidad de fallo
+        registry.atm_device_status.labels(device_id=device).set(status)
+        registry.atm_cash_level_percent.labels(device_id=device).set(random.uniform(10, 95))
+
+        # Transacciones y fallos (Counters)
+        if status == 1:
+            registry.atm_transaction_total.labels(operation="withdrawal").inc(random.randint(5, 20))
+        else:
+            registry.atm_out_of_service_total.labels(reason="hardware_fail").inc(1)
+
+    # --- 4. Seguridad y Fraude (LOGICA MEJORADA) ---
+    for ch in CHANNELS:
+        registry.security_login_success_total.labels(channel=ch).inc(random.randint(10, 100))
+
+    # Incremento garantizado y más alto para fallos de login
+    registry.security_login_failed_total.labels(reason="credentials_fail").inc(random.randint(3, 10))
+
+    # Mayor probabilidad (0.2) y mayor incremento (1 a 3) para las alertas de fraude
+    if random.random() < 0.2:
+        num_alerts = random.randint(1, 3)
+        registry.security_fraud_alerts_total.labels(severity="critical").inc(num_alerts)
+
+    # --- 5. Backend / APIs ---
+    for svc in API_SERVICES:
+        reqs = random.randint(50, 500)
+        errors = int(reqs * random.uniform(0.00, 0.01))
+        registry.api_requests_total.labels(service=svc, code="200").inc(reqs - errors)
+        if errors > 0:
+            registry.api_requests_total.labels(service=svc, code="500").inc(errors) # 5xx es un request total que falla
+        # Latency samples
+        for _ in range(min(reqs // 50, 10)):
+            registry.api_latency_seconds.observe(random.uniform(0.01, 0.5))
+
+    # DB Latency (general pool)
+    for _ in range(random.randint(5, 20)):
+        registry.db_query_time_seconds.observe(random.uniform(0.0005, 0.05))
+
 def simulate_and_push(args):
     registry = CollectorRegistry()
     registry = build_registry(registry)
-
-    channels = ["web", "mobile", "api"]
-    atm_devices = [f"ATM-{i:03d}" for i in range(1, 4)]
-    credit_types = ["personal", "hipotecario", "auto"]
-    api_services = ["accounts", "payments", "auth"]
-
-    # Estado persistente para Gauges que no son de infra (ej. NPL)
-    npl_value = 0.025 # Inicializamos NPL
-
-    while True:
-        # --- 1. Transacciones y Negocio Central ---
-        for ch in channels:
-            attempts = random.randint(100, 500)
-            successes = int(attempts * random.uniform(0.95, 0.995))
-            failures = attempts - successes
-            
-            # Transferencias
-            registry.bank_transaction_total.labels(type="transfer", status="success", channel=ch).inc(successes)
-            registry.bank_transaction_total.labels(type="transfer", status="failed", channel=ch).inc(failures)
-            registry.bank_transaction_value_total.labels(type="transfer").inc(successes * random.randint(1000, 50000))
-
-            # Apertura de cuentas (Simulado como un evento batch o menos frecuente)
-            if random.random() < 0.1:
-                registry.bank_new_accounts_total.labels(product="checking").inc(1)
-            
-            # Latencia de pagos interbancarios (simulando un worker)
-            for _ in range(random.randint(0, 5)):
-                registry.bank_payments_processing_time_seconds.observe(random.uniform(0.1, 5.0))
-
-        # --- 2. Originación de Crédito y Riesgo ---
-        for ctype in credit_types:
-            applications = random.randint(1, 10)
-            approved = int(applications * random.uniform(0.5, 0.8))
-            registry.credit_application_total.labels(product_type=ctype).inc(applications)
-            registry.credit_application_approved_total.labels(product_type=ctype).inc(approved)
-            
-            for _ in range(applications):
-                registry.credit_application_latency_seconds.observe(random.uniform(10, 600))
-
-        # NPL (se simula un pequeño cambio que se "push" de un proceso diario)
-        npl_value += random.uniform(-0.0005, 0.0005)
-        registry.bank_npl_ratio.set(round(npl_value, 4))
-        
-        # --- 3. Cajeros Automáticos (ATM) ---
-        for device in atm_devices:
-            # Estado y Cash Level (Gauges)
-            status = 1 if random.random() > 0.1 else 0 # 10% de probabilidad de fallo
-            registry.atm_device_status.labels(device_id=device).set(status)
-            registry.atm_cash_level_percent.labels(device_id=device).set(random.uniform(10, 95))
-
-            # Transacciones y fallos (Counters)
-            if status == 1:
-                registry.atm_transaction_total.labels(operation="withdrawal").inc(random.randint(5, 20))
-            else:
-                registry.atm_out_of_service_total.labels(reason="hardware_fail").inc(1)
-
-        # --- 4. Seguridad y Fraude (LOGICA MEJORADA) ---
-        for ch in channels:
-            registry.security_login_success_total.labels(channel=ch).inc(random.randint(10, 100))
-        
-        # Incremento garantizado y más alto para fallos de login
-        registry.security_login_failed_total.labels(reason="credentials_fail").inc(random.randint(3, 10))
-        
-        # Mayor probabilidad (0.2) y mayor incremento (1 a 3) para las alertas de fraude
-        if random.random() < 0.2:
-            num_alerts = random.randint(1, 3)
-            registry.security_fraud_alerts_total.labels(severity="critical").inc(num_alerts)
-
-        # --- 5. Backend / APIs ---
-        for svc in api_services:
-            reqs = random.randint(50, 500)
-            errors = int(reqs * random.uniform(0.00, 0.01))
-            registry.api_requests_total.labels(service=svc, code="200").inc(reqs - errors)
-            if errors > 0:
-                registry.api_requests_total.labels(service=svc, code="500").inc(errors) # 5xx es un request total que falla
-            # Latency samples
-            for _ in range(min(reqs // 50, 10)):
-                registry.api_latency_seconds.observe(random.uniform(0.01, 0.5))
-        
-        # DB Latency (general pool)
-        for _ in range(random.randint(5, 20)):
-            registry.db_query_time_seconds.observe(random.uniform(0.0005, 0.05))
-
-        # --- Push al Pushgateway ---
-        instance = args.instance or "bank-sim-core-1"
-        try:
-            pushadd_to_gateway(
-                args.pushgateway,
-                job=args.job,
-                registry=registry,
-                grouping_key={"instance": instance}
-            )
-            print(f"Pushed metrics to {args.pushgateway} (job={args.job}, instance={instance}) at {time.strftime('%H:%M:%S')}")
-        except Exception as e:
-            print(f"Error pushing to Pushgateway: {e}")
-
-        time.sleep(args.interval)
+    sinks = build_sinks(args)
+    instance = args.instance or "bank-sim-core-1"
+
+    try:
+        while True:
+            simulate(registry)
+
+            # --- Push a los destinos configurados (Pushgateway por defecto) ---
+            for sink in sinks:
+                try:
+                    sink.push(registry, args.job, {"instance": instance})
+                    print(f"Pushed metrics to {sink} (job={args.job}, instance={instance}) at {time.strftime('%H:%M:%S')}")
+                except Exception as e:
+                    print(f"Error pushing to {sink}: {e}")
+
+            time.sleep(args.interval)
+    finally:
+        for sink in sinks:
+            sink.close()
 
 def main():
     parser = argparse.ArgumentParser(description="Banking metrics simulator (push to Pushgateway)")
-    parser.add_argument("--pushgateway", default="http://localhost:9091", help="Pushgateway URL")
+    parser.add_argument("--pushgateway", default="http://localhost:9091", help="Pushgateway URL ('' para desactivar el push)")
     parser.add_argument("--job", default="banking_core_job", help="Pushgateway job name")
     parser.add_argument("--instance", default="bank-sim-core-1", help="Instance label to push (grouping_key)")
     parser.add_argument("--interval", type=int, default=5, help="Seconds between pushes")
+    add_sink_arguments(parser)
     args = parser.parse_args()
 
     # Inicializa el estado para que los contadores no se resetee con cada llamada a build_registry
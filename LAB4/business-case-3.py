@@ -1,8 +1,13 @@
 #!/usr/bin/env python3
+import os
+import sys
 import time
 import random
 import argparse
-from prometheus_client import CollectorRegistry, Gauge, Counter, Histogram, Summary, pushadd_to_gateway
+from prometheus_client import CollectorRegistry, Gauge, Counter, Histogram, Summary
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from obslab.sinks import add_sink_arguments, build_sinks  # noqa: E402
 
 def build_registry(registry):
     # 1. Capacidad e Instalaciones (Gauges)
@@ -76,82 +81,87 @@ def build_registry(registry):
 
     return registry
 
+WARDS = ["General A", "General B", "Pediatrics", "ICU", "Maternity"]
+CLINICS = ["Cardiology", "Neurology", "General Practice"]
+SUPPLIES = ["Masks", "Gloves", "Syringes"]
+
+def simulate(registry):
+    # --- 1. Capacidad e Instalaciones (Gauges) ---
+    for w in WARDS:
+        # Randomize capacity for each ward
+        capacity = random.randint(15, 50) if w != "ICU" else 20
+        available = random.randint(0, int(capacity * random.uniform(0.1, 0.7)))
+        registry.hospital_beds_available_gauge.labels(ward=w).set(available)
+
+        if w == "ICU":
+            occupancy_percent = 100 * (capacity - available) / capacity
+            registry.hospital_icu_occupancy_percent_gauge.set(round(occupancy_percent, 2))
+
+    registry.hospital_waiting_room_patients_gauge.set(random.randint(5, 50))
+    registry.hospital_ventilators_in_use_gauge.set(random.randint(0, 30))
+    registry.hospital_isolation_rooms_available_gauge.set(random.randint(0, 5))
+    registry.hospital_staff_on_duty_gauge.set(random.randint(150, 400))
+
+    # --- 2. Flujo de Pacientes (Counters & Histograms) ---
+    registry.hospital_admissions_total.inc(random.randint(5, 20))
+    registry.hospital_discharges_total.inc(random.randint(4, 18))
+    registry.hospital_icu_admissions_total.inc(random.randint(0, 4))
+    registry.hospital_emergency_calls_total.inc(random.randint(2, 10))
+
+    for _ in range(random.randint(10, 30)):
+        registry.hospital_er_wait_time_minutes_histogram.observe(random.uniform(5, 120))
+
+    for c in CLINICS:
+        registry.hospital_appointments_completed_total.labels(clinic=c).inc(random.randint(5, 30))
+
+    # --- 3. Calidad y Seguridad (Counters & Histograms) ---
+    if random.random() < 0.05:
+        registry.hospital_medication_errors_total.inc()
+    if random.random() < 0.03:
+        registry.hospital_patient_readmissions_total.inc()
+
+    registry.hospital_telemetry_errors_total.inc(random.randint(0, 5))
+
+    # MODIFICADO: Observar la duración en el nuevo Histogram
+    for _ in range(random.randint(2, 8)):
+        registry.hospital_surgery_duration_minutes_histogram.observe(random.uniform(30, 600))
+
+    # --- 4. Logística y Recursos (Gauges) ---
+    for s in SUPPLIES:
+        registry.hospital_med_supplies_remaining_gauge.labels(supply_type=s).set(random.randint(100, 10000))
+
+    registry.hospital_cleanliness_score_gauge.set(round(random.uniform(8.5, 9.9), 1))
+
 def simulate_and_push(args):
     registry = CollectorRegistry()
     registry = build_registry(registry)
-
-    wards = ["General A", "General B", "Pediatrics", "ICU", "Maternity"]
-    clinics = ["Cardiology", "Neurology", "General Practice"]
-    supplies = ["Masks", "Gloves", "Syringes"]
-
-    while True:
-        # --- 1. Capacidad e Instalaciones (Gauges) ---
-        for w in wards:
-            # Randomize capacity for each ward
-            capacity = random.randint(15, 50) if w != "ICU" else 20
-            available = random.randint(0, int(capacity * random.uniform(0.1, 0.7)))
-            registry.hospital_beds_available_gauge.labels(ward=w).set(available)
-            
-            if w == "ICU":
-                occupancy_percent = 100 * (capacity - available) / capacity
-                registry.hospital_icu_occupancy_percent_gauge.set(round(occupancy_percent, 2))
-
-        registry.hospital_waiting_room_patients_gauge.set(random.randint(5, 50))
-        registry.hospital_ventilators_in_use_gauge.set(random.randint(0, 30))
-        registry.hospital_isolation_rooms_available_gauge.set(random.randint(0, 5))
-        registry.hospital_staff_on_duty_gauge.set(random.randint(150, 400))
-        
-        # --- 2. Flujo de Pacientes (Counters & Histograms) ---
-        registry.hospital_admissions_total.inc(random.randint(5, 20))
-        registry.hospital_discharges_total.inc(random.randint(4, 18))
-        registry.hospital_icu_admissions_total.inc(random.randint(0, 4))
-        registry.hospital_emergency_calls_total.inc(random.randint(2, 10))
-        
-        for _ in range(random.randint(10, 30)):
-            registry.hospital_er_wait_time_minutes_histogram.observe(random.uniform(5, 120))
-
-        for c in clinics:
-            registry.hospital_appointments_completed_total.labels(clinic=c).inc(random.randint(5, 30))
-
-        # --- 3. Calidad y Seguridad (Counters & Histograms) ---
-        if random.random() < 0.05:
-            registry.hospital_medication_errors_total.inc()
-        if random.random() < 0.03:
-            registry.hospital_patient_readmissions_total.inc()
-            
-        registry.hospital_telemetry_errors_total.inc(random.randint(0, 5))
-        
-        # MODIFICADO: Observar la duración en el nuevo Histogram
-        for _ in range(random.randint(2, 8)):
-            registry.hospital_surgery_duration_minutes_histogram.observe(random.uniform(30, 600))
-
-        # --- 4. Logística y Recursos (Gauges) ---
-        for s in supplies:
-            registry.hospital_med_supplies_remaining_gauge.labels(supply_type=s).set(random.randint(100, 10000))
-
-        registry.hospital_cleanliness_score_gauge.set(round(random.uniform(8.5, 9.9), 1))
-
-        # --- Push al Pushgateway ---
-        instance = args.instance or "hospital-sim-1"
-        try:
-            pushadd_to_gateway(
-                args.pushgateway,
-                job=args.job,
-                registry=registry,
-                grouping_key={"instance": instance}
-            )
-            print(f"Pushed metrics to {args.pushgateway} (job={args.job}, instance={instance}) at {time.strftime('%H:%M:%S')}")
-        except Exception as e:
-            print(f"Error pushing to Pushgateway: {e}")
-
-        time.sleep(args.interval)
+    sinks = build_sinks(args)
+    instance = args.instance or "hospital-sim-1"
+
+    try:
+        while True:
+            simulate(registry)
+
+            # --- Push a los destinos configurados (Pushgateway por defecto) ---
+            for sink in sinks:
+                try:
+                    sink.push(registry, args.job, {"instance": instance})
+                    print(f"Pushed metrics to {sink} (job={args.job}, instance={instance}) at {time.strftime('%H:%M:%S')}")
+                except Exception as e:
+                    print(f"Error pushing to {sink}: {e}")
+
+            time.sleep(args.interval)
+    finally:
+        for sink in sinks:
+            sink.close()
 
 def main():
     parser = argparse.ArgumentParser(description="Hospital metrics simulator (push to Pushgateway)")
-    parser.add_argument("--pushgateway", default="http://localhost:9091", help="Pushgateway URL")
+    parser.add_argument("--pushgateway", default="http://localhost:9091", help="Pushgateway URL ('' para desactivar el push)")
     parser.add_argument("--job", default="hospital_job", help="Pushgateway job name")
     parser.add_argument("--instance", default="hospital-sim-1", help="Instance label to push (grouping_key)")
     parser.add_argument("--interval", type=int, default=5, help="Seconds between pushes")
+    add_sink_arguments(parser)
     args = parser.parse_args()
 
     simulate_and_push(args)
@@ -13,10 +13,15 @@ Uso:
     python3 telecom_push.py --instance <instance-name> --pushgateway http://localhost:9091 --interval 5
 """
 
+import os
+import sys
 import time
 import random
 import argparse
-from prometheus_client import CollectorRegistry, Gauge, Counter, Histogram, Summary, pushadd_to_gateway
+from prometheus_client import CollectorRegistry, Gauge, Counter, Histogram, Summary
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from obslab.sinks import add_sink_arguments, build_sinks  # noqa: E402
 
 def build_registry(registry):
     # 1. Clientes y Capacidad (Gauges)
@@ -81,83 +86,88 @@ def build_registry(registry):
 
     return registry
 
+REGIONS = ["north", "south", "east", "west"]
+ROUTERS = ["core_r1", "core_r2", "edge_r3", "edge_r4"]
+COMPLAINT_TOPICS = ["speed", "outage", "billing"]
+
+def simulate(registry):
+    # --- 1. Clientes y Capacidad (Gauges) ---
+    peak_users = random.randint(20000, 120000)
+    registry.isp_peak_users_gauge.set(peak_users)
+    registry.isp_current_bandwidth_mbps_gauge.set(random.uniform(100, 5000))
+    registry.isp_routers_online_gauge.set(random.randint(4, 12))
+
+    for r in REGIONS:
+        active_customers = random.randint(10000, 90000)
+        registry.isp_active_customers_gauge.labels(region=r).set(active_customers)
+        # Gauges de promedio
+        registry.isp_average_latency_ms_gauge.labels(region=r).set(random.uniform(5, 120))
+
+    # --- 2. Red y Rendimiento (Counters & Histograms) ---
+    for rt in ROUTERS:
+        registry.isp_packets_dropped_total.labels(router=rt).inc(random.randint(0, 500))
+
+    # Throughput total
+    registry.isp_throughput_bytes_total.inc(random.randint(1_000_000_000, 100_000_000_000))
+
+    # Errores de conexión (ej. DHCP, PPPoE)
+    registry.isp_connection_errors_total.labels(protocol="dhcp").inc(random.randint(0, 50))
+
+    # Latency & Bandwidth distributions
+    for _ in range(random.randint(10, 50)):
+        registry.isp_bandwidth_usage_mbps_histogram.observe(random.uniform(1, 800))
+        registry.isp_latency_ms_histogram.observe(random.uniform(1, 400))
+
+    # Jitter
+    registry.isp_avg_jitter_ms_gauge.set(random.uniform(0.1, 30))
+
+    # --- 3. Calidad de Servicio (QoS) y Fallas ---
+    if random.random() < 0.05:
+        # Outage event
+        registry.isp_outages_total.labels(cause="fiber_cut").inc()
+        registry.isp_repair_time_hours_summary.observe(random.uniform(0.5, 24))
+
+    registry.isp_reconnects_total.inc(random.randint(0, 300))
+
+    if random.random() < 0.02:
+        registry.isp_sla_violations_total.inc()
+
+    # Quejas de clientes
+    complaints = random.randint(0, 5)
+    if complaints > 0:
+        topic = random.choice(COMPLAINT_TOPICS)
+        registry.isp_customer_complaints_total.labels(topic=topic).inc(complaints)
+
 def simulate_and_push(args):
     registry = CollectorRegistry()
     registry = build_registry(registry)
-
-    regions = ["north", "south", "east", "west"]
-    routers = ["core_r1", "core_r2", "edge_r3", "edge_r4"]
-    complaint_topics = ["speed", "outage", "billing"]
-
-    while True:
-        # --- 1. Clientes y Capacidad (Gauges) ---
-        peak_users = random.randint(20000, 120000)
-        registry.isp_peak_users_gauge.set(peak_users)
-        registry.isp_current_bandwidth_mbps_gauge.set(random.uniform(100, 5000))
-        registry.isp_routers_online_gauge.set(random.randint(4, 12))
-
-        for r in regions:
-            active_customers = random.randint(10000, 90000)
-            registry.isp_active_customers_gauge.labels(region=r).set(active_customers)
-            # Gauges de promedio
-            registry.isp_average_latency_ms_gauge.labels(region=r).set(random.uniform(5, 120))
-
-        # --- 2. Red y Rendimiento (Counters & Histograms) ---
-        for rt in routers:
-            registry.isp_packets_dropped_total.labels(router=rt).inc(random.randint(0, 500))
-        
-        # Throughput total
-        registry.isp_throughput_bytes_total.inc(random.randint(1_000_000_000, 100_000_000_000))
-
-        # Errores de conexión (ej. DHCP, PPPoE)
-        registry.isp_connection_errors_total.labels(protocol="dhcp").inc(random.randint(0, 50))
-
-        # Latency & Bandwidth distributions
-        for _ in range(random.randint(10, 50)):
-            registry.isp_bandwidth_usage_mbps_histogram.observe(random.uniform(1, 800))
-            registry.isp_latency_ms_histogram.observe(random.uniform(1, 400))
-        
-        # Jitter
-        registry.isp_avg_jitter_ms_gauge.set(random.uniform(0.1, 30))
-
-        # --- 3. Calidad de Servicio (QoS) y Fallas ---
-        if random.random() < 0.05:
-            # Outage event
-            registry.isp_outages_total.labels(cause="fiber_cut").inc()
-            registry.isp_repair_time_hours_summary.observe(random.uniform(0.5, 24))
-            
-        registry.isp_reconnects_total.inc(random.randint(0, 300))
-
-        if random.random() < 0.02:
-            registry.isp_sla_violations_total.inc()
-        
-        # Quejas de clientes
-        complaints = random.randint(0, 5)
-        if complaints > 0:
-            topic = random.choice(complaint_topics)
-            registry.isp_customer_complaints_total.labels(topic=topic).inc(complaints)
-
-        # --- Push al Pushgateway ---
-        instance = args.instance or "telecom-sim-1"
-        try:
-            pushadd_to_gateway(
-                args.pushgateway,
-                job=args.job,
-                registry=registry,
-                grouping_key={"instance": instance}
-            )
-            print(f"Pushed metrics to {args.pushgateway} (job={args.job}, instance={instance}) at {time.strftime('%H:%M:%S')}")
-        except Exception as e:
-            print(f"Error pushing to Pushgateway: {e}")
-
-        time.sleep(args.interval)
+    sinks = build_sinks(args)
+    instance = args.instance or "telecom-sim-1"
+
+    try:
+        while True:
+            simulate(registry)
+
+            # --- Push a los destinos configurados (Pushgateway por defecto) ---
+            for sink in sinks:
+                try:
+                    sink.push(registry, args.job, {"instance": instance})
+                    print(f"Pushed metrics to {sink} (job={args.job}, instance={instance}) at {time.strftime('%H:%M:%S')}")
+                except Exception as e:
+                    print(f"Error pushing to {sink}: {e}")
+
+            time.sleep(args.interval)
+    finally:
+        for sink in sinks:
+            sink.close()
 
 def main():
     parser = argparse.ArgumentParser(description="Telecom metrics simulator (push to Pushgateway)")
-    parser.add_argument("--pushgateway", default="http://localhost:9091", help="Pushgateway URL")
+    parser.add_argument("--pushgateway", default="http://localhost:9091", help="Pushgateway URL ('' para desactivar el push)")
     parser.add_argument("--job", default="telecom_job", help="Pushgateway job name")
     parser.add_argument("--instance", default="telecom-sim-1", help="Instance label to push (grouping_key)")
     parser.add_argument("--interval", type=int, default=5, help="Seconds between pushes")
+    add_sink_arguments(parser)
     args = parser.parse_args()
 
     simulate_and_push(args)
@@ -1,8 +1,15 @@
 #!/usr/bin/env python3
+import os
+import sys
 import time
 import random
 import argparse
-from prometheus_client import CollectorRegistry, Gauge, Counter, Histogram, Summary, pushadd_to_gateway
+import numpy as np
+from prometheus_client import CollectorRegistry, Gauge, Counter, Histogram, Summary
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from obslab.aggregate_sim import Uniform, observe_distribution, volume  # noqa: E402
+from obslab.sinks import add_sink_arguments, build_sinks  # noqa: E402
 
 def build_registry(registry):
     # 1. Rendimiento y Latencia (Gauges, Histograms, Summaries)
@@ -69,90 +76,155 @@ def build_registry(registry):
 
     return registry
 
+ENDPOINTS = ["/login", "/search", "/billing", "/upload", "/report"]
+INSTANCES = [f"i-{i:03d}" for i in range(1, 8)]
+
+# Las distribuciones de simulate, para el modo por agregados
+DISTRIBUTIONS = {"request_duration": Uniform(0.01, 2.5), "db_query": Uniform(0.001, 0.5)}
+
+def simulate(registry):
+    # --- 1. Rendimiento y Latencia ---
+    registry.saas_active_sessions_gauge.set(random.randint(100, 5000))
+
+    for ep in ENDPOINTS:
+        # Latency Gauge (instantaneous sample)
+        registry.saas_api_latency_ms_gauge.labels(endpoint=ep).set(random.uniform(10, 700))
+
+        # Cache Hit Ratio Gauge
+        registry.saas_cache_hit_ratio_gauge.labels(endpoint=ep).set(random.uniform(0.4, 0.99))
+
+        # Requests and Duration (Counters, Histograms, Summaries)
+        get_reqs = random.randint(10, 500)
+        post_reqs = random.randint(0, 200)
+
+        # Successful Requests
+        registry.saas_api_requests_total_counter.labels(endpoint=ep, method="GET", code="200").inc(get_reqs)
+        registry.saas_api_requests_total_counter.labels(endpoint=ep, method="POST", code="200").inc(post_reqs)
+
+        for _ in range(get_reqs + post_reqs):
+            registry.saas_request_duration_seconds_histogram.observe(random.uniform(0.01, 2.5))
+            registry.saas_db_query_seconds_summary.observe(random.uniform(0.001, 0.5))
+
+    registry.saas_stream_bytes_total.inc(random.randint(1000, 500000))
+
+    # --- 2. Errores y Calidad ---
+    error_count = 0
+    for ep in ENDPOINTS:
+        if random.random() < 0.03:
+            app_errors = random.randint(1, 5)
+            registry.saas_errors_total_counter.labels(endpoint=ep).inc(app_errors)
+            error_count += app_errors
+            # Also log API 5xx errors
+            registry.saas_api_requests_total_counter.labels(endpoint=ep, method="GET", code="500").inc(random.randint(0, 2))
+
+    # Approximate Error Rate (This would normally be calculated in Prometheus)
+    # We simulate the final output of a PromQL query for demonstration.
+    registry.saas_error_rate_5m_gauge.set(random.uniform(0.0, 5.0)) # Rate in errors per 1000 requests
+
+    # --- 3. Infraestructura y DevOps ---
+    for inst in INSTANCES:
+        registry.saas_instance_cpu_percent_gauge.labels(instance_id=inst).set(random.uniform(1, 95))
+        registry.saas_instance_memory_mb_gauge.labels(instance_id=inst).set(random.uniform(200, 32000))
+
+    registry.saas_deployments_total.inc(random.randint(0, 1))
+    registry.saas_background_jobs_pending_gauge.set(random.randint(0, 120))
+    registry.saas_db_connections_gauge.set(random.randint(20, 500))
+
+    # --- 4. Negocio y Crecimiento ---
+    registry.saas_user_signup_total.inc(random.randint(0, 20))
+    registry.saas_password_reset_total.inc(random.randint(0, 5))
+    registry.saas_feature_flag_active_gauge.labels(flag="beta_ui").set(random.choice([0, 1]))
+    registry.saas_feature_flag_active_gauge.labels(flag="new_pricing").set(1)
+
+def simulate_aggregate(registry, rng, scale=1.0):
+    """
+    Mismo tráfico que simulate con ``scale`` veces más volumen, sorteando el
+    resultado de cada ciclo (ver obslab/aggregate_sim.py): el costo no depende
+    del volumen. ``rng`` es un numpy.random.Generator.
+    """
+    # --- 1. Rendimiento y Latencia ---
+    registry.saas_active_sessions_gauge.set(volume(rng, 100, 5000, scale))
+
+    requests = 0
+    for ep in ENDPOINTS:
+        registry.saas_api_latency_ms_gauge.labels(endpoint=ep).set(rng.uniform(10, 700))
+        registry.saas_cache_hit_ratio_gauge.labels(endpoint=ep).set(rng.uniform(0.4, 0.99))
+
+        get_reqs = volume(rng, 10, 500, scale)
+        post_reqs = volume(rng, 0, 200, scale)
+        registry.saas_api_requests_total_counter.labels(endpoint=ep, method="GET", code="200").inc(get_reqs)
+        registry.saas_api_requests_total_counter.labels(endpoint=ep, method="POST", code="200").inc(post_reqs)
+        requests += get_reqs + post_reqs
+
+    # Histograma y summary sin labels: un solo sorteo por ciclo para todos los endpoints
+    observe_distribution(rng, registry.saas_request_duration_seconds_histogram, DISTRIBUTIONS["request_duration"], requests)
+    observe_distribution(rng, registry.saas_db_query_seconds_summary, DISTRIBUTIONS["db_query"], requests)
+    registry.saas_stream_bytes_total.inc(volume(rng, 1000, 500000, scale))
+
+    # --- 2. Errores y Calidad ---
+    for ep in ENDPOINTS:
+        if rng.random() < 0.03:
+            registry.saas_errors_total_counter.labels(endpoint=ep).inc(volume(rng, 1, 5, scale))
+            registry.saas_api_requests_total_counter.labels(endpoint=ep, method="GET", code="500").inc(volume(rng, 0, 2, scale))
+    registry.saas_error_rate_5m_gauge.set(rng.uniform(0.0, 5.0))
+
+    # --- 3. Infraestructura y DevOps ---
+    for inst in INSTANCES:
+        registry.saas_instance_cpu_percent_gauge.labels(instance_id=inst).set(rng.uniform(1, 95))
+        registry.saas_instance_memory_mb_gauge.labels(instance_id=inst).set(rng.uniform(200, 32000))
+
+    registry.saas_deployments_total.inc(rng.integers(0, 2))
+    registry.saas_background_jobs_pending_gauge.set(volume(rng, 0, 120, scale))
+    registry.saas_db_connections_gauge.set(rng.integers(20, 501))
+
+    # --- 4. Negocio y Crecimiento ---
+    registry.saas_user_signup_total.inc(volume(rng, 0, 20, scale))
+    registry.saas_password_reset_total.inc(volume(rng, 0, 5, scale))
+    registry.saas_feature_flag_active_gauge.labels(flag="beta_ui").set(rng.choice([0, 1]))
+    registry.saas_feature_flag_active_gauge.labels(flag="new_pricing").set(1)
+
 def simulate_and_push(args):
     registry = CollectorRegistry()
     registry = build_registry(registry)
-
-    endpoints = ["/login", "/search", "/billing", "/upload", "/report"]
-    instances = [f"i-{i:03d}" for i in range(1, 8)]
-
-    while True:
-        # --- 1. Rendimiento y Latencia ---
-        registry.saas_active_sessions_gauge.set(random.randint(100, 5000))
-        
-        for ep in endpoints:
-            # Latency Gauge (instantaneous sample)
-            registry.saas_api_latency_ms_gauge.labels(endpoint=ep).set(random.uniform(10, 700))
-            
-            # Cache Hit Ratio Gauge
-            registry.saas_cache_hit_ratio_gauge.labels(endpoint=ep).set(random.uniform(0.4, 0.99))
-            
-            # Requests and Duration (Counters, Histograms, Summaries)
-            get_reqs = random.randint(10, 500)
-            post_reqs = random.randint(0, 200)
-            
-            # Successful Requests
-            registry.saas_api_requests_total_counter.labels(endpoint=ep, method="GET", code="200").inc(get_reqs)
-            registry.saas_api_requests_total_counter.labels(endpoint=ep, method="POST", code="200").inc(post_reqs)
-
-            for _ in range(get_reqs + post_reqs):
-                registry.saas_request_duration_seconds_histogram.observe(random.uniform(0.01, 2.5))
-                registry.saas_db_query_seconds_summary.observe(random.uniform(0.001, 0.5))
-
-        registry.saas_stream_bytes_total.inc(random.randint(1000, 500000))
-
-        # --- 2. Errores y Calidad ---
-        error_count = 0
-        for ep in endpoints:
-            if random.random() < 0.03:
-                app_errors = random.randint(1, 5)
-                registry.saas_errors_total_counter.labels(endpoint=ep).inc(app_errors)
-                error_count += app_errors
-                # Also log API 5xx errors
-                registry.saas_api_requests_total_counter.labels(endpoint=ep, method="GET", code="500").inc(random.randint(0, 2))
-        
-        # Approximate Error Rate (This would normally be calculated in Prometheus)
-        # We simulate the final output of a PromQL query for demonstration.
-        registry.saas_error_rate_5m_gauge.set(random.uniform(0.0, 5.0)) # Rate in errors per 1000 requests
-
-        # --- 3. Infraestructura y DevOps ---
-        for inst in instances:
-            registry.saas_instance_cpu_percent_gauge.labels(instance_id=inst).set(random.uniform(1, 95))
-            registry.saas_instance_memory_mb_gauge.labels(instance_id=inst).set(random.uniform(200, 32000))
-        
-        registry.saas_deployments_total.inc(random.randint(0, 1))
-        registry.saas_background_jobs_pending_gauge.set(random.randint(0, 120))
-        registry.saas_db_connections_gauge.set(random.randint(20, 500))
-
-        # --- 4. Negocio y Crecimiento ---
-        registry.saas_user_signup_total.inc(random.randint(0, 20))
-        registry.saas_password_reset_total.inc(random.randint(0, 5))
-        registry.saas_feature_flag_active_gauge.labels(flag="beta_ui").set(random.choice([0, 1]))
-        registry.saas_feature_flag_active_gauge.labels(flag="new_pricing").set(1)
-
-
-        # --- Push al Pushgateway ---
-        instance = args.instance or "saas-sim-app-1"
-        try:
-            pushadd_to_gateway(
-                args.pushgateway,
-                job=args.job,
-                registry=registry,
-                grouping_key={"instance": instance}
-            )
-            print(f"Pushed metrics to {args.pushgateway} (job={args.job}, instance={instance}) at {time.strftime('%H:%M:%S')}")
-        except Exception as e:
-            print(f"Error pushing to Pushgateway: {e}")
-
-        time.sleep(args.interval)
+    sinks = build_sinks(args)
+    instance = args.instance or "saas-sim-app-1"
+    rng = None
+    if args.engine == "aggregate":
+        rng = np.random.default_rng()
+
+    try:
+        while True:
+            if rng is not None:
+                simulate_aggregate(registry, rng, args.scale)
+            else:
+                simulate(registry)
+
+            # --- Push a los destinos configurados (Pushgateway por defecto) ---
+            for sink in sinks:
+                try:
+                    sink.push(registry, args.job, {"instance": instance})
+                    print(f"Pushed metrics to {sink} (job={args.job}, instance={instance}) at {time.strftime('%H:%M:%S')}")
+                except Exception as e:
+                    print(f"Error pushing to {sink}: {e}")
+
+            time.sleep(args.interval)
+    finally:
+        for sink in sinks:
+            sink.close()
 
 def main():
     parser = argparse.ArgumentParser(description="SaaS metrics simulator (push to Pushgateway)")
-    parser.add_argument("--pushgateway", default="http://localhost:9091", help="Pushgateway URL")
+    parser.add_argument("--pushgateway", default="http://localhost:9091", help="Pushgateway URL ('' para desactivar el push)")
     parser.add_argument("--job", default="saas_job", help="Pushgateway job name")
     parser.add_argument("--instance", default="saas-sim-app-1", help="Instance label to push (grouping_key)")
     parser.add_argument("--interval", type=int, default=5, help="Seconds between pushes")
+    parser.add_argument("--engine", choices=["events", "aggregate"], default="events",
+                        help="events: un observe por request; aggregate: resultado del ciclo sorteado")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplicador del tráfico simulado (con --engine aggregate)")
+    add_sink_arguments(parser)
     args = parser.parse_args()
+    if args.scale != 1.0 and args.engine != "aggregate":
+        parser.error("--scale requiere --engine aggregate")
 
     simulate_and_push(args)
 
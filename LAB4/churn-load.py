@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+churn-load.py
+
+Generador de churn de series para probar la memoria del head de Prometheus
+(ver obslab/churn.py): una flota de instancias de un business case que se
+reinician (counters que vuelven a cero), se reemplazan en deploys rolling
+con nombres de instancia nuevos (el grupo viejo se borra del Pushgateway) y
+rotan los labels efímeros (``instance_id`` del caso 5, ``device_id`` de los
+ATMs del caso 2). Informa las series activas, creadas y terminadas por
+minuto y las que quedan en el head hasta el próximo corte de bloque.
+
+Subcomandos:
+  run      push real a los destinos de siempre (Pushgateway por defecto)
+           con el reporte de series cada ``--report-every`` segundos
+  bench    simulación offline de ``--hours`` horas: series en el head,
+           memoria estimada y series por bloque comparadas con la misma
+           flota sin churn (solo las series activas)
+
+Uso:
+    python3 churn-load.py run --case 5 --instances 20 --deploy-every 10m --ephemeral-rate 2
+    python3 churn-load.py bench --case 1 --instances 10 --restart-rate 2 --deploy-every 30m
+    python3 churn-load.py bench --case 2 --no-delete      # grupos viejos que nadie borra
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from obslab.churn import EPHEMERAL, ChurnFleet, SeriesTracker  # noqa: E402
+from obslab.promql import parse_duration  # noqa: E402
+from obslab.scenarios import CASES  # noqa: E402
+from obslab.sinks import add_sink_arguments, build_sinks  # noqa: E402
+
+
+def build_fleet(args):
+    return ChurnFleet(args.case, args.instances, args.job, args.interval, args.restart_rate,
+                      parse_duration(args.deploy_every), args.deploy_batch, args.ephemeral_rate,
+                      delete_stale=not args.no_delete, seed=args.seed)
+
+
+def mib(value):
+    return f"{value / 2 ** 20:,.1f} MiB"
+
+
+def report_line(stats):
+    return (f"activas {stats['active']:>7,}  creadas {stats['created_per_minute']:>7,.1f}/min  "
+            f"terminadas {stats['ended_per_minute']:>7,.1f}/min  counters reiniciados "
+            f"{stats['resets_per_minute']:>6,.1f}/min  head {stats['head_series']:>7,} (~{mib(stats['head_bytes'])})")
+
+
+def describe(args):
+    ephemeral = (f", {args.ephemeral_rate:g}/h de {EPHEMERAL[args.case][1]} rotados"
+                 if args.case in EPHEMERAL else "")
+    deploys = f"deploy cada {args.deploy_every}" if parse_duration(args.deploy_every) else "sin deploys"
+    return (f"business-case-{args.case}: {args.instances} instancias cada {args.interval:g} s, "
+            f"{args.restart_rate:g} reinicios/h por instancia, {deploys}{ephemeral}")
+
+
+def run(args):
+    fleet = build_fleet(args)
+    tracker = SeriesTracker(parse_duration(args.block_range), args.bytes_per_series)
+    sinks = build_sinks(args, replace=True)
+    print(f"🌪️  {describe(args)} -> {', '.join(str(sink) for sink in sinks) or 'sin destinos'}")
+    last_report = time.time()
+    try:
+        while True:
+            now = time.time()
+            fleet.step(now)
+            for sink in sinks:
+                for grouping_key in fleet.retired:
+                    try:
+                        sink.delete(fleet.job, grouping_key)
+                    except Exception as e:
+                        print(f"Error borrando {grouping_key} de {sink}: {e}")
+                for member in fleet.members:
+                    try:
+                        sink.push(member.registry, fleet.job, member.grouping_key)
+                    except Exception as e:
+                        print(f"Error pushing to {sink} ({member.instance}): {e}")
+            tracker.observe(now, fleet.samples())
+            if now - last_report >= args.report_every:
+                print(f"{time.strftime('%H:%M:%S')}  {report_line(tracker.stats(args.report_every))}")
+                last_report = now
+            time.sleep(max(0.0, args.interval - (time.time() - now)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for sink in sinks:
+            sink.close()
+        print(f"\n📊 {fleet.restarts} reinicios, {fleet.replaced} instancias reemplazadas, "
+              f"{fleet.rotated} labels rotados, {tracker.created:,} series creadas")
+
+
+def bench(args):
+    print(f"🧪 {describe(args)}; {args.hours:g} h simuladas, bloques de {args.block_range}\n")
+    fleet = build_fleet(args)
+    block_range = parse_duration(args.block_range)
+    tracker = SeriesTracker(block_range, args.bytes_per_series)
+    every = parse_duration(args.report_every_sim)
+    cycles = int(args.hours * 3600 // args.interval)
+    t0 = time.perf_counter()
+    for k in range(cycles):
+        now = k * args.interval
+        fleet.step(now)
+        tracker.observe(now, fleet.samples())
+        if k and now % every == 0:
+            print(f"   {now / 60:>5.0f} min  {report_line(tracker.stats(every))}")
+    elapsed = time.perf_counter() - t0
+
+    # Sin churn el head tiene siempre las mismas series que están activas
+    static = max(row[1] for row in tracker.history)
+    churned = max(tracker.created - static, 0)
+    peak = max(row[5] for row in tracker.history)
+    print(f"\n🌪️  Eventos: {fleet.restarts} reinicios, {fleet.replaced} instancias reemplazadas, "
+          f"{fleet.rotated} labels rotados, {len(fleet.orphans)} grupos sin borrar "
+          f"({elapsed:.0f} s de simulación)")
+    print(f"📈 Series creadas después del arranque: {churned:,} ({churned / (args.hours * 60):,.1f}/min, "
+          f"{churned / static / args.hours:.0%} de las activas por hora)")
+    print(f"🔁 Counters reiniciados: {tracker.resets:,}")
+    print(f"🧠 Pico del head: {peak:,} series (~{mib(peak * args.bytes_per_series)}) vs {static:,} sin churn "
+          f"(~{mib(static * args.bytes_per_series)})  x{peak / static:.1f}")
+    for start, series in tracker.blocks:
+        print(f"🧱 Bloque {start / 3600:g}h-{(start + block_range) / 3600:g}h: {series:,} series vs {static:,} "
+              f"sin churn (índice y postings que escribe la compactación)")
+    if not tracker.blocks:
+        print(f"🧱 Sin cortes de bloque: el primero ocurre a 1.5 x {args.block_range} (usar --hours mayor)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Churn de series e instancias reiniciadas para el head de Prometheus")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    churn_args = argparse.ArgumentParser(add_help=False)
+    churn_args.add_argument("--case", type=int, default=5, choices=sorted(CASES), help="Business case de la flota")
+    churn_args.add_argument("--instances", type=int, default=10, help="Instancias de la flota")
+    churn_args.add_argument("--job", default=None, help="Job (por defecto el del business case)")
+    churn_args.add_argument("--interval", type=float, default=15, help="Segundos entre pushes (y scrapes)")
+    churn_args.add_argument("--restart-rate", type=float, default=1.0,
+                            help="Reinicios por instancia y por hora (counters vuelven a cero)")
+    churn_args.add_argument("--deploy-every", default="30m",
+                            help="Cada cuánto empieza un deploy rolling que cambia el label instance ('0' = nunca)")
+    churn_args.add_argument("--deploy-batch", type=int, default=1, help="Instancias reemplazadas por ciclo en un deploy")
+    churn_args.add_argument("--ephemeral-rate", type=float, default=0.5,
+                            help="Fracción por hora de instance_id (caso 5) o device_id (caso 2) que se reemplaza")
+    churn_args.add_argument("--no-delete", action="store_true",
+                            help="No borra del Pushgateway los grupos de instancias reemplazadas")
+    churn_args.add_argument("--block-range", default="2h", help="Rango de bloque del TSDB (corte del head)")
+    churn_args.add_argument("--bytes-per-series", type=int, default=4096,
+                            help="Memoria estimada por serie en el head para el reporte")
+    churn_args.add_argument("--seed", type=int, default=None, help="Semilla de los eventos de churn")
+
+    p_run = sub.add_parser("run", parents=[churn_args], help="Push real con churn")
+    p_run.add_argument("--pushgateway", default="http://localhost:9091",
+                       help="Pushgateway URL ('' para desactivar el push)")
+    p_run.add_argument("--report-every", type=float, default=60, help="Segundos entre reportes de series")
+    add_sink_arguments(p_run)
+
+    p_bench = sub.add_parser("bench", parents=[churn_args], help="Simulación offline del head con churn")
+    p_bench.add_argument("--hours", type=float, default=3.5,
+                         help="Horas simuladas (el primer corte de bloque ocurre a 1.5 x --block-range)")
+    p_bench.add_argument("--report-every-sim", default="30m", help="Cada cuánto tiempo simulado se imprime una fila")
+    args = parser.parse_args()
+    if args.command == "bench" and args.seed is None:
+        args.seed = 42
+
+    {"run": run, "bench": bench}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+dashboard-check.py
+
+Verifica offline que los paneles de los dashboards de LAB4 devuelvan valores
+razonables, sin levantar Docker: los simuladores alimentan directamente un TSDB
+en memoria (obslab.tsdb) y las queries de cada panel se evalúan con el
+evaluador de PromQL de obslab.promql.
+
+Dos modos:
+  - backfill (por defecto): corre N instancias de cada business case con
+    timestamps sintéticos, un snapshot por scrape_interval.
+  - captura: lee el TSDB que guardó un simulador con --tsdb-capture o el
+    directorio de una captura columnar (--capture).
+
+Uso:
+    python3 dashboard-check.py --case 1 --instances 3
+    python3 business-case-2.py --tsdb-capture /tmp/bank.npz   # (Ctrl+C al rato)
+    python3 dashboard-check.py --case 2 --capture /tmp/bank.npz
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from obslab.capture import CaptureReader  # noqa: E402
+from obslab.dashboards import iter_targets, load_dashboard, time_range_seconds  # noqa: E402
+from obslab.promql import PromQLError, expand_variables, query_range  # noqa: E402
+from obslab.scenarios import CASES, Scenario, dashboard_path  # noqa: E402
+from obslab.tsdb import TSDB  # noqa: E402
+
+
+def backfill(case, instances, duration, scrape_interval, start=0.0):
+    """Corre ``instances`` simuladores y guarda un snapshot por scrape."""
+    db = TSDB()
+    job = CASES[case][0]
+    scenarios = [Scenario(case, job=job, instance=f"{CASES[case][1]}-{i}") for i in range(1, instances + 1)]
+    for k in range(int(duration // scrape_interval) + 1):
+        samples = []
+        for scenario in scenarios:
+            scenario.step()
+            samples.extend(scenario.samples())
+        db.append(start + k * scrape_interval, samples)
+    return db, job
+
+
+def check_dashboard(db, case, job, scrape_interval):
+    dashboard = load_dashboard(dashboard_path(case))
+    span = time_range_seconds(dashboard)
+    end = float(db.times[-1])
+    start = max(end - span, float(db.times[0]))
+    variables = {"job": job, "instance": ".*", "region": ".*"}
+
+    problems = 0
+    for panel, target in iter_targets(dashboard):
+        expr = expand_variables(target["expr"], variables, scrape_interval, scrape_interval, span)
+        title = f"#{panel.get('id')} {panel.get('title', '')} [{target.get('refId', 'A')}]"
+        t0 = time.perf_counter()
+        try:
+            result = query_range(db, expr, start, end, scrape_interval)
+        except PromQLError as e:
+            print(f"  ❌ {title}: error de PromQL: {e}")
+            problems += 1
+            continue
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+
+        values = np.atleast_2d(result.values)
+        last = values[:, -1] if values.size else np.array([])
+        status = "OK"
+        if not np.isfinite(last).any():
+            status = "SIN DATOS"
+        elif np.isinf(last).any():
+            status = "INFINITO"
+        elif (last[np.isfinite(last)] < 0).any():
+            status = "NEGATIVO"
+        if status != "OK":
+            problems += 1
+
+        finite = last[np.isfinite(last)]
+        summary = f"{finite.min():.4g} .. {finite.max():.4g}" if finite.size else "-"
+        icon = "✅" if status == "OK" else "⚠️ "
+        print(f"  {icon} {title}: {values.shape[0]} series, último {summary} ({status}, {elapsed_ms:.1f} ms)")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evalúa offline los paneles de los dashboards de LAB4")
+    parser.add_argument("--case", type=int, action="append", choices=sorted(CASES),
+                        help="Business case a verificar (repetible; por defecto todos)")
+    parser.add_argument("--instances", type=int, default=2, help="Instancias simuladas por business case")
+    parser.add_argument("--minutes", type=float, default=75,
+                        help="Minutos de historia a generar (cubre el [1h] más largo de los paneles)")
+    parser.add_argument("--scrape-interval", type=float, default=15, help="Segundos entre snapshots")
+    parser.add_argument("--seed", type=int, default=None, help="Semilla para reproducir una corrida")
+    parser.add_argument("--capture", help="TSDB de --tsdb-capture o directorio de --capture (en lugar de backfill)")
+    parser.add_argument("--strict", action="store_true", help="Termina con código 1 si algún panel falla")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    cases = args.case or sorted(CASES)
+    if args.capture and len(cases) != 1:
+        parser.error("--capture requiere un único --case")
+
+    problems = 0
+    for case in cases:
+        t0 = time.perf_counter()
+        if args.capture:
+            if os.path.isdir(args.capture):
+                db = CaptureReader(args.capture).to_tsdb()
+            else:
+                db = TSDB.load(args.capture)
+            jobs = {labels.get("job") for labels in db.labels}
+            job = CASES[case][0] if CASES[case][0] in jobs else sorted(jobs)[0]
+            origin = f"captura {args.capture}"
+        else:
+            db, job = backfill(case, args.instances, args.minutes * 60, args.scrape_interval)
+            origin = f"backfill {args.instances} instancias x {args.minutes:g} min"
+        load_ms = (time.perf_counter() - t0) * 1000
+        print(f"📊 business-case-{case} ({origin}): {len(db)} series x {len(db.times)} snapshots en {load_ms:.0f} ms")
+
+        t0 = time.perf_counter()
+        problems += check_dashboard(db, case, job, args.scrape_interval)
+        print(f"   evaluado en {(time.perf_counter() - t0) * 1000:.0f} ms\n")
+
+    print(f"{problems} panel(es) con problemas" if problems else "Todos los paneles devuelven datos")
+    if args.strict and problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+dashboard-cost.py
+
+Estima cuánto le cuesta a Prometheus cada panel de los dashboards de LAB4
+(ver obslab/query_cost.py): series que toca cada query según los registries
+de los business cases y la cantidad de instancias, steps por refresh y
+muestras leídas. Con ``--budget`` ajusta ``interval``, ``maxDataPoints`` y
+el refresh del dashboard hasta que las muestras por minuto de un espectador
+entren en el presupuesto, y muestra el antes/después.
+
+Uso:
+    python3 dashboard-cost.py                                  # reporte de los 5 casos
+    python3 dashboard-cost.py --case 1 --instances 50 --budget 2e6
+    python3 dashboard-cost.py --instances 20 --budget 1e6 --output-dir /tmp/ajustados
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from obslab.dashboards import load_dashboard, refresh_seconds  # noqa: E402
+from obslab.query_cost import ScenarioSeries, estimate, per_minute, tune_dashboard  # noqa: E402
+from obslab.scenarios import CASES, dashboard_path  # noqa: E402
+
+
+def case_of(path, dashboard):
+    """El business case de un dashboard: por el nombre del archivo o por el job de sus queries."""
+    for case, (job, _) in CASES.items():
+        if os.path.basename(path) == f"business-case-{case}.json" or job in json.dumps(dashboard):
+            return case
+    raise SystemExit(f"No se sabe a qué business case corresponde {path}")
+
+
+def human(value):
+    for unit, size in (("G", 1e9), ("M", 1e6), ("k", 1e3)):
+        if value >= size:
+            return f"{value / size:.1f}{unit}"
+    return f"{value:.0f}"
+
+
+def print_costs(costs, top):
+    visible = sorted((cost for cost in costs if not cost.collapsed), key=lambda cost: -cost.samples)
+    for cost in visible[:top]:
+        note = f"  ⚠️  sin series: {', '.join(sorted(set(cost.missing)))}" if cost.missing else ""
+        note += f"  ❌ {cost.error}" if cost.error else ""
+        print(f"   {human(cost.samples):>7} muestras  {cost.series:>6,} series  {cost.steps:>4} steps de "
+              f"{cost.step:>4g}s  {cost.title}{note}")
+    if len(visible) > top:
+        print(f"   ... {len(visible) - top} targets más")
+    hidden = [cost for cost in costs if cost.collapsed]
+    if hidden:
+        print(f"   ({len(hidden)} targets en rows colapsadas, {human(sum(c.samples for c in hidden))} muestras "
+              f"al expandirlas)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Costo de queries de los dashboards de LAB4 y ajuste a un presupuesto")
+    parser.add_argument("dashboards", nargs="*", help="Archivos JSON (por defecto business-case-N.json)")
+    parser.add_argument("--case", type=int, action="append", choices=sorted(CASES),
+                        help="Business case a analizar (repetible; por defecto todos)")
+    parser.add_argument("--instances", type=int, default=10, help="Instancias de cada business case")
+    parser.add_argument("--scrape-interval", type=float, default=15, help="Segundos entre muestras")
+    parser.add_argument("--datasource-interval", type=float, default=15,
+                        help="Scrape interval configurado en el datasource de Grafana (step mínimo de los panels "
+                             "sin interval)")
+    parser.add_argument("--budget", type=float, default=None,
+                        help="Muestras por minuto que puede leer un espectador del dashboard (activa el ajuste)")
+    parser.add_argument("--max-reduction", type=int, default=4,
+                        help="Cuántas veces menos puntos puede mostrar un panel antes de refrescar más lento")
+    parser.add_argument("--min-points", type=int, default=10, help="maxDataPoints mínimo al bajar la resolución")
+    parser.add_argument("--max-refresh", default="5m", help="Refresh más lento aceptable")
+    parser.add_argument("--top", type=int, default=8, help="Targets más caros que se listan")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument("--output-dir", help="Escribe los dashboards ajustados en este directorio")
+    output.add_argument("--in-place", action="store_true", help="Sobrescribe los JSON originales")
+    args = parser.parse_args()
+
+    from obslab.promql import parse_duration
+
+    paths = args.dashboards or [dashboard_path(case) for case in (args.case or sorted(CASES))]
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    index = {}
+    for path in paths:
+        dashboard = load_dashboard(path)
+        case = case_of(path, dashboard)
+        if case not in index:
+            index[case] = ScenarioSeries(case, args.instances)
+        series = index[case]
+        refresh = refresh_seconds(dashboard)
+        costs = estimate(dashboard, series, args.scrape_interval, datasource_interval=args.datasource_interval)
+        queries = sum(1 for cost in costs if not cost.collapsed)
+        print(f"📊 {os.path.basename(path)} ({args.instances} instancias, refresh {dashboard.get('refresh') or '-'}): "
+              f"{human(per_minute(costs, refresh))} muestras/min, "
+              f"{queries * 60 / refresh if refresh else queries:,.0f} queries/min por espectador")
+        print_costs(costs, args.top)
+
+        if args.budget is None:
+            print()
+            continue
+        tuned, report = tune_dashboard(dashboard, series, args.budget, args.scrape_interval, args.min_points,
+                                       parse_duration(args.max_refresh), args.datasource_interval, args.max_reduction)
+        refresh = refresh_seconds(tuned)
+        after_queries = sum(1 for cost in report["after"] if not cost.collapsed)
+        icon = "✅" if report["within_budget"] else "⚠️ "
+        print(f"   {icon} ajustado (refresh {tuned.get('refresh') or '-'}): "
+              f"{human(report['before_per_minute'])} -> {human(report['after_per_minute'])} muestras/min "
+              f"(presupuesto {human(args.budget)}), "
+              f"{after_queries * 60 / refresh if refresh else after_queries:,.0f} queries/min")
+        if not report["within_budget"]:
+            print(f"      no alcanza con hasta {args.max_reduction} veces menos puntos y refresh <= {args.max_refresh}")
+        for change in report["changes"]:
+            print(f"      🔧 {change}")
+        print_costs(report["after"], args.top)
+
+        destination = path if args.in_place else (
+            os.path.join(args.output_dir, os.path.basename(path)) if args.output_dir else None)
+        if destination and report["changes"]:
+            with open(destination, "w", encoding="utf-8") as f:
+                json.dump(tuned, f, indent=2, ensure_ascii=False)
+                f.write("\n")
+            print(f"   guardado en {destination}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+dashboard-optimize.py
+
+Busca queries repetidas entre los panels de los dashboards de LAB4 y las
+reemplaza por el datasource ``-- Dashboard --`` (ver obslab.query_dedup):
+un panel que pide lo mismo que otro, o su ``sum`` sin agrupar, lee los datos
+de ese panel en lugar de consultar de nuevo a Prometheus.
+
+Reporta queries por refresh y por minuto antes/después, cada reescritura y
+las subexpresiones (``rate(métrica)``) que se repiten entre panels con otra
+ventana o agrupación.
+
+Uso:
+    python3 dashboard-optimize.py                        # reporte de los 5 casos
+    python3 dashboard-optimize.py --case 1 --unify-windows
+    python3 dashboard-optimize.py --output-dir /tmp/optimizados
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from obslab.dashboards import load_dashboard, refresh_seconds  # noqa: E402
+from obslab.query_dedup import optimize_dashboard  # noqa: E402
+from obslab.scenarios import CASES, dashboard_path  # noqa: E402
+
+
+def per_minute(queries, refresh):
+    return f"{queries * 60 / refresh:,.0f}/min" if refresh else "sin auto-refresh"
+
+
+def print_report(path, dashboard, report):
+    refresh = refresh_seconds(dashboard)
+    before, after = report["before"], report["after"]
+    print(f"📊 {os.path.basename(path)} (refresh {dashboard.get('refresh') or '-'})")
+    print(f"   queries por refresh: {before} -> {after}"
+          f"  ({per_minute(before, refresh)} -> {per_minute(after, refresh)} por usuario)")
+    for rewrite in report["rewrites"]:
+        print(f"   ♻️  {rewrite['panel']} <- {rewrite['source']}: {rewrite['kind']}")
+    for expr, uses in report["shared"].items():
+        variants = ", ".join(f"{panel} [{window}]" for panel, window in uses)
+        print(f"   🔁 {expr}\n      {variants}")
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deduplica queries entre panels de los dashboards de LAB4")
+    parser.add_argument("dashboards", nargs="*", help="Archivos JSON (por defecto business-case-N.json)")
+    parser.add_argument("--case", type=int, action="append", choices=sorted(CASES),
+                        help="Business case a analizar (repetible; por defecto todos)")
+    parser.add_argument("--unify-windows", action="store_true",
+                        help="Permite reescribir queries que solo difieren en la ventana de rango "
+                             "(el panel pasa a mostrar la ventana del origen)")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument("--output-dir", help="Escribe los dashboards reescritos en este directorio")
+    output.add_argument("--in-place", action="store_true", help="Sobrescribe los JSON originales")
+    args = parser.parse_args()
+
+    paths = args.dashboards or [dashboard_path(case) for case in (args.case or sorted(CASES))]
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    totals = [0, 0]
+    for path in paths:
+        dashboard = load_dashboard(path)
+        optimized, report = optimize_dashboard(dashboard, unify_windows=args.unify_windows)
+        print_report(path, dashboard, report)
+        totals[0] += report["before"]
+        totals[1] += report["after"]
+
+        destination = path if args.in_place else (
+            os.path.join(args.output_dir, os.path.basename(path)) if args.output_dir else None)
+        if destination and report["rewrites"]:
+            with open(destination, "w", encoding="utf-8") as f:
+                json.dump(optimized, f, indent=2, ensure_ascii=False)
+                f.write("\n")
+            print(f"   guardado en {destination}\n")
+
+    print(f"Total: {totals[0]} -> {totals[1]} queries por refresh")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+edge-aggregate.py
+
+Agregador en el borde (ver obslab/edge_aggregate.py): recibe los pushes de
+muchas instancias (habla la API del Pushgateway, texto o protobuf) o el
+remote_write de un Prometheus local, suma counters y buckets sobre
+``instance`` (u otros labels) manejando los reinicios, y reenvía solo las
+series agregadas a Grafana Cloud por remote_write. Las familias que algún
+panel mira por instancia se pueden dejar pasar sin agregar (``--dashboard``).
+
+Subcomandos:
+  serve    el agregador: los simuladores hacen push a él en lugar de al
+           Pushgateway (o Prometheus le hace remote_write) y las series
+           agregadas van a ``--remote-write`` y a /metrics
+  bench    simula una flota de instancias de un business case (con algunos
+           reinicios), compara series y bytes de remote_write con y sin
+           agregación y verifica que los paneles del dashboard den lo mismo
+
+Uso:
+    python3 edge-aggregate.py serve --port 9093 --dashboard business-case-1.json \\
+        --remote-write https://<PROMETHEUS_URL>/api/prom/push --remote-write-user <ID> --remote-write-password <KEY>
+    python3 business-case-1.py --pushgateway http://localhost:9093 --instance ecommerce-sim-7
+    python3 edge-aggregate.py bench --case 1 --instances 50
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from obslab import snappy  # noqa: E402
+from obslab.dashboards import iter_targets, load_dashboard, time_range_seconds  # noqa: E402
+from obslab.edge_aggregate import (EdgeAggregator, Forwarder, aggregator_server,  # noqa: E402
+                                   families_from_protobuf, families_from_text, passthrough_from_dashboards)
+from obslab.promql import PromQLError, expand_variables, query_range  # noqa: E402
+from obslab.proto_exposition import ProtobufEncoder  # noqa: E402
+from obslab.remote_write import encode_write_request  # noqa: E402
+from obslab.scenarios import CASES, Scenario, dashboard_path  # noqa: E402
+from obslab.tsdb import TSDB  # noqa: E402
+
+
+def build_aggregator(args, dashboards, clock=time.time):
+    passthrough = set(args.passthrough)
+    if dashboards:
+        names, failed = passthrough_from_dashboards(dashboards, args.drop_label)
+        passthrough |= names
+        for expr in failed:
+            print(f"⚠️  No se pudo analizar {expr[:70]!r}: sus métricas se agregan igual")
+    gauge_ops = dict(item.split("=", 1) for item in args.gauge_op_for)
+    return EdgeAggregator(args.drop_label, passthrough, args.gauge_op, gauge_ops, args.stale_after,
+                          args.forget_after, clock)
+
+
+def serve(args):
+    dashboards = [load_dashboard(path) for path in args.dashboard]
+    aggregator = build_aggregator(args, dashboards)
+    forwarder = None
+    if args.remote_write:
+        auth = (args.remote_write_user, args.remote_write_password) if args.remote_write_user else None
+        forwarder = Forwarder(aggregator, args.remote_write, args.interval, auth, args.max_series)
+        forwarder.start()
+    server = aggregator_server(aggregator, args.listen, args.port, forwarder, args.verbose)
+    print(f"🧲 Agregador en http://{args.listen}:{args.port} (push /metrics/job/..., remote_write /api/v1/write), "
+          f"sin labels {', '.join(sorted(aggregator.drop_labels))}, {len(aggregator.passthrough)} familias sin "
+          f"agregar -> {forwarder or 'solo /metrics'}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if forwarder is not None:
+            forwarder.flush()
+            forwarder.close()
+        print(f"\n📊 {aggregator.summary()}")
+
+
+# --- Benchmark ---
+
+def compare_panels(raw_db, aggregated_db, case, job, scrape_interval, seconds):
+    """
+    Evalúa cada panel sobre las dos bases en los últimos ``seconds``;
+    devuelve ``[(título, error relativo máximo o None)]``.
+    """
+    dashboard = load_dashboard(dashboard_path(case))
+    span = time_range_seconds(dashboard)
+    end = float(raw_db.times[-1])
+    start = max(end - seconds, float(raw_db.times[0]))
+    variables = {"job": job, "instance": ".*", "region": ".*"}
+    results = []
+    for panel, target in iter_targets(dashboard):
+        expr = expand_variables(target["expr"], variables, scrape_interval, scrape_interval, span)
+        title = f"#{panel.get('id')} {panel.get('title', '')} [{target.get('refId', 'A')}]"
+        try:
+            raw = query_range(raw_db, expr, start, end, scrape_interval)
+            aggregated = query_range(aggregated_db, expr, start, end, scrape_interval)
+        except PromQLError:
+            results.append((title, None))
+            continue
+        rows = {tuple(sorted(labels.items())): values
+                for labels, values in zip(getattr(aggregated, "labels", [{}]), np.atleast_2d(aggregated.values))}
+        error = 0.0
+        for labels, values in zip(getattr(raw, "labels", [{}]), np.atleast_2d(raw.values)):
+            other = rows.get(tuple(sorted(labels.items())))
+            if other is None:
+                error = float("inf")
+                break
+            both = np.isfinite(values) & np.isfinite(other)
+            if (np.isfinite(values) != np.isfinite(other)).any():
+                error = float("inf")
+                break
+            scale = np.maximum(np.abs(values[both]), 1e-9)
+            if both.any():
+                error = max(error, float(np.max(np.abs(values[both] - other[both]) / scale)))
+        results.append((title, error))
+    return results
+
+
+def bench(args):
+    random.seed(args.seed)
+    job, default_instance = CASES[args.case]
+    instances = [f"{default_instance}-{i}" for i in range(1, args.instances + 1)]
+    scenarios = [Scenario(args.case, job=job, instance=instance) for instance in instances]
+    dashboards = [] if args.no_dashboard else [load_dashboard(dashboard_path(args.case))]
+    now = [0.0]
+    aggregator = build_aggregator(args, dashboards, clock=lambda: now[0])
+    raw_db, aggregated_db = TSDB(), TSDB()
+    cycles = int(args.minutes * 60 // args.scrape_interval)
+    restart_at = cycles // 2
+    print(f"🧪 business-case-{args.case}: {args.instances} instancias x {cycles} ciclos de "
+          f"{args.scrape_interval:g} s, {args.restarts} reinicios en el ciclo {restart_at}; "
+          f"{len(aggregator.passthrough)} familias sin agregar\n")
+
+    encoder = ProtobufEncoder()
+    raw_bytes = aggregated_bytes = raw_series = aggregated_series = 0
+    ingest_seconds = samples_in = 0
+    for k in range(cycles):
+        now[0] = k * args.scrape_interval
+        if k == restart_at:
+            for i in random.sample(range(len(scenarios)), min(args.restarts, len(scenarios))):
+                scenarios[i] = Scenario(args.case, job=job, instance=instances[i])
+        samples = []
+        for scenario in scenarios:
+            scenario.step()
+            # Lo que cuesta en el agregador: parsear el push y aplicarlo
+            body = encoder.encode(scenario.registry) if args.push_format == "protobuf" else scenario.exposition()
+            t0 = time.perf_counter()
+            if args.push_format == "protobuf":
+                families = families_from_protobuf(body)
+            else:
+                families = families_from_text(body.decode())
+            aggregator.ingest((job, ("instance", scenario.instance)), families,
+                              {"job": job, "instance": scenario.instance}, replace=True)
+            ingest_seconds += time.perf_counter() - t0
+            samples.extend(scenario.samples())
+        samples_in += len(samples)
+        raw_db.append(now[0], samples)
+        snapshot = aggregator.snapshot()
+        aggregated_db.append(now[0], [(name, dict(labels), value) for (name, labels), value in snapshot])
+
+        timestamp_ms = int(now[0] * 1000)
+        raw_payload = encode_write_request((dict(labels, __name__=name), [(value, timestamp_ms)])
+                                           for name, labels, value in samples)
+        raw_bytes += len(snappy.compress(raw_payload))
+        aggregated_bytes += sum(len(snappy.compress(payload)) for payload in aggregator.write_requests(timestamp_ms))
+        raw_series, aggregated_series = len(samples), len(snapshot)
+
+    summary = aggregator.summary()
+    print(f"📦 Series por ciclo:        {raw_series:>9,} -> {aggregated_series:,}  x{raw_series / aggregated_series:.1f}"
+          f" ({summary['passthrough_series']:,} de entrada sin agregar)")
+    print(f"📤 Bytes de remote_write:   {raw_bytes:>9,} -> {aggregated_bytes:,}  x{raw_bytes / aggregated_bytes:.1f}"
+          f" (snappy{'' if snappy._snappy else ' sin comprimir: falta python-snappy'})")
+    print(f"⚙️  Parseo ({args.push_format}) y agregación: {samples_in / ingest_seconds:,.0f} muestras/s, "
+          f"{summary['resets']} reinicios detectados\n")
+
+    # Los counters agregados nunca bajan, aunque haya reinicios
+    values = aggregated_db.values
+    decreasing = 0
+    for sid, labels in enumerate(aggregated_db.labels):
+        name = labels["__name__"]
+        if name.endswith(("_total", "_bucket", "_count")) and "instance" not in labels:
+            row = values[sid][np.isfinite(values[sid])]
+            decreasing += int((np.diff(row) < -1e-9).any())
+    print(f"{'✅' if not decreasing else '❌'} Counters agregados que bajan: {decreasing}")
+
+    results = compare_panels(raw_db, aggregated_db, args.case, job, args.scrape_interval, args.compare_minutes * 60)
+    exact = sum(1 for _, error in results if error is not None and error < 1e-6)
+    print(f"📊 Paneles iguales con y sin agregación (últimos {args.compare_minutes:g} min): {exact}/{len(results)}")
+    for title, error in results:
+        if error is None:
+            print(f"   ⚠️  {title}: no se pudo evaluar")
+        elif error >= 1e-6:
+            print(f"   {'⚠️ ' if error > 0.01 else 'ℹ️ '} {title}: diferencia relativa máxima {error:.2%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agregación de series de la flota antes de remote_write")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    agg_args = argparse.ArgumentParser(add_help=False)
+    agg_args.add_argument("--drop-label", action="append", default=None,
+                          help="Label que se suma (repetible; por defecto instance)")
+    agg_args.add_argument("--passthrough", action="append", default=[], metavar="FAMILIA",
+                          help="Familia que se reenvía sin agregar (repetible)")
+    agg_args.add_argument("--gauge-op", choices=["sum", "max", "min", "avg"], default="sum",
+                          help="Cómo se combinan los gauges de las instancias")
+    agg_args.add_argument("--gauge-op-for", action="append", default=[], metavar="FAMILIA=OP",
+                          help="Operación para una familia de gauges en particular (repetible)")
+    agg_args.add_argument("--stale-after", type=float, default=300,
+                          help="Segundos sin pushes tras los que una instancia deja de aportar a los gauges")
+    agg_args.add_argument("--forget-after", type=float, default=3600,
+                          help="Segundos que se recuerda el último valor de cada counter de entrada")
+
+    p_serve = sub.add_parser("serve", parents=[agg_args], help="Agregador con API de Pushgateway y remote_write")
+    p_serve.add_argument("--listen", default="0.0.0.0", help="Dirección de escucha")
+    p_serve.add_argument("--port", type=int, default=9093, help="Puerto")
+    p_serve.add_argument("--dashboard", action="append", default=[], metavar="JSON",
+                         help="Dashboard cuyos paneles por instancia definen qué familias no se agregan (repetible)")
+    p_serve.add_argument("--remote-write", help="Endpoint remote_write al que se reenvían las series agregadas")
+    p_serve.add_argument("--remote-write-user", help="Usuario basic auth para remote_write")
+    p_serve.add_argument("--remote-write-password", help="Password/API key basic auth para remote_write")
+    p_serve.add_argument("--interval", type=float, default=15, help="Segundos entre envíos por remote_write")
+    p_serve.add_argument("--max-series", type=int, default=2000, help="Series máximas por request de remote_write")
+    p_serve.add_argument("--verbose", action="store_true", help="Imprime cada push")
+
+    p_bench = sub.add_parser("bench", parents=[agg_args], help="Flota simulada con y sin agregación")
+    p_bench.add_argument("--case", type=int, default=1, choices=sorted(CASES), help="Business case a simular")
+    p_bench.add_argument("--instances", type=int, default=20, help="Instancias de la flota")
+    p_bench.add_argument("--minutes", type=float, default=75,
+                         help="Minutos simulados (cubre el [1h] más largo de los paneles)")
+    p_bench.add_argument("--compare-minutes", type=float, default=10,
+                         help="Minutos finales en los que se comparan los paneles (antes, las series que nacen "
+                              "dentro de la ventana se extrapolan distinto por instancia que sumadas)")
+    p_bench.add_argument("--push-format", choices=["text", "protobuf"], default="protobuf",
+                         help="Formato en que las instancias le hacen push al agregador")
+    p_bench.add_argument("--scrape-interval", type=float, default=15, help="Segundos entre pushes")
+    p_bench.add_argument("--restarts", type=int, default=3, help="Instancias que se reinician a mitad de la prueba")
+    p_bench.add_argument("--no-dashboard", action="store_true",
+                         help="Agrega todo, sin dejar pasar lo que el dashboard mira por instancia")
+    p_bench.add_argument("--seed", type=int, default=42, help="Semilla de los reinicios")
+    args = parser.parse_args()
+    args.drop_label = args.drop_label or ["instance"]
+
+    {"serve": serve, "bench": bench}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+exposition-benchmark.py
+
+Compara, para el registry de cada business case, el push en formato de
+texto (``generate_latest``) con protobuf delimitado
+(obslab/proto_exposition.py):
+
+    codificación  tiempo de serializar el registry en cada formato
+    bytes         tamaño del cuerpo, sin comprimir y con gzip
+    parseo        tiempo de leerlo del lado del receptor: el parser de texto
+                  de prometheus_client frente a ``proto_exposition.decode``
+
+Las dos mediciones de parseo son Python puro; el Pushgateway (Go) parsea
+ambos formatos más rápido, pero la proporción entre ellos es la que importa.
+
+Uso:
+    python3 exposition-benchmark.py
+    python3 exposition-benchmark.py --case 5 --cycles 50 --repeat 7
+"""
+
+import argparse
+import gzip
+import os
+import sys
+import time
+
+from prometheus_client import generate_latest
+from prometheus_client.parser import text_string_to_metric_families
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from obslab.proto_exposition import ProtobufEncoder, decode  # noqa: E402
+from obslab.scenarios import CASES, Scenario  # noqa: E402
+
+
+def best_seconds(fn, repeat, number):
+    """Mejor tiempo por llamada de ``repeat`` rondas de ``number`` llamadas."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def parse_text(body):
+    return sum(len(family.samples) for family in text_string_to_metric_families(body.decode()))
+
+
+def parse_protobuf(body):
+    return sum(len(family["metrics"]) for family in decode(body))
+
+
+def measure(case, cycles, store, repeat, number):
+    scenario = Scenario(case, store=store)
+    for _ in range(cycles):
+        scenario.step()
+    registry = scenario.registry
+    encoder = ProtobufEncoder()
+    text = generate_latest(registry)
+    proto = encoder.encode(registry)
+    return {
+        "bytes": (len(text), len(proto)),
+        "gzip": (len(gzip.compress(text)), len(gzip.compress(proto))),
+        "encode": (best_seconds(lambda: generate_latest(registry), repeat, number),
+                   best_seconds(lambda: encoder.encode(registry), repeat, number)),
+        "parse": (best_seconds(lambda: parse_text(text), repeat, number),
+                  best_seconds(lambda: parse_protobuf(proto), repeat, number)),
+        "families": len(decode(proto)),
+        "samples": parse_text(text),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de exposición en texto frente a protobuf delimitado")
+    parser.add_argument("--case", type=int, action="append", choices=sorted(CASES),
+                        help="Business case a medir (repetible; por defecto todos)")
+    parser.add_argument("--cycles", type=int, default=20, help="Ciclos de simulación antes de medir")
+    parser.add_argument("--store", choices=("client", "array"), default="client",
+                        help="Métricas de prometheus_client o en arrays de NumPy (obslab.array_metrics)")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones; se informa la mejor")
+    parser.add_argument("--number", type=int, default=20, help="Llamadas por repetición")
+    args = parser.parse_args()
+
+    totals = {"bytes": [0, 0], "gzip": [0, 0], "encode": [0.0, 0.0], "parse": [0.0, 0.0]}
+    for case in args.case or sorted(CASES):
+        r = measure(case, args.cycles, args.store, args.repeat, args.number)
+        for key in totals:
+            totals[key][0] += r[key][0]
+            totals[key][1] += r[key][1]
+        (text_b, proto_b), (text_gz, proto_gz) = r["bytes"], r["gzip"]
+        (text_enc, proto_enc), (text_parse, proto_parse) = r["encode"], r["parse"]
+        print(f"📦 business-case-{case}: {r['families']} familias, {r['samples']} muestras en texto")
+        print(f"   bytes        texto {text_b:>8,}   protobuf {proto_b:>8,}   x{text_b / proto_b:.1f}")
+        print(f"   bytes gzip   texto {text_gz:>8,}   protobuf {proto_gz:>8,}   x{text_gz / proto_gz:.1f}")
+        print(f"   codificación texto {text_enc * 1000:>7.3f} ms protobuf {proto_enc * 1000:>7.3f} ms"
+              f"   x{text_enc / proto_enc:.1f}")
+        print(f"   parseo       texto {text_parse * 1000:>7.3f} ms protobuf {proto_parse * 1000:>7.3f} ms"
+              f"   x{text_parse / proto_parse:.1f}\n")
+
+    print("📊 Total")
+    for key, label, scale, unit in (("bytes", "bytes", 1, ""), ("gzip", "bytes gzip", 1, ""),
+                                    ("encode", "codificación", 1000, " ms"), ("parse", "parseo", 1000, " ms")):
+        text, proto = totals[key]
+        print(f"   {label:<12} texto {text * scale:>10,.2f}{unit}   protobuf {proto * scale:>10,.2f}{unit}"
+              f"   x{text / proto:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+log-benchmark.py
+
+Mide cuántas líneas por segundo procesa la ingesta de logs
+(obslab/log_metrics.py) con las configuraciones de ``log-configs/``:
+
+    bloques      parseo por bloque + actualizaciones vectorizadas, leyendo
+                 con read() y con mmap
+    por línea    referencia: regex / json.loads por línea y ``labels().inc()``
+                 / ``observe()`` de prometheus_client, como se haría a mano
+
+Los logs (access log combinado y eventos JSONL del e-commerce) se generan
+al azar en un directorio temporal. Todo corre en un solo hilo.
+
+Uso:
+    python3 log-benchmark.py
+    python3 log-benchmark.py --lines 2000000 --repeat 3
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+from prometheus_client import CollectorRegistry, Counter, Histogram
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from obslab.log_metrics import ACCESS_LOG, LogIngestor, LogTailer, build_collector, load_config  # noqa: E402
+
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "log-configs")
+PATHS = ["/api/orders/{}", "/api/checkout", "/api/products/{}", "/api/users/{}", "/", "/products/{}",
+         "/cart", "/checkout", "/static/app.js"]
+REGIONS = ["US-East", "EU-West", "APAC"]
+GATEWAYS = ["stripe", "paypal", "adp"]
+STEPS = ["view", "cart", "checkout", "paid"]
+
+
+def write_access_log(path, lines):
+    with open(path, "w") as f:
+        for i in range(lines):
+            method = "POST" if random.random() < 0.2 else "GET"
+            status = random.choices([200, 201, 304, 404, 500, 503], [80, 5, 5, 5, 3, 2])[0]
+            request = random.choice(PATHS).format(random.randint(1, 5000))
+            f.write(f'10.0.{i % 256}.{i % 97} - - [19/Oct/2026:10:{i % 60:02d}:00 +0000] "{method} {request} HTTP/1.1" '
+                    f'{status} {random.randint(200, 20000)} "-" "Mozilla/5.0" {random.expovariate(8):.3f}\n')
+
+
+def write_events(path, lines):
+    with open(path, "w") as f:
+        for _ in range(lines):
+            kind = random.choices(["cart_created", "funnel_step", "payment", "delivered", "queue_stats"],
+                                  [20, 40, 25, 10, 5])[0]
+            event = {"event": kind, "region": random.choice(REGIONS)}
+            if kind == "funnel_step":
+                event["step"] = random.choice(STEPS)
+            elif kind == "payment":
+                event.update(gateway=random.choice(GATEWAYS), amount=round(random.uniform(5, 400), 2),
+                             result="success" if random.random() < 0.93 else "declined")
+            elif kind == "delivered":
+                event["shipping_hours"] = round(random.uniform(1, 96), 1)
+            elif kind == "queue_stats":
+                event.update(queue=random.choice(["emails", "orders"]), size=random.randint(0, 500))
+            f.write(json.dumps(event) + "\n")
+
+
+def ingest_blocks(config_path, log_path, use_mmap):
+    config = load_config(config_path)
+    collector = build_collector(config, CollectorRegistry())
+    ingestor = LogIngestor(config, collector, {"job": "bench", "instance": "bench-1"})
+    tailer = LogTailer(log_path, use_mmap=use_mmap)
+    while True:
+        block = tailer.read()
+        if not block:
+            break
+        ingestor.feed(block)
+    tailer.close()
+    return ingestor.lines
+
+
+def access_per_line(log_path):
+    registry = CollectorRegistry()
+    requests = Counter("api_requests_total", "", ["service"], registry=registry)
+    errors = Counter("api_errors_total", "", ["service", "code"], registry=registry)
+    latency = Histogram("api_latency_seconds", "", ["service"], registry=registry)
+    page = Histogram("frontend_page_load_seconds", "", buckets=[0.5, 1.0, 2.5, 5.0, 10.0], registry=registry)
+    line_re = re.compile(ACCESS_LOG.pattern.decode())
+    service_re = re.compile(r"^/api/(\w+)")
+    page_re = re.compile(r"/(|products/.*|cart|checkout)")
+    count = 0
+    with open(log_path) as f:
+        for line in f:
+            count += 1
+            m = line_re.match(line)
+            if m is None:
+                continue
+            path, status, seconds = m.group("path"), m.group("status"), float(m.group("request_time") or 0)
+            service = service_re.match(path)
+            if service:
+                requests.labels(service.group(1)).inc()
+                latency.labels(service.group(1)).observe(seconds)
+                if status[0] in "45":
+                    errors.labels(service.group(1), status).inc()
+            elif m.group("method") == "GET" and page_re.fullmatch(path):
+                page.observe(seconds)
+    return count
+
+
+def events_per_line(log_path):
+    registry = CollectorRegistry()
+    carts = Counter("ecom_cart_created_total", "", ["region"], registry=registry)
+    funnel = Counter("funnel_step_total", "", ["region", "step"], registry=registry)
+    payments = Counter("payment_request_total", "", registry=registry)
+    success = Counter("payment_success_total", "", ["gateway"], registry=registry)
+    paid = Counter("ecom_orders_paid_total", "", ["region"], registry=registry)
+    revenue = Counter("ecom_revenue_total", "", ["region", "gateway"], registry=registry)
+    shipping = Histogram("shipping_time_seconds", "", ["region"],
+                         buckets=[3600, 10800, 21600, 43200, 86400, 172800, 345600], registry=registry)
+    count = 0
+    with open(log_path, "rb") as f:
+        for line in f:
+            count += 1
+            event = json.loads(line)
+            kind = event.get("event")
+            if kind == "cart_created":
+                carts.labels(event["region"]).inc()
+            elif kind == "funnel_step":
+                funnel.labels(event["region"], event["step"]).inc()
+            elif kind == "payment":
+                payments.inc()
+                if event.get("result") == "success":
+                    success.labels(event["gateway"]).inc()
+                    paid.labels(event["region"]).inc()
+                    revenue.labels(event["region"], event["gateway"]).inc(event["amount"])
+            elif kind == "delivered":
+                shipping.labels(event["region"]).observe(event["shipping_hours"] * 3600)
+    return count
+
+
+def best_rate(fn, repeat):
+    best = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        lines = fn()
+        best = max(best, lines / (time.perf_counter() - start))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la ingesta de logs a métricas")
+    parser.add_argument("--lines", type=int, default=500000, help="Líneas de cada log generado")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones; se informa la mejor")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla de los logs generados")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    with tempfile.TemporaryDirectory() as directory:
+        access = os.path.join(directory, "access.log")
+        events = os.path.join(directory, "events.jsonl")
+        t0 = time.perf_counter()
+        write_access_log(access, args.lines)
+        write_events(events, args.lines)
+        print(f"📝 {args.lines:,} líneas por log generadas en {time.perf_counter() - t0:.1f} s "
+              f"(access {os.path.getsize(access) / 1e6:.0f} MB, jsonl {os.path.getsize(events) / 1e6:.0f} MB)\n")
+
+        for title, config, path, baseline in (
+                ("access log", "ecommerce-access.json", access, access_per_line),
+                ("eventos JSONL", "ecommerce-events.json", events, events_per_line)):
+            config = os.path.join(CONFIG_DIR, config)
+            buffered = best_rate(lambda: ingest_blocks(config, path, False), args.repeat)
+            mapped = best_rate(lambda: ingest_blocks(config, path, True), args.repeat)
+            per_line = best_rate(lambda: baseline(path), 1)
+            print(f"⚡ {title}")
+            print(f"   bloques (read) {buffered:>12,.0f} líneas/s   x{buffered / per_line:.1f}")
+            print(f"   bloques (mmap) {mapped:>12,.0f} líneas/s   x{mapped / per_line:.1f}")
+            print(f"   por línea      {per_line:>12,.0f} líneas/s\n")
+
+
+if __name__ == "__main__":
+    main()
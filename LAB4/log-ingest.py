@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+log-ingest.py
+
+Alimenta las métricas de un business case (o las de LAB3) con eventos
+reales en lugar de valores al azar: sigue archivos JSONL o access logs,
+los parsea en bloques y aplica las actualizaciones en lote sobre familias
+en arrays de NumPy (ver obslab/log_metrics.py). Cada ``--interval``
+segundos el registry se envía a los mismos destinos que los simuladores.
+
+Los archivos se leen en el orden dado: los primeros completos (p. ej.
+rotados, también ``.gz``) y el último se sigue en vivo, detectando sus
+rotaciones.
+
+Uso:
+    python3 log-ingest.py --config log-configs/ecommerce-access.json \\
+        --pushgateway http://localhost:9091 /var/log/nginx/access.log.1 /var/log/nginx/access.log
+    python3 log-ingest.py --config log-configs/ecommerce-events.json --once --from-start eventos.jsonl
+    python3 log-ingest.py --config ../LAB3/log-config.json --pushgateway http://localhost:9091 access.log
+"""
+
+import argparse
+import os
+import socket
+import sys
+import time
+
+from prometheus_client import CollectorRegistry
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from obslab.log_metrics import LogIngestor, LogTailer, build_collector, load_config  # noqa: E402
+from obslab.scenarios import CASES  # noqa: E402
+from obslab.sinks import add_sink_arguments, build_sinks  # noqa: E402
+
+
+def push(sinks, registry, job, instance):
+    for sink in sinks:
+        try:
+            sink.push(registry, job, {"instance": instance})
+        except Exception as e:
+            print(f"❌ Error al enviar métricas a {sink}: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Métricas de Prometheus a partir de logs JSONL o access logs")
+    parser.add_argument("files", nargs="+", help="Archivos de log (el último se sigue en vivo)")
+    parser.add_argument("--config", required=True, help="Configuración JSON (formato, familias y reglas)")
+    parser.add_argument("--pushgateway", default="", help="URL del Pushgateway ('' para no hacer push)")
+    parser.add_argument("--job", default=None, help="Job del push (por defecto el del business case)")
+    parser.add_argument("--instance", default=None, help="Instance del push (por defecto el del business case)")
+    parser.add_argument("--interval", type=float, default=10, help="Segundos entre pushes")
+    parser.add_argument("--from-start", action="store_true", help="Lee el último archivo desde el principio")
+    parser.add_argument("--once", action="store_true", help="Lee todo hasta el final, hace un push y termina")
+    parser.add_argument("--mmap", action="store_true", help="Lee con mmap en lugar de read() con buffer")
+    parser.add_argument("--chunk-mb", type=float, default=4, help="Tamaño de cada bloque leído")
+    add_sink_arguments(parser)
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    case = config.get("case")
+    job = args.job or (CASES[case][0] if case else "log_ingest_job")
+    instance = args.instance or (CASES[case][1] if case else socket.gethostname())
+    registry = CollectorRegistry()
+    collector = build_collector(config, registry)
+    ingestor = LogIngestor(config, collector, {"job": job, "instance": instance})
+    sinks = build_sinks(args, replace=True)
+
+    chunk = int(args.chunk_mb * 1024 * 1024)
+    tailers = [LogTailer(path, True, args.mmap, chunk) for path in args.files[:-1]]
+    live = LogTailer(args.files[-1], args.from_start or args.once, args.mmap, chunk)
+    print(f"📜 {len(ingestor.rules)} reglas ({config.get('format', 'jsonl')}) -> job={job} instance={instance}; "
+          f"destinos: {', '.join(str(sink) for sink in sinks) or 'ninguno'}")
+
+    started = time.perf_counter()
+    try:
+        for tailer in tailers:
+            while True:
+                block = tailer.read()
+                if not block:
+                    break
+                ingestor.feed(block)
+            ingestor.feed(tailer.flush())
+            tailer.close()
+            print(f"📂 {tailer}: {ingestor.lines:,} líneas hasta ahora")
+
+        next_push = time.monotonic() + args.interval
+        window_lines, window_start = ingestor.lines, time.monotonic()
+        while True:
+            block = live.read()
+            if block:
+                ingestor.feed(block)
+            elif args.once:
+                ingestor.feed(live.flush())
+                break
+            else:
+                time.sleep(0.2)
+            now = time.monotonic()
+            if now >= next_push:
+                rate = (ingestor.lines - window_lines) / (now - window_start)
+                push(sinks, registry, job, instance)
+                print(f"✅ [{time.strftime('%H:%M:%S')}] {ingestor.lines:,} líneas ({rate:,.0f}/s), "
+                      f"{ingestor.skipped:,} sin parsear, {live.rotations} rotaciones")
+                window_lines, window_start = ingestor.lines, now
+                next_push = now + args.interval
+    except KeyboardInterrupt:
+        print("\nDetenido por el usuario.")
+    finally:
+        live.close()
+        if sinks:
+            push(sinks, registry, job, instance)
+        elapsed = time.perf_counter() - started
+        print(f"📊 {ingestor.lines:,} líneas en {elapsed:.1f} s ({ingestor.lines / max(elapsed, 1e-9):,.0f}/s), "
+              f"{ingestor.skipped:,} sin parsear, {ingestor.updates:,} actualizaciones")
+        for sink in sinks:
+            sink.close()
+
+
+if __name__ == "__main__":
+    main()
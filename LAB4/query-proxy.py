@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+query-proxy.py
+
+Proxy con caché para ``/api/v1/query_range`` delante de Prometheus (ver
+obslab/query_cache.py): alinea start/end al step, guarda los slices de tiempo
+que ya no cambian y solo le pide a Prometheus el más nuevo. Requests
+idénticos de varios espectadores se hacen una sola vez.
+
+Subcomandos:
+  serve    el proxy; en Grafana se apunta el datasource a él en lugar de
+           a Prometheus (el resto de la API se reenvía sin caché)
+  standin  API de queries de prueba: los simuladores alimentan un TSDB en
+           memoria (con historia backfilleada) y las queries se evalúan con
+           obslab.promql; cuenta cuántos puntos evalúa
+  bench    levanta standin y proxy en este proceso y simula espectadores del
+           dashboard de un business case, primero directo y después por el
+           proxy; compara la carga del backend
+
+Uso:
+    python3 query-proxy.py serve --upstream http://localhost:9090 --port 9095
+    python3 query-proxy.py standin --case 1 --port 9098
+    python3 query-proxy.py bench --case 1 --viewers 5 --refreshes 6
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import threading
+import time
+import urllib.parse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from obslab.dashboards import iter_targets, load_dashboard, refresh_seconds, time_range_seconds  # noqa: E402
+from obslab.promql import PromQLError, Scalar, expand_variables, query_range  # noqa: E402
+from obslab.query_cache import (QUERY_RANGE_PATH, PrometheusBackend, QueryCache, parse_step,  # noqa: E402
+                                parse_time, proxy_server)
+from obslab.scenarios import CASES, Scenario, dashboard_path  # noqa: E402
+from obslab.transport import HTTPTarget  # noqa: E402
+from obslab.tsdb import TSDB  # noqa: E402
+
+
+def format_value(value):
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Standin:
+    """TSDB en memoria que avanza en tiempo real y responde query_range como Prometheus."""
+
+    def __init__(self, case, instances, minutes, scrape_interval):
+        self.job = CASES[case][0]
+        self.scrape_interval = scrape_interval
+        self.scenarios = [Scenario(case, job=self.job, instance=f"{CASES[case][1]}-{i}")
+                          for i in range(1, instances + 1)]
+        self.db = TSDB()
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.points = 0
+        self.seconds = 0.0
+        now = time.time()
+        for k in range(int(minutes * 60 // scrape_interval), -1, -1):
+            self._append(now - k * scrape_interval)
+        self._stop = threading.Event()
+        threading.Thread(target=self._feed, daemon=True).start()
+
+    def _append(self, timestamp):
+        samples = []
+        for scenario in self.scenarios:
+            scenario.step()
+            samples.extend(scenario.samples())
+        with self.lock:
+            self.db.append(timestamp, samples)
+
+    def _feed(self):
+        while not self._stop.wait(self.scrape_interval):
+            self._append(time.time())
+
+    def reset_counters(self):
+        with self.lock:
+            self.requests, self.points, self.seconds = 0, 0, 0.0
+
+    def query_range(self, expr, start, end, step):
+        """``(status, payload)`` con el formato de la API de Prometheus."""
+        t0 = time.perf_counter()
+        with self.lock:
+            try:
+                result = query_range(self.db, expr, start, end, step)
+            except PromQLError as e:
+                return 400, {"status": "error", "errorType": "bad_data", "error": str(e)}
+            points = len(result.values[0]) if isinstance(result, Scalar) else result.values.shape[1]
+            self.requests += 1
+            self.points += points
+            self.seconds += time.perf_counter() - t0
+        steps = [start + j * step for j in range(points)]
+        if isinstance(result, Scalar):
+            rows = [({}, result.values)]
+        else:
+            rows = zip(result.labels, result.values)
+        series = []
+        for labels, values in rows:
+            pairs = [[round(t, 3), format_value(v)] for t, v in zip(steps, values) if not math.isnan(v)]
+            if pairs:
+                series.append({"metric": labels, "values": pairs})
+        return 200, {"status": "success", "data": {"resultType": "matrix", "result": series}}
+
+    def server(self, host, port):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        standin = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _handle(self, method):
+                path, _, query_string = self.path.partition("?")
+                params = dict(urllib.parse.parse_qsl(query_string))
+                if method == "POST":
+                    length = int(self.headers.get("Content-Length", 0) or 0)
+                    params.update(urllib.parse.parse_qsl(self.rfile.read(length).decode()))
+                if path == QUERY_RANGE_PATH:
+                    try:
+                        status, payload = standin.query_range(params["query"], parse_time(params["start"]),
+                                                              parse_time(params["end"]), parse_step(params["step"]))
+                    except (KeyError, ValueError) as e:
+                        status, payload = 400, {"status": "error", "errorType": "bad_data", "error": str(e)}
+                else:
+                    status, payload = 404, {"status": "error", "error": "solo /api/v1/query_range"}
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def log_message(self, *args):
+                pass
+
+        return ThreadingHTTPServer((host, port), Handler)
+
+    def close(self):
+        self._stop.set()
+
+
+def start_thread(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def dashboard_queries(case, job, scrape_interval, max_points):
+    """``(exprs, rango, step, refresh)`` como los pediría Grafana al abrir el dashboard."""
+    dashboard = load_dashboard(dashboard_path(case))
+    span = time_range_seconds(dashboard)
+    step = max(scrape_interval, math.ceil(span / max_points))
+    variables = {"job": job, "instance": ".*", "region": ".*"}
+    exprs = [expand_variables(target["expr"], variables, step, scrape_interval, span)
+             for _, target in iter_targets(dashboard)]
+    return exprs, span, step, refresh_seconds(dashboard) or 5.0
+
+
+def run_viewers(url, exprs, span, step, viewers, refreshes, refresh, stagger):
+    """Cada espectador refresca todos los paneles ``refreshes`` veces; devuelve los errores."""
+    errors = []
+
+    def viewer():
+        target = HTTPTarget(url, timeout=60.0)
+        time.sleep(random.uniform(0, stagger))
+        next_refresh = time.monotonic()
+        for _ in range(refreshes):
+            end = time.time()
+            for expr in exprs:
+                body = urllib.parse.urlencode({"query": expr, "start": f"{end - span:.3f}", "end": f"{end:.3f}",
+                                               "step": f"{step:g}"}).encode()
+                status, data = target.request("POST", QUERY_RANGE_PATH, body,
+                                              {"Content-Type": "application/x-www-form-urlencoded"})
+                if status != 200:
+                    errors.append(f"HTTP {status} {data[:120]!r}")
+            next_refresh += refresh
+            time.sleep(max(0.0, next_refresh - time.monotonic()))
+        target.close()
+
+    threads = [threading.Thread(target=viewer) for _ in range(viewers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+def bench(args):
+    print(f"🧪 Stand-in del business-case-{args.case}: {args.instances} instancias, "
+          f"{args.minutes:g} min de historia")
+    standin = Standin(args.case, args.instances, args.minutes, args.scrape_interval)
+    exprs, span, step, refresh = dashboard_queries(args.case, standin.job, args.scrape_interval, args.max_points)
+    refresh = args.refresh or refresh
+    backend_url = start_thread(standin.server("127.0.0.1", 0))
+    cache = QueryCache(PrometheusBackend(backend_url), args.slice_seconds, args.max_freshness,
+                       head_ttl=args.head_ttl)
+    proxy_url = start_thread(proxy_server(cache, backend_url, "127.0.0.1", 0))
+    stagger = refresh if args.stagger is None else args.stagger
+    print(f"   {len(exprs)} queries por refresh, rango {span:g} s, step {step:g} s, refresh {refresh:g} s, "
+          f"{args.viewers} espectadores x {args.refreshes} refreshes\n")
+
+    results = {}
+    for mode, url in (("directo", backend_url), ("proxy", proxy_url)):
+        standin.reset_counters()
+        t0 = time.perf_counter()
+        errors = run_viewers(url, exprs, span, step, args.viewers, args.refreshes, refresh, stagger)
+        elapsed = time.perf_counter() - t0
+        results[mode] = (standin.requests, standin.points, standin.seconds)
+        print(f"{'🐢' if mode == 'directo' else '⚡'} {mode:<8} backend: {standin.requests} queries, "
+              f"{standin.points:,} puntos evaluados, {standin.seconds:.2f} s de evaluación "
+              f"({elapsed:.0f} s de prueba{f', {len(errors)} errores' if errors else ''})")
+        for error in errors[:3]:
+            print(f"   ❌ {error}")
+    standin.close()
+
+    (req_d, pts_d, sec_d), (req_p, pts_p, sec_p) = results["directo"], results["proxy"]
+    print(f"\n📊 Proxy: {cache.summary()}")
+    print(f"   Carga del backend con el proxy: queries x{req_d / max(req_p, 1):.1f} menos, "
+          f"puntos x{pts_d / max(pts_p, 1):.1f} menos, tiempo de evaluación x{sec_d / max(sec_p, 1e-9):.1f} menos")
+
+
+def serve(args):
+    cache = QueryCache(PrometheusBackend(args.upstream), args.slice_seconds, args.max_freshness,
+                       args.max_slices, args.head_ttl)
+    server = proxy_server(cache, args.upstream, args.listen, args.port, args.verbose)
+    print(f"🔁 Proxy en http://{args.listen}:{args.port} -> {args.upstream} "
+          f"(slices de {args.slice_seconds:g} s, estadísticas en /proxy/stats)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"\n📊 {cache.summary()}")
+
+
+def standin_main(args):
+    standin = Standin(args.case, args.instances, args.minutes, args.scrape_interval)
+    server = standin.server(args.listen, args.port)
+    print(f"🧪 Stand-in de business-case-{args.case} en http://{args.listen}:{args.port}{QUERY_RANGE_PATH} "
+          f"({len(standin.db)} series, job={standin.job})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        standin.close()
+        print(f"\n{standin.requests} queries, {standin.points:,} puntos evaluados en {standin.seconds:.2f} s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Proxy con caché para query_range de Prometheus")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    cache_args = argparse.ArgumentParser(add_help=False)
+    cache_args.add_argument("--slice-seconds", type=float, default=300,
+                            help="Ancho de los slices que se cachean (se redondea a múltiplo del step)")
+    cache_args.add_argument("--max-freshness", type=float, default=60,
+                            help="Segundos hacia atrás desde ahora que nunca se cachean (datos que pueden cambiar)")
+    cache_args.add_argument("--head-ttl", type=float, default=0,
+                            help="Segundos que se reutiliza el slice más nuevo (0 = solo deduplicar en vuelo)")
+    sim_args = argparse.ArgumentParser(add_help=False)
+    sim_args.add_argument("--case", type=int, default=1, choices=sorted(CASES), help="Business case a simular")
+    sim_args.add_argument("--instances", type=int, default=2, help="Instancias simuladas")
+    sim_args.add_argument("--minutes", type=float, default=75, help="Minutos de historia iniciales")
+    sim_args.add_argument("--scrape-interval", type=float, default=15, help="Segundos entre snapshots")
+
+    p_serve = sub.add_parser("serve", parents=[cache_args], help="Proxy delante de Prometheus")
+    p_serve.add_argument("--upstream", default="http://localhost:9090", help="URL de Prometheus")
+    p_serve.add_argument("--listen", default="0.0.0.0", help="Dirección de escucha")
+    p_serve.add_argument("--port", type=int, default=9095, help="Puerto del proxy")
+    p_serve.add_argument("--max-slices", type=int, default=20000, help="Slices que se guardan como máximo (LRU)")
+    p_serve.add_argument("--verbose", action="store_true", help="Imprime cada query_range")
+
+    p_standin = sub.add_parser("standin", parents=[sim_args], help="API de queries de prueba alimentada por simuladores")
+    p_standin.add_argument("--listen", default="127.0.0.1", help="Dirección de escucha")
+    p_standin.add_argument("--port", type=int, default=9098, help="Puerto")
+
+    p_bench = sub.add_parser("bench", parents=[cache_args, sim_args],
+                             help="Espectadores simulados, directo contra el stand-in y por el proxy")
+    p_bench.add_argument("--viewers", type=int, default=5, help="Espectadores simultáneos del dashboard")
+    p_bench.add_argument("--refreshes", type=int, default=6, help="Refreshes por espectador y por modo")
+    p_bench.add_argument("--refresh", type=float, default=None, help="Segundos entre refreshes (por defecto el del dashboard)")
+    p_bench.add_argument("--stagger", type=float, default=None,
+                         help="Los espectadores abren el dashboard en un momento al azar de este intervalo "
+                              "(por defecto un refresh; 0 = todos a la vez)")
+    p_bench.add_argument("--max-points", type=int, default=1000, help="maxDataPoints de los paneles (define el step)")
+    args = parser.parse_args()
+
+    {"serve": serve, "standin": standin_main, "bench": bench}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
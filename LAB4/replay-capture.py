@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+replay-capture.py
+
+Reproduce una captura (--capture de los simuladores) sin volver a correr la
+simulación aleatoria: útil para repetir un incidente o generar carga. Los
+segmentos se leen con memmap, snapshot por snapshot, así que el tamaño de la
+captura no limita la memoria.
+
+Destinos (se pueden combinar):
+  --pushgateway URL     PUT por (job, instance), igual que push_to_gateway
+  --remote-write URL    WriteRequest protobuf + snappy
+  --openmetrics DIR     un archivo OpenMetrics por snapshot (con timestamps)
+
+Uso:
+    python3 replay-capture.py /tmp/run-a --pushgateway http://localhost:9091 --speed 10
+    python3 replay-capture.py /tmp/run-a --remote-write http://localhost:9090/api/v1/write \\
+        --speed 0 --rewrite-timestamps --copies 50
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from obslab.capture import CaptureReader  # noqa: E402
+from obslab.exposition import SeriesCatalog  # noqa: E402
+from obslab.fanout import TEXT_CONTENT_TYPE, grouping_path  # noqa: E402
+from obslab.remote_write import RemoteWriteClient, encode_labels, encode_timeseries  # noqa: E402
+from obslab.transport import HTTPTarget  # noqa: E402
+
+
+def copy_instance(template, instance, copy, copies):
+    return instance if copies == 1 else template.format(instance=instance, copy=copy)
+
+
+class PushgatewayEmitter:
+    def __init__(self, url, series, copies, template):
+        self.target = HTTPTarget(url)
+        self.catalog = SeriesCatalog(series, relabel=lambda l: {k: v for k, v in l.items() if k not in ("job", "instance")})
+        groups = {}
+        for sid, (_, labels) in enumerate(series):
+            groups.setdefault((labels.get("job", ""), labels.get("instance", "")), []).append(sid)
+        self.group_of = np.zeros(len(series), dtype=np.intp)
+        self.paths = []
+        for g, ((job, instance), sids) in enumerate(groups.items()):
+            self.group_of[sids] = g
+            self.paths.append([grouping_path(job, {"instance": copy_instance(template, instance, c, copies)})
+                               for c in range(1, copies + 1)])
+
+    def emit(self, ts, ids, values):
+        groups = self.group_of[ids]
+        for g in np.unique(groups):
+            mask = groups == g
+            body = self.catalog.render_text(ids[mask].tolist(), values[mask].tolist())
+            for path in self.paths[g]:
+                self.target.send("PUT", path, body, {"Content-Type": TEXT_CONTENT_TYPE})
+
+    def close(self):
+        self.target.close()
+
+
+class RemoteWriteEmitter:
+    def __init__(self, url, series, copies, template, max_samples, basic_auth=None):
+        self.client = RemoteWriteClient(url, basic_auth=basic_auth)
+        self.max_samples = max_samples
+        self.labels = []  # por copia: labels codificados de cada serie
+        for c in range(1, copies + 1):
+            encoded = []
+            for name, labels in series:
+                labels = dict(labels)
+                if "instance" in labels:
+                    labels["instance"] = copy_instance(template, labels["instance"], c, copies)
+                labels["__name__"] = name
+                encoded.append(encode_labels(labels))
+            self.labels.append(encoded)
+
+    def emit(self, ts, ids, values):
+        ts_ms = int(ts * 1000)
+        ids = ids.tolist()
+        values = values.tolist()
+        batch = []
+        for encoded in self.labels:
+            for sid, value in zip(ids, values):
+                batch.append(encode_timeseries(encoded[sid], [(value, ts_ms)]))
+                if len(batch) >= self.max_samples:
+                    self.client.send_raw(b"".join(batch))
+                    batch = []
+        if batch:
+            self.client.send_raw(b"".join(batch))
+
+    def close(self):
+        self.client.close()
+
+
+class OpenMetricsEmitter:
+    def __init__(self, path, series, copies, template):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        # Un solo catálogo con las series de todas las copias: OpenMetrics no
+        # permite repetir una familia más adelante en el mismo archivo.
+        expanded = []
+        for c in range(1, copies + 1):
+            for name, labels in series:
+                labels = dict(labels)
+                if "instance" in labels:
+                    labels["instance"] = copy_instance(template, labels["instance"], c, copies)
+                expanded.append((name, labels))
+        self.catalog = SeriesCatalog(expanded)
+        self.offsets = np.arange(copies) * len(series)
+        self.count = 0
+
+    def emit(self, ts, ids, values):
+        all_ids = (self.offsets[:, None] + ids[None, :]).ravel().tolist()
+        all_values = np.tile(values, len(self.offsets)).tolist()
+        self.count += 1
+        name = os.path.join(self.path, f"snapshot-{self.count:08d}.om")
+        with open(name, "wb") as f:
+            f.write(self.catalog.render_openmetrics(all_ids, all_values, timestamp=ts))
+
+    def close(self):
+        pass
+
+
+def replay(reader, emitters, speed, rewrite, loop):
+    """Emite cada snapshot respetando el espaciado original dividido por ``speed``."""
+    snapshots = samples = 0
+    wall0 = time.time()
+    report_at = wall0 + 5
+    offset = 0.0  # desplazamiento acumulado entre vueltas con --loop
+    t_first = None
+    last_out = 0.0
+    while True:
+        t_last = None
+        for ts, ids, values in reader.snapshots():
+            if t_first is None:
+                t_first = ts
+            elapsed = (ts - t_first + offset)
+            if speed > 0:
+                delay = wall0 + elapsed / speed - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                out_ts = wall0 + elapsed / speed if rewrite else ts
+            else:
+                # Sin pausas el tiempo se comprime: cada snapshot lleva la hora
+                # de emisión, forzada a crecer al menos 1 ms
+                out_ts = max(time.time(), last_out + 0.001) if rewrite else ts
+            last_out = out_ts
+            for emitter in emitters:
+                emitter.emit(out_ts, np.asarray(ids), np.asarray(values))
+            snapshots += 1
+            samples += len(ids)
+            t_last = ts
+            now = time.time()
+            if now >= report_at:
+                rate = samples / (now - wall0)
+                print(f"{snapshots} snapshots, {samples} muestras ({rate:,.0f} muestras/s)")
+                report_at = now + 5
+        if not loop or t_last is None:
+            break
+        # La siguiente vuelta continúa en el tiempo (los counters "reinician")
+        offset += t_last - t_first + 1
+    return snapshots, samples, time.time() - wall0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay de capturas de métricas a N× tiempo real")
+    parser.add_argument("capture", help="Directorio creado con --capture")
+    parser.add_argument("--speed", type=float, default=1.0, help="Multiplicador de velocidad (0 = sin pausas)")
+    parser.add_argument("--loop", action="store_true", help="Repite la captura indefinidamente")
+    parser.add_argument("--rewrite-timestamps", action="store_true",
+                        help="Usa la hora de emisión en lugar del timestamp capturado")
+    parser.add_argument("--copies", type=int, default=1, help="Réplicas de cada instancia (multiplica la carga)")
+    parser.add_argument("--instance-template", default="{instance}-r{copy}",
+                        help="Nombre de las instancias replicadas (variables {instance} y {copy})")
+    parser.add_argument("--pushgateway", help="Pushgateway URL")
+    parser.add_argument("--remote-write", help="Endpoint remote_write (p. ej. http://localhost:9090/api/v1/write)")
+    parser.add_argument("--remote-write-user", help="Usuario basic auth para remote_write")
+    parser.add_argument("--remote-write-password", help="Password/API key basic auth para remote_write")
+    parser.add_argument("--max-samples", type=int, default=2000, help="Muestras máximas por request de remote_write")
+    parser.add_argument("--openmetrics", metavar="DIR", help="Escribe un archivo OpenMetrics por snapshot")
+    args = parser.parse_args()
+
+    if not (args.pushgateway or args.remote_write or args.openmetrics):
+        parser.error("indica al menos un destino: --pushgateway, --remote-write u --openmetrics")
+
+    reader = CaptureReader(args.capture)
+    emitters = []
+    if args.pushgateway:
+        emitters.append(PushgatewayEmitter(args.pushgateway, reader.series, args.copies, args.instance_template))
+    if args.remote_write:
+        auth = (args.remote_write_user, args.remote_write_password) if args.remote_write_user else None
+        emitters.append(RemoteWriteEmitter(args.remote_write, reader.series, args.copies,
+                                           args.instance_template, args.max_samples, auth))
+    if args.openmetrics:
+        emitters.append(OpenMetricsEmitter(args.openmetrics, reader.series, args.copies, args.instance_template))
+
+    print(f"▶️  Replay de {args.capture}: {len(reader.series)} series x {args.copies} copia(s), velocidad {args.speed:g}x")
+    try:
+        snapshots, samples, elapsed = replay(reader, emitters, args.speed, args.rewrite_timestamps, args.loop)
+    except KeyboardInterrupt:
+        print("Replay interrumpido")
+        return
+    finally:
+        for emitter in emitters:
+            emitter.close()
+    print(f"✅ {snapshots} snapshots / {samples * args.copies} muestras en {elapsed:.1f}s "
+          f"({samples * args.copies / max(elapsed, 1e-9):,.0f} muestras/s)")
+
+
+if __name__ == "__main__":
+    main()
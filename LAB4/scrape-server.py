@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+scrape-server.py
+
+Modo pull de los business cases: un solo proceso sirve muchas instancias
+simuladas para que Prometheus las scrapee directamente, sin Pushgateway
+(ver obslab/scrape_server.py).
+
+    /targets/<instance>/metrics   métricas de una instancia
+    /sd                           lista de targets para http_sd_configs
+    /metrics                      métricas del propio servidor
+
+Uso:
+    python3 scrape-server.py --case 1 --instances 50
+    python3 scrape-server.py --instances 1000 --port 9200
+    python3 scrape-server.py --instances 1000 --store array     # métricas en arrays de NumPy
+    python3 scrape-server.py --case 3 --instances 200 --port-base 20000   # un puerto por instancia
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from obslab.scenarios import CASES  # noqa: E402
+from obslab.scrape_server import ScrapeServer  # noqa: E402
+
+
+async def serve(server, host, port):
+    servers = await server.start(host, port)
+    print(f"🌐 {len(server.targets)} instancias en http://{host}:{port}/targets/<instance>/metrics"
+          f" (SD en /sd, {len(servers)} puerto(s) abiertos)")
+    await asyncio.gather(*(s.serve_forever() for s in servers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sirve instancias simuladas de LAB4 para scrape directo")
+    parser.add_argument("--case", type=int, action="append", choices=sorted(CASES),
+                        help="Business case a simular (repetible; por defecto todos)")
+    parser.add_argument("--instances", type=int, default=1, help="Instancias por business case")
+    parser.add_argument("--interval", type=float, default=10, help="Segundos simulados por ciclo")
+    parser.add_argument("--max-catchup", type=int, default=4,
+                        help="Ciclos que se recuperan como máximo si una instancia estuvo sin scrapes")
+    parser.add_argument("--listen", default="0.0.0.0", help="Dirección de escucha")
+    parser.add_argument("--port", type=int, default=9200, help="Puerto principal (rutas /targets, /sd y /metrics)")
+    parser.add_argument("--port-base", type=int, default=None,
+                        help="Además, un puerto por instancia a partir de este (/metrics en cada uno)")
+    parser.add_argument("--store", choices=("client", "array"), default="client",
+                        help="Dónde guardar las métricas: objetos de prometheus_client o arrays de NumPy")
+    args = parser.parse_args()
+
+    cases = args.case or sorted(CASES)
+    t0 = time.perf_counter()
+    server = ScrapeServer({case: args.instances for case in cases}, args.interval,
+                          args.max_catchup, args.port_base, args.store)
+    print(f"🚀 {len(server.targets)} instancias creadas en {time.perf_counter() - t0:.1f} s")
+    try:
+        asyncio.run(serve(server, args.listen, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
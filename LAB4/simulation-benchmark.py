@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+simulation-benchmark.py
+
+Costo por ciclo de la simulación evento por evento frente a la simulación
+por agregados (obslab/aggregate_sim.py) de los business cases 1 y 5, para
+distintos volúmenes de tráfico, y verificación de que ambas den las mismas
+distribuciones: fracción acumulada por bucket, promedio (``_sum`` /
+``_count``) de cada histograma y summary, y conversión del funnel.
+
+Uso:
+    python3 simulation-benchmark.py
+    python3 simulation-benchmark.py --case 1 --rates 10,1e4,1e7 --store array
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from obslab.scenarios import AGGREGATE_CASES, Scenario  # noqa: E402
+
+# Requests de API por ciclo con scale=1: 4 servicios x 750 (caso 1), 5 endpoints x (255 GET + 100 POST) (caso 5)
+REQUESTS_PER_CYCLE = {1: 3000, 5: 1775}
+
+
+def ms_per_cycle(scenario, cycles):
+    t0 = time.perf_counter()
+    for _ in range(cycles):
+        scenario.step()
+    return (time.perf_counter() - t0) / cycles * 1000
+
+
+def distributions(scenario, cycles):
+    """
+    Por histograma/summary: (fracciones por bucket o None, promedio, observaciones);
+    y la conversión del funnel (una tasa sorteada por región y ciclo).
+    """
+    buckets, counts, sums, steps = {}, {}, {}, {}
+    regions = set()
+    for name, labels, value in scenario.samples():
+        if name.endswith("_bucket"):
+            family = name[:-len("_bucket")]
+            le = float(labels["le"])
+            buckets.setdefault(family, {})
+            buckets[family][le] = buckets[family].get(le, 0.0) + value
+        elif name.endswith("_count"):
+            counts[name[:-len("_count")]] = counts.get(name[:-len("_count")], 0.0) + value
+        elif name.endswith("_sum"):
+            sums[name[:-len("_sum")]] = sums.get(name[:-len("_sum")], 0.0) + value
+        elif name == "funnel_step_total":
+            steps[labels["step"]] = steps.get(labels["step"], 0.0) + value
+            regions.add(labels["region"])
+    result = {}
+    for family, total in counts.items():
+        fractions = None
+        if family in buckets and total:
+            fractions = np.array([count / total for _, count in sorted(buckets[family].items())])
+        result[family] = (fractions, sums[family] / total if total else float("nan"), total)
+    if steps:
+        result["funnel order_paid / cart_created"] = (None, steps["order_paid"] / steps["cart_created"],
+                                                      cycles * len(regions))
+    return result
+
+
+def compare(case, store, cycles, seed):
+    events = Scenario(case, store=store)
+    aggregate = Scenario(case, store=store, engine="aggregate", seed=seed)
+    for _ in range(cycles):
+        events.step()
+        aggregate.step()
+    expected, got = distributions(events, cycles), distributions(aggregate, cycles)
+    rows = []
+    for family, (fractions, mean, observations) in sorted(expected.items()):
+        other_fractions, other_mean, _ = got[family]
+        bucket_error = float(np.max(np.abs(fractions - other_fractions))) if fractions is not None else 0.0
+        # Lo que se puede esperar del ruido de muestreo de dos corridas independientes
+        tolerance = 3 / np.sqrt(observations)
+        rows.append((family, bucket_error, abs(other_mean - mean) / abs(mean) if mean else 0.0, tolerance))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulación evento por evento vs por agregados")
+    parser.add_argument("--case", type=int, action="append", choices=sorted(AGGREGATE_CASES),
+                        help="Business case (repetible; por defecto los que tienen simulación por agregados)")
+    parser.add_argument("--rates", default="10,1e3,1e5,1e7", help="Requests de API por segundo a simular")
+    parser.add_argument("--interval", type=float, default=15, help="Segundos simulados por ciclo")
+    parser.add_argument("--store", choices=["client", "array"], default="client",
+                        help="prometheus_client o arrays de NumPy (obslab.array_metrics)")
+    parser.add_argument("--cycles", type=int, default=30, help="Ciclos medidos por combinación")
+    parser.add_argument("--check-cycles", type=int, default=200,
+                        help="Ciclos con scale=1 para comparar las distribuciones de ambos modos")
+    parser.add_argument("--seed", type=int, default=42, help="Semilla del modo por agregados")
+    args = parser.parse_args()
+
+    rates = [float(rate) for rate in args.rates.split(",")]
+    for case in args.case or sorted(AGGREGATE_CASES):
+        print(f"⚙️  business-case-{case} ({args.store}, ciclos de {args.interval:g} s)")
+        # El modo evento por evento tiene un volumen fijo (scale=1): su costo crece lineal con el tráfico
+        events_ms = ms_per_cycle(Scenario(case, store=args.store), args.cycles)
+        print(f"   evento por evento con {REQUESTS_PER_CYCLE[case]:,} req/ciclo: {events_ms:.2f} ms/ciclo")
+        print(f"   {'req/s':>12} {'req/ciclo':>14} {'scale':>10} {'eventos ms/ciclo*':>18} {'agregados ms/ciclo':>19}")
+        for rate in rates:
+            requests = rate * args.interval
+            scale = requests / REQUESTS_PER_CYCLE[case]
+            aggregate = Scenario(case, store=args.store, engine="aggregate", scale=scale, seed=args.seed)
+            aggregate_ms = ms_per_cycle(aggregate, args.cycles)
+            print(f"   {rate:>12,.0f} {requests:>14,.0f} {scale:>10.4g} {events_ms * scale:>18,.2f} {aggregate_ms:>19.3f}")
+        print("   * estimado: costo medido con scale=1 por scale")
+        print(f"\n   Distribuciones en {args.check_cycles} ciclos con scale=1 (diferencia agregados vs eventos):")
+        for family, bucket_error, mean_error, tolerance in compare(case, args.store, args.check_cycles, args.seed):
+            icon = "✅" if bucket_error < tolerance and mean_error < tolerance else "⚠️ "
+            buckets = f"buckets {bucket_error:.4f}" if bucket_error else " " * 14
+            print(f"   {icon} {family:<48} {buckets}  promedio {mean_error:.2%}")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+store-benchmark.py
+
+Compara las métricas de prometheus_client con las familias en arrays de
+NumPy de obslab/array_metrics.py:
+
+    memoria     bytes por combinación de labels (y por serie expuesta) con
+                ``--series`` ATMs / instancias, medido con tracemalloc
+    updates     operaciones por segundo: ``labels(...).inc()`` resolviendo
+                los labels cada vez, con el hijo ya resuelto y, en arrays,
+                las variantes vectorizadas (``set_many``, ``observe_many``)
+    exposición  tiempo de ``generate_latest`` frente a ``exposition()``
+    escenarios  un ciclo de simulación + exposición de cada business case
+
+Uso:
+    python3 store-benchmark.py
+    python3 store-benchmark.py --series 20000 --repeat 5
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from obslab.array_metrics import ArrayCollector  # noqa: E402
+from obslab.scenarios import CASES, Scenario  # noqa: E402
+
+BUCKETS = [0.01, 0.05, 0.1, 0.3, 0.5, 1, 2, 5]
+
+
+def build(store, kind, n):
+    """Una familia con ``n`` combinaciones de labels, cada una con un valor."""
+    devices = [f"ATM-{i:05d}" for i in range(n)]
+    if store == "client":
+        registry = CollectorRegistry()
+        if kind == "gauge":
+            family = Gauge("atm_cash_level_percent", "Nivel de efectivo", ["device_id"], registry=registry)
+        elif kind == "counter":
+            family = Counter("atm_transaction_total", "Transacciones", ["device_id"], registry=registry)
+        else:
+            family = Histogram("saas_request_duration_seconds", "Duración", ["instance_id"],
+                               buckets=BUCKETS, registry=registry)
+        render = lambda: generate_latest(registry)  # noqa: E731
+    else:
+        collector = ArrayCollector()
+        if kind == "gauge":
+            family = collector.gauge("atm_cash_level_percent", "Nivel de efectivo", ["device_id"])
+        elif kind == "counter":
+            family = collector.counter("atm_transaction_total", "Transacciones", ["device_id"])
+        else:
+            family = collector.histogram("saas_request_duration_seconds", "Duración", ["instance_id"], BUCKETS)
+        render = collector.exposition
+    for device in devices:
+        child = family.labels(device)
+        if kind == "gauge":
+            child.set(50.0)
+        elif kind == "counter":
+            child.inc(3)
+        else:
+            child.observe(0.2)
+    return family, devices, render
+
+
+def memory(store, kind, n):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    family, devices, render = build(store, kind, n)
+    render()  # la exposición en arrays cachea el texto de los labels: se cuenta
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del family, devices, render
+    return used
+
+
+def best_rate(fn, count, repeat):
+    best = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = max(best, count / (time.perf_counter() - start))
+    return best
+
+
+def best_seconds(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def updates(store, n, repeat):
+    """``{operación: ops/s}``."""
+    gauge, devices, _ = build(store, "gauge", n)
+    histogram, _, _ = build(store, "histogram", n)
+    values = np.random.uniform(10, 95, n)
+    values_list = values.tolist()
+    children = [gauge.labels(d) for d in devices]
+    hist_children = [histogram.labels(d) for d in devices]
+
+    def set_labels():
+        for device, value in zip(devices, values_list):
+            gauge.labels(device).set(value)
+
+    def set_child():
+        for child, value in zip(children, values_list):
+            child.set(value)
+
+    def observe_child():
+        for child, value in zip(hist_children, values_list):
+            child.observe(value / 100)
+
+    rates = {
+        "gauge labels(...).set": best_rate(set_labels, n, repeat),
+        "gauge hijo.set": best_rate(set_child, n, repeat),
+        "histogram hijo.observe": best_rate(observe_child, n, repeat),
+    }
+    if store == "array":
+        ids = gauge.ids([(d,) for d in devices])
+        rates["gauge set_many"] = best_rate(lambda: gauge.set_many(ids, values), n, repeat)
+        samples = values / 100
+        rates["histogram observe_many"] = best_rate(lambda: histogram.observe_many(0, samples), n, repeat)
+    return rates
+
+
+def scenario_step(store, case, repeat):
+    scenario = Scenario(case, store=store)
+    scenario.step()
+
+    def cycle():
+        scenario.step()
+        scenario.exposition()
+
+    return best_seconds(cycle, repeat)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de métricas en arrays frente a prometheus_client")
+    parser.add_argument("--series", type=int, default=5000, help="Combinaciones de labels por familia")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones; se informa la mejor")
+    args = parser.parse_args()
+    stores = ("client", "array")
+
+    print(f"💾 Memoria con {args.series} combinaciones de labels")
+    for kind, exposed in (("gauge", 1), ("counter", 2), ("histogram", len(BUCKETS) + 3)):
+        used = {store: memory(store, kind, args.series) for store in stores}
+        print(f"   {kind:<10} client {used['client'] / args.series:>7,.0f} B   "
+              f"array {used['array'] / args.series:>6,.0f} B por combinación "
+              f"({used['array'] / args.series / exposed:,.0f} B por serie expuesta, "
+              f"x{used['client'] / used['array']:.1f} menos)")
+
+    print(f"\n⚡ Updates ({args.series} por ronda)")
+    rates = {store: updates(store, args.series, args.repeat) for store in stores}
+    for operation in rates["array"]:
+        client = rates["client"].get(operation)
+        array = rates["array"][operation]
+        line = f"   {operation:<24} array {array:>13,.0f} ops/s"
+        if client:
+            line += f"   client {client:>11,.0f} ops/s   x{array / client:.1f}"
+        print(line)
+
+    print("\n📤 Exposición")
+    for kind in ("gauge", "histogram"):
+        seconds = {}
+        for store in stores:
+            _, _, render = build(store, kind, args.series)
+            seconds[store] = best_seconds(render, args.repeat)
+        print(f"   {kind:<10} generate_latest {seconds['client'] * 1000:>7.1f} ms   "
+              f"exposition() {seconds['array'] * 1000:>7.1f} ms   x{seconds['client'] / seconds['array']:.1f}")
+
+    print("\n🔁 Ciclo de simulación + exposición por business case")
+    for case in sorted(CASES):
+        seconds = {store: scenario_step(store, case, args.repeat) for store in stores}
+        print(f"   caso {case}: client {seconds['client'] * 1000:>6.2f} ms   array {seconds['array'] * 1000:>6.2f} ms"
+              f"   x{seconds['client'] / seconds['array']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
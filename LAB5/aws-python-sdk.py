@@ -1,6 +1,14 @@
-import boto3
-import random
+import argparse
 import datetime
+import json
+import os
+import random
+import socket
+import sys
+
+# boto3 se importa solo dentro de create_client: con --fast o --socket no se
+# carga, y es la mayor parte del tiempo de arranque de cada ejecución.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 
 # --- 1. Define tus credenciales (Generalmente obtenidas de un proveedor de credenciales o ambiente) ---
 # NOTA: En un entorno de producción, nunca se deberían codificar
@@ -10,198 +18,391 @@ AWS_SECRET_ACCESS_KEY = 'TU_SECRET_KEY_AQUI'
 AWS_SESSION_TOKEN = 'TU_SESSION_TOKEN_AQUI' # Necesario si usas credenciales temporales (STS/IAM Role)
 AWS_REGION = 'us-east-1' # Reemplaza con tu región, e.g., 'eu-central-1'
 
-# Inicializa el cliente de CloudWatch
-cloudwatch = boto3.client(
-    'cloudwatch',
-    region_name=AWS_REGION,
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-    aws_session_token=AWS_SESSION_TOKEN
-)
-
 # Constantes para las métricas
 NAMESPACE = 'AplicacionPython'
 INSTANCE_ID_DIMENSION = 'i-0123456789abcdef0' 
-CURRENT_TIMESTAMP = datetime.datetime.utcnow()
+
+
+def explicit_credentials():
+    """Las credenciales de arriba, o None si siguen los valores de ejemplo (se usa el ambiente/rol)."""
+    if AWS_ACCESS_KEY_ID.startswith('TU_'):
+        return None
+    token = None if AWS_SESSION_TOKEN.startswith('TU_') else AWS_SESSION_TOKEN
+    return AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, token
+
+
+def create_client(fast=False, endpoint_url=None):
+    """Cliente de CloudWatch: boto3, o el cliente mínimo de obslab si ``fast``."""
+    credentials = explicit_credentials()
+    if fast:
+        from obslab.cloudwatch import CloudWatchClient, resolve_credentials
+
+        return CloudWatchClient(AWS_REGION, resolve_credentials(*(credentials or ())), endpoint_url)
+    import boto3
+
+    kwargs = {}
+    if credentials:
+        kwargs = dict(aws_access_key_id=credentials[0], aws_secret_access_key=credentials[1],
+                      aws_session_token=credentials[2])
+    # Inicializa el cliente de CloudWatch
+    return boto3.client('cloudwatch', region_name=AWS_REGION, endpoint_url=endpoint_url, **kwargs)
+
 
 # --- 2. Generación de las 20 Métricas ---
-metric_data_list = []
-
-# --- GRUPO A: Uso de Recursos del Sistema (8 Métricas) ---
-
-# 1. Uso de Disco (Tu métrica original)
-metric_data_list.append({
-    'MetricName': 'DiskUsedPercent', 
-    'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
-    'Timestamp': CURRENT_TIMESTAMP,
-    'Value': 75.5,
-    'Unit': 'Percent'
-})
-# 2. Inodes Usados
-metric_data_list.append({
-    'MetricName': 'InodesUsedPercent', 
-    'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
-    'Timestamp': CURRENT_TIMESTAMP,
-    'Value': 45.1,
-    'Unit': 'Percent'
-})
-# 3. Uso de CPU (Usuario)
-metric_data_list.append({
-    'MetricName': 'CPU_User', 
-    'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
-    'Timestamp': CURRENT_TIMESTAMP,
-    'Value': random.uniform(20, 50),
-    'Unit': 'Percent'
-})
-# 4. Uso de CPU (Sistema)
-metric_data_list.append({
-    'MetricName': 'CPU_System', 
-    'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
-    'Timestamp': CURRENT_TIMESTAMP,
-    'Value': random.uniform(5, 15),
-    'Unit': 'Percent'
-})
-# 5. Uso de Memoria (Libre)
-metric_data_list.append({
-    'MetricName': 'Memory_Available', 
-    'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
-    'Timestamp': CURRENT_TIMESTAMP,
-    'Value': random.randint(1024, 4096),
-    'Unit': 'Megabytes'
-})
-# 6. Uso de Swap
-metric_data_list.append({
-    'MetricName': 'SwapUsedPercent', 
-    'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
-    'Timestamp': CURRENT_TIMESTAMP,
-    'Value': random.uniform(0, 5),
-    'Unit': 'Percent'
-})
-# 7. Carga del Sistema (1 Minuto)
-metric_data_list.append({
-    'MetricName': 'Load_Average_1min', 
-    'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
-    'Timestamp': CURRENT_TIMESTAMP,
-    'Value': random.uniform(0.5, 2.0),
-    'Unit': 'Count'
-})
-# 8. Número de Procesos Ejecutándose
-metric_data_list.append({
-    'MetricName': 'ProcessesRunning', 
-    'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
-    'Timestamp': CURRENT_TIMESTAMP,
-    'Value': random.randint(100, 250),
-    'Unit': 'Count'
-})
-
-# --- GRUPO B: Métricas de Red y Tráfico (6 Métricas) ---
-
-# 9. Conexiones TCP Abiertas
-metric_data_list.append({
-    'MetricName': 'TCPConnectionsEstablished', 
-    'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
-    'Timestamp': CURRENT_TIMESTAMP,
-    'Value': random.randint(50, 200),
-    'Unit': 'Count'
-})
-# 10. Paquetes de Entrada (Incoming)
-metric_data_list.append({
-    'MetricName': 'NetworkPacketsIn', 
-    'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
-    'Timestamp': CURRENT_TIMESTAMP,
-    'Value': random.randint(500, 1500),
-    'Unit': 'Count'
-})
-# 11. Paquetes de Salida (Outgoing)
-metric_data_list.append({
-    'MetricName': 'NetworkPacketsOut', 
-    'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
-    'Timestamp': CURRENT_TIMESTAMP,
-    'Value': random.randint(200, 1000),
-    'Unit': 'Count'
-})
-# 12. Errores de Red (Input)
-metric_data_list.append({
-    'MetricName': 'NetworkErrorsIn', 
-    'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
-    'Timestamp': CURRENT_TIMESTAMP,
-    'Value': random.randint(0, 5),
-    'Unit': 'Count'
-})
-# 13. Tasa de peticiones HTTP (Global)
-metric_data_list.append({
-    'MetricName': 'RequestsPerSecond', 
-    'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
-    'Timestamp': CURRENT_TIMESTAMP,
-    'Value': random.randint(10, 80),
-    'Unit': 'Count'
-})
-# 14. Latencia Promedio de la API (en Segundos)
-metric_data_list.append({
-    'MetricName': 'APILatency', 
-    'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
-    'Timestamp': CURRENT_TIMESTAMP,
-    'Value': random.uniform(0.05, 0.5),
-    'Unit': 'Seconds'
-})
-
-# --- GRUPO C: Métricas de Aplicación/Procesamiento (6 Métricas) ---
-
-# 15. Tareas en Cola de Procesamiento
-metric_data_list.append({
-    'MetricName': 'QueueLength', 
-    'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
-    'Timestamp': CURRENT_TIMESTAMP,
-    'Value': random.randint(0, 15),
-    'Unit': 'Count'
-})
-# 16. Errores 5xx de la Aplicación
-metric_data_list.append({
-    'MetricName': 'HTTP5xxCount', 
-    'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
-    'Timestamp': CURRENT_TIMESTAMP,
-    'Value': random.randint(0, 3),
-    'Unit': 'Count'
-})
-# 17. Tiempo de Procesamiento del Backend (ms)
-metric_data_list.append({
-    'MetricName': 'BackendProcessingTime', 
-    'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
-    'Timestamp': CURRENT_TIMESTAMP,
-    'Value': random.randint(100, 800),
-    'Unit': 'Milliseconds'
-})
-# 18. Tasa de Aciertos en Caché
-metric_data_list.append({
-    'MetricName': 'CacheHitRatio', 
-    'Dimensions': [{'Name': 'CacheName', 'Value': 'AppCache'}], # Diferente dimensión
-    'Timestamp': CURRENT_TIMESTAMP,
-    'Value': random.uniform(85, 99),
-    'Unit': 'Percent'
-})
-# 19. Sesiones de Usuario Activas
-metric_data_list.append({
-    'MetricName': 'ActiveUserSessions', 
-    'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
-    'Timestamp': CURRENT_TIMESTAMP,
-    'Value': random.randint(10, 100),
-    'Unit': 'Count'
-})
-# 20. Uso de Hilos/Workers (Pool Size)
-metric_data_list.append({
-    'MetricName': 'WorkerThreadUsage', 
-    'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
-    'Timestamp': CURRENT_TIMESTAMP,
-    'Value': random.uniform(50, 95),
-    'Unit': 'Percent'
-})
-
-# --- 3. Llamada Final a la API de CloudWatch ---
-print(f"Enviando {len(metric_data_list)} métricas a CloudWatch...")
-
-response = cloudwatch.put_metric_data(
-    Namespace=NAMESPACE,
-    MetricData=metric_data_list
-)
-
-print("Métricas enviadas con éxito:", response)
\ No newline at end of file
+def build_metric_data(timestamp=None):
+    """Las 20 métricas del laboratorio, con valores nuevos en cada llamada."""
+    timestamp = timestamp or datetime.datetime.utcnow()
+    metric_data_list = []
+
+    # --- GRUPO A: Uso de Recursos del Sistema (8 Métricas) ---
+
+    # 1. Uso de Disco (Tu métrica original)
+    metric_data_list.append({
+        'MetricName': 'DiskUsedPercent', 
+        'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
+        'Timestamp': timestamp,
+        'Value': 75.5,
+        'Unit': 'Percent'
+    })
+    # 2. Inodes Usados
+    metric_data_list.append({
+        'MetricName': 'InodesUsedPercent', 
+        'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
+        'Timestamp': timestamp,
+        'Value': 45.1,
+        'Unit': 'Percent'
+    })
+    # 3. Uso de CPU (Usuario)
+    metric_data_list.append({
+        'MetricName': 'CPU_User', 
+        'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
+        'Timestamp': timestamp,
+        'Value': random.uniform(20, 50),
+        'Unit': 'Percent'
+    })
+    # 4. Uso de CPU (Sistema)
+    metric_data_list.append({
+        'MetricName': 'CPU_System', 
+        'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
+        'Timestamp': timestamp,
+        'Value': random.uniform(5, 15),
+        'Unit': 'Percent'
+    })
+    # 5. Uso de Memoria (Libre)
+    metric_data_list.append({
+        'MetricName': 'Memory_Available', 
+        'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
+        'Timestamp': timestamp,
+        'Value': random.randint(1024, 4096),
+        'Unit': 'Megabytes'
+    })
+    # 6. Uso de Swap
+    metric_data_list.append({
+        'MetricName': 'SwapUsedPercent', 
+        'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
+        'Timestamp': timestamp,
+        'Value': random.uniform(0, 5),
+        'Unit': 'Percent'
+    })
+    # 7. Carga del Sistema (1 Minuto)
+    metric_data_list.append({
+        'MetricName': 'Load_Average_1min', 
+        'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
+        'Timestamp': timestamp,
+        'Value': random.uniform(0.5, 2.0),
+        'Unit': 'Count'
+    })
+    # 8. Número de Procesos Ejecutándose
+    metric_data_list.append({
+        'MetricName': 'ProcessesRunning', 
+        'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
+        'Timestamp': timestamp,
+        'Value': random.randint(100, 250),
+        'Unit': 'Count'
+    })
+
+    # --- GRUPO B: Métricas de Red y Tráfico (6 Métricas) ---
+
+    # 9. Conexiones TCP Abiertas
+    metric_data_list.append({
+        'MetricName': 'TCPConnectionsEstablished', 
+        'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
+        'Timestamp': timestamp,
+        'Value': random.randint(50, 200),
+        'Unit': 'Count'
+    })
+    # 10. Paquetes de Entrada (Incoming)
+    metric_data_list.append({
+        'MetricName': 'NetworkPacketsIn', 
+        'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
+        'Timestamp': timestamp,
+        'Value': random.randint(500, 1500),
+        'Unit': 'Count'
+    })
+    # 11. Paquetes de Salida (Outgoing)
+    metric_data_list.append({
+        'MetricName': 'NetworkPacketsOut', 
+        'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
+        'Timestamp': timestamp,
+        'Value': random.randint(200, 1000),
+        'Unit': 'Count'
+    })
+    # 12. Errores de Red (Input)
+    metric_data_list.append({
+        'MetricName': 'NetworkErrorsIn', 
+        'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
+        'Timestamp': timestamp,
+        'Value': random.randint(0, 5),
+        'Unit': 'Count'
+    })
+    # 13. Tasa de peticiones HTTP (Global)
+    metric_data_list.append({
+        'MetricName': 'RequestsPerSecond', 
+        'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
+        'Timestamp': timestamp,
+        'Value': random.randint(10, 80),
+        'Unit': 'Count'
+    })
+    # 14. Latencia Promedio de la API (en Segundos)
+    metric_data_list.append({
+        'MetricName': 'APILatency', 
+        'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
+        'Timestamp': timestamp,
+        'Value': random.uniform(0.05, 0.5),
+        'Unit': 'Seconds'
+    })
+
+    # --- GRUPO C: Métricas de Aplicación/Procesamiento (6 Métricas) ---
+
+    # 15. Tareas en Cola de Procesamiento
+    metric_data_list.append({
+        'MetricName': 'QueueLength', 
+        'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
+        'Timestamp': timestamp,
+        'Value': random.randint(0, 15),
+        'Unit': 'Count'
+    })
+    # 16. Errores 5xx de la Aplicación
+    metric_data_list.append({
+        'MetricName': 'HTTP5xxCount', 
+        'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
+        'Timestamp': timestamp,
+        'Value': random.randint(0, 3),
+        'Unit': 'Count'
+    })
+    # 17. Tiempo de Procesamiento del Backend (ms)
+    metric_data_list.append({
+        'MetricName': 'BackendProcessingTime', 
+        'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
+        'Timestamp': timestamp,
+        'Value': random.randint(100, 800),
+        'Unit': 'Milliseconds'
+    })
+    # 18. Tasa de Aciertos en Caché
+    metric_data_list.append({
+        'MetricName': 'CacheHitRatio', 
+        'Dimensions': [{'Name': 'CacheName', 'Value': 'AppCache'}], # Diferente dimensión
+        'Timestamp': timestamp,
+        'Value': random.uniform(85, 99),
+        'Unit': 'Percent'
+    })
+    # 19. Sesiones de Usuario Activas
+    metric_data_list.append({
+        'MetricName': 'ActiveUserSessions', 
+        'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
+        'Timestamp': timestamp,
+        'Value': random.randint(10, 100),
+        'Unit': 'Count'
+    })
+    # 20. Uso de Hilos/Workers (Pool Size)
+    metric_data_list.append({
+        'MetricName': 'WorkerThreadUsage', 
+        'Dimensions': [{'Name': 'InstanceId', 'Value': INSTANCE_ID_DIMENSION}],
+        'Timestamp': timestamp,
+        'Value': random.uniform(50, 95),
+        'Unit': 'Percent'
+    })
+    return metric_data_list
+
+
+# --- 3. Envío a través de un daemon local (opcional) ---
+# Un proceso de larga vida mantiene el cliente (y la conexión HTTPS) listos;
+# cada ejecución de cron solo arma las métricas y las escribe en el socket.
+
+def _json_default(value):
+    if isinstance(value, datetime.datetime):
+        return value.strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+    raise TypeError(f"no serializable: {value!r}")
+
+
+def send_to_daemon(socket_path, namespace, metric_data, timeout=15):
+    payload = json.dumps({'Namespace': namespace, 'MetricData': metric_data}, default=_json_default)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall(payload.encode())
+        sock.shutdown(socket.SHUT_WR)
+        reply = b''.join(iter(lambda: sock.recv(65536), b''))
+    reply = json.loads(reply)
+    if 'error' in reply:
+        raise IOError(reply['error'])
+    return reply
+
+
+def serve(socket_path, client):
+    import socketserver
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            try:
+                request = json.loads(self.rfile.read())
+                reply = client.put_metric_data(Namespace=request['Namespace'], MetricData=request['MetricData'])
+                print(f"{len(request['MetricData'])} métricas enviadas a {request['Namespace']}")
+            except Exception as e:
+                print(f"Error enviando métricas: {e}")
+                reply = {'error': str(e)}
+            self.wfile.write(json.dumps(reply, default=str).encode())
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    server = socketserver.UnixStreamServer(socket_path, Handler)
+    os.chmod(socket_path, 0o600)
+    print(f"Daemon escuchando en {socket_path} (Ctrl+C para detener)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(socket_path)
+
+
+# --- 4. Lambda: el cliente sobrevive entre invocaciones del mismo contenedor ---
+_lambda_client = None
+
+
+def lambda_handler(event, context):
+    global _lambda_client
+    if _lambda_client is None:
+        _lambda_client = create_client(fast=True)
+    response = _lambda_client.put_metric_data(Namespace=NAMESPACE, MetricData=build_metric_data())
+    return response['ResponseMetadata']
+
+
+# --- 5. OTLP: las mismas métricas hacia un OpenTelemetry Collector ---
+OTLP_UNITS = {'Percent': '%', 'Count': '1', 'Seconds': 's', 'Milliseconds': 'ms', 'Megabytes': 'MBy'}
+
+
+def export_otlp(endpoint, metric_data, headers=None):
+    """Envía ``metric_data`` (formato de put_metric_data) como gauges OTLP; devuelve el resumen del envío."""
+    from obslab.otlp import OTLPExporter, encode_metric, encode_resource_metrics, number_point
+
+    grouped = {}
+    for datum in metric_data:
+        timestamp = datum['Timestamp'].replace(tzinfo=datetime.timezone.utc)
+        time_ns = int(timestamp.timestamp() * 1e9)
+        attributes = {d['Name']: d['Value'] for d in datum.get('Dimensions', [])}
+        point = number_point(attributes, time_ns, time_ns, datum['Value'])
+        grouped.setdefault((datum['MetricName'], datum.get('Unit', '')), []).append(point)
+    metrics = [encode_metric(name, '', OTLP_UNITS.get(unit, ''), 'gauge', points)
+               for (name, unit), points in grouped.items()]
+
+    exporter = OTLPExporter(endpoint, headers=headers, max_retries=1)
+    exporter.submit(encode_resource_metrics({'service.name': NAMESPACE}, metrics), len(metric_data))
+    exporter.close()
+    if exporter.failed:
+        raise IOError(exporter.stats())
+    return exporter.stats()
+
+
+# --- 6. Spool: lo que no se pudo enviar queda en disco para la próxima ejecución ---
+def spool_metric_data(spool, metric_data):
+    spool.append(json.dumps(metric_data, default=_json_default).encode())
+
+
+def replay_spool(spool, send, period=60):
+    """Reenvía el backlog resumido en estadísticas por minuto; devuelve (datapoints, requests, descartados)."""
+    from obslab.cloudwatch import MAX_DATUMS_PER_REQUEST, coalesce_metric_data
+
+    totals = [0, 0, 0]
+
+    def handler(payloads):
+        datums = [datum for payload in payloads for datum in json.loads(payload)]
+        coalesced, dropped = coalesce_metric_data(datums, period)
+        for i in range(0, len(coalesced), MAX_DATUMS_PER_REQUEST):
+            send(coalesced[i:i + MAX_DATUMS_PER_REQUEST])
+            totals[1] += 1
+        totals[0] += len(datums)
+        totals[2] += dropped
+
+    spool.replay(handler, batch_records=200)
+    return tuple(totals)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publica 20 métricas personalizadas en CloudWatch")
+    parser.add_argument('--fast', action='store_true',
+                        help="Cliente mínimo sin boto3 (arranque rápido para cron/Lambda)")
+    parser.add_argument('--endpoint-url', help="Endpoint alternativo de CloudWatch (p. ej. para pruebas)")
+    parser.add_argument('--socket', help="Envía las métricas al daemon que escucha en este socket Unix")
+    parser.add_argument('--serve', metavar='SOCKET', help="Modo daemon: recibe métricas por este socket Unix")
+    parser.add_argument('--otlp-endpoint', metavar='URL',
+                        help="En lugar de CloudWatch, exporta por OTLP/HTTP (p. ej. http://localhost:4318)")
+    parser.add_argument('--otlp-header', action='append', default=[], metavar='NOMBRE=VALOR',
+                        help="Header extra para el endpoint OTLP (repetible)")
+    parser.add_argument('--spool', metavar='DIR',
+                        help="Si el envío falla, guarda las métricas en este directorio y las reenvía "
+                             "en la próxima ejecución que logre enviar")
+    parser.add_argument('--spool-mb', type=float, default=16, help="Tamaño máximo del spool en MB")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, create_client(args.fast, args.endpoint_url))
+        return
+
+    metric_data_list = build_metric_data()
+
+    if args.otlp_endpoint:
+        headers = dict(header.split('=', 1) for header in args.otlp_header)
+        print(f"Enviando {len(metric_data_list)} métricas por OTLP a {args.otlp_endpoint}...")
+        print("Métricas enviadas con éxito:", export_otlp(args.otlp_endpoint, metric_data_list, headers))
+        return
+
+    # --- Llamada Final a la API de CloudWatch ---
+    print(f"Enviando {len(metric_data_list)} métricas a CloudWatch...")
+
+    if args.socket:
+        send = lambda data: send_to_daemon(args.socket, NAMESPACE, data)  # noqa: E731
+    else:
+        cloudwatch = create_client(args.fast, args.endpoint_url)
+        send = lambda data: cloudwatch.put_metric_data(Namespace=NAMESPACE, MetricData=data)  # noqa: E731
+
+    if not args.spool:
+        response = send(metric_data_list)
+        print("Métricas enviadas con éxito:", response)
+        return
+
+    from obslab.spool import Spool
+
+    spool = Spool(args.spool, max_bytes=int(args.spool_mb * 1024 * 1024))
+    try:
+        response = send(metric_data_list)
+    except Exception as e:
+        spool_metric_data(spool, metric_data_list)
+        spool.close()
+        print(f"Error enviando métricas: {e}")
+        print(f"Guardadas en {args.spool} ({spool.pending_bytes()} bytes pendientes)")
+        sys.exit(1)
+    print("Métricas enviadas con éxito:", response)
+    if spool:
+        try:
+            datapoints, requests, dropped = replay_spool(spool, send)
+            print(f"Backlog reenviado: {datapoints} datapoints en {requests} request(s)"
+                  f" ({dropped} descartados por antiguos)")
+        except Exception as e:
+            print(f"Reenvío del backlog interrumpido, se retoma en la próxima ejecución: {e}")
+    spool.close()
+
+
+if __name__ == '__main__':
+    main()
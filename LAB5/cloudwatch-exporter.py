@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+cloudwatch-exporter.py
+
+Trae de vuelta las métricas que publica aws-python-sdk.py (namespace
+AplicacionPython) y las expone en /metrics para Prometheus/Alloy, usando
+GetMetricData en bloques de hasta 500 métricas por request y pidiendo en
+cada poll solo los datapoints nuevos (ver obslab/cloudwatch_reader.py).
+
+Uso:
+    python3 cloudwatch-exporter.py --port 9106
+    python3 cloudwatch-exporter.py --metric CPU_User --metric APILatency --stat Average --stat Maximum
+    python3 cloudwatch-exporter.py --once          # un poll, a stdout
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import boto3
+from prometheus_client import CollectorRegistry, generate_latest, start_http_server
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from obslab.cloudwatch_reader import CloudWatchCollector, MetricDataReader, discover_queries  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta a Prometheus métricas de CloudWatch con GetMetricData")
+    parser.add_argument("--namespace", default="AplicacionPython")
+    parser.add_argument("--metric", action="append", help="Métrica a leer (repetible; por defecto todas las del namespace)")
+    parser.add_argument("--stat", action="append", help="Estadística (repetible; por defecto Average)")
+    parser.add_argument("--period", type=int, default=60, help="Período en segundos de cada datapoint")
+    parser.add_argument("--lookback", type=int, default=900, help="Segundos de historia del primer poll")
+    parser.add_argument("--min-interval", type=float, default=60, help="Segundos mínimos entre polls a CloudWatch")
+    parser.add_argument("--workers", type=int, default=4, help="Requests GetMetricData en paralelo")
+    parser.add_argument("--region", default=os.environ.get("AWS_REGION", "us-east-1"))
+    parser.add_argument("--endpoint-url", help="Endpoint alternativo de CloudWatch (p. ej. para pruebas)")
+    parser.add_argument("--port", type=int, default=9106)
+    parser.add_argument("--once", action="store_true", help="Un solo poll, imprime la exposición y termina")
+    args = parser.parse_args()
+
+    client = boto3.client("cloudwatch", region_name=args.region, endpoint_url=args.endpoint_url)
+    queries = discover_queries(client, args.namespace, args.metric, args.stat or ["Average"], args.period)
+    print(f"{len(queries)} series de {args.namespace}", file=sys.stderr)
+    reader = MetricDataReader(client, queries, args.lookback, max_workers=args.workers)
+    registry = CollectorRegistry()
+    registry.register(CloudWatchCollector(reader, args.min_interval))
+
+    if args.once:
+        sys.stdout.write(generate_latest(registry).decode())
+        return
+    start_http_server(args.port, registry=registry)
+    print(f"Exporter en http://0.0.0.0:{args.port}/metrics", file=sys.stderr)
+    while True:
+        time.sleep(3600)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+startup-benchmark.py
+
+Mide la latencia de punta a punta de cada invocación de aws-python-sdk.py
+(arranque del intérprete + imports + cliente + PutMetricData) en sus tres
+modos, contra un endpoint local que imita la respuesta de CloudWatch, para
+que el resultado no dependa de la red:
+
+    boto3    comportamiento original (import boto3 + boto3.client)
+    fast     --fast: cliente mínimo de obslab, sin boto3
+    daemon   --socket: el trabajo pesado lo hace un daemon ya iniciado
+
+Uso:
+    python3 startup-benchmark.py --runs 20
+"""
+
+import argparse
+import http.server
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "aws-python-sdk.py")
+
+RESPONSE = b"""<PutMetricDataResponse xmlns="http://monitoring.amazonaws.com/doc/2010-08-01/">
+  <ResponseMetadata><RequestId>00000000-0000-0000-0000-000000000000</RequestId></ResponseMetadata>
+</PutMetricDataResponse>"""
+
+
+class FakeCloudWatch(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(200)
+        self.send_header("Content-Type", "text/xml")
+        self.send_header("Content-Length", str(len(RESPONSE)))
+        self.end_headers()
+        self.wfile.write(RESPONSE)
+
+    def log_message(self, *args):
+        pass
+
+
+def time_runs(command, runs, env):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, env=env, check=True, stdout=subprocess.DEVNULL)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de arranque del publicador de CloudWatch")
+    parser.add_argument("--runs", type=int, default=15, help="Invocaciones por modo")
+    parser.add_argument("--modes", default="boto3,fast,daemon", help="Modos a medir, separados por coma")
+    args = parser.parse_args()
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), FakeCloudWatch)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f"http://127.0.0.1:{server.server_address[1]}"
+
+    env = dict(os.environ, AWS_ACCESS_KEY_ID="AKIDBENCHMARK", AWS_SECRET_ACCESS_KEY="secret",
+               AWS_DEFAULT_REGION="us-east-1")
+    env.pop("AWS_SESSION_TOKEN", None)
+    base = [sys.executable, SCRIPT, "--endpoint-url", endpoint]
+
+    results = {}
+    for mode in args.modes.split(","):
+        if mode == "boto3":
+            results[mode] = time_runs(base, args.runs, env)
+        elif mode == "fast":
+            results[mode] = time_runs(base + ["--fast"], args.runs, env)
+        elif mode == "daemon":
+            sock = os.path.join(tempfile.mkdtemp(), "cw.sock")
+            daemon = subprocess.Popen(base + ["--fast", "--serve", sock], env=env, stdout=subprocess.DEVNULL)
+            try:
+                while not os.path.exists(sock):
+                    time.sleep(0.01)
+                results[mode] = time_runs([sys.executable, SCRIPT, "--socket", sock], args.runs, env)
+            finally:
+                daemon.terminate()
+                daemon.wait()
+        else:
+            parser.error(f"modo desconocido: {mode}")
+
+    server.shutdown()
+    print(f"{'modo':<8} {'min':>8} {'mediana':>8} {'p90':>8}   (ms por invocación, {args.runs} corridas)")
+    for mode, samples in results.items():
+        samples.sort()
+        p90 = samples[min(len(samples) - 1, int(len(samples) * 0.9))]
+        print(f"{mode:<8} {samples[0]:>8.1f} {statistics.median(samples):>8.1f} {p90:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+"""
+Utilidades compartidas por los simuladores de los laboratorios.
+
+Los scripts de cada LAB agregan la raíz del repositorio a ``sys.path`` e
+importan desde aquí, por ejemplo::
+
+    from obslab.sinks import add_sink_arguments, build_sinks
+"""
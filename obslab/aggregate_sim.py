@@ -0,0 +1,125 @@
+"""
+Simulación por agregados: el resultado de cada ciclo se sortea directamente
+en lugar de generarse evento por evento.
+
+Los simuladores de LAB4 hacen un ``observe`` por request (y un ``randint``
+por paso del funnel), así que el costo de cada ciclo crece con el volumen
+simulado. Aquí cada ciclo cuesta lo mismo con 10 o con 10 millones de
+requests por segundo:
+
+- funnel (``cart_created`` -> ``checkout_start`` -> ``order_paid``):
+  binomiales encadenadas, y multinomial para repartir un total entre
+  categorías (códigos de error, gateways);
+- histogramas: los conteos por bucket son una multinomial con las
+  probabilidades de cada bucket según la distribución de latencias, y la
+  suma se sortea por bucket con la media y varianza de la distribución
+  restringida a él (aproximación normal, acotada al rango del bucket);
+- summaries: conteo y suma con la misma aproximación, sin buckets.
+
+``observe_distribution`` aplica el resultado a un histograma o summary de
+prometheus_client o de ``obslab.array_metrics`` por igual.
+"""
+
+import math
+
+import numpy as np
+
+
+class Uniform:
+    """Latencias uniformes en ``[low, high]`` (las que usan los business cases)."""
+
+    def __init__(self, low, high):
+        self.low = float(low)
+        self.high = float(high)
+        self._moments = {}
+
+    def bucket_moments(self, bounds):
+        """
+        Para los intervalos ``(-inf, b0], (b0, b1], ..., (bn, +inf)``: arrays de
+        probabilidad, media y varianza de la distribución restringida a cada uno.
+        """
+        key = tuple(bounds)
+        if key not in self._moments:
+            edges = np.clip(np.array([-math.inf] + list(key) + [math.inf]), self.low, self.high)
+            lower, upper = edges[:-1], edges[1:]
+            self._moments[key] = ((upper - lower) / (self.high - self.low), (lower + upper) / 2,
+                                  (upper - lower) ** 2 / 12, lower, upper)
+        return self._moments[key]
+
+
+def volume(rng, low, high, scale=1.0):
+    """Un ``randint(low, high)`` escalado: el volumen del ciclo con ``scale`` veces más tráfico."""
+    return int(rng.uniform(low, high + 1) * scale)
+
+
+def funnel(rng, entries, rates):
+    """Cuántos llegan a cada paso: ``entries`` y después una binomial por tasa de conversión."""
+    steps = [int(entries)]
+    for rate in rates:
+        steps.append(int(rng.binomial(steps[-1], rate)))
+    return steps
+
+
+def split(rng, total, weights):
+    """Reparte ``total`` entre categorías con probabilidades proporcionales a ``weights``."""
+    weights = np.asarray(weights, dtype=float)
+    return rng.multinomial(int(total), weights / weights.sum())
+
+
+def sample_histogram(rng, distribution, bounds, n):
+    """Conteos por bucket (no acumulados, el último es +Inf) y suma de ``n`` observaciones."""
+    probabilities, means, variances, lower, upper = distribution.bucket_moments(bounds)
+    counts = rng.multinomial(int(n), probabilities)
+    sums = rng.normal(counts * means, np.sqrt(counts * variances))
+    return counts, float(np.clip(sums, counts * lower, counts * upper).sum())
+
+
+def sample_sum(rng, distribution, n):
+    """Suma de ``n`` observaciones (para summaries)."""
+    if n <= 0:
+        return 0.0
+    _, means, variances, lower, upper = distribution.bucket_moments(())
+    total = rng.normal(n * means[0], math.sqrt(n * variances[0]))
+    return float(min(max(total, n * lower[0]), n * upper[0]))
+
+
+def add_observations(child, counts, total):
+    """
+    Suma ``counts`` (por bucket, o un entero en summaries) y ``total`` a un
+    histograma o summary ya resuelto con ``labels(...)`` (o sin labels).
+    """
+    if hasattr(child, "_family"):  # hijo de obslab.array_metrics
+        child._family.add_observations(child._id, counts, total)
+    elif hasattr(child, "add_observations"):  # familia de arrays sin labels
+        child.add_observations(0, counts, total)
+    elif hasattr(child, "_buckets"):
+        # prometheus_client no tiene una operación para esto: sus hijos guardan
+        # un valor por bucket (no acumulado), _sum y, en summaries, _count
+        for bucket, count in zip(child._buckets, np.asarray(counts).tolist()):
+            if count:
+                bucket.inc(count)
+        child._sum.inc(total)
+    else:
+        child._count.inc(int(counts))
+        child._sum.inc(total)
+
+
+def _bounds(child):
+    family = getattr(child, "_family", child)
+    if hasattr(family, "bounds"):
+        return family.bounds
+    if hasattr(child, "_upper_bounds"):
+        return [bound for bound in child._upper_bounds if not math.isinf(bound)]
+    return None
+
+
+def observe_distribution(rng, child, distribution, n):
+    """Equivale a ``n`` llamadas a ``child.observe(...)`` con valores de ``distribution``."""
+    n = int(n)
+    if n <= 0:
+        return
+    bounds = _bounds(child)
+    if bounds is None:  # summary
+        add_observations(child, n, sample_sum(rng, distribution, n))
+    else:
+        add_observations(child, *sample_histogram(rng, distribution, bounds, n))
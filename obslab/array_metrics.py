@@ -0,0 +1,405 @@
+"""
+Métricas guardadas en arrays de NumPy, como collector de ``prometheus_client``.
+
+``prometheus_client`` crea por cada combinación de labels un objeto hijo con
+su lock y un ``MutexValue`` por valor (uno por bucket en los histogramas),
+así que con miles de series (un ATM o una instancia por label) se lleva
+varios KB por serie y cada ``inc``/``observe`` paga locks y atributos.
+
+Aquí cada familia asigna a cada combinación de labels un id (interning la
+primera vez que aparece) y guarda los valores en arrays contiguos:
+
+    counter / gauge   values[id]
+    histogram         counts[id * (buckets + 1) + bucket] (no acumulado), sums[id]
+    summary           counts[id], sums[id]
+
+Las escrituras no toman locks: se asume un solo hilo escritor (el loop de
+simulación). Al crecer, los arrays nuevos se publican antes que el id, así
+que un lector (``collect`` o ``exposition`` desde otro hilo) que lee
+primero la cantidad de ids y después los arrays nunca indexa fuera de rango;
+a lo sumo ve valores de un instante antes.
+
+``ArrayCollector.exposition()`` arma el formato de texto directamente desde
+los arrays; ``collect()`` entrega las familias de ``prometheus_client`` para
+que funcionen ``generate_latest`` y los sinks. No se exponen las series
+``_created``. ``build_case_registry`` construye el registry de un business
+case de LAB4 con estas familias en lugar de las de ``prometheus_client``.
+"""
+
+import bisect
+import math
+
+import numpy as np
+from prometheus_client import Histogram
+from prometheus_client.core import (CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily,
+                                    SummaryMetricFamily)
+from prometheus_client.utils import floatToGoString
+
+_INITIAL_CAPACITY = 16
+
+
+def _escape(value):
+    return value.replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _grow(array, capacity, stride=1):
+    grown = np.zeros(capacity * stride, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class _Child:
+    """Lo que devuelve ``labels(...)``: la familia y el id, nada más."""
+
+    __slots__ = ("_family", "_id")
+
+    def __init__(self, family, index):
+        self._family = family
+        self._id = index
+
+    def inc(self, amount=1):
+        self._family.inc_id(self._id, amount)
+
+    def dec(self, amount=1):
+        self._family.inc_id(self._id, -amount)
+
+    def set(self, value):
+        self._family.set_id(self._id, value)
+
+    def observe(self, amount):
+        self._family.observe_id(self._id, amount)
+
+
+class ArrayFamily:
+    """Base común: interning de labels y crecimiento de los arrays."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._ids = {}
+        self.labelvalues = []   # id -> tupla de valores
+        self._capacity = 0
+        self._label_text = []   # id -> 'a="x",b="y"' (lo completa la exposición)
+        if not self.labelnames:
+            self.index()
+
+    def index(self, *labelvalues):
+        """Id de una combinación de labels (la crea si no existía)."""
+        index = self._ids.get(labelvalues)
+        if index is None:
+            if len(labelvalues) != len(self.labelnames):
+                raise ValueError(f"{self.name}: se esperaban labels {self.labelnames}, llegó {labelvalues}")
+            index = len(self.labelvalues)
+            if index == self._capacity:
+                self._capacity = max(_INITIAL_CAPACITY, self._capacity * 2)
+                self._resize(self._capacity)
+            # Primero los arrays, después el id: un lector nunca ve un id sin fila
+            self.labelvalues.append(labelvalues)
+            self._ids[labelvalues] = index
+        return index
+
+    def labels(self, *labelvalues, **labelkwargs):
+        if labelkwargs:
+            labelvalues = tuple(labelkwargs[name] for name in self.labelnames)
+        index = self._ids.get(labelvalues)
+        if index is None:  # primera vez, o valores que no son str
+            index = self.index(*(str(value) for value in labelvalues))
+        return _Child(self, index)
+
+    def ids(self, labelvalues):
+        """Ids de una lista de combinaciones, como array (para las operaciones ``*_many``)."""
+        return np.fromiter((self.index(*values) for values in labelvalues), dtype=np.intp,
+                           count=len(labelvalues))
+
+    # Familias sin labels: mismas llamadas que en prometheus_client
+    def inc(self, amount=1):
+        self.inc_id(0, amount)
+
+    def dec(self, amount=1):
+        self.inc_id(0, -amount)
+
+    def set(self, value):
+        self.set_id(0, value)
+
+    def observe(self, amount):
+        self.observe_id(0, amount)
+
+    def inc_id(self, index, amount):
+        raise TypeError(f"{self.name} ({self.kind}) no admite inc")
+
+    def set_id(self, index, value):
+        raise TypeError(f"{self.name} ({self.kind}) no admite set")
+
+    def observe_id(self, index, amount):
+        raise TypeError(f"{self.name} ({self.kind}) no admite observe")
+
+    def _resize(self, capacity):
+        raise NotImplementedError
+
+    def _labels_text(self, count):
+        """Texto de labels de los primeros ``count`` ids (se calcula una vez por id)."""
+        texts = self._label_text
+        for values in self.labelvalues[len(texts):count]:
+            pairs = sorted(zip(self.labelnames, values))
+            texts.append(",".join(f'{name}="{_escape(value)}"' for name, value in pairs))
+        return texts
+
+    def nbytes(self):
+        raise NotImplementedError
+
+
+class ArrayGauge(ArrayFamily):
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.values = np.zeros(0)
+        super().__init__(name, documentation, labelnames)
+
+    def _resize(self, capacity):
+        self.values = _grow(self.values, capacity)
+
+    def inc_id(self, index, amount=1):
+        self.values[index] += amount
+
+    def set_id(self, index, value):
+        self.values[index] = value
+
+    def inc_many(self, ids, amounts):
+        """Suma ``amounts`` a las filas ``ids`` (con repetidos) en una sola operación."""
+        np.add.at(self.values, ids, np.asarray(amounts, dtype=float))
+
+    def set_many(self, ids, values):
+        self.values[ids] = values
+
+    def samples(self, count):
+        return [(self.name, self.values[:count])]
+
+    def nbytes(self):
+        return self.values.nbytes
+
+
+class ArrayCounter(ArrayGauge):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        if name.endswith("_total"):
+            name = name[:-len("_total")]
+        super().__init__(name, documentation, labelnames)
+
+    set_id = ArrayFamily.set_id
+
+    def set_many(self, ids, values):
+        raise TypeError(f"{self.name} (counter) no admite set")
+
+    def inc_id(self, index, amount=1):
+        if amount < 0:
+            raise ValueError("Counters can only be incremented by non-negative amounts.")
+        self.values[index] += amount
+
+    def inc_many(self, ids, amounts):
+        amounts = np.asarray(amounts, dtype=float)
+        if (amounts < 0).any():
+            raise ValueError("Counters can only be incremented by non-negative amounts.")
+        np.add.at(self.values, ids, amounts)
+
+    def samples(self, count):
+        return [(f"{self.name}_total", self.values[:count])]
+
+
+class ArrayHistogram(ArrayFamily):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=Histogram.DEFAULT_BUCKETS):
+        bounds = sorted(float(b) for b in buckets if not math.isinf(float(b)))
+        self.bounds = bounds
+        self.stride = len(bounds) + 1  # el último es +Inf
+        self.counts = np.zeros(0)
+        self.sums = np.zeros(0)
+        self._le = [floatToGoString(b) for b in bounds] + ["+Inf"]
+        super().__init__(name, documentation, labelnames)
+
+    def _resize(self, capacity):
+        self.counts = _grow(self.counts, capacity, self.stride)
+        self.sums = _grow(self.sums, capacity)
+
+    def observe_id(self, index, amount):
+        self.counts[index * self.stride + bisect.bisect_left(self.bounds, amount)] += 1
+        self.sums[index] += amount
+
+    def observe_many(self, index, amounts):
+        """Muchas observaciones de una misma serie a la vez."""
+        amounts = np.asarray(amounts, dtype=float)
+        buckets = np.searchsorted(self.bounds, amounts, side="left")
+        start = index * self.stride
+        self.counts[start:start + self.stride] += np.bincount(buckets, minlength=self.stride)
+        self.sums[index] += amounts.sum()
+
+    def observe_ids(self, ids, amounts):
+        """Una observación por elemento: ``amounts[i]`` va a la serie ``ids[i]``."""
+        amounts = np.asarray(amounts, dtype=float)
+        flat = np.asarray(ids) * self.stride + np.searchsorted(self.bounds, amounts, side="left")
+        self.counts += np.bincount(flat, minlength=len(self.counts))
+        self.sums += np.bincount(ids, weights=amounts, minlength=len(self.sums))
+
+    def add_observations(self, index, counts, total):
+        """Conteos por bucket ya agregados (no acumulados, el último es +Inf) y su suma."""
+        start = index * self.stride
+        self.counts[start:start + self.stride] += counts
+        self.sums[index] += total
+
+    def cumulative(self, count):
+        return np.cumsum(self.counts[:count * self.stride].reshape(count, self.stride), axis=1)
+
+    def nbytes(self):
+        return self.counts.nbytes + self.sums.nbytes
+
+
+class ArraySummary(ArrayFamily):
+    kind = "summary"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.counts = np.zeros(0)
+        self.sums = np.zeros(0)
+        super().__init__(name, documentation, labelnames)
+
+    def _resize(self, capacity):
+        self.counts = _grow(self.counts, capacity)
+        self.sums = _grow(self.sums, capacity)
+
+    def observe_id(self, index, amount):
+        self.counts[index] += 1
+        self.sums[index] += amount
+
+    def observe_ids(self, ids, amounts):
+        self.counts += np.bincount(ids, minlength=len(self.counts))
+        self.sums += np.bincount(ids, weights=np.asarray(amounts, dtype=float), minlength=len(self.sums))
+
+    def add_observations(self, index, count, total):
+        self.counts[index] += count
+        self.sums[index] += total
+
+    def samples(self, count):
+        return [(f"{self.name}_count", self.counts[:count]), (f"{self.name}_sum", self.sums[:count])]
+
+    def nbytes(self):
+        return self.counts.nbytes + self.sums.nbytes
+
+
+class ArrayCollector:
+    """
+    Conjunto de familias; se registra en ``registry`` si se pasa uno.
+    ``counter``/``gauge``/``histogram``/``summary`` crean las familias.
+    """
+
+    def __init__(self, registry=None):
+        self.families = []
+        if registry is not None:
+            registry.register(self)
+
+    def _add(self, family):
+        self.families.append(family)
+        return family
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(ArrayCounter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._add(ArrayGauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=Histogram.DEFAULT_BUCKETS):
+        return self._add(ArrayHistogram(name, documentation, labelnames, buckets))
+
+    def summary(self, name, documentation, labelnames=()):
+        return self._add(ArraySummary(name, documentation, labelnames))
+
+    def factories(self):
+        """Reemplazos de ``Counter``/``Gauge``/``Histogram``/``Summary`` con la firma de prometheus_client."""
+        def wrap(create, with_buckets=False):
+            def factory(name, documentation, labelnames=(), registry=None, **kwargs):
+                if with_buckets and "buckets" in kwargs:
+                    return create(name, documentation, labelnames, kwargs["buckets"])
+                return create(name, documentation, labelnames)
+            return factory
+
+        return {
+            "Counter": wrap(self.counter),
+            "Gauge": wrap(self.gauge),
+            "Histogram": wrap(self.histogram, with_buckets=True),
+            "Summary": wrap(self.summary),
+        }
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        for family in self.families:
+            count = len(family.labelvalues)
+            labelvalues = family.labelvalues[:count]
+            if family.kind == "histogram":
+                metric = HistogramMetricFamily(family.name, family.documentation, labels=family.labelnames)
+                cumulative = family.cumulative(count).tolist()
+                for values, row, total in zip(labelvalues, cumulative, family.sums[:count].tolist()):
+                    metric.add_metric(list(values), list(zip(family._le, row)), total)
+            elif family.kind == "summary":
+                metric = SummaryMetricFamily(family.name, family.documentation, labels=family.labelnames)
+                for values, n, total in zip(labelvalues, family.counts[:count].tolist(),
+                                            family.sums[:count].tolist()):
+                    metric.add_metric(list(values), n, total)
+            else:
+                cls = CounterMetricFamily if family.kind == "counter" else GaugeMetricFamily
+                metric = cls(family.name, family.documentation, labels=family.labelnames)
+                for values, value in zip(labelvalues, family.values[:count].tolist()):
+                    metric.add_metric(list(values), value)
+            yield metric
+
+    def exposition(self):
+        """Formato de texto de Prometheus (el mismo que ``generate_latest`` sin ``_created``)."""
+        fmt = floatToGoString
+        lines = []
+        for family in self.families:
+            count = len(family.labelvalues)
+            texts = family._labels_text(count)
+            doc = family.documentation.replace("\\", r"\\").replace("\n", r"\n")
+            exposed = f"{family.name}_total" if family.kind == "counter" else family.name
+            lines.append(f"# HELP {exposed} {doc}\n# TYPE {exposed} {family.kind}\n")
+            if family.kind == "histogram":
+                cumulative = family.cumulative(count).tolist()
+                sums = family.sums[:count].tolist()
+                for text, row, total in zip(texts, cumulative, sums):
+                    sep = "," if text else ""
+                    for le, value in zip(family._le, row):
+                        lines.append(f'{family.name}_bucket{{{text}{sep}le="{le}"}} {fmt(value)}\n')
+                    braces = f"{{{text}}}" if text else ""
+                    lines.append(f"{family.name}_count{braces} {fmt(row[-1])}\n"
+                                 f"{family.name}_sum{braces} {fmt(total)}\n")
+                continue
+            for sample, values in family.samples(count):
+                for text, value in zip(texts, values.tolist()):
+                    braces = f"{{{text}}}" if text else ""
+                    lines.append(f"{sample}{braces} {fmt(value)}\n")
+        return "".join(lines).encode("utf-8")
+
+    def nbytes(self):
+        return sum(family.nbytes() for family in self.families)
+
+
+def build_case_registry(module, registry):
+    """
+    Corre ``module.build_registry(registry)`` de un business case con las
+    familias de arrays en lugar de las de prometheus_client. Devuelve
+    ``(registry, collector)``.
+    """
+    collector = ArrayCollector(registry)
+    replaced = {name: getattr(module, name) for name in collector.factories() if hasattr(module, name)}
+    try:
+        for name, factory in collector.factories().items():
+            if name in replaced:
+                setattr(module, name, factory)
+        module.build_registry(registry)
+    finally:
+        for name, original in replaced.items():
+            setattr(module, name, original)
+    return registry, collector
@@ -0,0 +1,272 @@
+"""
+Ajuste de buckets de histogramas a partir de los datos observados.
+
+Para cada histogram se buscan los límites (``le``) más pocos con los que
+``histogram_quantile`` (interpolación lineal dentro del bucket, igual que
+Prometheus) estima los cuantiles de interés con un error relativo menor que
+``target_error``, tanto por serie (cada combinación de labels) como sumando
+todas (los paneles suelen agregar con ``sum by (le)``).
+
+Los candidatos son cuantiles de los datos y valores "redondos" de la serie
+1-2-2.5-5, con dos cifras significativas. Se agrega de a uno el que más baja
+el error y al final se quita todo límite que no haga falta, sin bajar de
+``min_buckets``: con datos uniformes un solo límite ya interpola bien los
+cuantiles observados, pero no deja ver cuando la distribución cambia.
+
+Las muestras salen de correr los simuladores (``record_observations``
+intercepta ``Histogram.observe``) o, con menos detalle, de los buckets de una
+captura (``samples_from_buckets`` supone distribución uniforme dentro de
+cada bucket, así que no puede proponer nada más fino que lo capturado).
+"""
+
+import ast
+import math
+from contextlib import contextmanager
+
+import numpy as np
+from prometheus_client import Histogram
+
+DEFAULT_QUANTILES = (0.5, 0.9, 0.95, 0.99)
+_NICE = (1.0, 2.0, 2.5, 5.0)
+
+
+@contextmanager
+def record_observations():
+    """
+    Durante el bloque guarda cada valor observado por cualquier ``Histogram``:
+    entrega ``(observed, current)`` con ``observed[nombre][labels] = [valores]``
+    y ``current[nombre] = buckets actuales``.
+    """
+    observed = {}
+    current = {}
+    original = Histogram.observe
+
+    def observe(self, amount, exemplar=None):
+        labels = tuple(zip(self._labelnames, self._labelvalues))
+        observed.setdefault(self._name, {}).setdefault(labels, []).append(amount)
+        current.setdefault(self._name, list(self._upper_bounds))
+        return original(self, amount, exemplar)
+
+    Histogram.observe = observe
+    try:
+        yield observed, current
+    finally:
+        Histogram.observe = original
+
+
+def samples_from_buckets(buckets, points=2000):
+    """
+    Muestras sintéticas a partir de ``[(le, acumulado)]``: repartidas en forma
+    pareja dentro de cada bucket (lo de +Inf queda en el último límite finito).
+    """
+    buckets = sorted(buckets)
+    total = buckets[-1][1] if buckets else 0
+    if total <= 0:
+        return np.array([])
+    scale = min(1.0, points / total)
+    samples = []
+    lower = 0.0
+    previous = 0.0
+    for le, cumulative in buckets:
+        n = int(round((cumulative - previous) * scale))
+        previous = cumulative
+        if n <= 0:
+            lower = le if math.isfinite(le) else lower
+            continue
+        if math.isfinite(le):
+            samples.append(np.linspace(lower, le, n + 2)[1:-1])
+            lower = le
+        else:
+            samples.append(np.full(n, lower))
+    return np.concatenate(samples) if samples else np.array([])
+
+
+def histogram_quantile(q, bounds, cumulative):
+    """Como ``histogram_quantile`` de Prometheus; ``bounds`` sin +Inf, ``cumulative`` con un elemento más."""
+    total = cumulative[-1]
+    if total == 0:
+        return math.nan
+    rank = q * total
+    i = int(np.searchsorted(cumulative, rank, side="left"))
+    if i == len(bounds):  # cae en +Inf
+        return bounds[-1] if bounds else math.nan
+    upper = bounds[i]
+    lower = bounds[i - 1] if i > 0 else (0.0 if upper > 0 else upper)
+    below = cumulative[i - 1] if i > 0 else 0
+    in_bucket = cumulative[i] - below
+    if in_bucket == 0:
+        return upper
+    return lower + (upper - lower) * (rank - below) / in_bucket
+
+
+def max_error(groups, bounds, quantiles):
+    """Peor error relativo de ``histogram_quantile`` frente al cuantil real, sobre todos los grupos."""
+    worst = 0.0
+    for samples in groups:
+        cumulative = np.append(np.searchsorted(samples, bounds, side="right"), len(samples))
+        for q in quantiles:
+            exact = float(np.quantile(samples, q))
+            estimate = histogram_quantile(q, bounds, cumulative)
+            error = abs(estimate - exact) / max(abs(exact), 1e-12)
+            worst = max(worst, error)
+    return worst
+
+
+def error_groups(series):
+    """Muestras ordenadas de cada serie y, si hay más de una, de todas sumadas (``sum by (le)``)."""
+    groups = [np.sort(np.asarray(s, dtype=float)) for s in series if len(s)]
+    if len(groups) > 1:
+        groups.append(np.sort(np.concatenate(groups)))
+    return groups
+
+
+def _largest_gap(bounds):
+    return max(b - a for a, b in zip([0.0] + bounds[:-1], bounds))
+
+
+def _round_sig(value, digits=2, up=False):
+    if value == 0:
+        return 0.0
+    exponent = math.floor(math.log10(abs(value))) - digits + 1
+    scaled = value / 10 ** exponent
+    scaled = math.ceil(scaled) if up else round(scaled)
+    return float(f"{scaled * 10 ** exponent:.{digits}g}")
+
+
+def candidate_bounds(samples):
+    lo, hi = float(samples[0]), float(samples[-1])
+    candidates = {_round_sig(v) for v in np.quantile(samples, np.linspace(0, 1, 101))}
+    candidates.add(_round_sig(hi, up=True))
+    if lo > 0:
+        for exponent in range(math.floor(math.log10(lo)) - 1, math.ceil(math.log10(hi)) + 1):
+            candidates.update(n * 10.0 ** exponent for n in _NICE)
+    return sorted(c for c in candidates if lo / 2 <= c <= hi * 2 or c == _round_sig(hi, up=True))
+
+
+def propose_buckets(series, quantiles=DEFAULT_QUANTILES, target_error=0.05, max_buckets=20, candidates=None,
+                    min_buckets=4):
+    """
+    ``series``: listas de muestras (una por combinación de labels). Devuelve
+    ``(límites, error)`` con la menor cantidad de límites (al menos
+    ``min_buckets`` si hay candidatos) que encontró; con ``candidates`` solo
+    elige entre esos límites.
+    """
+    groups = error_groups(series)
+    if not groups:
+        return [], math.nan
+    everything = groups[-1]
+    if candidates is None:
+        candidates = candidate_bounds(everything)
+        bounds = [_round_sig(float(everything[-1]), up=True)]
+    else:
+        candidates = sorted(candidates)
+        bounds = [next((c for c in candidates if c >= everything[-1]), candidates[-1])]
+    error = max_error(groups, bounds, quantiles)
+
+    def best_addition(spread=False):
+        # spread: entre los que no empeoran el objetivo, el que más achica el bucket más ancho
+        best = None
+        for candidate in candidates:
+            if candidate in bounds:
+                continue
+            trial = sorted(bounds + [candidate])
+            trial_error = max_error(groups, trial, quantiles)
+            if spread:
+                key = (trial_error > max(error, target_error), _largest_gap(trial), trial_error)
+            else:
+                key = (trial_error, _largest_gap(trial))
+            if best is None or key < best[0]:
+                best = (key, trial_error, trial)
+        return best
+
+    while error > target_error and len(bounds) < max_buckets:
+        best = best_addition()
+        if best is None or best[1] >= error:
+            break
+        _, error, bounds = best
+    # Poda: quitar lo que no haga falta para seguir dentro del objetivo
+    for bound in sorted(bounds, reverse=True):
+        if len(bounds) <= max(min_buckets, 1):
+            break
+        trial = [b for b in bounds if b != bound]
+        trial_error = max_error(groups, trial, quantiles)
+        if trial_error <= max(error, target_error):
+            bounds, error = trial, trial_error
+    while len(bounds) < min(min_buckets, max_buckets):
+        best = best_addition(spread=True)
+        if best is None:
+            break
+        _, error, bounds = best
+    return bounds, error
+
+
+def dashboard_quantiles(dashboard):
+    """``{métrica: {cuantiles}}`` de los ``histogram_quantile`` del dashboard."""
+    from obslab.dashboards import iter_targets
+    from obslab.promql import PromQLError, expand_variables, parse
+
+    found = {}
+
+    def walk(node, quantile=None):
+        if not isinstance(node, tuple):
+            if isinstance(node, list):
+                for item in node:
+                    walk(item, quantile)
+            return
+        if node[0] == "call" and node[1] == "histogram_quantile" and node[2][0][0] == "number":
+            quantile = node[2][0][1]
+        if node[0] == "selector" and quantile is not None and (node[1] or "").endswith("_bucket"):
+            found.setdefault(node[1][:-len("_bucket")], set()).add(quantile)
+        for child in node[1:]:
+            walk(child, quantile)
+
+    for _, target in iter_targets(dashboard):
+        try:
+            walk(parse(expand_variables(target["expr"], {"job": ".*", "instance": ".*", "region": ".*"}, 15)))
+        except PromQLError:
+            pass
+    return found
+
+
+def format_buckets(bounds):
+    return "[" + ", ".join(f"{b:g}" for b in bounds) + "]"
+
+
+def apply_buckets(path, metric, bounds):
+    """
+    Reemplaza (o agrega) ``buckets=[...]`` en la definición ``Histogram('<metric>', ...)``
+    de ``path``. Devuelve ``False`` si no encontró la definición.
+    """
+    with open(path, encoding="utf-8") as f:
+        source = f.read()
+    lines = source.splitlines(keepends=True)
+    offsets = np.cumsum([0] + [len(line.encode("utf-8")) for line in lines])
+
+    def position(lineno, col):
+        return len(source.encode("utf-8")[:offsets[lineno - 1] + col].decode("utf-8"))
+
+    for node in ast.walk(ast.parse(source)):
+        if not (isinstance(node, ast.Call) and getattr(node.func, "id", getattr(node.func, "attr", None)) == "Histogram"
+                and node.args and isinstance(node.args[0], ast.Constant) and node.args[0].value == metric):
+            continue
+        keywords = {kw.arg: kw for kw in node.keywords}
+        if "buckets" in keywords:
+            value = keywords["buckets"].value
+            start = position(value.lineno, value.col_offset)
+            end = position(value.end_lineno, value.end_col_offset)
+            new = source[:start] + format_buckets(bounds) + source[end:]
+            # El comentario al final de la línea describía los buckets viejos
+            line_end = new.find("\n", start)
+            line_end = len(new) if line_end < 0 else line_end
+            comment = new.find("#", start, line_end)
+            if comment >= 0:
+                new = new[:comment].rstrip() + new[line_end:]
+        elif "registry" in keywords:
+            start = position(keywords["registry"].lineno, keywords["registry"].col_offset)
+            new = source[:start] + f"buckets={format_buckets(bounds)}, " + source[start:]
+        else:
+            return False
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(new)
+        return True
+    return False
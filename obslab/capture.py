@@ -0,0 +1,249 @@
+"""
+Captura columnar append-only de cada snapshot que produce un simulador.
+
+Estructura de un directorio de captura::
+
+    captura/
+      series.jsonl        una línea por serie nueva: {"id", "name", "labels"}
+      seg-000001.bin      registros (ts, series_id, value) de 20 bytes
+      seg-000002.bin      ... se abre uno nuevo al superar segment_bytes
+
+Los labels de cada serie se escriben una sola vez (internados a un id); los
+segmentos solo guardan números y se leen con ``np.memmap`` sin copiar nada.
+Cada snapshot queda como un bloque contiguo de registros con el mismo ``ts``.
+
+Uso desde línea de comandos::
+
+    python3 -m obslab.capture info /tmp/captura
+    python3 -m obslab.capture diff /tmp/corrida-a /tmp/corrida-b
+"""
+
+import argparse
+import glob
+import json
+import os
+import time
+
+import numpy as np
+
+from obslab.scenarios import registry_samples
+
+RECORD = np.dtype([("ts", "<f8"), ("series", "<u4"), ("value", "<f8")])
+DEFAULT_SEGMENT_BYTES = 64 * 1024 * 1024
+
+
+def _segment_paths(path):
+    return sorted(glob.glob(os.path.join(path, "seg-*.bin")))
+
+
+def _read_series(path):
+    """``(series, bytes válidos de series.jsonl)``: se corta en la primera línea dañada."""
+    series = []
+    valid = 0
+    series_path = os.path.join(path, "series.jsonl")
+    if os.path.exists(series_path):
+        with open(series_path, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    valid += len(line)
+                    continue
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # línea truncada por un corte: lo siguiente no es confiable
+                if not isinstance(entry, dict) or entry.get("id") != len(series) or not line.endswith(b"\n"):
+                    break
+                series.append((entry["name"], entry["labels"]))
+                valid += len(line)
+    return series, valid
+
+
+class CaptureWriter:
+    def __init__(self, path, segment_bytes=DEFAULT_SEGMENT_BYTES):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self._ids = {}
+        series, valid = _read_series(path)
+        for sid, (name, labels) in enumerate(series):
+            self._ids[(name,) + tuple(sorted(labels.items()))] = sid
+        series_path = os.path.join(path, "series.jsonl")
+        if os.path.exists(series_path) and os.path.getsize(series_path) > valid:
+            # Lo que quedó a medias de un corte se descarta antes de seguir agregando
+            os.truncate(series_path, valid)
+        self._series_file = open(series_path, "a", encoding="utf-8")
+        segments = _segment_paths(path)
+        self._segment_no = int(os.path.basename(segments[-1])[4:10]) if segments else 0
+        self._segment = None
+        self._segment_size = 0
+        self.snapshots = 0
+        self.write_seconds = 0.0
+
+    def _series_id(self, name, labels):
+        key = (name,) + tuple(sorted(labels.items()))
+        sid = self._ids.get(key)
+        if sid is None:
+            sid = len(self._ids)
+            self._ids[key] = sid
+            self._series_file.write(json.dumps({"id": sid, "name": name, "labels": labels}) + "\n")
+        return sid
+
+    def _roll(self):
+        if self._segment is not None:
+            self._segment.close()
+        self._segment_no += 1
+        name = os.path.join(self.path, f"seg-{self._segment_no:06d}.bin")
+        self._segment = open(name, "ab")
+        self._segment_size = self._segment.tell()
+
+    def append(self, timestamp, samples):
+        """Escribe un snapshot: ``samples`` entrega ``(nombre, labels, valor)``."""
+        t0 = time.perf_counter()
+        ids = []
+        values = []
+        for name, labels, value in samples:
+            ids.append(self._series_id(name, labels))
+            values.append(value)
+        block = np.empty(len(ids), dtype=RECORD)
+        block["ts"] = timestamp
+        block["series"] = ids
+        block["value"] = values
+
+        if self._segment is None or self._segment_size >= self.segment_bytes:
+            self._roll()
+        self._series_file.flush()  # los ids deben estar en disco antes que sus valores
+        self._segment.write(block.tobytes())
+        self._segment.flush()
+        self._segment_size += block.nbytes
+        self.snapshots += 1
+        self.write_seconds += time.perf_counter() - t0
+
+    def append_registry(self, timestamp, registry, job, grouping_key=None):
+        self.append(timestamp, registry_samples(registry, job, grouping_key))
+
+    def close(self):
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+        self._series_file.close()
+
+
+class CaptureReader:
+    def __init__(self, path):
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"no existe el directorio de captura {path}")
+        self.path = path
+        self.series = _read_series(path)[0]
+
+    def segments(self):
+        """Memmaps de solo lectura de cada segmento (los registros incompletos se ignoran)."""
+        for seg in _segment_paths(self.path):
+            count = os.path.getsize(seg) // RECORD.itemsize
+            if count:
+                yield np.memmap(seg, dtype=RECORD, mode="r", shape=(count,))
+
+    def snapshots(self):
+        """Entrega ``(ts, series_ids, values)`` por snapshot, sin cargar todo a memoria."""
+        for records in self.segments():
+            ts = records["ts"]
+            bounds = np.concatenate([[0], np.flatnonzero(ts[1:] != ts[:-1]) + 1, [len(records)]])
+            for a, b in zip(bounds[:-1], bounds[1:]):
+                block = records[a:b]
+                yield float(block["ts"][0]), block["series"], block["value"]
+
+    def to_tsdb(self):
+        from obslab.tsdb import TSDB
+
+        db = TSDB()
+        for ts, ids, values in self.snapshots():
+            db.append(ts, ((self.series[i][0], self.series[i][1], v) for i, v in zip(ids.tolist(), values.tolist())))
+        return db
+
+    def last_values(self):
+        """Último valor conocido de cada serie (por id)."""
+        last = np.full(len(self.series), np.nan)
+        for records in self.segments():
+            last[records["series"]] = records["value"]
+        return last
+
+    def info(self):
+        segments = _segment_paths(self.path)
+        first = last = None
+        records = 0
+        snapshots = 0
+        for seg in self.segments():
+            records += len(seg)
+            if first is None:
+                first = float(seg["ts"][0])
+            last = float(seg["ts"][-1])
+            snapshots += int(np.count_nonzero(seg["ts"][1:] != seg["ts"][:-1])) + 1
+        return {
+            "series": len(self.series),
+            "segments": len(segments),
+            "records": records,
+            "snapshots": snapshots,
+            "bytes": sum(os.path.getsize(s) for s in segments),
+            "first": first,
+            "last": last,
+        }
+
+
+def diff(path_a, path_b, tolerance=0.0):
+    """
+    Compara el último valor de cada serie de dos capturas. Devuelve
+    ``(solo_en_a, solo_en_b, cambiadas)`` con claves ``nombre{labels}``.
+    """
+    def final(path):
+        reader = CaptureReader(path)
+        values = reader.last_values()
+        return {series_key(name, labels): values[i] for i, (name, labels) in enumerate(reader.series)}
+
+    a = final(path_a)
+    b = final(path_b)
+    only_a = sorted(set(a) - set(b))
+    only_b = sorted(set(b) - set(a))
+    changed = []
+    for key in sorted(set(a) & set(b)):
+        va, vb = a[key], b[key]
+        if np.isnan(va) and np.isnan(vb):
+            continue
+        if not np.isclose(va, vb, rtol=tolerance, atol=0.0):
+            changed.append((key, va, vb))
+    return only_a, only_b, changed
+
+
+def series_key(name, labels):
+    inner = ",".join(f'{k}="{v}"' for k, v in sorted(labels.items()))
+    return f"{name}{{{inner}}}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspección de capturas columnar de snapshots")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_info = sub.add_parser("info", help="Resumen de una captura")
+    p_info.add_argument("path")
+    p_diff = sub.add_parser("diff", help="Diferencias de series y valores finales entre dos capturas")
+    p_diff.add_argument("a")
+    p_diff.add_argument("b")
+    p_diff.add_argument("--tolerance", type=float, default=0.0, help="Tolerancia relativa para considerar iguales")
+    args = parser.parse_args()
+
+    if args.command == "info":
+        info = CaptureReader(args.path).info()
+        span = (info["last"] - info["first"]) if info["first"] is not None else 0
+        print(f"{args.path}: {info['series']} series, {info['snapshots']} snapshots, "
+              f"{info['records']} registros en {info['segments']} segmentos ({info['bytes'] / 1e6:.1f} MB), "
+              f"{span:.0f}s de datos")
+    else:
+        only_a, only_b, changed = diff(args.a, args.b, args.tolerance)
+        for key in only_a:
+            print(f"- {key}")
+        for key in only_b:
+            print(f"+ {key}")
+        for key, va, vb in changed:
+            print(f"~ {key}: {va:g} -> {vb:g}")
+        print(f"{len(only_a)} solo en A, {len(only_b)} solo en B, {len(changed)} con valor distinto")
+
+
+if __name__ == "__main__":
+    main()
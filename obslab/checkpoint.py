@@ -0,0 +1,303 @@
+"""
+Checkpoints del estado de los registries en un archivo mapeado en memoria,
+para que un simulador que se reinicia siga con sus counters donde estaban.
+
+Al reiniciarse, un simulador arranca sus counters de cero y ``rate()`` /
+``increase()`` ven un reinicio. Aquí cada push copia los valores de counters,
+histogramas, summaries y gauges a un ``np.memmap``: mientras no cambie el
+conjunto de series el archivo no se reescribe, solo se copian los floats de
+cada grupo a su lugar (unos microsegundos; el kernel escribe las páginas a
+disco por su cuenta, así que el checkpoint sobrevive a que el proceso muera
+aunque no a que se caiga la máquina, salvo con ``fsync``). Cuando aparecen
+series nuevas el archivo se rearma completo (temporal + ``os.replace``).
+
+Formato: ``MAGIC``, largo del header (uint64), header JSON con la ubicación
+de cada familia de cada grupo (job + grouping key) y, alineados a 64 bytes,
+los valores como float64:
+
+    counter / gauge   un valor por serie
+    histogram         conteos por bucket (no acumulados, +Inf al final) y sumas
+    summary           conteos y sumas
+
+Al restaurar, los counters, histogramas y summaries se suman a lo que ya
+tenga el registry (el primer ciclo del proceso nuevo no se pierde) y los
+gauges solo se reponen en las series que todavía no existen. Funciona con
+registries de prometheus_client y de ``obslab.array_metrics``.
+"""
+
+import json
+import os
+import struct
+import time
+
+import numpy as np
+from prometheus_client.metrics import MetricWrapperBase
+
+from obslab.aggregate_sim import add_observations
+
+MAGIC = b"OBSLABCK"
+_ALIGN = 64
+
+
+class FamilyState:
+    """Valores de una familia: ``series`` (tuplas de valores de labels) y ``vector`` con el layout del módulo."""
+
+    __slots__ = ("name", "kind", "labelnames", "series", "stride", "vector")
+
+    def __init__(self, name, kind, labelnames, series, stride, vector):
+        self.name = name
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.series = series
+        self.stride = stride
+        self.vector = vector
+
+    @property
+    def layout(self):
+        return self.name, self.kind, self.labelnames, tuple(self.series), self.stride
+
+
+def _families(registry):
+    """(nombre, tipo, labelnames, métrica) de cada familia que ``build_registry`` dejó como atributo."""
+    for metric in vars(registry).values():
+        if isinstance(metric, MetricWrapperBase):
+            yield metric._name, metric._type, tuple(metric._labelnames), metric
+        elif hasattr(metric, "labelvalues") and hasattr(metric, "kind"):  # obslab.array_metrics
+            yield metric.name, metric.kind, metric.labelnames, metric
+
+
+def _children(metric):
+    if metric._labelnames:
+        return list(metric._metrics.items())
+    return [((), metric)]
+
+
+def extract(registry):
+    """Estado actual del registry como lista de ``FamilyState``."""
+    states = []
+    for name, kind, labelnames, metric in _families(registry):
+        if isinstance(metric, MetricWrapperBase):
+            children = _children(metric)
+            series = [labelvalues for labelvalues, _ in children]
+            stride = 1
+            if kind == "histogram":
+                stride = len(metric._upper_bounds)
+                counts = [bucket.get() for _, child in children for bucket in child._buckets]
+                vector = np.array(counts + [child._sum.get() for _, child in children])
+            elif kind == "summary":
+                vector = np.array([child._count.get() for _, child in children] +
+                                  [child._sum.get() for _, child in children])
+            else:
+                vector = np.array([child._value.get() for _, child in children])
+        else:
+            count = len(metric.labelvalues)
+            series = metric.labelvalues[:count]
+            stride = getattr(metric, "stride", 1)
+            if kind in ("histogram", "summary"):
+                vector = np.concatenate([metric.counts[:count * stride], metric.sums[:count]])
+            else:
+                vector = metric.values[:count].copy()
+        states.append(FamilyState(name, kind, labelnames, series, stride, vector.astype(float)))
+    return states
+
+
+def restore(registry, states):
+    """Aplica un checkpoint a un registry recién creado (ver el docstring del módulo). Devuelve las series repuestas."""
+    current = {(name, kind, labelnames): metric for name, kind, labelnames, metric in _families(registry)}
+    restored = 0
+    for state in states:
+        metric = current.get((state.name, state.kind, state.labelnames))
+        if metric is None or not state.series:
+            continue
+        n = len(state.series)
+        for i, labelvalues in enumerate(state.series):
+            if state.kind == "gauge":
+                # Los simuladores pisan los gauges en cada ciclo: solo se reponen los que faltan
+                if not labelvalues or _exists(metric, labelvalues):
+                    continue
+                metric.labels(*labelvalues).set(state.vector[i])
+            else:
+                child = metric.labels(*labelvalues) if labelvalues else metric
+                if state.kind == "counter":
+                    child.inc(state.vector[i])
+                elif state.kind == "histogram":
+                    add_observations(child, state.vector[i * state.stride:(i + 1) * state.stride],
+                                     state.vector[n * state.stride + i])
+                else:
+                    add_observations(child, state.vector[i], state.vector[n + i])
+            restored += 1
+    return restored
+
+
+def _exists(metric, labelvalues):
+    if isinstance(metric, MetricWrapperBase):
+        return labelvalues in metric._metrics
+    return labelvalues in metric._ids
+
+
+def _data_offset(header_len):
+    # Los valores empiezan alineados después del header
+    return -(-(len(MAGIC) + 8 + header_len) // _ALIGN) * _ALIGN
+
+
+def group_key(job, grouping_key):
+    return job, tuple(sorted((grouping_key or {}).items()))
+
+
+class CheckpointFile:
+    """
+    El archivo de checkpoint de uno o varios grupos (una flota entera cabe
+    en uno). ``update`` escribe en el lugar si el grupo mantiene sus series
+    y devuelve False si hay que rearmar el archivo con ``rewrite``.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._layout = {}  # grupo -> (layouts de sus familias, offset, largo)
+        self._data = None
+
+    @staticmethod
+    def load(path):
+        """``{grupo: [FamilyState]}`` con los valores copiados del archivo (vacío si no existe)."""
+        if not os.path.exists(path):
+            return {}
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} no es un checkpoint de obslab")
+            (header_len,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_len))
+        data = np.fromfile(path, dtype="<f8", offset=_data_offset(header_len))
+        groups = {}
+        for group in header["groups"]:
+            key = (group["job"], tuple(tuple(pair) for pair in group["grouping_key"]))
+            groups[key] = [
+                FamilyState(family["name"], family["kind"], family["labelnames"],
+                            [tuple(values) for values in family["series"]], family["stride"],
+                            data[family["offset"]:family["offset"] + family["length"]].copy())
+                for family in group["families"]]
+        return groups
+
+    def rewrite(self, groups):
+        """Rearma el archivo con ``{grupo: [FamilyState]}`` y lo vuelve a mapear."""
+        entries, offset = [], 0
+        layout = {}
+        for (job, grouping), states in groups.items():
+            families = []
+            start = offset
+            for state in states:
+                families.append({"name": state.name, "kind": state.kind, "labelnames": state.labelnames,
+                                 "series": state.series, "stride": state.stride, "offset": offset,
+                                 "length": len(state.vector)})
+                offset += len(state.vector)
+            entries.append({"job": job, "grouping_key": grouping, "families": families})
+            layout[(job, grouping)] = ([state.layout for state in states], start, offset - start)
+        header = json.dumps({"groups": entries}).encode()
+        data_offset = _data_offset(len(header))
+        vector = np.concatenate([state.vector for states in groups.values() for state in states] or [np.zeros(0)])
+
+        self.close()
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+            f.write(b"\0" * (data_offset - f.tell()))
+            f.write(vector.astype("<f8").tobytes())
+        os.replace(tmp, self.path)
+        self._layout = layout
+        if len(vector):
+            self._data = np.memmap(self.path, dtype="<f8", mode="r+", offset=data_offset, shape=(len(vector),))
+
+    def update(self, key, states):
+        """Copia los valores del grupo a su lugar en el archivo; False si cambiaron sus series."""
+        current = self._layout.get(key)
+        if current is None or self._data is None:
+            return False
+        layouts, start, length = current
+        if len(layouts) != len(states) or any(state.layout != layout for state, layout in zip(states, layouts)):
+            return False
+        self._data[start:start + length] = np.concatenate([state.vector for state in states])
+        return True
+
+    def flush(self):
+        if self._data is not None:
+            self._data.flush()
+
+    def close(self):
+        if self._data is not None:
+            self._data.flush()
+            self._data = None
+
+
+class Checkpointer:
+    """
+    Checkpoint continuo de los grupos que se le pasan con ``save`` y
+    restauración de cada grupo la primera vez que se lo ve (``restore_into``).
+
+    Las series nuevas obligan a rearmar el archivo; para no hacerlo una vez
+    por instancia cuando arranca una flota, se rearma a lo sumo cada
+    ``rewrite_interval`` segundos o cuando un grupo ya guardado vuelve a
+    llegar (empezó otro ciclo), en ``sync`` y en ``close``. Mientras tanto los
+    grupos sin series nuevas se siguen escribiendo en el lugar. ``fsync_interval``
+    fuerza las páginas a disco cada tantos segundos (0 = lo decide el kernel).
+    """
+
+    def __init__(self, path, rewrite_interval=1.0, fsync_interval=0.0, clock=time.monotonic):
+        self.file = CheckpointFile(path)
+        self.pending = CheckpointFile.load(path)  # grupos del checkpoint anterior todavía no restaurados
+        self.groups = {}
+        self.rewrite_interval = rewrite_interval
+        self.fsync_interval = fsync_interval
+        self.clock = clock
+        self.restored_series = 0
+        self.rewrites = 0
+        self._stale = False
+        self._seen = set()
+        self._rewritten_at = self._synced_at = float("-inf")
+        # Lo que no se vuelva a ver en este proceso se conserva en el próximo archivo
+        self.groups.update(self.pending)
+
+    def restore_into(self, registry, job, grouping_key):
+        """Suma al registry lo guardado para el grupo, si quedaba pendiente."""
+        states = self.pending.pop(group_key(job, grouping_key), None)
+        if states is None:
+            return 0
+        restored = restore(registry, states)
+        self.restored_series += restored
+        return restored
+
+    def save(self, registry, job, grouping_key):
+        key = group_key(job, grouping_key)
+        states = extract(registry)
+        self.groups[key] = states
+        if not self.file.update(key, states):
+            self._stale = True
+        now = self.clock()
+        if self._stale and (key in self._seen or now - self._rewritten_at >= self.rewrite_interval):
+            self.rewrite()
+        self._seen.add(key)
+        if self.fsync_interval and now - self._synced_at >= self.fsync_interval:
+            self.file.flush()
+            self._synced_at = now
+
+    def sync(self):
+        """Rearma el archivo si hay grupos con series nuevas (p. ej. al final de un ciclo de la flota)."""
+        if self._stale:
+            self.rewrite()
+
+    def forget(self, job, grouping_key):
+        """Saca un grupo del checkpoint (p. ej. una instancia que ya no existe)."""
+        key = group_key(job, grouping_key)
+        self.pending.pop(key, None)
+        if self.groups.pop(key, None) is not None:
+            self._stale = True
+
+    def rewrite(self):
+        self.file.rewrite(self.groups)
+        self.rewrites += 1
+        self._stale = False
+        self._seen.clear()
+        self._rewritten_at = self.clock()
+
+    def close(self):
+        if self._stale or self.groups and self.file._data is None:
+            self.rewrite()
+        self.file.close()
@@ -0,0 +1,235 @@
+"""
+Churn de series: una flota de instancias de un business case que se
+reinician, se reemplazan en deploys y rotan valores de labels efímeros.
+
+Los simuladores de LAB4 mantienen el mismo conjunto de labels para siempre,
+pero lo que hace crecer el head de Prometheus es el churn: cada deploy
+cambia ``instance`` (nombres tipo pod), los ``instance_id`` de
+business-case-5 y los ``device_id`` de los ATMs de business-case-2 van y
+vienen, y cada serie nueva ocupa memoria en el head hasta el próximo corte
+de bloque aunque haya dejado de recibir muestras.
+
+``ChurnFleet`` genera esa carga (reinicios con counters que vuelven a cero,
+deploys rolling que retiran el grupo viejo del Pushgateway, rotación de
+labels efímeros) y ``SeriesTracker`` cuenta lo que vería el head: series
+activas, creadas y terminadas por minuto, reinicios de counters, series en
+el head según el corte de bloques y series por bloque compactado.
+"""
+
+import random
+
+from prometheus_client.metrics import MetricWrapperBase
+
+from obslab.scenarios import CASES, Scenario
+
+# Labels efímeros de cada caso: lista del módulo que recorre simulate() y label que la usa
+EPHEMERAL = {
+    2: ("ATM_DEVICES", "device_id"),
+    5: ("INSTANCES", "instance_id"),
+}
+
+COUNTER_SUFFIXES = ("_total", "_count", "_bucket", "_sum")
+
+
+def remove_label_value(registry, label, value):
+    """Borra del registry los hijos con ``label=value`` (la serie deja de exponerse)."""
+    removed = 0
+    for metric in vars(registry).values():
+        if not isinstance(metric, MetricWrapperBase) or label not in metric._labelnames:
+            continue
+        index = metric._labelnames.index(label)
+        # prometheus_client no expone los hijos; _metrics es el dict labelvalues -> hijo
+        for labelvalues in [key for key in metric._metrics if key[index] == value]:
+            metric.remove(*labelvalues)
+            removed += 1
+    return removed
+
+
+class ChurnFleet:
+    """
+    ``instances`` instancias del business case ``case`` que avanzan de a un
+    ciclo de ``interval`` segundos con ``step(now)``.
+
+    - ``restart_rate``: reinicios por instancia y por hora; la instancia
+      conserva su nombre pero arranca con un registry nuevo (counters en 0).
+    - ``deploy_every``: cada cuántos segundos empieza un deploy rolling que
+      reemplaza ``deploy_batch`` instancias por ciclo por otras con nombre
+      nuevo; los grupos reemplazados quedan en ``retired`` para que el
+      llamador los borre del Pushgateway. Con ``delete_stale=False`` siguen
+      expuestos con su último valor (``samples()`` los incluye), como pasa
+      si nadie los borra.
+    - ``ephemeral_rate``: fracción por hora de los valores de labels
+      efímeros (``EPHEMERAL``) que se reemplazan por valores nuevos.
+
+    Las instancias guardan sus métricas en arrays de NumPy (``store``, ver
+    ``obslab.scenarios.Scenario``) salvo en los casos con labels efímeros,
+    que necesitan borrar hijos del registry de prometheus_client.
+    """
+
+    def __init__(self, case, instances=10, job=None, interval=15.0, restart_rate=1.0, deploy_every=1800.0,
+                 deploy_batch=1, ephemeral_rate=0.5, delete_stale=True, seed=None, store=None):
+        default_job, default_instance = CASES[case]
+        self.case = case
+        self.job = job or default_job
+        self.base = default_instance.rsplit("-", 1)[0]
+        self.interval = interval
+        self.restart_rate = restart_rate
+        self.deploy_every = deploy_every
+        self.deploy_batch = deploy_batch
+        self.ephemeral_rate = ephemeral_rate
+        self.delete_stale = delete_stale
+        self.store = store or ("client" if case in EPHEMERAL else "array")
+        if case in EPHEMERAL and self.store != "client":
+            raise ValueError(f"business case {case}: la rotación de {EPHEMERAL[case][1]} necesita store='client'")
+        self.rng = random.Random(seed)
+        self.members = [self._spawn(slot) for slot in range(instances)]
+        self.orphans = []  # reemplazadas sin borrar: el Pushgateway las sigue exponiendo
+        self.retired = []  # grouping keys a borrar desde el último step
+        self.restarts = self.replaced = self.rotated = 0
+        self._pending_deploy = []
+        self._next_deploy = None
+        self._next_id = 0
+        if case in EPHEMERAL:
+            attribute, _ = EPHEMERAL[case]
+            self._original = list(getattr(self.members[0].module, attribute))
+            for member in self.members:
+                member.ephemeral = list(self._original)
+
+    def _spawn(self, slot, ephemeral=None):
+        instance = f"{self.base}-{slot + 1}-{self.rng.getrandbits(20):05x}"
+        member = Scenario(self.case, job=self.job, instance=instance, store=self.store)
+        member.ephemeral = ephemeral
+        return member
+
+    def _new_value(self, old):
+        # Mismo prefijo que los valores del caso (ATM-, i-) con un número que no se repite
+        self._next_id += 1
+        prefix = old.rstrip("0123456789")
+        return f"{prefix}{len(self._original) + self._next_id:03d}"
+
+    def step(self, now):
+        """Aplica los eventos de churn de este ciclo y avanza la simulación de cada instancia."""
+        self.retired = []
+        chance = self.interval / 3600
+        for slot, member in enumerate(self.members):
+            if self.rng.random() < self.restart_rate * chance:
+                restarted = Scenario(self.case, job=self.job, instance=member.instance, store=self.store)
+                restarted.ephemeral = member.ephemeral
+                self.members[slot] = restarted
+                self.restarts += 1
+
+        if self.deploy_every and self._next_deploy is None:
+            self._next_deploy = now + self.deploy_every
+        if self.deploy_every and now >= self._next_deploy:
+            self._pending_deploy = list(range(len(self.members)))
+            self._next_deploy += self.deploy_every
+        for slot in self._pending_deploy[:self.deploy_batch]:
+            old = self.members[slot]
+            self.members[slot] = self._spawn(slot, old.ephemeral)
+            if self.delete_stale:
+                self.retired.append(old.grouping_key)
+            else:
+                self.orphans.append(old)
+            self.replaced += 1
+        del self._pending_deploy[:self.deploy_batch]
+
+        if self.case in EPHEMERAL:
+            attribute, label = EPHEMERAL[self.case]
+            values = getattr(self.members[0].module, attribute)
+            for member in self.members:
+                for i, value in enumerate(member.ephemeral):
+                    if self.rng.random() < self.ephemeral_rate * chance:
+                        member.ephemeral[i] = self._new_value(value)
+                        remove_label_value(member.registry, label, value)
+                        self.rotated += 1
+                values[:] = member.ephemeral
+                member.step()
+            values[:] = self._original
+        else:
+            for member in self.members:
+                member.step()
+
+    def samples(self):
+        """Lo que Prometheus scrapea del Pushgateway: las instancias vivas y los grupos no borrados."""
+        for member in self.members + self.orphans:
+            yield from member.samples()
+
+
+class SeriesTracker:
+    """
+    Cuenta series como el head de Prometheus: una serie se crea con su
+    primera muestra y sigue en el head (aunque ya no reciba muestras) hasta
+    el corte de bloque que la deja afuera. El head se corta cuando abarca
+    1.5 veces ``block_range``: el primer bloque se compacta y se descartan
+    las series sin muestras posteriores a él.
+
+    ``bytes_per_series`` es una estimación gruesa de memoria por serie en el
+    head (labels, índice y chunk abierto); sirve para comparar escenarios,
+    no para predecir el RSS exacto.
+    """
+
+    def __init__(self, block_range=7200.0, bytes_per_series=4096):
+        self.block_range = block_range
+        self.bytes_per_series = bytes_per_series
+        self.last_seen = {}  # serie -> timestamp de su última muestra (series en el head)
+        self.last_value = {}
+        self.history = []  # (ts, activas, creadas, terminadas, reinicios, head)
+        self.blocks = []  # (inicio, series en el bloque compactado)
+        self.created = self.ended = self.resets = 0
+        self._active = set()
+        self._block_start = None
+        self._block_series = set()
+
+    def observe(self, ts, samples):
+        if self._block_start is None:
+            self._block_start = ts - ts % self.block_range
+        self._truncate(ts)
+        active = set()
+        created = resets = 0
+        for name, labels, value in samples:
+            key = (name, tuple(sorted(labels.items())))
+            active.add(key)
+            if key not in self.last_seen:
+                created += 1
+            elif name.endswith(COUNTER_SUFFIXES) and value < self.last_value.get(key, value):
+                resets += 1
+            self.last_seen[key] = ts
+            self.last_value[key] = value
+        if ts < self._block_start + self.block_range:
+            self._block_series |= active
+        ended = len(self._active - active)
+        self._active = active
+        self.created += created
+        self.ended += ended
+        self.resets += resets
+        self.history.append((ts, len(active), created, ended, resets, len(self.last_seen)))
+
+    def _truncate(self, ts):
+        while ts >= self._block_start + 1.5 * self.block_range:
+            cut = self._block_start + self.block_range
+            self.blocks.append((self._block_start, len(self._block_series)))
+            self.last_seen = {key: seen for key, seen in self.last_seen.items() if seen >= cut}
+            self.last_value = {key: self.last_value[key] for key in self.last_seen}
+            self._block_start = cut
+            self._block_series = set(self.last_seen)
+
+    def stats(self, window=300.0):
+        """Resumen de los últimos ``window`` segundos (tasas por minuto)."""
+        if not self.history:
+            return {}
+        now = self.history[-1][0]
+        recent = [row for row in self.history if row[0] > now - window]
+        minutes = 1.0
+        if len(recent) > 1:
+            # La primera fila es la referencia: las tasas cuentan lo que pasó después
+            minutes = (recent[-1][0] - recent[0][0]) / 60
+            recent = recent[1:]
+        head = self.history[-1][5]
+        return {
+            "active": self.history[-1][1],
+            "created_per_minute": sum(row[2] for row in recent) / minutes,
+            "ended_per_minute": sum(row[3] for row in recent) / minutes,
+            "resets_per_minute": sum(row[4] for row in recent) / minutes,
+            "head_series": head,
+            "head_bytes": head * self.bytes_per_series,
+        }
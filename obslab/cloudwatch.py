@@ -0,0 +1,218 @@
+"""
+Cliente mínimo de CloudWatch (``PutMetricData``) sin boto3.
+
+Un proceso que publica una vez y termina (cron, Lambda) gasta más tiempo en
+``import boto3`` y en cargar el modelo del servicio que en la llamada misma.
+Aquí el request se arma a mano: protocolo *query* (form-urlencoded, versión
+2010-08-01) firmado con SigV4 usando solo la biblioteca estándar.
+
+Solo si las credenciales no están en los argumentos, el ambiente ni en
+``~/.aws/credentials`` se recurre (de forma perezosa) a la cadena de botocore
+(roles de instancia, SSO, etc.).
+"""
+
+import collections
+import configparser
+import datetime
+import hashlib
+import hmac
+import os
+import re
+import urllib.parse
+
+from obslab.transport import HTTPTarget
+
+API_VERSION = "2010-08-01"
+SERVICE = "monitoring"
+CONTENT_TYPE = "application/x-www-form-urlencoded; charset=utf-8"
+
+Credentials = collections.namedtuple("Credentials", "access_key secret_key token")
+
+
+def resolve_credentials(access_key=None, secret_key=None, token=None, profile=None):
+    if access_key and secret_key:
+        return Credentials(access_key, secret_key, token)
+    env = os.environ
+    if env.get("AWS_ACCESS_KEY_ID") and env.get("AWS_SECRET_ACCESS_KEY"):
+        return Credentials(env["AWS_ACCESS_KEY_ID"], env["AWS_SECRET_ACCESS_KEY"], env.get("AWS_SESSION_TOKEN"))
+    profile = profile or env.get("AWS_PROFILE", "default")
+    path = env.get("AWS_SHARED_CREDENTIALS_FILE", os.path.expanduser("~/.aws/credentials"))
+    config = configparser.ConfigParser()
+    config.read(path)
+    if config.has_option(profile, "aws_access_key_id"):
+        section = config[profile]
+        return Credentials(section["aws_access_key_id"], section["aws_secret_access_key"],
+                           section.get("aws_session_token"))
+    import botocore.session  # cadena completa: roles de instancia/contenedor, SSO, ...
+
+    found = botocore.session.get_session().get_credentials()
+    if found is None:
+        raise RuntimeError("no se encontraron credenciales de AWS")
+    frozen = found.get_frozen_credentials()
+    return Credentials(frozen.access_key, frozen.secret_key, frozen.token)
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return value.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+    return str(value)
+
+
+def _flatten(prefix, value, out):
+    """Serialización del protocolo query: listas como ``.member.N``, dicts como ``.Campo``."""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f"{prefix}.{key}", item, out)
+    elif isinstance(value, (list, tuple)):
+        for i, item in enumerate(value, 1):
+            _flatten(f"{prefix}.member.{i}", item, out)
+    else:
+        out.append((prefix, _format_value(value)))
+
+
+def encode_put_metric_data(namespace, metric_data):
+    """Cuerpo del request ``PutMetricData`` para la misma estructura que recibe boto3."""
+    params = [("Action", "PutMetricData"), ("Version", API_VERSION), ("Namespace", namespace)]
+    _flatten("MetricData", list(metric_data), params)
+    return urllib.parse.urlencode(params, quote_via=urllib.parse.quote).encode()
+
+
+def _hmac(key, msg):
+    return hmac.new(key, msg.encode(), hashlib.sha256).digest()
+
+
+def sign_v4(method, host, path, body, headers, credentials, region, service=SERVICE, now=None):
+    """
+    Agrega ``X-Amz-Date`` (y el token si hay) y la cabecera ``Authorization``
+    de SigV4 a ``headers``. Se firman todas las cabeceras más ``host``.
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    day = amz_date[:8]
+    headers["X-Amz-Date"] = amz_date
+    if credentials.token:
+        headers["X-Amz-Security-Token"] = credentials.token
+    canonical = {k.lower(): " ".join(str(v).split()) for k, v in headers.items()}
+    canonical["host"] = host
+    signed = ";".join(sorted(canonical))
+    canonical_request = "\n".join([
+        method, path or "/", "",
+        "".join(f"{k}:{canonical[k]}\n" for k in sorted(canonical)),
+        signed, hashlib.sha256(body).hexdigest(),
+    ])
+    scope = f"{day}/{region}/{service}/aws4_request"
+    string_to_sign = "\n".join([
+        "AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode()).hexdigest(),
+    ])
+    key = _hmac(("AWS4" + credentials.secret_key).encode(), day)
+    for part in (region, service, "aws4_request"):
+        key = _hmac(key, part)
+    signature = hmac.new(key, string_to_sign.encode(), hashlib.sha256).hexdigest()
+    headers["Authorization"] = (
+        f"AWS4-HMAC-SHA256 Credential={credentials.access_key}/{scope}, "
+        f"SignedHeaders={signed}, Signature={signature}"
+    )
+    return headers
+
+
+_TAG_RE = {tag: re.compile(rf"<{tag}>(.*?)</{tag}>", re.S) for tag in ("RequestId", "Code", "Message")}
+
+
+def _tag(xml, tag):
+    match = _TAG_RE[tag].search(xml)
+    return match.group(1) if match else ""
+
+
+class CloudWatchClient:
+    """
+    ``put_metric_data`` con la misma firma que el cliente de boto3. Mantiene
+    la conexión HTTPS abierta entre llamadas (útil en el modo daemon y en
+    invocaciones "tibias" de Lambda).
+    """
+
+    def __init__(self, region, credentials=None, endpoint_url=None, timeout=10.0):
+        self.region = region
+        self.credentials = credentials or resolve_credentials()
+        self.endpoint_url = endpoint_url or f"https://{SERVICE}.{region}.amazonaws.com"
+        self.target = HTTPTarget(self.endpoint_url, timeout=timeout)
+        self.host = urllib.parse.urlsplit(self.endpoint_url).netloc
+
+    def put_metric_data(self, Namespace, MetricData):
+        body = encode_put_metric_data(Namespace, MetricData)
+        headers = sign_v4("POST", self.host, self.target.base_path + "/", body,
+                          {"Content-Type": CONTENT_TYPE}, self.credentials, self.region)
+        status, data = self.target.request("POST", "/", body, headers)
+        xml = data.decode("utf-8", "replace")
+        if status >= 300:
+            raise IOError(f"PutMetricData: HTTP {status} {_tag(xml, 'Code')}: {_tag(xml, 'Message')}")
+        return {"ResponseMetadata": {"RequestId": _tag(xml, "RequestId"), "HTTPStatusCode": status}}
+
+    def close(self):
+        self.target.close()
+
+
+MAX_DATUMS_PER_REQUEST = 1000
+MAX_DATAPOINT_AGE = datetime.timedelta(days=14)  # CloudWatch rechaza datapoints más viejos
+
+
+def _as_datetime(value):
+    if isinstance(value, str):
+        value = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value
+
+
+def coalesce_metric_data(metric_data, period=60, now=None):
+    """
+    Junta los datapoints de una misma métrica (nombre, dimensiones, unidad)
+    dentro de cada período en un solo ``StatisticValues`` (SampleCount, Sum,
+    Minimum, Maximum): el promedio de los gauges y la suma de los conteos
+    quedan iguales en CloudWatch. Descarta lo que CloudWatch ya no acepta
+    por viejo. Devuelve ``(metric_data, descartados)``.
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    oldest = now - MAX_DATAPOINT_AGE
+    merged = {}
+    dropped = 0
+    for datum in metric_data:
+        timestamp = _as_datetime(datum.get("Timestamp") or now)
+        if timestamp < oldest:
+            dropped += 1
+            continue
+        epoch = int(timestamp.timestamp()) // period * period
+        dimensions = tuple(sorted((d["Name"], d["Value"]) for d in datum.get("Dimensions", [])))
+        key = (datum["MetricName"], dimensions, datum.get("Unit"), epoch)
+        if "StatisticValues" in datum:
+            stats = dict(datum["StatisticValues"])
+        else:
+            value = datum["Value"]
+            stats = {"SampleCount": 1, "Sum": value, "Minimum": value, "Maximum": value}
+        current = merged.get(key)
+        if current is None:
+            merged[key] = stats
+        else:
+            current["SampleCount"] += stats["SampleCount"]
+            current["Sum"] += stats["Sum"]
+            current["Minimum"] = min(current["Minimum"], stats["Minimum"])
+            current["Maximum"] = max(current["Maximum"], stats["Maximum"])
+
+    coalesced = []
+    for (name, dimensions, unit, epoch), stats in merged.items():
+        datum = {
+            "MetricName": name,
+            "Dimensions": [{"Name": k, "Value": v} for k, v in dimensions],
+            "Timestamp": datetime.datetime.fromtimestamp(epoch, datetime.timezone.utc),
+        }
+        if stats["SampleCount"] == 1:
+            datum["Value"] = stats["Sum"]
+        else:
+            datum["StatisticValues"] = stats
+        if unit:
+            datum["Unit"] = unit
+        coalesced.append(datum)
+    return coalesced, dropped
@@ -0,0 +1,214 @@
+"""
+Lectura de métricas de CloudWatch con ``GetMetricData`` para exponerlas a
+Prometheus.
+
+``get_metric_statistics`` pide una métrica por llamada; ``GetMetricData``
+acepta hasta 500 ``MetricDataQueries`` con un mismo rango de tiempo. El
+lector agrupa las queries por (período, rango), reparte cada grupo en
+requests de a 500, los pagina en paralelo (``NextToken`` dentro de cada
+request) y guarda los datapoints ya leídos: cada poll pide solo la cola
+nueva más ``late_periods`` períodos, porque CloudWatch puede completar
+datapoints recientes con retraso.
+
+Recibe un cliente de boto3 ya creado, así que se puede probar sin red con
+``botocore.stub.Stubber`` (con ``max_workers=1`` el orden de los requests es
+determinístico).
+"""
+
+import re
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+MAX_QUERIES = 500
+
+MetricQuery = namedtuple("MetricQuery", "namespace name dimensions stat period")
+MetricQuery.__doc__ = "Una serie a leer; ``dimensions`` es una tupla ordenada de ``(Name, Value)``."
+
+
+def snake_case(name):
+    """``CPU_User`` -> ``cpu_user``, ``APILatency`` -> ``api_latency``."""
+    name = re.sub(r"([A-Z]+)([A-Z][a-z])", r"\1_\2", name)
+    name = re.sub(r"([a-z0-9])([A-Z])", r"\1_\2", name)
+    return re.sub(r"[^a-z0-9]+", "_", name.lower()).strip("_")
+
+
+def discover_queries(client, namespace, names=None, stats=("Average",), period=60):
+    """Una ``MetricQuery`` por métrica (y estadística) publicada en ``namespace`` según ``list_metrics``."""
+    queries = []
+    for page in client.get_paginator("list_metrics").paginate(Namespace=namespace):
+        for metric in page["Metrics"]:
+            if names and metric["MetricName"] not in names:
+                continue
+            dimensions = tuple(sorted((d["Name"], d["Value"]) for d in metric.get("Dimensions", [])))
+            for stat in stats:
+                queries.append(MetricQuery(namespace, metric["MetricName"], dimensions, stat, period))
+    return queries
+
+
+class MetricDataReader:
+    """
+    ``poll()`` trae lo nuevo de todas las ``queries`` y ``latest(query)``
+    devuelve el último ``(timestamp, valor)`` conocido. Se guardan a lo sumo
+    ``lookback`` segundos de datapoints por serie.
+    """
+
+    def __init__(self, client, queries, lookback=900, late_periods=2, max_workers=4, clock=time.time):
+        self.client = client
+        self.queries = list(queries)
+        self.lookback = lookback
+        self.late_periods = late_periods
+        self.max_workers = max_workers
+        self.clock = clock
+        self.points = {query: {} for query in self.queries}  # query -> {timestamp: valor}
+        self.fetched_until = {}
+        self.requests = 0
+        self.requested_metrics = 0
+
+    def _window(self, query, now):
+        end = int(now // query.period) * query.period
+        start = end - self.lookback
+        fetched = self.fetched_until.get(query)
+        if fetched is not None:
+            start = max(start, fetched - self.late_periods * query.period)
+        return start, end
+
+    def plan(self, now=None):
+        """Lista de ``(start, end, period, [queries])`` con a lo sumo ``MAX_QUERIES`` queries cada una."""
+        now = self.clock() if now is None else now
+        groups = {}
+        for query in self.queries:
+            start, end = self._window(query, now)
+            if start < end:
+                groups.setdefault((start, end, query.period), []).append(query)
+        return [(start, end, period, queries[i:i + MAX_QUERIES])
+                for (start, end, period), queries in sorted(groups.items())
+                for i in range(0, len(queries), MAX_QUERIES)]
+
+    def _fetch(self, request):
+        start, end, period, queries = request
+        data_queries = [{
+            "Id": f"q{i}",
+            "MetricStat": {
+                "Metric": {
+                    "Namespace": query.namespace,
+                    "MetricName": query.name,
+                    "Dimensions": [{"Name": name, "Value": value} for name, value in query.dimensions],
+                },
+                "Period": period,
+                "Stat": query.stat,
+            },
+            "ReturnData": True,
+        } for i, query in enumerate(queries)]
+        kwargs = {"MetricDataQueries": data_queries, "StartTime": start, "EndTime": end,
+                  "ScanBy": "TimestampAscending"}
+        results = {}
+        calls = 0
+        while True:
+            response = self.client.get_metric_data(**kwargs)
+            calls += 1
+            for result in response["MetricDataResults"]:
+                query = queries[int(result["Id"][1:])]
+                points = results.setdefault(query, {})
+                for timestamp, value in zip(result["Timestamps"], result["Values"]):
+                    points[timestamp.timestamp()] = value
+            token = response.get("NextToken")
+            if not token:
+                break
+            kwargs["NextToken"] = token
+        return end, results, calls, len(queries)
+
+    def poll(self, now=None):
+        """Trae la cola nueva de todas las series; devuelve la cantidad de requests hechos."""
+        now = self.clock() if now is None else now
+        requests = self.plan(now)
+        if not requests:
+            return 0
+        if self.max_workers > 1 and len(requests) > 1:
+            with ThreadPoolExecutor(min(self.max_workers, len(requests))) as pool:
+                fetched = list(pool.map(self._fetch, requests))
+        else:
+            fetched = [self._fetch(request) for request in requests]
+
+        calls_made = 0
+        for (_, _, _, queries), (end, results, calls, count) in zip(requests, fetched):
+            calls_made += calls
+            self.requested_metrics += count * calls
+            for query in queries:
+                points = self.points[query]
+                points.update(results.get(query, {}))
+                self.fetched_until[query] = end
+                oldest = now - self.lookback
+                for timestamp in [t for t in points if t < oldest]:
+                    del points[timestamp]
+        self.requests += calls_made
+        return calls_made
+
+    def latest(self, query):
+        points = self.points.get(query)
+        if not points:
+            return None
+        timestamp = max(points)
+        return timestamp, points[timestamp]
+
+
+class CloudWatchCollector:
+    """
+    Collector de ``prometheus_client``: en cada scrape hace ``poll()`` si
+    pasaron al menos ``min_interval`` segundos desde el anterior y expone el
+    último datapoint de cada serie (con su timestamp) como
+    ``aws_<namespace>_<métrica>_<estadística>``, con las dimensiones como labels.
+    """
+
+    def __init__(self, reader, min_interval=60, prefix="aws"):
+        self.reader = reader
+        self.min_interval = min_interval
+        self.prefix = prefix
+        self.errors = 0
+        self.last_error = None
+        self._polled_at = None
+        self._lock = threading.Lock()
+
+    def _maybe_poll(self):
+        now = self.reader.clock()
+        if self._polled_at is not None and now - self._polled_at < self.min_interval:
+            return
+        self._polled_at = now
+        try:
+            self.reader.poll(now)
+        except Exception as e:  # el scrape sigue sirviendo lo que ya estaba en caché
+            self.errors += 1
+            self.last_error = str(e)
+
+    def describe(self):
+        return []  # evita que registrar el collector dispare un poll
+
+    def collect(self):
+        with self._lock:
+            self._maybe_poll()
+            families = {}
+            for query in self.reader.queries:
+                latest = self.reader.latest(query)
+                if latest is None:
+                    continue
+                name = "_".join([self.prefix, snake_case(query.namespace), snake_case(query.name),
+                                 snake_case(query.stat)])
+                families.setdefault(name, (query, []))[1].append((query, latest))
+            for name, (first, series) in sorted(families.items()):
+                label_names = sorted({snake_case(dim) for query, _ in series for dim, _ in query.dimensions})
+                family = GaugeMetricFamily(name, f"CloudWatch {first.namespace}/{first.name} ({first.stat})",
+                                           labels=label_names)
+                for query, (timestamp, value) in series:
+                    dims = {snake_case(dim): v for dim, v in query.dimensions}
+                    family.add_metric([dims.get(label, "") for label in label_names], value, timestamp=timestamp)
+                yield family
+
+            yield CounterMetricFamily("cloudwatch_get_metric_data_requests",
+                                      "Llamadas a GetMetricData", value=self.reader.requests)
+            yield CounterMetricFamily("cloudwatch_get_metric_data_metrics",
+                                      "Métricas pedidas a GetMetricData (lo que se factura)",
+                                      value=self.reader.requested_metrics)
+            yield CounterMetricFamily("cloudwatch_poll_errors", "Polls fallidos", value=self.errors)
@@ -0,0 +1,42 @@
+"""
+Lectura de los dashboards de Grafana de LAB4 (``business-case-N.json``).
+"""
+
+import json
+import re
+
+from obslab.promql import parse_duration
+
+
+def load_dashboard(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def iter_panels(dashboard):
+    """Recorre todos los panels, incluidos los que están dentro de rows colapsadas."""
+    def walk(panels):
+        for panel in panels:
+            yield panel
+            yield from walk(panel.get("panels", []))
+    return walk(dashboard.get("panels", []))
+
+
+def iter_targets(dashboard):
+    """Entrega ``(panel, target)`` para cada query PromQL del dashboard."""
+    for panel in iter_panels(dashboard):
+        for target in panel.get("targets", []):
+            if target.get("expr"):
+                yield panel, target
+
+
+def time_range_seconds(dashboard, default=900.0):
+    """Duración del rango por defecto del dashboard (``"now-15m"`` -> 900)."""
+    start = dashboard.get("time", {}).get("from", "")
+    m = re.fullmatch(r"now-(\w+)", start)
+    return parse_duration(m.group(1)) if m else default
+
+
+def refresh_seconds(dashboard):
+    refresh = dashboard.get("refresh")
+    return parse_duration(refresh) if refresh else None
@@ -0,0 +1,542 @@
+"""
+Agregación en el borde: recibe pushes (API del Pushgateway, en texto o
+protobuf) y remote_write de muchas instancias y mantiene solo las series
+sumadas sobre los labels descartados (por omisión ``instance``).
+
+* Counters, ``_count``/``_sum`` y buckets de histogramas se suman por
+  incrementos: cada serie de entrada recuerda su último valor y aporta
+  ``valor - anterior``; si bajó (reinicio de la instancia) aporta el valor
+  completo. Los reinicios se detectan por serie de histograma/summary: si
+  baja cualquiera de sus muestras se reinician todas juntas. Sin reinicios
+  el resultado es exactamente ``sum without (instance)``; con reinicios el
+  agregado sigue siendo monótono y ``rate()`` da lo mismo que sumar los
+  ``rate()`` por instancia.
+* Gauges: la suma (u otra operación por familia) de los últimos valores de
+  las instancias vivas. Una entrada que no se actualiza en ``stale_after``
+  segundos deja de aportar. El último valor de cada counter de entrada se
+  recuerda más tiempo (``forget_after``) para que una instancia que vuelve
+  no se cuente dos veces.
+* Los cuantiles de summaries y las series ``_created`` no se pueden sumar y
+  se descartan.
+* Las familias en ``passthrough`` (p. ej. las que un dashboard mira por
+  instancia, ver ``passthrough_from_dashboards``) se reenvían sin agregar.
+
+Las series agregadas se exponen en ``/metrics`` y se reenvían por
+remote_write (``Forwarder``).
+"""
+
+import base64
+import json
+import threading
+import time
+import urllib.parse
+
+from prometheus_client.parser import text_string_to_metric_families
+from prometheus_client.utils import floatToGoString
+
+from obslab import snappy
+from obslab.exposition import render_labels
+from obslab.promql import PromQLError, parse
+from obslab.protowire import field_bytes
+from obslab.remote_write import RemoteWriteClient, decode_write_request, encode_labels, encode_sample
+
+GAUGE_OPS = {
+    "sum": sum,
+    "max": max,
+    "min": min,
+    "avg": lambda values: sum(values) / len(values),
+}
+# Las que agrega el propio Pushgateway: sumar timestamps no tiene sentido
+DEFAULT_GAUGE_OPS = {"push_time_seconds": "max", "push_failure_time_seconds": "max"}
+
+_COUNTER_SUFFIXES = ("_total", "_bucket", "_count", "_sum")
+_SUFFIX_ORDER = {"_bucket": 0, "_count": 1, "_sum": 2}
+_GAUGE_TYPES = {"gauge", "untyped", "unknown", "info", "stateset", "gaugehistogram"}
+
+# Funciones que conmutan con sum(): sum(rate(x)) == rate(sum(x)) salvo reinicios
+_LINEAR_FUNCTIONS = {"rate", "irate", "increase", "delta", "idelta", "sum_over_time", "avg_over_time"}
+
+
+def _base(name):
+    for suffix in _COUNTER_SUFFIXES[1:]:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def _sort_key(item):
+    (name, labels), _ = item
+    le = dict(labels).get("le")
+    base = _base(name)
+    rest = tuple(pair for pair in labels if pair[0] != "le")
+    return base, rest, _SUFFIX_ORDER.get(name[len(base):], 0), float(le) if le is not None else 0.0
+
+
+# --- Parseo de lo que llega ---
+
+def families_from_text(text):
+    """``[(familia, tipo, [(nombre, labels, valor)])]`` de una exposición de texto."""
+    return [(metric.name, metric.type, [(s.name, s.labels, s.value) for s in metric.samples])
+            for metric in text_string_to_metric_families(text)]
+
+
+def families_from_protobuf(data):
+    """Lo mismo desde protobuf delimitado (``obslab.proto_exposition``)."""
+    from obslab.proto_exposition import decode
+
+    result = []
+    for family in decode(data):
+        name, kind = family["name"], family["type"]
+        samples = []
+        for metric in family["metrics"]:
+            labels = metric["labels"]
+            if kind in ("histogram", "gaugehistogram", "summary"):
+                if kind == "summary":
+                    for quantile, value in metric.get("quantiles", []):
+                        samples.append((name, dict(labels, quantile=floatToGoString(quantile)), value))
+                else:
+                    buckets = metric.get("buckets", [])
+                    for le, count in buckets:
+                        samples.append((name + "_bucket", dict(labels, le=floatToGoString(le)), float(count)))
+                    if not buckets or buckets[-1][0] != float("inf"):
+                        samples.append((name + "_bucket", dict(labels, le="+Inf"), float(metric["count"])))
+                samples.append((name + "_count", labels, float(metric["count"])))
+                samples.append((name + "_sum", labels, metric["sum"]))
+            else:
+                samples.append((name, labels, metric.get("value", 0.0)))
+        if kind == "counter" and name.endswith("_total"):
+            name = name[:-6]
+        result.append((name, kind, samples))
+    return result
+
+
+def families_from_remote_write(series):
+    """
+    Las series de un ``WriteRequest`` no traen tipo: se infiere del nombre
+    (``_total``/``_bucket``/``_count``/``_sum`` son counters, el resto gauges,
+    con ``quantile`` se descartan). Devuelve una lista de rondas (la k-ésima
+    muestra de cada serie, en orden de tiempo) para aplicar en orden.
+    """
+    rounds = []
+    for labels, samples in series:
+        labels = dict(labels)
+        name = labels.pop("__name__", "")
+        if name.endswith("_created") or "quantile" in labels:
+            kind = "skip"
+        elif name.endswith(_COUNTER_SUFFIXES):
+            kind = "counter"
+        else:
+            kind = "gauge"
+        for k, (value, _) in enumerate(sorted(samples, key=lambda sample: sample[1])):
+            if k == len(rounds):
+                rounds.append([])
+            rounds[k].append((name, kind, [(name, labels, value)]))
+    return rounds
+
+
+def parse_grouping_path(path):
+    """``/metrics/job/<job>/<label>/<valor>...`` (con ``@base64``) -> ``(job, {labels})``."""
+    parts = path.strip("/").split("/")
+    if len(parts) < 3 or parts[0] != "metrics" or parts[1] not in ("job", "job@base64") or len(parts) % 2 == 0:
+        raise ValueError(f"ruta de push inválida: {path}")
+    labels = {}
+    for name, value in zip(parts[1::2], parts[2::2]):
+        if name.endswith("@base64"):
+            name = name[:-7]
+            value = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4)).decode()
+        else:
+            value = urllib.parse.unquote(value)
+        labels[name] = value
+    return labels.pop("job"), labels
+
+
+# --- Agregador ---
+
+class EdgeAggregator:
+    """
+    Estado de la agregación. ``ingest`` y ``snapshot`` son seguros entre
+    hilos (un lock para todo: el costo está en el parseo, que va afuera).
+    """
+
+    def __init__(self, drop_labels=("instance",), passthrough=(), gauge_op="sum", gauge_ops=None,
+                 stale_after=300.0, forget_after=3600.0, clock=time.time):
+        self.drop_labels = frozenset(drop_labels)
+        self.passthrough = set(passthrough)
+        self.gauge_op = gauge_op
+        self.gauge_ops = dict(DEFAULT_GAUGE_OPS, **(gauge_ops or {}))
+        for op in [gauge_op, *self.gauge_ops.values()]:
+            if op not in GAUGE_OPS:
+                raise ValueError(f"operación de gauge desconocida: {op}")
+        self.stale_after = stale_after
+        self.forget_after = max(forget_after, stale_after)
+        self.clock = clock
+        self.lock = threading.Lock()
+        self._inputs = {}  # (fuente, nombre, labels) -> [último valor, clave de salida, tipo, visto]
+        self._by_source = {}  # fuente -> claves de entrada
+        self._counters = {}  # (nombre, labels) -> [acumulado, visto]
+        self._gauges = {}  # (nombre, labels) -> {clave de entrada: valor}
+        self._types = {}  # nombre de muestra -> (nombre en # TYPE, tipo)
+        self._encoded = {}  # clave de salida -> labels codificados para remote_write
+        self.stats = {"pushes": 0, "remote_writes": 0, "deletes": 0, "samples_in": 0, "skipped": 0, "resets": 0}
+
+    def _kind(self, family, kind, name):
+        if name.endswith("_created"):
+            return "skip"
+        if self.passthrough and (family in self.passthrough or _base(name) in self.passthrough
+                                 or name in self.passthrough):
+            return "last"
+        if kind == "counter" or (kind in ("histogram", "summary") and name != family):
+            return "counter"
+        if kind in _GAUGE_TYPES:
+            return "gauge"
+        return "skip"  # cuantiles de summaries
+
+    def ingest(self, source, families, extra_labels=None, replace=False):
+        """
+        Aplica un push (o una ronda de remote_write). ``source`` identifica a
+        quien envía (job + grouping key); con ``replace`` (PUT) los gauges de
+        esa fuente que no vienen dejan de aportar, como en el Pushgateway.
+        """
+        now = self.clock()
+        rows = []
+        skipped = 0
+        for family, kind, samples in families:
+            type_kind = kind if kind in ("counter", "histogram", "summary") else "gauge"
+            for name, labels, value in samples:
+                kind_of = self._kind(family, kind, name)
+                if kind_of == "skip":
+                    skipped += 1
+                    continue
+                if extra_labels:
+                    labels = dict(labels, **extra_labels)
+                items = tuple(sorted(labels.items()))
+                if kind_of == "last":
+                    out_items = items
+                else:
+                    out_items = tuple(pair for pair in items if pair[0] not in self.drop_labels)
+                # Una serie de histograma/summary (sin le) se reinicia entera
+                group = (_base(name), tuple(pair for pair in items if pair[0] != "le"))
+                rows.append(((source, name, items), (name, out_items), kind_of, float(value), group,
+                             (name if kind == "counter" else family, type_kind)))
+        with self.lock:
+            if source is not None:
+                self.stats["pushes"] += 1
+            self.stats["samples_in"] += len(rows) + skipped
+            self.stats["skipped"] += skipped
+            reset = set()
+            for in_key, _, kind_of, value, group, _ in rows:
+                if kind_of == "counter":
+                    previous = self._inputs.get(in_key)
+                    if previous is not None and value < previous[0]:
+                        reset.add(group)
+            self.stats["resets"] += len(reset)
+            seen = set()
+            for in_key, out_key, kind_of, value, group, type_info in rows:
+                seen.add(in_key)
+                self._types[out_key[0]] = type_info
+                previous = self._inputs.get(in_key)
+                if kind_of == "counter":
+                    if previous is None or previous[2] != "counter" or group in reset:
+                        delta = value
+                    else:
+                        delta = value - previous[0]
+                    entry = self._counters.get(out_key)
+                    if entry is None:
+                        entry = self._counters[out_key] = [0.0, now]
+                    entry[0] += delta
+                    entry[1] = now
+                else:
+                    self._gauges.setdefault(out_key, {})[in_key] = value
+                if previous is None:
+                    self._inputs[in_key] = [value, out_key, kind_of, now]
+                    self._by_source.setdefault(source, set()).add(in_key)
+                else:
+                    previous[0], previous[1], previous[2], previous[3] = value, out_key, kind_of, now
+            if replace:
+                for in_key in self._by_source.get(source, set()) - seen:
+                    self._drop_gauge(in_key)
+
+    def _drop_gauge(self, in_key):
+        """Deja de contar un gauge de entrada (de los counters solo se recuerda el último valor)."""
+        state = self._inputs.get(in_key)
+        if state is None or state[2] == "counter":
+            return
+        del self._inputs[in_key]
+        self._by_source.get(in_key[0], set()).discard(in_key)
+        contributions = self._gauges.get(state[1])
+        if contributions is not None:
+            contributions.pop(in_key, None)
+            if not contributions:
+                del self._gauges[state[1]]
+                self._encoded.pop(state[1], None)
+
+    def ingest_remote_write(self, rounds):
+        """Una request de remote_write: cada ronda (un timestamp) se aplica como un push sin fuente."""
+        for families in rounds:
+            self.ingest(None, families)
+        with self.lock:
+            self.stats["remote_writes"] += 1
+
+    def delete_source(self, source):
+        """DELETE de un grupo: sus gauges dejan de aportar (lo acumulado en counters queda)."""
+        with self.lock:
+            self.stats["deletes"] += 1
+            for in_key in list(self._by_source.get(source, ())):
+                self._drop_gauge(in_key)
+
+    def expire(self):
+        """
+        Olvida los gauges sin novedades en ``stale_after`` segundos, los
+        counters de salida que nadie alimenta hace ese tiempo y los últimos
+        valores de counters de entrada más viejos que ``forget_after``.
+        """
+        now = self.clock()
+        with self.lock:
+            for in_key, state in list(self._inputs.items()):
+                if state[2] != "counter" and state[3] < now - self.stale_after:
+                    self._drop_gauge(in_key)
+                elif state[3] < now - self.forget_after:
+                    del self._inputs[in_key]
+                    self._by_source.get(in_key[0], set()).discard(in_key)
+            for out_key in [key for key, entry in self._counters.items() if entry[1] < now - self.stale_after]:
+                del self._counters[out_key]
+                self._encoded.pop(out_key, None)
+
+    def snapshot(self):
+        """``[((nombre, labels), valor)]`` de las series de salida, ordenadas por familia."""
+        with self.lock:
+            result = [(key, entry[0]) for key, entry in self._counters.items()]
+            for key, contributions in self._gauges.items():
+                values = list(contributions.values())
+                state = self._inputs[next(iter(contributions))]
+                if state[2] == "last":
+                    result.append((key, values[0]))
+                else:
+                    op = self.gauge_ops.get(key[0], self.gauge_op)
+                    result.append((key, GAUGE_OPS[op](values)))
+        result.sort(key=_sort_key)
+        return result
+
+    def render_text(self):
+        """Exposición de texto (0.0.4) de las series agregadas."""
+        lines = []
+        declared = set()
+        for (name, labels), value in self.snapshot():
+            type_name, kind = self._types.get(name, (name, "gauge"))
+            if type_name not in declared:
+                declared.add(type_name)
+                lines.append(f"# TYPE {type_name} {kind}")
+            lines.append(f"{name}{render_labels(dict(labels))} {floatToGoString(value)}")
+        return ("\n".join(lines) + "\n").encode() if lines else b""
+
+    def write_requests(self, timestamp_ms, max_series=2000):
+        """``WriteRequest`` sin comprimir con a lo sumo ``max_series`` series cada uno."""
+        snapshot = self.snapshot()
+        for start in range(0, len(snapshot), max_series):
+            chunk = []
+            for key, value in snapshot[start:start + max_series]:
+                encoded = self._encoded.get(key)
+                if encoded is None:
+                    encoded = self._encoded[key] = encode_labels(dict(key[1], __name__=key[0]))
+                chunk.append(field_bytes(1, encoded + encode_sample(value, timestamp_ms)))
+            yield b"".join(chunk)
+
+    def summary(self):
+        with self.lock:
+            inputs = len(self._inputs)
+            outputs = len(self._counters) + len(self._gauges)
+            passthrough = sum(1 for state in self._inputs.values() if state[2] == "last")
+        return dict(self.stats, input_series=inputs, output_series=outputs, passthrough_series=passthrough,
+                    reduction=inputs / outputs if outputs else 0.0)
+
+
+class Forwarder:
+    """Cada ``interval`` segundos expira lo viejo y envía las series agregadas por remote_write."""
+
+    def __init__(self, aggregator, url, interval=15.0, basic_auth=None, max_series=2000, timeout=10.0):
+        self.aggregator = aggregator
+        self.client = RemoteWriteClient(url, timeout=timeout, basic_auth=basic_auth)
+        self.interval = interval
+        self.max_series = max_series
+        self.stats = {"requests": 0, "bytes": 0, "errors": 0}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def flush(self):
+        self.aggregator.expire()
+        timestamp_ms = int(time.time() * 1000)
+        for payload in self.aggregator.write_requests(timestamp_ms, self.max_series):
+            body = snappy.compress(payload)
+            try:
+                self.client.target.send("POST", body=body)
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"❌ Error de remote_write a {self.client}: {e}")
+                return
+            self.stats["requests"] += 1
+            self.stats["bytes"] += len(body)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="edge-forwarder", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.client.close()
+
+    def __str__(self):
+        return str(self.client)
+
+
+# --- Qué familias hay que reenviar sin agregar ---
+
+def _all_values(value):
+    """Matchers que Grafana arma con "All" (o ``.*``) también matchean la serie sin el label."""
+    return value in (".*", "") or value.startswith("$")
+
+
+def _selectors_needing_labels(node, drop_labels, aggregated=False):
+    kind = node[0]
+    if kind == "paren":
+        yield from _selectors_needing_labels(node[1], drop_labels, aggregated)
+    elif kind == "range":
+        yield from _selectors_needing_labels(node[1], drop_labels, aggregated)
+    elif kind == "selector":
+        filtered = any(label in drop_labels and not (op == "=~" and _all_values(value))
+                       for label, op, value in node[2])
+        if node[1] and (not aggregated or filtered):
+            yield node[1]
+    elif kind == "call":
+        linear = node[1] in _LINEAR_FUNCTIONS
+        for arg in node[2]:
+            yield from _selectors_needing_labels(arg, drop_labels, aggregated and linear)
+    elif kind == "aggregate":
+        _, op, args, grouping = node
+        if grouping is None:
+            drops = True
+        elif grouping[0] == "by":
+            drops = not drop_labels & set(grouping[1])
+        else:
+            drops = drop_labels <= set(grouping[1])
+        for arg in args:
+            yield from _selectors_needing_labels(arg, drop_labels, op == "sum" and drops)
+    elif kind == "binary":
+        _, op, lhs, rhs, _, _ = node
+        # ``x * 100`` o ``x or vector(0)`` dentro de un sum() siguen siendo sumables
+        linear = op == "or" or (op == "*" and "number" in (lhs[0], rhs[0])) or (op == "/" and rhs[0] == "number")
+        for side in (lhs, rhs):
+            yield from _selectors_needing_labels(side, drop_labels, aggregated and linear)
+
+
+def passthrough_from_dashboards(dashboards, drop_labels=("instance",)):
+    """
+    Familias que algún panel consulta sin sumar los labels descartados (o
+    filtrando por uno de ellos): esas se reenvían sin agregar. Devuelve
+    ``(familias, expresiones que no se pudieron parsear)``.
+    """
+    from obslab.dashboards import iter_targets
+    from obslab.query_dedup import prepare_expr
+
+    drop_labels = frozenset(drop_labels)
+    names = set()
+    failed = []
+    for dashboard in dashboards:
+        for _, target in iter_targets(dashboard):
+            expr = target.get("expr", "")
+            try:
+                node = parse(prepare_expr(expr))
+            except PromQLError:
+                failed.append(expr)
+                continue
+            for name in _selectors_needing_labels(node, drop_labels):
+                names.add(name)
+                names.add(_base(name))
+    return names, failed
+
+
+# --- Servidor HTTP ---
+
+def aggregator_server(aggregator, host, port, forwarder=None, verbose=False):
+    """
+    ``ThreadingHTTPServer`` (sin arrancar) con la API de push del Pushgateway
+    (``PUT``/``POST``/``DELETE /metrics/job/...``), ``POST /api/v1/write``
+    (remote_write), ``GET /metrics`` con las series agregadas y
+    ``GET /aggregator/stats`` en JSON.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self, status, body=b"", content_type="text/plain; charset=utf-8"):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self):
+            return self.rfile.read(int(self.headers.get("Content-Length", 0) or 0))
+
+        def _push(self, replace):
+            body = self._body()
+            try:
+                job, grouping = parse_grouping_path(self.path.partition("?")[0])
+                if "protobuf" in self.headers.get("Content-Type", ""):
+                    families = families_from_protobuf(body)
+                else:
+                    families = families_from_text(body.decode())
+            except (ValueError, UnicodeDecodeError) as e:
+                return self._reply(400, f"{e}\n".encode())
+            source = (job,) + tuple(sorted(grouping.items()))
+            aggregator.ingest(source, families, dict(grouping, job=job), replace)
+            self._reply(200)
+            if verbose:
+                print(f"{time.strftime('%H:%M:%S')} push {job} {grouping}", flush=True)
+
+        def do_PUT(self):
+            self._push(replace=True)
+
+        def do_POST(self):
+            path = self.path.partition("?")[0]
+            if path != "/api/v1/write":
+                return self._push(replace=False)
+            try:
+                rounds = families_from_remote_write(decode_write_request(snappy.decompress(self._body())))
+            except (ValueError, IndexError) as e:
+                return self._reply(400, f"{e}\n".encode())
+            aggregator.ingest_remote_write(rounds)
+            self._reply(204)
+
+        def do_DELETE(self):
+            self._body()
+            try:
+                job, grouping = parse_grouping_path(self.path.partition("?")[0])
+            except ValueError as e:
+                return self._reply(400, f"{e}\n".encode())
+            aggregator.delete_source((job,) + tuple(sorted(grouping.items())))
+            self._reply(202)
+
+        def do_GET(self):
+            path = self.path.partition("?")[0]
+            if path == "/metrics":
+                return self._reply(200, aggregator.render_text(), "text/plain; version=0.0.4; charset=utf-8")
+            if path == "/aggregator/stats":
+                stats = aggregator.summary()
+                if forwarder is not None:
+                    stats["forwarded"] = forwarder.stats
+                return self._reply(200, json.dumps(stats).encode(), "application/json")
+            if path in ("/-/healthy", "/-/ready"):
+                return self._reply(200, b"OK\n")
+            self._reply(404, b"Not Found\n")
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
@@ -0,0 +1,108 @@
+"""
+Exposición en formato de texto (0.0.4) y OpenMetrics a partir de series
+sueltas ``(nombre, labels)``, como las que guarda una captura.
+
+La captura no guarda el tipo de cada familia, así que se infiere de los
+nombres igual que lo haría un lector humano: ``_bucket``+``_count`` es un
+histogram, ``_sum``+``_count`` sin buckets un summary, ``_total`` un counter y
+el resto gauges.
+"""
+
+from prometheus_client.utils import floatToGoString
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items())) + "}"
+
+
+def infer_families(names):
+    """``{nombre_de_muestra: (familia, tipo)}`` para un conjunto de nombres."""
+    names = set(names)
+    result = {}
+    for name in names:
+        base, _, suffix = name.rpartition("_")
+        if suffix == "bucket" and base + "_count" in names:
+            result[name] = (base, "histogram")
+        elif suffix in ("sum", "count") and base + "_bucket" in names:
+            result[name] = (base, "histogram")
+        elif suffix in ("sum", "count") and {base + "_sum", base + "_count"} <= names:
+            result[name] = (base, "summary")
+        elif name + "_sum" in names and name + "_count" in names:
+            result[name] = (name, "summary")  # muestras con label quantile
+        elif suffix == "total":
+            result[name] = (name, "counter")
+        else:
+            result[name] = (name, "gauge")
+    return result
+
+
+class SeriesCatalog:
+    """
+    Pre-renderiza una vez los nombres+labels de un conjunto de series para
+    poder exponer muchos snapshots sin volver a formatear labels.
+
+    ``relabel`` recibe y devuelve el dict de labels de cada serie (p. ej. para
+    quitar ``job``/``instance`` al hacer push, porque el Pushgateway los pone
+    desde la URL, o para renombrar la instancia).
+    """
+
+    def __init__(self, series, relabel=None):
+        self.series = series
+        families = infer_families(name for name, _ in series)
+        self.family = [families[name][0] for name, _ in series]
+        self.type = {families[name][0]: families[name][1] for name, _ in series}
+        self.order = sorted(range(len(series)), key=self._sort_key)
+        self.position = [0] * len(series)
+        for pos, sid in enumerate(self.order):
+            self.position[sid] = pos
+        self.prefix = []
+        for name, labels in series:
+            if relabel is not None:
+                labels = relabel(dict(labels))
+            self.prefix.append(name + render_labels(labels))
+
+    def _sort_key(self, sid):
+        # OpenMetrics exige que las muestras de un mismo labelset (buckets,
+        # _count, _sum) vayan juntas y los buckets en orden creciente de le.
+        name, labels = self.series[sid]
+        group = sorted((k, v) for k, v in labels.items() if k not in ("le", "quantile"))
+        bound = labels.get("le", labels.get("quantile"))
+        return (self.family[sid], group, name, float(bound) if bound is not None else 0.0)
+
+    def render_text(self, ids, values, timestamp_ms=None):
+        """Formato de texto 0.0.4 para las series ``ids`` con sus ``values``."""
+        pairs = sorted(zip(ids, values), key=lambda p: self.position[p[0]])
+        out = []
+        current = None
+        suffix = f" {int(timestamp_ms)}\n" if timestamp_ms is not None else "\n"
+        for sid, value in pairs:
+            family = self.family[sid]
+            if family != current:
+                current = family
+                out.append(f"# TYPE {family} {self.type[family]}\n")
+            out.append(f"{self.prefix[sid]} {floatToGoString(value)}{suffix}")
+        return "".join(out).encode("utf-8")
+
+    def render_openmetrics(self, ids, values, timestamp=None, eof=True):
+        """OpenMetrics 1.0 (los counters se declaran sin el sufijo ``_total``)."""
+        pairs = sorted(zip(ids, values), key=lambda p: self.position[p[0]])
+        out = []
+        current = None
+        suffix = f" {timestamp:.3f}\n" if timestamp is not None else "\n"
+        for sid, value in pairs:
+            family = self.family[sid]
+            if family != current:
+                current = family
+                kind = self.type[family]
+                name = family[:-6] if kind == "counter" and family.endswith("_total") else family
+                out.append(f"# TYPE {name} {kind}\n")
+            out.append(f"{self.prefix[sid]} {floatToGoString(value)}{suffix}")
+        if eof:
+            out.append("# EOF\n")
+        return "".join(out).encode("utf-8")
@@ -0,0 +1,176 @@
+"""
+Push del mismo snapshot a varios Pushgateways (o receptores compatibles)
+en paralelo.
+
+El registry se serializa una sola vez por ciclo y los mismos bytes se
+entregan a un ``GatewayWorker`` por destino. Cada worker tiene su hilo, su
+conexión keep-alive, su timeout y su estado de salud, así que un gateway
+lento o caído no demora a los demás ni al loop de simulación:
+
+* por cada grupo (ruta ``/metrics/job/...``) se guarda solo el snapshot más
+  nuevo pendiente: si el gateway no da abasto, los viejos se descartan
+  (``superseded``) en lugar de acumularse;
+* un envío fallido se reintenta hasta ``max_retries`` veces con espera
+  exponencial (tope ``max_backoff``), salvo que mientras tanto llegue un
+  snapshot más nuevo del mismo grupo;
+* mientras está caído el worker espera el backoff antes de volver a
+  intentar, sin consumir CPU ni bloquear ``submit``;
+* un ``DELETE`` del grupo pasa por la misma cola: reemplaza al snapshot
+  pendiente y sale después del que esté en vuelo, así que nada lo recrea.
+"""
+
+import base64
+import threading
+import time
+import urllib.parse
+
+from obslab.transport import HTTPTarget
+
+TEXT_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def grouping_path(job, grouping_key=None):
+    """``/metrics/job/<job>/<label>/<valor>...`` con la variante ``@base64`` como en prometheus_client."""
+    def part(name, value):
+        value = str(value)
+        if not value:
+            return f"/{name}@base64/="
+        if "/" in value or " " in value:
+            return f"/{name}@base64/{base64.urlsafe_b64encode(value.encode()).decode()}"
+        return f"/{name}/{urllib.parse.quote_plus(value)}"
+
+    return "/metrics" + part("job", job) + "".join(part(k, v) for k, v in sorted((grouping_key or {}).items()))
+
+
+class GatewayWorker:
+    """Un destino: cola de a un snapshot por grupo y un hilo que los envía."""
+
+    def __init__(self, url, method="POST", timeout=5.0, max_retries=2, backoff=0.5, max_backoff=30.0,
+                 content_type=TEXT_CONTENT_TYPE):
+        self.target = HTTPTarget(url, timeout=timeout)
+        self.url = url
+        self.method = method
+        self.content_type = content_type
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.sent = 0
+        self.errors = 0
+        self.superseded = 0
+        self.dropped = 0
+        self.failures = 0          # fallos seguidos (0 = sano)
+        self.last_error = None
+        self.last_success = None
+        self._pending = {}         # ruta -> (body, intentos)
+        self._retry_at = 0.0
+        self._closing = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name=f"push-{url}", daemon=True)
+        self._thread.start()
+
+    @property
+    def healthy(self):
+        return self.failures == 0
+
+    def submit(self, path, body):
+        with self._cond:
+            if path in self._pending:
+                self.superseded += 1
+            self._pending[path] = (body, 0)
+            self._cond.notify()
+
+    def delete(self, path):
+        """Encola el ``DELETE`` del grupo en lugar de lo que tuviera pendiente."""
+        self.submit(path, None)
+
+    def _next(self):
+        """Espera el próximo envío; ``None`` al cerrar con la cola vacía."""
+        with self._cond:
+            while True:
+                if not self._pending:
+                    if self._closing:
+                        return None
+                    self._cond.wait()
+                    continue
+                delay = self._retry_at - time.monotonic()
+                if delay > 0 and not self._closing:
+                    self._cond.wait(delay)
+                    continue
+                path = next(iter(self._pending))
+                body, attempts = self._pending.pop(path)
+                return path, body, attempts
+
+    def _run(self):
+        headers = {"Content-Type": self.content_type}
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            path, body, attempts = item
+            try:
+                if body is None:
+                    self.target.send("DELETE", path)
+                else:
+                    self.target.send(self.method, path, body, headers)
+            except Exception as e:
+                with self._cond:
+                    self.errors += 1
+                    self.failures += 1
+                    self.last_error = str(e)
+                    self._retry_at = time.monotonic() + min(self.max_backoff,
+                                                            self.backoff * 2 ** (self.failures - 1))
+                    if attempts < self.max_retries and not self._closing and path not in self._pending:
+                        self._pending[path] = (body, attempts + 1)
+                    elif path not in self._pending:
+                        self.dropped += 1
+                continue
+            with self._cond:
+                self.sent += 1
+                self.failures = 0
+                self.last_success = time.time()
+                self._retry_at = 0.0
+
+    def _stop(self):
+        with self._cond:
+            self._closing = True
+            self._cond.notify()
+
+    def close(self, timeout=5.0):
+        """Intenta enviar lo pendiente (sin reintentos) durante a lo sumo ``timeout`` segundos."""
+        self._stop()
+        self._thread.join(timeout)
+        self.target.close()
+
+    def status(self):
+        state = "ok" if self.healthy else f"caído ({self.failures} fallo(s) seguidos: {self.last_error})"
+        return (f"{self.url}: {state}; enviados {self.sent}, errores {self.errors}, "
+                f"reemplazados {self.superseded}, descartados {self.dropped}")
+
+
+class FanoutPusher:
+    """``push(body, job, grouping_key)`` entrega los mismos bytes a todos los workers sin esperar."""
+
+    def __init__(self, urls, method="POST", timeout=5.0, max_retries=2, content_type=TEXT_CONTENT_TYPE):
+        self.workers = [GatewayWorker(url, method, timeout, max_retries, content_type=content_type)
+                        for url in urls]
+
+    def push(self, body, job, grouping_key=None):
+        path = grouping_path(job, grouping_key)
+        for worker in self.workers:
+            worker.submit(path, body)
+
+    def delete(self, job, grouping_key=None):
+        path = grouping_path(job, grouping_key)
+        for worker in self.workers:
+            worker.delete(path)
+
+    def unhealthy(self):
+        return [worker for worker in self.workers if not worker.healthy]
+
+    def close(self, timeout=5.0):
+        """Cierra todos los workers en paralelo: el tiempo total no supera ``timeout``."""
+        deadline = time.monotonic() + timeout
+        for worker in self.workers:
+            worker._stop()
+        for worker in self.workers:
+            worker.close(max(0.0, deadline - time.monotonic()))
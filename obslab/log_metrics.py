@@ -0,0 +1,453 @@
+"""
+Métricas a partir de logs reales: las mismas familias de los simuladores
+(o las que declare la configuración), alimentadas por eventos en lugar de
+valores al azar.
+
+``LogTailer`` sigue un archivo (lectura con buffer o con ``mmap``) y entrega
+bloques de líneas completas; detecta rotaciones (rename + archivo nuevo, o
+truncado con copytruncate) y termina de leer el archivo viejo antes de pasar
+al nuevo. Los ``.gz`` ya rotados se leen de principio a fin.
+
+``LogIngestor`` parsea cada bloque de una vez y lo convierte en columnas:
+
+* ``access``: Common/Combined Log Format (nginx, Apache) con el tiempo de
+  respuesta opcional al final, con un solo ``findall`` por bloque;
+* ``jsonl``: un objeto JSON por línea, con un solo ``json.loads`` por bloque.
+
+Cada regla de la configuración mapea campos a labels y a un valor; los ids
+de cada combinación de labels se resuelven una vez por valor distinto y las
+actualizaciones se aplican por bloque sobre las familias en arrays de
+``obslab.array_metrics`` (``inc_many``, ``set_many``, ``observe_ids``).
+
+Configuración (JSON)::
+
+    {
+      "format": "access",
+      "case": 1,                       # familias de LAB4/business-case-1.py
+      "families": [                    # y/o familias propias
+        {"name": "app_requests_total", "type": "counter", "help": "...", "labels": ["status"]}
+      ],
+      "rules": [
+        {"metric": "api_latency_seconds",
+         "where": {"method": ["GET", "POST"], "status": {"regex": "[23].."}},
+         "labels": {"service": {"field": "path", "regex": "^/api/(\\\\w+)"}},
+         "const_labels": {"job": "${job}", "instance": "${instance}"},
+         "value": "request_time", "scale": 1.0}
+      ]
+    }
+
+Sin ``value`` cada línea cuenta 1 (counters). En gauges ``"action"`` puede
+ser ``set`` (último valor del bloque, por defecto), ``inc`` o ``dec``. El
+timestamp de las líneas no se usa: las métricas reflejan lo leído hasta el
+momento del push, como un exporter.
+"""
+
+import gzip
+import itertools
+import json
+import mmap
+import os
+import re
+import string
+
+import numpy as np
+
+ACCESS_LOG = re.compile(
+    rb'^(?P<remote_addr>\S+) \S+ (?P<remote_user>\S+) \[(?P<time>[^\]]*)\] '
+    rb'"(?P<method>[A-Z]+) (?P<path>\S+)[^"]*" (?P<status>\d{3}) (?P<bytes>\d+|-)'
+    rb'(?: "(?P<referer>[^"]*)" "(?P<user_agent>[^"]*)")?(?: (?P<request_time>[\d.]+))?[^\n]*$',
+    re.M)
+ACCESS_FIELDS = list(ACCESS_LOG.groupindex)
+_MAX_KEYS = 100000  # claves crudas distintas recordadas por regla
+
+
+class LogTailer:
+    """
+    Lee ``path`` en bloques de a lo sumo ``chunk_bytes`` que terminan en fin
+    de línea. ``from_start=False`` empieza desde el final (solo lo nuevo).
+    """
+
+    def __init__(self, path, from_start=True, use_mmap=False, chunk_bytes=4 * 1024 * 1024):
+        self.path = path
+        self.from_start = from_start
+        self.use_mmap = use_mmap and not path.endswith(".gz")
+        self.chunk_bytes = chunk_bytes
+        self.rotations = 0
+        self._file = None
+        self._inode = None
+        self._pos = 0
+        self._map = None
+        self._partial = b""
+
+    def _open(self, at_end):
+        if self.path.endswith(".gz"):
+            self._file = gzip.open(self.path, "rb")
+            self._inode = None
+            self._pos = 0
+            return
+        self._file = open(self.path, "rb", buffering=0 if self.use_mmap else -1)
+        st = os.fstat(self._file.fileno())
+        self._inode = (st.st_dev, st.st_ino)
+        self._pos = st.st_size if at_end else 0
+        self._file.seek(self._pos)
+
+    def _close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _read_chunk(self):
+        if not self.use_mmap:
+            data = self._file.read(self.chunk_bytes)
+            self._pos += len(data)
+            return data
+        size = os.fstat(self._file.fileno()).st_size
+        if size <= self._pos:
+            return b""
+        if self._map is None or len(self._map) < size:
+            if self._map is not None:
+                self._map.close()
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        end = min(size, self._pos + self.chunk_bytes)
+        data = self._map[self._pos:end]
+        self._pos = end
+        return data
+
+    def _rotated(self):
+        """Después de leer hasta el final: ¿hay que reabrir (rotación) o volver al inicio (truncado)?"""
+        if self._inode is None:
+            return False
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False  # entre el rename y la creación del nuevo
+        if (st.st_dev, st.st_ino) != self._inode:
+            # La última línea del archivo viejo queda sola, sin pegarse a la primera del nuevo
+            self._partial = self.flush()
+            self._close()
+            self._open(at_end=False)
+            self.rotations += 1
+            return True
+        if st.st_size < self._pos:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+            self._file.seek(0)
+            self._pos = 0
+            self._partial = b""
+            self.rotations += 1
+            return True
+        return False
+
+    def read(self):
+        """Bloque de líneas completas (``b""`` si por ahora no hay nada nuevo)."""
+        if self._file is None:
+            if not os.path.exists(self.path):
+                return b""
+            self._open(at_end=not self.from_start)
+        data = self._read_chunk()
+        if not data and self._rotated():
+            data = self._read_chunk()
+        if not data:
+            return b""
+        data = self._partial + data
+        cut = data.rfind(b"\n") + 1
+        self._partial = data[cut:]
+        return data[:cut]
+
+    def flush(self):
+        """Lo que quedó sin fin de línea (al terminar de leer un archivo estático)."""
+        rest, self._partial = self._partial, b""
+        return rest + b"\n" if rest.strip() else b""
+
+    def close(self):
+        self._close()
+
+    def __str__(self):
+        return self.path
+
+
+def _text(value):
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    return "" if value is None else str(value)
+
+
+def _scalar(value):
+    """Objetos y listas de un registro JSON como texto (las columnas deben ser hashables)."""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True, separators=(",", ":"))
+    return value
+
+
+def _predicate(spec):
+    """Función valor -> bool para un filtro ``where``."""
+    if isinstance(spec, dict):
+        pattern = re.compile(spec["regex"])
+        return lambda value: pattern.fullmatch(_text(value)) is not None
+    allowed = {str(v) for v in spec} if isinstance(spec, list) else {str(spec)}
+    return lambda value: _text(value) in allowed
+
+
+def _extractor(spec):
+    """Función valor -> texto del label (``spec`` sin el campo)."""
+    pattern = re.compile(spec["regex"]) if "regex" in spec else None
+    default = spec.get("default", "")
+
+    def extract(value):
+        text = _text(value)
+        if pattern is None:
+            return text or default
+        match = pattern.search(text)
+        if match is None:
+            return default
+        return match.group(1) if match.groups() else match.group(0)
+
+    return extract
+
+
+def _floats(column):
+    """Columna -> array de floats; lo que no es número queda en NaN."""
+    try:
+        return np.asarray(column, dtype=float)
+    except (TypeError, ValueError):
+        out = np.empty(len(column))
+        for i, value in enumerate(column):
+            try:
+                out[i] = float(value)
+            except (TypeError, ValueError):
+                out[i] = np.nan
+        return out
+
+
+class _Derived:
+    """
+    Columna calculada a partir de un campo (filtro o label). La función se
+    evalúa una vez por valor distinto y el resultado queda cacheado entre
+    bloques; las reglas con el mismo filtro o label comparten la instancia.
+    """
+
+    def __init__(self, field, fn):
+        self.field = field
+        self.fn = fn
+        self.cache = {}
+
+    def compute(self, columns):
+        column = columns[self.field]
+        cache = self.cache
+        if len(cache) >= _MAX_KEYS:
+            cache.clear()  # p. ej. rutas con ids: el caché no crece sin límite
+        try:
+            distinct = set(column)
+        except TypeError:
+            # Un campo JSON con objetos o listas: como texto (solo se paga cuando aparecen)
+            column = columns[self.field] = [_scalar(value) for value in column]
+            distinct = set(column)
+        for value in distinct.difference(cache):
+            cache[value] = self.fn(value)
+        return list(map(cache.__getitem__, column))
+
+
+class _Rule:
+    def __init__(self, spec, family, variables, derived):
+        self.family = family
+        self.kind = family.kind
+        self.action = spec.get("action", "set" if self.kind == "gauge" else None)
+        self.value_field = spec.get("value")
+        self.scale = float(spec.get("scale", 1.0))
+        if self.value_field is None and self.kind != "counter":
+            raise ValueError(f"regla de {spec['metric']}: los {self.kind} necesitan 'value'")
+        self.where = [derived(field, "where", allowed, _predicate) for field, allowed in spec.get("where", {}).items()]
+        sources = {}
+        for name, source in spec.get("labels", {}).items():
+            source = {"field": source} if isinstance(source, str) else source
+            options = {k: v for k, v in source.items() if k != "field"}
+            sources[name] = derived(source["field"], "label", options, _extractor)
+        const = {name: string.Template(str(value)).safe_substitute(variables)
+                 for name, value in spec.get("const_labels", {}).items()}
+        missing = [name for name in family.labelnames if name not in sources and name not in const]
+        if missing:
+            raise ValueError(f"regla de {spec['metric']}: faltan los labels {missing}")
+        # Cada label sale de una columna calculada (posición en la clave) o es constante
+        self.sources = [sources[name] for name in family.labelnames if name in sources]
+        self.layout = [(self.sources.index(sources[name]), None) if name in sources else (None, const[name])
+                       for name in family.labelnames]
+        self._ids = {}  # valores de los labels calculados -> id de la familia
+
+    def needed_fields(self):
+        fields = {d.field for d in self.where} | {d.field for d in self.sources}
+        if self.value_field is not None:
+            fields.add(self.value_field)
+        return fields
+
+    def _resolve(self, key):
+        labelvalues = tuple(const if position is None else key[position] for position, const in self.layout)
+        index = self._ids[key] = self.family.index(*labelvalues)
+        return index
+
+    def apply(self, columns, count, computed):
+        """
+        Aplica la regla a un bloque; ``computed(derived)`` devuelve la columna
+        calculada (una sola vez por bloque). Devuelve cuántas líneas la cumplieron.
+        """
+        mask = None
+        for derived in self.where:
+            current = np.fromiter(computed(derived), dtype=bool, count=count)
+            mask = current if mask is None else mask & current
+        if self.value_field is None:
+            values = np.ones(count)
+        else:
+            values = _floats(columns[self.value_field]) * self.scale
+            valid = ~np.isnan(values)
+            mask = valid if mask is None else mask & valid
+        if mask is not None:
+            values = values[mask]
+        if not len(values):
+            return 0
+
+        known = self._ids
+        if self.sources:
+            keys = zip(*(computed(derived) for derived in self.sources))
+            keys = list(itertools.compress(keys, mask) if mask is not None else keys)
+            for key in dict.fromkeys(keys):
+                if key not in known:
+                    self._resolve(key)
+            ids = np.fromiter(map(known.__getitem__, keys), dtype=np.intp, count=len(keys))
+        else:
+            index = known[()] if () in known else self._resolve(())
+            ids = np.full(len(values), index, dtype=np.intp)
+
+        family = self.family
+        if self.kind == "counter":
+            keep = values >= 0
+            family.inc_many(ids[keep], values[keep])
+        elif self.kind == "gauge":
+            if self.action == "set":
+                family.set_many(ids, values)
+            else:
+                family.inc_many(ids, values if self.action == "inc" else -values)
+        else:
+            family.observe_ids(ids, values)
+        return len(ids)
+
+
+class LogIngestor:
+    """
+    Parsea bloques de líneas y los aplica a las familias de ``collector``.
+    En ``const_labels`` se reemplazan ``${job}``/``${instance}`` (y lo que
+    haya en ``variables``).
+    """
+
+    def __init__(self, config, collector, variables=None):
+        self.format = config.get("format", "jsonl")
+        if self.format not in ("jsonl", "access"):
+            raise ValueError(f"formato de log desconocido: {self.format}")
+        self.collector = collector
+        families = {}
+        for family in collector.families:
+            families[family.name] = family
+            if family.kind == "counter":
+                families[family.name + "_total"] = family
+        self._derived = {}
+        self.rules = []
+        for spec in config.get("rules", []):
+            if spec["metric"] not in families:
+                raise ValueError(f"la regla usa {spec['metric']}, que no está definida")
+            self.rules.append(_Rule(spec, families[spec["metric"]], variables or {}, self._shared))
+        self.fields = sorted(set().union(*(rule.needed_fields() for rule in self.rules)))
+        if self.format == "access":
+            unknown = set(self.fields) - set(ACCESS_FIELDS)
+            if unknown:
+                raise ValueError(f"campos que el formato access no tiene: {sorted(unknown)}")
+            # Solo se capturan los campos que usan las reglas: findall arma tuplas más chicas
+            pattern = ACCESS_LOG.pattern
+            for name in ACCESS_FIELDS:
+                if name not in self.fields:
+                    pattern = pattern.replace(f"(?P<{name}>".encode(), b"(?:")
+            self._access = re.compile(pattern, re.M)
+            self._access_fields = [name for name in ACCESS_FIELDS if name in self.fields]
+        self.lines = 0
+        self.skipped = 0
+        self.updates = 0
+
+    def _shared(self, field, kind, spec, factory):
+        """Una sola ``_Derived`` por campo y especificación, compartida entre reglas."""
+        key = (field, kind, json.dumps(spec, sort_keys=True))
+        if key not in self._derived:
+            self._derived[key] = _Derived(field, factory(spec))
+        return self._derived[key]
+
+    def _columns(self, block):
+        """``(cantidad, {campo: lista})`` de un bloque de líneas completas."""
+        if self.format == "access":
+            rows = self._access.findall(block)
+            lines = block.count(b"\n")
+            if not rows:
+                return 0, {}, lines
+            if len(self._access_fields) == 1:
+                return len(rows), {self._access_fields[0]: rows}, lines
+            return len(rows), dict(zip(self._access_fields, zip(*rows))), lines
+        lines = [line for line in block.split(b"\n") if line.strip()]
+        try:
+            records = json.loads(b"[" + b",".join(lines) + b"]")
+        except ValueError:
+            records = None
+        # Dos líneas rotas seguidas pueden unirse en un registro "válido": solo vale si coincide la cantidad
+        if records is None or len(records) != len(lines):
+            records = []
+            for line in lines:  # alguna línea rota: se descartan solo esas
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    pass
+        records = [r for r in records if isinstance(r, dict)]
+        return len(records), {field: [r.get(field) for r in records] for field in self.fields}, len(lines)
+
+    def feed(self, block):
+        """Procesa un bloque; devuelve la cantidad de líneas."""
+        if not block:
+            return 0
+        count, columns, lines = self._columns(block)
+        self.lines += lines
+        self.skipped += lines - count
+        if count:
+            memo = {}
+
+            def computed(derived):
+                if derived not in memo:
+                    memo[derived] = derived.compute(columns)
+                return memo[derived]
+
+            for rule in self.rules:
+                self.updates += rule.apply(columns, count, computed)
+        return lines
+
+
+def load_config(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def build_collector(config, registry):
+    """``ArrayCollector`` registrado en ``registry`` con las familias del business case y/o las propias."""
+    from obslab.array_metrics import ArrayCollector, build_case_registry
+
+    if config.get("case"):
+        from obslab.scenarios import load_case
+
+        _, collector = build_case_registry(load_case(int(config["case"])), registry)
+    else:
+        collector = ArrayCollector(registry)
+    for spec in config.get("families", []):
+        kind = spec.get("type", "counter")
+        args = (spec["name"], spec.get("help", spec["name"]), spec.get("labels", []))
+        if kind == "histogram" and "buckets" in spec:
+            collector.histogram(*args, buckets=spec["buckets"])
+        elif kind in ("counter", "gauge", "histogram", "summary"):
+            getattr(collector, kind)(*args)
+        else:
+            raise ValueError(f"tipo de familia desconocido: {kind}")
+    return collector
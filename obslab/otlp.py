@@ -0,0 +1,485 @@
+"""
+Exportación de métricas por OTLP/HTTP (protobuf + gzip) hacia un
+OpenTelemetry Collector, sin depender del SDK de OpenTelemetry.
+
+    ExportMetricsServiceRequest { repeated ResourceMetrics resource_metrics = 1; }
+    ResourceMetrics { Resource resource = 1; repeated ScopeMetrics scope_metrics = 2; }
+    ScopeMetrics    { InstrumentationScope scope = 1; repeated Metric metrics = 2; }
+    Metric          { name = 1; description = 2; unit = 3;
+                      oneof { Gauge gauge = 5; Sum sum = 7; Histogram histogram = 9; Summary summary = 11; } }
+
+Los snapshots de un registry de ``prometheus_client`` se convierten con
+``RegistryConverter`` (counters como ``Sum`` monotónico, histogramas con
+buckets no acumulados) en temporalidad acumulada o delta. ``OTLPExporter``
+encola los ``ResourceMetrics`` ya codificados en una cola acotada y un hilo
+los agrupa en requests de hasta ``max_batch_points`` puntos.
+
+Para probar sin Collector: ``python -m obslab.otlp receive --port 4318``
+levanta un receptor que decodifica cada request y muestra un resumen.
+"""
+
+import argparse
+import gzip
+import http.client
+import queue
+import threading
+import time
+
+from obslab.protowire import (
+    as_double, as_fixed64, as_int64, field_bytes, field_double, field_fixed64, field_string,
+    field_varint, iter_fields, packed_double, packed_fixed64, unpack_double, unpack_fixed64,
+)
+from obslab.transport import HTTPTarget
+
+CUMULATIVE = "cumulative"
+DELTA = "delta"
+_TEMPORALITY = {DELTA: 1, CUMULATIVE: 2}
+_TEMPORALITY_NAMES = {0: "unspecified", 1: DELTA, 2: CUMULATIVE}
+HEADERS = {"Content-Type": "application/x-protobuf", "Content-Encoding": "gzip"}
+METRICS_PATH = "/v1/metrics"
+SCOPE = field_string(1, "obslab")
+_RETRY_STATUS = {429, 502, 503, 504}
+
+
+# --- Codificación ---
+
+def encode_attributes(field, attributes):
+    """``KeyValue`` con valores string (como los labels de Prometheus)."""
+    return b"".join(
+        field_bytes(field, field_string(1, key) + field_bytes(2, field_string(1, str(value))))
+        for key, value in attributes.items()
+    )
+
+
+def number_point(attributes, start_ns, time_ns, value):
+    return (encode_attributes(7, attributes) + field_fixed64(2, start_ns) + field_fixed64(3, time_ns)
+            + field_double(4, float(value)))
+
+
+def histogram_point(attributes, start_ns, time_ns, count, total, bucket_counts, bounds):
+    """``bucket_counts`` no acumulados, uno más que ``bounds`` (el último es +Inf)."""
+    return (encode_attributes(9, attributes) + field_fixed64(2, start_ns) + field_fixed64(3, time_ns)
+            + field_fixed64(4, int(count)) + field_double(5, float(total))
+            + packed_fixed64(6, [int(c) for c in bucket_counts]) + packed_double(7, bounds))
+
+
+def summary_point(attributes, start_ns, time_ns, count, total, quantiles):
+    body = (encode_attributes(7, attributes) + field_fixed64(2, start_ns) + field_fixed64(3, time_ns)
+            + field_fixed64(4, int(count)) + field_double(5, float(total)))
+    return body + b"".join(field_bytes(6, field_double(1, q) + field_double(2, v)) for q, v in quantiles)
+
+
+def encode_metric(name, description, unit, kind, points, temporality=CUMULATIVE, monotonic=True):
+    """``kind``: gauge, sum, histogram o summary; ``points`` ya codificados."""
+    data = b"".join(field_bytes(1, point) for point in points)
+    if kind == "sum":
+        data += field_varint(2, _TEMPORALITY[temporality]) + field_varint(3, int(monotonic))
+        field = 7
+    elif kind == "histogram":
+        data += field_varint(2, _TEMPORALITY[temporality])
+        field = 9
+    elif kind == "summary":
+        field = 11
+    else:
+        field = 5
+    body = field_string(1, name)
+    if description:
+        body += field_string(2, description)
+    if unit:
+        body += field_string(3, unit)
+    return body + field_bytes(field, data)
+
+
+def encode_resource_metrics(resource, metrics):
+    """Un ``ResourceMetrics`` con un solo scope; ``metrics`` son ``Metric`` codificados."""
+    scope_metrics = field_bytes(1, SCOPE) + b"".join(field_bytes(2, metric) for metric in metrics)
+    return field_bytes(1, encode_attributes(1, resource)) + field_bytes(2, scope_metrics)
+
+
+# --- Conversión desde prometheus_client ---
+
+class RegistryConverter:
+    """
+    Convierte lo que devuelve ``registry.collect()`` en ``Metric`` de OTLP.
+    En ``delta`` guarda el último acumulado de cada serie: cada punto cubre
+    desde el export anterior (un reset del counter cuenta desde cero).
+    """
+
+    def __init__(self, temporality=CUMULATIVE, drop_labels=("job", "instance")):
+        if temporality not in _TEMPORALITY:
+            raise ValueError(f"temporalidad desconocida: {temporality}")
+        self.temporality = temporality
+        self.drop_labels = set(drop_labels)
+        self.start_ns = time.time_ns()
+        self._previous = {}  # resource -> {(métrica, labels): (acumulado, time_ns)}
+        self._seen = {}  # lo del convert en curso: al terminar reemplaza al del resource
+        self._resource = ()
+
+    def _attributes(self, labels):
+        return {k: v for k, v in labels.items() if k not in self.drop_labels}
+
+    def _start(self, key, created, time_ns, cumulative):
+        """``(start_ns, valor_a_informar)`` según la temporalidad."""
+        first = int(created * 1e9) if created else self.start_ns
+        if self.temporality == CUMULATIVE:
+            return first, cumulative
+        previous = self._previous.get(self._resource, {}).get(key)
+        self._seen[key] = (cumulative, time_ns)
+        if previous is None:
+            return first, cumulative
+        before, start = previous
+        if isinstance(cumulative, tuple):
+            delta = tuple(
+                [c - b for c, b in zip(cur, prev)] if isinstance(cur, list) else cur - prev
+                for cur, prev in zip(cumulative, before))
+            if delta[0] < 0 or min(delta[2], default=0) < 0:  # reset
+                return start, cumulative
+            return start, delta
+        return start, cumulative - before if cumulative >= before else cumulative
+
+    def convert(self, collected, time_ns=None, resource=None):
+        """
+        Devuelve ``(metrics, puntos)`` para un snapshot. ``resource`` separa
+        el estado delta cuando un mismo convertidor recibe varias instancias.
+        """
+        time_ns = time_ns or time.time_ns()
+        self._resource = tuple(sorted((resource or {}).items()))
+        self._seen = {}
+        metrics = []
+        total_points = 0
+        for metric in collected:
+            converter = getattr(self, f"_convert_{metric.type}", self._convert_gauge)
+            encoded, count = converter(metric, time_ns)
+            if count:
+                metrics.append(encoded)
+                total_points += count
+        # Las series que ya no vienen se olvidan (si vuelven, cuentan desde cero como tras un reset)
+        if self.temporality != CUMULATIVE:
+            self._previous[self._resource] = self._seen
+        return metrics, total_points
+
+    def _convert_gauge(self, metric, time_ns):
+        points = [number_point(self._attributes(s.labels), self.start_ns, time_ns, s.value)
+                  for s in metric.samples if not s.name.endswith("_created")]
+        return encode_metric(metric.name, metric.documentation, metric.unit, "gauge", points), len(points)
+
+    def _convert_counter(self, metric, time_ns):
+        created = {tuple(sorted(s.labels.items())): s.value for s in metric.samples if s.name.endswith("_created")}
+        points = []
+        for sample in metric.samples:
+            if not sample.name.endswith("_total"):
+                continue
+            labels = tuple(sorted(sample.labels.items()))
+            start, value = self._start((metric.name, labels), created.get(labels), time_ns, sample.value)
+            points.append(number_point(self._attributes(sample.labels), start, time_ns, value))
+        encoded = encode_metric(metric.name, metric.documentation, metric.unit, "sum", points, self.temporality)
+        return encoded, len(points)
+
+    def _convert_histogram(self, metric, time_ns):
+        series = {}
+        for sample in metric.samples:
+            labels = tuple(sorted((k, v) for k, v in sample.labels.items() if k != "le"))
+            entry = series.setdefault(labels, {"buckets": [], "count": 0, "sum": 0.0, "created": None})
+            suffix = sample.name[len(metric.name):]
+            if suffix == "_bucket":
+                entry["buckets"].append((float(sample.labels["le"]), sample.value))
+            elif suffix == "_count":
+                entry["count"] = sample.value
+            elif suffix == "_sum":
+                entry["sum"] = sample.value
+            elif suffix == "_created":
+                entry["created"] = sample.value
+        points = []
+        for labels, entry in series.items():
+            buckets = sorted(entry["buckets"])
+            bounds = [le for le, _ in buckets if le != float("inf")]
+            counts = []
+            previous = 0
+            for _, cumulative in buckets:
+                counts.append(cumulative - previous)
+                previous = cumulative
+            start, (count, total, counts) = self._start(
+                (metric.name, labels), entry["created"], time_ns, (entry["count"], entry["sum"], counts))
+            points.append(histogram_point(self._attributes(dict(labels)), start, time_ns,
+                                          count, total, counts, bounds))
+        encoded = encode_metric(metric.name, metric.documentation, metric.unit, "histogram", points,
+                                self.temporality)
+        return encoded, len(points)
+
+    def _convert_summary(self, metric, time_ns):
+        # Summary no tiene temporalidad en OTLP: siempre acumulado
+        series = {}
+        for sample in metric.samples:
+            labels = tuple(sorted((k, v) for k, v in sample.labels.items() if k != "quantile"))
+            entry = series.setdefault(labels, {"quantiles": [], "count": 0, "sum": 0.0, "created": None})
+            suffix = sample.name[len(metric.name):]
+            if suffix == "":
+                entry["quantiles"].append((float(sample.labels["quantile"]), sample.value))
+            elif suffix in ("_count", "_sum", "_created"):
+                entry[suffix[1:]] = sample.value
+        points = [
+            summary_point(self._attributes(dict(labels)),
+                          int(entry["created"] * 1e9) if entry["created"] else self.start_ns,
+                          time_ns, entry["count"], entry["sum"], sorted(entry["quantiles"]))
+            for labels, entry in series.items()
+        ]
+        return encode_metric(metric.name, metric.documentation, metric.unit, "summary", points), len(points)
+
+
+# --- Envío ---
+
+class OTLPExporter:
+    """
+    Cola acotada de ``ResourceMetrics`` codificados y un hilo que los envía
+    en lotes de hasta ``max_batch_points`` puntos, esperando a lo sumo
+    ``flush_interval`` segundos para completar un lote. Si la cola está
+    llena el snapshot se descarta (``dropped``) en lugar de bloquear.
+    """
+
+    _STOP = object()
+
+    def __init__(self, endpoint, headers=None, max_queue=256, max_batch_points=8192, flush_interval=1.0,
+                 timeout=10.0, max_retries=3):
+        if not endpoint.rstrip("/").endswith(METRICS_PATH):
+            endpoint = endpoint.rstrip("/") + METRICS_PATH
+        all_headers = dict(HEADERS)
+        all_headers.update(headers or {})
+        self.target = HTTPTarget(endpoint, timeout=timeout, headers=all_headers)
+        self.max_batch_points = max_batch_points
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.requests = self.points = self.dropped = self.failed = self.rejected = 0
+        self.last_error = None
+        self._thread = threading.Thread(target=self._run, name="otlp-exporter", daemon=True)
+        self._thread.start()
+
+    def submit(self, resource_metrics, points):
+        """Encola un ``ResourceMetrics`` ya codificado; devuelve ``False`` si se descartó."""
+        try:
+            self.queue.put_nowait((resource_metrics, points))
+            return True
+        except queue.Full:
+            self.dropped += points
+            return False
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self.queue.get()
+            if item is self._STOP:
+                break
+            batch = [item[0]]
+            points = item[1]
+            deadline = time.monotonic() + self.flush_interval
+            while points < self.max_batch_points:
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                batch.append(item[0])
+                points += item[1]
+            self._export(batch, points)
+
+    def _export(self, batch, points):
+        body = gzip.compress(b"".join(field_bytes(1, rm) for rm in batch), compresslevel=6)
+        delay = 0.5
+        for attempt in range(self.max_retries + 1):
+            try:
+                status, data = self.target.request("POST", body=body)
+            except (OSError, http.client.HTTPException) as e:
+                status, data = None, f"{type(e).__name__}: {e}"
+            if status is not None and status < 300:
+                self.requests += 1
+                self.points += points
+                try:
+                    self.rejected += decode_export_response(data)
+                except (ValueError, IndexError):
+                    pass  # 2xx con un cuerpo que no es protobuf (p. ej. JSON): nada rechazado
+                return
+            self.last_error = f"HTTP {status}: {data[:200]!r}" if status is not None else data
+            if (status is not None and status not in _RETRY_STATUS) or attempt == self.max_retries:
+                break
+            time.sleep(delay)
+            delay *= 2
+        self.failed += points
+
+    def close(self, timeout=10.0):
+        """Envía lo que quede en la cola y detiene el hilo."""
+        try:
+            self.queue.put(self._STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self.target.close()
+
+    def stats(self):
+        text = f"{self.requests} requests, {self.points} puntos"
+        if self.dropped or self.failed or self.rejected:
+            text += f" ({self.dropped} descartados por cola llena, {self.failed} fallidos, {self.rejected} rechazados)"
+        if self.failed and self.last_error:
+            text += f"; último error: {self.last_error}"
+        return text
+
+    def __str__(self):
+        return f"otlp:{self.target.url}"
+
+
+# --- Decodificación (receptor de prueba) ---
+
+def _decode_attributes(data, field, into):
+    for f, _, value in iter_fields(data):
+        if f != field:
+            continue
+        key = ""
+        text = None
+        for kf, _, kv in iter_fields(value):
+            if kf == 1:
+                key = bytes(kv).decode("utf-8")
+            elif kf == 2:
+                for vf, wire_type, vv in iter_fields(kv):
+                    if vf == 1:
+                        text = bytes(vv).decode("utf-8")
+                    elif vf == 3:
+                        text = as_int64(vv)
+                    elif vf == 4:
+                        text = as_double(vv)
+                    elif vf == 2:
+                        text = bool(vv)
+        into[key] = text
+    return into
+
+
+def _decode_point(data, kind):
+    attr_field = 9 if kind == "histogram" else 7
+    point = {"attributes": _decode_attributes(data, attr_field, {})}
+    for f, _, value in iter_fields(data):
+        if f == 2:
+            point["start"] = as_fixed64(value)
+        elif f == 3:
+            point["time"] = as_fixed64(value)
+        elif kind in ("gauge", "sum"):
+            if f == 4:
+                point["value"] = as_double(value)
+            elif f == 6:
+                point["value"] = as_int64(as_fixed64(value))
+        elif f == 4:
+            point["count"] = as_fixed64(value)
+        elif f == 5:
+            point["sum"] = as_double(value)
+        elif kind == "histogram" and f == 6:
+            point["bucket_counts"] = unpack_fixed64(value)
+        elif kind == "histogram" and f == 7:
+            point["bounds"] = unpack_double(value)
+        elif kind == "summary" and f == 6:
+            q = dict((qf, as_double(qv)) for qf, _, qv in iter_fields(value))
+            point.setdefault("quantiles", []).append((q.get(1, 0.0), q.get(2, 0.0)))
+    return point
+
+
+def _decode_metric(data):
+    kinds = {5: "gauge", 7: "sum", 9: "histogram", 11: "summary"}
+    metric = {"name": "", "description": "", "unit": "", "points": []}
+    for f, _, value in iter_fields(data):
+        if f in (1, 2, 3):
+            metric[("name", "description", "unit")[f - 1]] = bytes(value).decode("utf-8")
+        elif f in kinds:
+            kind = metric["type"] = kinds[f]
+            for df, _, dv in iter_fields(value):
+                if df == 1:
+                    metric["points"].append(_decode_point(dv, kind))
+                elif df == 2:
+                    metric["temporality"] = _TEMPORALITY_NAMES.get(dv, dv)
+                elif df == 3:
+                    metric["monotonic"] = bool(dv)
+    return metric
+
+
+def decode_export_request(data):
+    """``[{"resource": {...}, "metrics": [{"name", "type", "points", ...}]}]``."""
+    result = []
+    for f, _, rm in iter_fields(data):
+        if f != 1:
+            continue
+        entry = {"resource": {}, "metrics": []}
+        for rf, _, rv in iter_fields(rm):
+            if rf == 1:
+                _decode_attributes(rv, 1, entry["resource"])
+            elif rf == 2:
+                for sf, _, sv in iter_fields(rv):
+                    if sf == 2:
+                        entry["metrics"].append(_decode_metric(sv))
+        result.append(entry)
+    return result
+
+
+def decode_export_response(data):
+    """Puntos rechazados según ``partial_success`` (0 si la respuesta viene vacía)."""
+    for f, _, value in iter_fields(data or b""):
+        if f == 1:
+            for pf, _, pv in iter_fields(value):
+                if pf == 1:
+                    return as_int64(pv)
+    return 0
+
+
+def serve_receiver(host, port, verbose=False):
+    """Receptor OTLP/HTTP de prueba: decodifica cada request e imprime un resumen."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            raw = gzip.decompress(body) if self.headers.get("Content-Encoding") == "gzip" else body
+            if self.path != METRICS_PATH:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            resources = decode_export_request(raw)
+            points = sum(len(m["points"]) for r in resources for m in r["metrics"])
+            names = {r["resource"].get("service.name") for r in resources}
+            print(f"{time.strftime('%H:%M:%S')} {len(resources)} resources ({', '.join(sorted(map(str, names)))}), "
+                  f"{sum(len(r['metrics']) for r in resources)} métricas, {points} puntos, "
+                  f"{len(body)} bytes ({len(raw)} sin comprimir)", flush=True)
+            if verbose:
+                for resource in resources:
+                    for metric in resource["metrics"]:
+                        print(f"  {metric['name']} {metric.get('type')} {metric.get('temporality', '')} "
+                              f"{metric['points'][:1]}")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-protobuf")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    print(f"Receptor OTLP en http://{host}:{port}{METRICS_PATH}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Herramientas OTLP de obslab")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_receive = sub.add_parser("receive", help="Receptor OTLP/HTTP de prueba que decodifica los requests")
+    p_receive.add_argument("--listen", default="127.0.0.1")
+    p_receive.add_argument("--port", type=int, default=4318)
+    p_receive.add_argument("--verbose", action="store_true", help="Muestra el primer punto de cada métrica")
+    args = parser.parse_args()
+    serve_receiver(args.listen, args.port, args.verbose)
+
+
+if __name__ == "__main__":
+    main()
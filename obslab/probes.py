@@ -0,0 +1,442 @@
+"""
+Probers asíncronos compatibles con los módulos del blackbox exporter
+(``http``, ``tcp`` e ``icmp``) para sondear miles de targets desde un solo
+proceso.
+
+El blackbox exporter hace un probe por cada scrape de ``/probe?target=...``;
+aquí ``ProbeRunner`` recorre toda la lista en rondas con concurrencia
+acotada y deja el resultado ya renderizado, de modo que ``/metrics`` solo
+devuelve bytes en caché. Los nombres de las métricas son los del blackbox
+exporter, con los labels ``module`` y ``target`` (más los del archivo de
+targets).
+"""
+
+import asyncio
+import collections
+import gzip
+import os
+import re
+import socket
+import ssl
+import struct
+import time
+import urllib.parse
+
+from prometheus_client.utils import floatToGoString
+
+from obslab.exposition import render_labels
+
+Target = collections.namedtuple("Target", "module address labels")
+
+METRICS = {
+    "probe_success": ("gauge", "Displays whether or not the probe was a success"),
+    "probe_duration_seconds": ("gauge", "Returns how long the probe took to complete in seconds"),
+    "probe_dns_lookup_time_seconds": ("gauge", "Returns the time taken for probe dns lookup in seconds"),
+    "probe_ip_protocol": ("gauge", "Specifies whether probe ip protocol is IP4 or IP6"),
+    "probe_http_duration_seconds": ("gauge", "Duration of http request by phase, summed over all redirects"),
+    "probe_http_status_code": ("gauge", "Response HTTP status code"),
+    "probe_http_content_length": ("gauge", "Length of http content response"),
+    "probe_http_uncompressed_body_length": ("gauge", "Length of uncompressed response body"),
+    "probe_http_version": ("gauge", "Returns the version of HTTP of the probe response"),
+    "probe_http_redirects": ("gauge", "The number of redirects"),
+    "probe_http_ssl": ("gauge", "Indicates if SSL was used for the final redirect"),
+    "probe_ssl_earliest_cert_expiry": ("gauge", "Returns last SSL chain expiry in unixtime"),
+    "probe_failed_due_to_regex": ("gauge", "Indicates if probe failed due to regex"),
+    "probe_icmp_duration_seconds": ("gauge", "Duration of icmp request by phase"),
+    "probe_runner_targets": ("gauge", "Targets sondeados en cada ronda"),
+    "probe_runner_round_duration_seconds": ("gauge", "Duración de la última ronda completa"),
+    "probe_runner_last_round_timestamp_seconds": ("gauge", "Fin de la última ronda completa"),
+}
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value, default=5.0):
+    """Duraciones estilo Go (``5s``, ``500ms``, ``1m30s``) a segundos."""
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        return float(value)
+    parts = _DURATION_RE.findall(value)
+    if not parts or "".join(n + u for n, u in parts) != value.strip():
+        raise ValueError(f"duración inválida: {value!r}")
+    return sum(float(n) * _UNITS[u] for n, u in parts)
+
+
+def load_modules(path):
+    """Lee el archivo de módulos del blackbox exporter (requiere ``pyyaml``)."""
+    import yaml
+
+    with open(path) as f:
+        config = yaml.safe_load(f) or {}
+    modules = {}
+    for name, module in (config.get("modules") or {}).items():
+        module = dict(module)
+        if module.get("prober") not in PROBERS:
+            raise ValueError(f"módulo {name}: prober no soportado {module.get('prober')!r}")
+        module["timeout"] = parse_duration(module.get("timeout"))
+        modules[name] = module
+    return modules
+
+
+def load_targets(path, modules=None):
+    """
+    Una línea por target: ``<módulo> <target> [label=valor ...]``. Las líneas
+    vacías y las que empiezan con ``#`` se ignoran.
+    """
+    targets = []
+    with open(path) as f:
+        for lineno, line in enumerate(f, 1):
+            fields = line.split()
+            if not fields or fields[0].startswith("#"):
+                continue
+            if len(fields) < 2:
+                raise ValueError(f"{path}:{lineno}: falta el target")
+            if modules is not None and fields[0] not in modules:
+                raise ValueError(f"{path}:{lineno}: módulo desconocido {fields[0]!r}")
+            labels = dict(field.split("=", 1) for field in fields[2:])
+            targets.append(Target(fields[0], fields[1], labels))
+    return targets
+
+
+class _Probe:
+    """Acumula las muestras de un probe; lo medido sobrevive aunque falle a mitad de camino."""
+
+    def __init__(self):
+        self.samples = []
+        self.success = False
+
+    def set(self, name, value, **labels):
+        self.samples.append((name, labels, value))
+
+
+async def _resolve(host, port, config):
+    """
+    Resuelve respetando ``preferred_ip_protocol`` (ip6 por omisión, como el
+    blackbox) con fallback a ip4. Devuelve ``(familia, dirección, segundos)``.
+    """
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    preferred = config.get("preferred_ip_protocol", "ip6")
+    infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    wanted = socket.AF_INET6 if preferred == "ip6" else socket.AF_INET
+    chosen = [info for info in infos if info[0] == wanted]
+    if not chosen:
+        if not config.get("ip_protocol_fallback", True):
+            raise OSError(f"{host} no tiene direcciones {preferred}")
+        chosen = infos
+    family, _, _, _, sockaddr = chosen[0]
+    return family, sockaddr[0], time.perf_counter() - start
+
+
+def _set_resolved(probe, family, seconds):
+    probe.set("probe_dns_lookup_time_seconds", seconds)
+    probe.set("probe_ip_protocol", 6 if family == socket.AF_INET6 else 4)
+
+
+def _ssl_context(tls_config):
+    context = ssl.create_default_context(cafile=tls_config.get("ca_file"))
+    if tls_config.get("insecure_skip_verify"):
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    return context
+
+
+def _cert_expiry(writer):
+    ssl_object = writer.get_extra_info("ssl_object")
+    cert = ssl_object.getpeercert() if ssl_object is not None else None
+    if cert and "notAfter" in cert:
+        return ssl.cert_time_to_seconds(cert["notAfter"])
+    return None
+
+
+async def _read_response(reader):
+    """Lee una respuesta HTTP/1.x completa (el request pide ``Connection: close``)."""
+    status_line = await reader.readline()
+    first_byte = time.perf_counter()
+    version, status, *_ = status_line.decode("latin-1").split(" ", 2) + [""]
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        body = bytearray()
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                break
+            body += await reader.readexactly(size)
+            await reader.readline()
+        body = bytes(body)
+    elif "content-length" in headers:
+        body = await reader.readexactly(int(headers["content-length"]))
+    else:
+        body = await reader.read()
+    return version, int(status), headers, body, first_byte
+
+
+async def probe_http(probe, target, module):
+    config = module.get("http") or {}
+    url = target if "://" in target else f"http://{target}"
+    valid_codes = config.get("valid_status_codes") or []
+    phases = dict.fromkeys(("resolve", "connect", "tls", "processing", "transfer"), 0.0)
+    redirects = 0
+    family = None
+    try:
+        while True:
+            parts = urllib.parse.urlsplit(url)
+            use_tls = parts.scheme == "https"
+            port = parts.port or (443 if use_tls else 80)
+            family, address, seconds = await _resolve(parts.hostname, port, config)
+            phases["resolve"] += seconds
+
+            start = time.perf_counter()
+            reader, writer = await asyncio.open_connection(address, port, family=family)
+            phases["connect"] += time.perf_counter() - start
+            try:
+                if use_tls:
+                    start = time.perf_counter()
+                    tls_config = config.get("tls_config") or {}
+                    await writer.start_tls(_ssl_context(tls_config),
+                                           server_hostname=tls_config.get("server_name", parts.hostname))
+                    phases["tls"] += time.perf_counter() - start
+                    expiry = _cert_expiry(writer)
+                    if expiry is not None:
+                        probe.set("probe_ssl_earliest_cert_expiry", expiry)
+
+                path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+                body = (config.get("body") or "").encode()
+                headers = {"Host": parts.netloc, "User-Agent": "obslab-prober", "Accept": "*/*",
+                           "Connection": "close", **(config.get("headers") or {})}
+                if body:
+                    headers["Content-Length"] = str(len(body))
+                request = f"{config.get('method', 'GET')} {path} HTTP/1.1\r\n"
+                request += "".join(f"{k}: {v}\r\n" for k, v in headers.items()) + "\r\n"
+                start = time.perf_counter()
+                writer.write(request.encode("latin-1") + body)
+                await writer.drain()
+                version, status, response_headers, response_body, first_byte = await _read_response(reader)
+                phases["processing"] += first_byte - start
+                phases["transfer"] += time.perf_counter() - first_byte
+            finally:
+                writer.close()
+
+            location = response_headers.get("location")
+            if 300 <= status < 400 and location and not config.get("no_follow_redirects"):
+                redirects += 1
+                if redirects > 10:
+                    raise OSError("demasiados redirects")
+                url = urllib.parse.urljoin(url, location)
+                continue
+            break
+    finally:
+        if family is not None:
+            _set_resolved(probe, family, phases["resolve"])
+        for phase, seconds in phases.items():
+            probe.set("probe_http_duration_seconds", seconds, phase=phase)
+        probe.set("probe_http_redirects", redirects)
+
+    probe.set("probe_http_status_code", status)
+    probe.set("probe_http_content_length", int(response_headers.get("content-length", -1)))
+    probe.set("probe_http_uncompressed_body_length", len(response_body))
+    probe.set("probe_http_version", float(version.partition("/")[2] or 0))
+    probe.set("probe_http_ssl", 1 if use_tls else 0)
+
+    ok = status in valid_codes if valid_codes else 200 <= status < 300
+    if config.get("fail_if_ssl") and use_tls or config.get("fail_if_not_ssl") and not use_tls:
+        ok = False
+    text = response_body.decode("utf-8", "replace")
+    regex_failed = any(re.search(p, text) for p in config.get("fail_if_body_matches_regexp") or []) or \
+        not all(re.search(p, text) for p in config.get("fail_if_body_not_matches_regexp") or [])
+    probe.set("probe_failed_due_to_regex", 1 if regex_failed else 0)
+    return ok and not regex_failed
+
+
+async def probe_tcp(probe, target, module):
+    config = module.get("tcp") or {}
+    host, _, port = target.rpartition(":")
+    family, address, seconds = await _resolve(host.strip("[]"), int(port), config)
+    _set_resolved(probe, family, seconds)
+    ssl_context = _ssl_context(config.get("tls_config") or {}) if config.get("tls") else None
+    reader, writer = await asyncio.open_connection(address, int(port), family=family, ssl=ssl_context,
+                                                   server_hostname=host.strip("[]") if ssl_context else None)
+    try:
+        if ssl_context is not None:
+            expiry = _cert_expiry(writer)
+            if expiry is not None:
+                probe.set("probe_ssl_earliest_cert_expiry", expiry)
+        for step in config.get("query_response") or []:
+            if "send" in step:
+                writer.write(step["send"].encode() + b"\n")
+                await writer.drain()
+            if "expect" in step:
+                pattern = re.compile(step["expect"].encode())
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        return False
+                    if pattern.search(line):
+                        break
+    finally:
+        writer.close()
+    return True
+
+
+def _checksum(data):
+    if len(data) % 2:
+        data += b"\0"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def _icmp_socket(family):
+    """Socket ICMP sin privilegios si ``net.ipv4.ping_group_range`` lo permite; si no, raw (root)."""
+    proto = socket.IPPROTO_ICMPV6 if family == socket.AF_INET6 else socket.IPPROTO_ICMP
+    try:
+        sock, raw = socket.socket(family, socket.SOCK_DGRAM, proto), False
+    except PermissionError:
+        sock, raw = socket.socket(family, socket.SOCK_RAW, proto), True
+    sock.setblocking(False)
+    return sock, raw
+
+
+async def probe_icmp(probe, target, module):
+    config = module.get("icmp") or {}
+    loop = asyncio.get_running_loop()
+    family, address, seconds = await _resolve(target, None, config)
+    _set_resolved(probe, family, seconds)
+    probe.set("probe_icmp_duration_seconds", seconds, phase="resolve")
+
+    start = time.perf_counter()
+    sock, raw = _icmp_socket(family)
+    v6 = family == socket.AF_INET6
+    ident = os.getpid() & 0xFFFF
+    seq = int.from_bytes(os.urandom(2), "big")
+    payload = b"obslab-prober"
+    header = struct.pack("!BBHHH", 128 if v6 else 8, 0, 0, ident, seq)
+    packet = header[:2] + struct.pack("!H", 0 if v6 else _checksum(header + payload)) + header[4:] + payload
+    probe.set("probe_icmp_duration_seconds", time.perf_counter() - start, phase="setup")
+    try:
+        start = time.perf_counter()
+        await loop.sock_sendto(sock, packet, (address, 0))
+        while True:
+            data = await loop.sock_recv(sock, 1500)
+            if raw and not v6:
+                data = data[(data[0] & 0x0F) * 4:]  # quitar la cabecera IP
+            kind, _, _, reply_ident, reply_seq = struct.unpack("!BBHHH", data[:8])
+            # Con SOCK_DGRAM el kernel reescribe el identificador; basta la secuencia
+            if kind == (129 if v6 else 0) and reply_seq == seq and (not raw or reply_ident == ident):
+                break
+        probe.set("probe_icmp_duration_seconds", time.perf_counter() - start, phase="rtt")
+    finally:
+        sock.close()
+    return True
+
+
+PROBERS = {"http": probe_http, "tcp": probe_tcp, "icmp": probe_icmp}
+
+
+class ProbeRunner:
+    """
+    Sondea ``targets`` en rondas con a lo más ``concurrency`` probes en
+    vuelo. Al terminar cada ronda renderiza una vez la exposición completa
+    (``exposition``, y su versión gzip bajo demanda).
+    """
+
+    def __init__(self, modules, targets, concurrency=100):
+        self.modules = modules
+        self.targets = targets
+        self.concurrency = concurrency
+        self.exposition = b""
+        self.rounds = 0
+        self._gzip = None
+
+    async def _run_one(self, semaphore, target):
+        module = self.modules[target.module]
+        probe = _Probe()
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                async with asyncio.timeout(module["timeout"]):
+                    probe.success = bool(await PROBERS[module["prober"]](probe, target.address, module))
+            except (OSError, asyncio.TimeoutError, ValueError, ssl.SSLError, asyncio.IncompleteReadError):
+                probe.success = False
+            probe.set("probe_duration_seconds", time.perf_counter() - start)
+        probe.set("probe_success", 1 if probe.success else 0)
+        return probe
+
+    async def run_round(self):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        start = time.perf_counter()
+        probes = await asyncio.gather(*(self._run_one(semaphore, t) for t in self.targets))
+        duration = time.perf_counter() - start
+        self.exposition = self.render(probes, duration)
+        self._gzip = None
+        self.rounds += 1
+        return probes
+
+    def render(self, probes, round_duration):
+        families = collections.defaultdict(list)
+        for target, probe in zip(self.targets, probes):
+            base = {"module": target.module, "target": target.address, **target.labels}
+            for name, labels, value in probe.samples:
+                families[name].append(f"{name}{render_labels({**base, **labels})} {floatToGoString(value)}\n")
+        families["probe_runner_targets"].append(f"probe_runner_targets {len(self.targets)}\n")
+        families["probe_runner_round_duration_seconds"].append(
+            f"probe_runner_round_duration_seconds {floatToGoString(round_duration)}\n")
+        families["probe_runner_last_round_timestamp_seconds"].append(
+            f"probe_runner_last_round_timestamp_seconds {floatToGoString(time.time())}\n")
+        out = []
+        for name, (kind, help_text) in METRICS.items():
+            lines = families.get(name)
+            if not lines:
+                continue
+            out.append(f"# HELP {name} {help_text}\n# TYPE {name} {kind}\n")
+            out.extend(lines)
+        return "".join(out).encode("utf-8")
+
+    def exposition_gzip(self):
+        if self._gzip is None:
+            self._gzip = gzip.compress(self.exposition, compresslevel=6)
+        return self._gzip
+
+    async def run_forever(self, interval):
+        while True:
+            start = time.perf_counter()
+            await self.run_round()
+            await asyncio.sleep(max(0.0, interval - (time.perf_counter() - start)))
+
+    async def handle_http(self, reader, writer):
+        """Servidor HTTP mínimo: ``/metrics`` devuelve la última ronda, nunca dispara probes."""
+        try:
+            request_line = await reader.readline()
+            accept_gzip = False
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                if name.strip().lower() == "accept-encoding" and "gzip" in value:
+                    accept_gzip = True
+            parts = request_line.split()
+            if len(parts) >= 2 and parts[1].split(b"?")[0] == b"/metrics":
+                body = self.exposition_gzip() if accept_gzip else self.exposition
+                headers = "HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                if accept_gzip:
+                    headers += "Content-Encoding: gzip\r\n"
+            else:
+                body = b"Not Found\n"
+                headers = "HTTP/1.1 404 Not Found\r\nContent-Type: text/plain\r\n"
+            headers += f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+            writer.write(headers.encode() + body)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,770 @@
+"""
+Evaluador del subconjunto de PromQL que usan los dashboards de LAB4.
+
+Soporta:
+
+- selectores con matchers ``=``, ``!=``, ``=~``, ``!~`` y rangos ``[5m]``
+- ``rate``, ``irate``, ``increase``, ``delta``, ``*_over_time``,
+  ``histogram_quantile``, ``vector``, ``scalar`` y algunas funciones
+  matemáticas
+- agregaciones ``sum``, ``avg``, ``min``, ``max``, ``count``, ``topk`` y
+  ``bottomk`` con ``by``/``without`` antes o después de los argumentos
+- operadores aritméticos, de comparación (con ``bool``) y ``and``/``or``/
+  ``unless``, con ``on(...)``/``ignoring(...)``
+
+Cada instant vector se representa como una matriz ``series x steps``
+(``NaN`` = sin muestra en ese step), de modo que una consulta de rango se
+evalúa completa con operaciones de NumPy sobre todas las series y steps a la
+vez. La semántica (ventanas ``(t - rango, t]``, lookback de 5m, extrapolación
+de ``rate``/``increase``, interpolación de ``histogram_quantile``) sigue la de
+Prometheus.
+
+Ejemplo::
+
+    from obslab.promql import query_range
+    result = query_range(db, 'sum by (region) (rate(ecom_orders_paid_total[5m]))',
+                         start, end, step=15)
+    for labels, row in zip(result.labels, result.values):
+        print(labels, row[-1])
+"""
+
+import re
+import warnings
+
+import numpy as np
+
+from obslab.tsdb import parse_matchers
+
+LOOKBACK_DELTA = 300.0
+
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800, "y": 31536000}
+
+_TOKEN_RE = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<duration>(?:\d+(?:ms|s|m|h|d|w|y))+(?![\w.]))
+  | (?P<number>0[xX][0-9a-fA-F]+|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<ident>[a-zA-Z_:][a-zA-Z0-9_:]*)
+  | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<op>=~|!~|!=|==|<=|>=|[-+*/%^<>=(){}\[\],])
+""", re.VERBOSE)
+
+_ESCAPE_RE = re.compile(r"\\(.)")
+_ESCAPES = {"n": "\n", "t": "\t"}
+
+AGGREGATIONS = {"sum", "avg", "min", "max", "count", "topk", "bottomk"}
+_COMPARISONS = {"==", "!=", "<", ">", "<=", ">="}
+_SET_OPS = {"and", "or", "unless"}
+
+
+class PromQLError(ValueError):
+    pass
+
+
+def parse_duration(text):
+    total = 0.0
+    for amount, unit in re.findall(r"(\d+)(ms|s|m|h|d|w|y)", text):
+        total += int(amount) * _DURATION_UNITS[unit]
+    return total
+
+
+# ---------------------------------------------------------------------------
+# Parser
+# ---------------------------------------------------------------------------
+
+def tokenize(expr):
+    tokens = []
+    pos = 0
+    while pos < len(expr):
+        m = _TOKEN_RE.match(expr, pos)
+        if not m:
+            raise PromQLError(f"carácter inesperado en {pos}: {expr[pos:pos + 20]!r}")
+        pos = m.end()
+        kind = m.lastgroup
+        if kind == "space":
+            continue
+        value = m.group(kind)
+        if kind == "string":
+            value = _ESCAPE_RE.sub(lambda e: _ESCAPES.get(e.group(1), e.group(1)), value[1:-1])
+        tokens.append((kind, value))
+    tokens.append(("eof", None))
+    return tokens
+
+
+class Parser:
+    def __init__(self, expr):
+        self.tokens = tokenize(expr)
+        self.pos = 0
+
+    def peek(self, offset=0):
+        return self.tokens[self.pos + offset]
+
+    def next(self):
+        tok = self.tokens[self.pos]
+        self.pos += 1
+        return tok
+
+    def accept(self, kind, value=None):
+        tok = self.peek()
+        if tok[0] == kind and (value is None or tok[1] == value):
+            self.pos += 1
+            return tok
+        return None
+
+    def expect(self, kind, value=None):
+        tok = self.accept(kind, value)
+        if tok is None:
+            raise PromQLError(f"se esperaba {value or kind}, llegó {self.peek()[1]!r}")
+        return tok
+
+    def parse(self):
+        node = self.parse_binary(0)
+        if self.peek()[0] != "eof":
+            raise PromQLError(f"sobra texto desde {self.peek()[1]!r}")
+        return node
+
+    # Precedencias de menor a mayor (^ es asociativo a la derecha)
+    _LEVELS = [{"or"}, {"and", "unless"}, _COMPARISONS, {"+", "-"}, {"*", "/", "%"}, {"^"}]
+
+    def _binary_op(self, level):
+        kind, value = self.peek()
+        if kind in ("op", "ident") and value in self._LEVELS[level]:
+            return value
+        return None
+
+    def parse_binary(self, level):
+        if level == len(self._LEVELS):
+            return self.parse_unary()
+        lhs = self.parse_binary(level + 1)
+        while True:
+            op = self._binary_op(level)
+            if op is None:
+                return lhs
+            self.next()
+            return_bool = bool(self.accept("ident", "bool"))
+            matching = self.parse_matching()
+            rhs = self.parse_binary(level if op == "^" else level + 1)
+            lhs = ("binary", op, lhs, rhs, return_bool, matching)
+
+    def parse_matching(self):
+        for keyword in ("on", "ignoring"):
+            if self.accept("ident", keyword):
+                labels = self.parse_label_list()
+                if self.peek()[1] in ("group_left", "group_right"):
+                    raise PromQLError("group_left/group_right no están soportados")
+                return (keyword, labels)
+        return None
+
+    def parse_unary(self):
+        if self.accept("op", "-"):
+            return ("binary", "*", ("number", -1.0), self.parse_unary(), False, None)
+        if self.accept("op", "+"):
+            return self.parse_unary()
+        return self.parse_postfix()
+
+    def parse_postfix(self):
+        node = self.parse_primary()
+        if self.accept("op", "["):
+            duration = parse_duration(self.expect("duration")[1])
+            self.expect("op", "]")
+            if node[0] != "selector":
+                raise PromQLError("los subqueries no están soportados")
+            node = ("range", node, duration)
+        return node
+
+    def parse_label_list(self):
+        self.expect("op", "(")
+        labels = []
+        while not self.accept("op", ")"):
+            labels.append(self.expect("ident")[1])
+            if not self.accept("op", ","):
+                self.expect("op", ")")
+                break
+        return labels
+
+    def parse_grouping(self):
+        for keyword in ("by", "without"):
+            if self.accept("ident", keyword):
+                return (keyword, self.parse_label_list())
+        return None
+
+    def parse_primary(self):
+        kind, value = self.peek()
+        if kind == "number":
+            self.next()
+            return ("number", float(int(value, 16)) if value.lower().startswith("0x") else float(value))
+        if kind == "string":
+            self.next()
+            return ("string", value)
+        if kind == "op" and value == "(":
+            self.next()
+            node = self.parse_binary(0)
+            self.expect("op", ")")
+            return ("paren", node)
+        if kind == "op" and value == "{":
+            return ("selector", None, self.parse_matchers())
+        if kind == "ident":
+            self.next()
+            if value.lower() in ("inf", "nan"):
+                return ("number", float(value))
+            if value in AGGREGATIONS and self.peek()[1] in ("(", "by", "without"):
+                return self.parse_aggregation(value)
+            if self.peek() == ("op", "("):
+                return ("call", value, self.parse_args())
+            matchers = self.parse_matchers() if self.peek() == ("op", "{") else []
+            return ("selector", value, matchers)
+        raise PromQLError(f"token inesperado {value!r}")
+
+    def parse_args(self):
+        self.expect("op", "(")
+        args = []
+        if self.accept("op", ")"):
+            return args
+        while True:
+            args.append(self.parse_binary(0))
+            if self.accept("op", ")"):
+                return args
+            self.expect("op", ",")
+
+    def parse_aggregation(self, op):
+        grouping = self.parse_grouping()
+        args = self.parse_args()
+        grouping = self.parse_grouping() or grouping
+        return ("aggregate", op, args, grouping)
+
+    def parse_matchers(self):
+        self.expect("op", "{")
+        matchers = []
+        while not self.accept("op", "}"):
+            label = self.expect("ident")[1]
+            kind, op = self.next()
+            if op not in ("=", "!=", "=~", "!~"):
+                raise PromQLError(f"operador de matcher inválido {op!r}")
+            matchers.append((label, op, self.expect("string")[1]))
+            if not self.accept("op", ","):
+                self.expect("op", "}")
+                break
+        return matchers
+
+
+def parse(expr):
+    return Parser(expr).parse()
+
+
+# ---------------------------------------------------------------------------
+# Valores
+# ---------------------------------------------------------------------------
+
+class Vector:
+    """Instant vector evaluado en todos los steps: ``values`` es ``series x steps``."""
+
+    __slots__ = ("labels", "values")
+
+    def __init__(self, labels, values):
+        self.labels = labels
+        self.values = values
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __repr__(self):
+        return f"Vector({len(self.labels)} series x {self.values.shape[1]} steps)"
+
+
+class Scalar:
+    __slots__ = ("values",)
+
+    def __init__(self, values):
+        self.values = values
+
+
+def _drop_name(labels):
+    return {k: v for k, v in labels.items() if k != "__name__"}
+
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+
+# ---------------------------------------------------------------------------
+# Evaluador
+# ---------------------------------------------------------------------------
+
+class Evaluator:
+    def __init__(self, db, steps):
+        self.db = db
+        self.steps = np.asarray(steps, dtype=float)
+        self.times = db.times
+        self._windows = {}
+
+    @property
+    def nsteps(self):
+        return self.steps.shape[0]
+
+    def eval(self, node):
+        kind = node[0]
+        if kind == "number":
+            return Scalar(np.full(self.nsteps, node[1]))
+        if kind == "string":
+            return node[1]
+        if kind == "paren":
+            return self.eval(node[1])
+        if kind == "selector":
+            return self.eval_instant_selector(node)
+        if kind == "range":
+            raise PromQLError("un range vector solo puede usarse como argumento de función")
+        if kind == "call":
+            return self.eval_call(node[1], node[2])
+        if kind == "aggregate":
+            return self.eval_aggregate(*node[1:])
+        if kind == "binary":
+            return self.eval_binary(*node[1:])
+        raise PromQLError(f"nodo desconocido {kind}")
+
+    # --- Selectores ---
+
+    def _select(self, selector):
+        _, name, raw = selector
+        matchers = []
+        for label, op, value in raw:
+            if label == "__name__" and op == "=" and name is None:
+                name = value
+            else:
+                matchers.append((label, op, value))
+        ids = self.db.select(name, parse_matchers(matchers))
+        return ids, [self.db.labels[i] for i in ids]
+
+    def _window(self, span):
+        """Índices ``[lo, hi)`` de los snapshots dentro de ``(t - span, t]`` por step."""
+        if span not in self._windows:
+            lo = np.searchsorted(self.times, self.steps - span, side="right")
+            hi = np.searchsorted(self.times, self.steps, side="right")
+            self._windows[span] = (lo, hi)
+        return self._windows[span]
+
+    def _window_edges(self, data, span):
+        """
+        Para cada serie y step: posición de la primera y última muestra dentro
+        de la ventana y cuántas muestras hay (vectorizado sobre ambos ejes).
+        """
+        lo, hi = self._window(span)
+        nseries, ntimes = data.shape
+        valid = ~np.isnan(data)
+        positions = np.arange(ntimes)
+        last_idx = np.maximum.accumulate(np.where(valid, positions, -1), axis=1)
+        next_idx = np.minimum.accumulate(np.where(valid, positions, ntimes)[:, ::-1], axis=1)[:, ::-1]
+        counts = np.concatenate([np.zeros((nseries, 1), dtype=np.int64), np.cumsum(valid, axis=1)], axis=1)
+
+        last = np.where(hi > 0, last_idx[:, np.maximum(hi - 1, 0)], -1)
+        first = np.where(lo < ntimes, next_idx[:, np.minimum(lo, ntimes - 1)], ntimes)
+        n = counts[:, hi] - counts[:, lo]
+        return first, last, n, last_idx
+
+    def eval_instant_selector(self, selector):
+        ids, labels = self._select(selector)
+        if not len(ids):
+            return Vector([], np.empty((0, self.nsteps)))
+        data = self.db.values[ids]
+        _, last, n, _ = self._window_edges(data, LOOKBACK_DELTA)
+        values = np.take_along_axis(data, np.maximum(last, 0), axis=1)
+        values = np.where(n > 0, values, np.nan)
+        return Vector(labels, values)
+
+    # --- Funciones sobre rangos ---
+
+    def _range_function(self, name, node):
+        if node[0] != "range":
+            raise PromQLError(f"{name}() espera un range vector")
+        ids, labels = self._select(node[1])
+        span = node[2]
+        out_labels = [_drop_name(l) for l in labels]
+        if not len(ids):
+            return Vector([], np.empty((0, self.nsteps)))
+        data = self.db.values[ids]
+        first, last, n, last_idx = self._window_edges(data, span)
+        times = self.times
+        safe_first = np.minimum(first, data.shape[1] - 1)
+        safe_last = np.maximum(last, 0)
+
+        if name in ("rate", "increase", "delta"):
+            is_counter = name != "delta"
+            if is_counter:
+                # Corrige resets: cada caída suma el valor previo al acumulado
+                prev_idx = np.concatenate([np.full((data.shape[0], 1), -1), last_idx[:, :-1]], axis=1)
+                prev = np.take_along_axis(data, np.maximum(prev_idx, 0), axis=1)
+                drop = (prev_idx >= 0) & (data < prev)
+                adjusted = data + np.cumsum(np.where(drop, prev, 0.0), axis=1)
+            else:
+                adjusted = data
+            first_v = np.take_along_axis(data, safe_first, axis=1)
+            result = np.take_along_axis(adjusted, safe_last, axis=1) - np.take_along_axis(adjusted, safe_first, axis=1)
+            values = self._extrapolate(result, first_v, times[safe_first], times[safe_last], n, span, is_counter)
+            if name == "rate":
+                values = values / span
+            return Vector(out_labels, values)
+
+        if name == "irate":
+            prev_pos = np.maximum(safe_last - 1, 0)
+            prev = np.take_along_axis(last_idx, prev_pos, axis=1)
+            prev = np.where(safe_last > 0, prev, -1)
+            ok = (n >= 2) & (prev >= first)
+            prev = np.maximum(prev, 0)
+            v_last = np.take_along_axis(data, safe_last, axis=1)
+            v_prev = np.take_along_axis(data, prev, axis=1)
+            diff = np.where(v_last < v_prev, v_last, v_last - v_prev)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                values = diff / (times[safe_last] - times[prev])
+            return Vector(out_labels, np.where(ok, values, np.nan))
+
+        if name in ("sum_over_time", "avg_over_time", "count_over_time"):
+            lo, hi = self._window(span)
+            csum = np.concatenate([np.zeros((data.shape[0], 1)), np.cumsum(np.nan_to_num(data), axis=1)], axis=1)
+            total = csum[:, hi] - csum[:, lo]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                values = {"sum_over_time": total, "avg_over_time": total / n, "count_over_time": n.astype(float)}[name]
+            return Vector(out_labels, np.where(n > 0, values, np.nan))
+
+        if name in ("min_over_time", "max_over_time", "last_over_time"):
+            lo, hi = self._window(span)
+            if name == "last_over_time":
+                values = np.take_along_axis(data, safe_last, axis=1)
+            else:
+                reduce = np.nanmin if name == "min_over_time" else np.nanmax
+                values = np.full((data.shape[0], self.nsteps), np.nan)
+                for k in range(self.nsteps):
+                    if hi[k] > lo[k]:
+                        with warnings.catch_warnings():
+                            warnings.simplefilter("ignore", RuntimeWarning)
+                            values[:, k] = reduce(data[:, lo[k]:hi[k]], axis=1)
+            return Vector(out_labels, np.where(n > 0, values, np.nan))
+
+        raise PromQLError(f"función desconocida {name}()")
+
+    def _extrapolate(self, result, first_v, t_first, t_last, n, span, is_counter):
+        """``extrapolatedRate`` de Prometheus, vectorizado."""
+        range_start = self.steps - span
+        range_end = self.steps
+        sampled = t_last - t_first
+        with np.errstate(divide="ignore", invalid="ignore"):
+            avg_between = sampled / (n - 1)
+            to_start = t_first - range_start
+            to_end = range_end - t_last
+            if is_counter:
+                to_zero = np.where((result > 0) & (first_v >= 0), sampled * (first_v / result), np.inf)
+                to_start = np.minimum(to_start, to_zero)
+            threshold = avg_between * 1.1
+            interval = sampled
+            interval = interval + np.where(to_start < threshold, to_start, avg_between / 2)
+            interval = interval + np.where(to_end < threshold, to_end, avg_between / 2)
+            values = result * (interval / sampled)
+        return np.where(n >= 2, values, np.nan)
+
+    # --- Llamadas ---
+
+    _MATH = {
+        "abs": np.abs, "ceil": np.ceil, "floor": np.floor, "sqrt": np.sqrt,
+        "exp": np.exp, "ln": np.log, "log2": np.log2, "log10": np.log10,
+    }
+
+    def eval_call(self, name, args):
+        if name in ("rate", "irate", "increase", "delta") or name.endswith("_over_time"):
+            return self._range_function(name, args[0])
+        if name == "histogram_quantile":
+            return self.histogram_quantile(self.eval(args[0]), self.eval(args[1]))
+        if name == "vector":
+            return Vector([{}], self.eval(args[0]).values[None, :].copy())
+        if name == "scalar":
+            vec = self.eval(args[0])
+            valid = ~np.isnan(vec.values)
+            only = valid.sum(axis=0) == 1
+            values = np.where(only, np.nansum(np.where(valid, vec.values, 0), axis=0), np.nan)
+            return Scalar(values)
+        if name == "time":
+            return Scalar(self.steps.copy())
+        if name in self._MATH:
+            vec = self.eval(args[0])
+            with np.errstate(all="ignore"):
+                return Vector([_drop_name(l) for l in vec.labels], self._MATH[name](vec.values))
+        if name in ("clamp_min", "clamp_max"):
+            vec = self.eval(args[0])
+            bound = self.eval(args[1]).values
+            func = np.maximum if name == "clamp_min" else np.minimum
+            return Vector([_drop_name(l) for l in vec.labels], func(vec.values, bound[None, :]))
+        raise PromQLError(f"función no soportada {name}()")
+
+    def histogram_quantile(self, phi, vec):
+        phi = phi.values
+        groups = {}
+        for row, labels in enumerate(vec.labels):
+            if "le" not in labels:
+                continue
+            rest = {k: v for k, v in labels.items() if k not in ("le", "__name__")}
+            groups.setdefault(_key(rest), (rest, []))[1].append((float(labels["le"]), row))
+
+        out_labels = []
+        out_values = []
+        for rest, buckets in groups.values():
+            buckets.sort()
+            uppers = np.array([b[0] for b in buckets])
+            counts = vec.values[[b[1] for b in buckets]]
+            out_labels.append(rest)
+            if len(buckets) < 2 or not np.isinf(uppers[-1]):
+                out_values.append(np.full(self.nsteps, np.nan))
+                continue
+            missing = np.isnan(counts).any(axis=0)
+            counts = np.maximum.accumulate(np.nan_to_num(counts), axis=0)
+            total = counts[-1]
+            rank = phi * total
+            b = np.argmax(counts >= rank[None, :], axis=0)
+            steps = np.arange(self.nsteps)
+            before = np.where(b > 0, counts[np.maximum(b - 1, 0), steps], 0.0)
+            start = np.where(b > 0, uppers[np.maximum(b - 1, 0)], 0.0)
+            end = uppers[b]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                value = start + (end - start) * (rank - before) / (counts[b, steps] - before)
+            value = np.where(b == len(uppers) - 1, uppers[-2], value)
+            value = np.where((b == 0) & (uppers[0] <= 0), uppers[0], value)
+            value = np.where(phi < 0, -np.inf, np.where(phi > 1, np.inf, value))
+            value = np.where(missing | (total == 0) | np.isnan(phi), np.nan, value)
+            out_values.append(value)
+        values = np.array(out_values) if out_values else np.empty((0, self.nsteps))
+        return Vector(out_labels, values)
+
+    # --- Agregaciones ---
+
+    def eval_aggregate(self, op, args, grouping):
+        param = None
+        if op in ("topk", "bottomk"):
+            param = self.eval(args[0]).values
+            vec = self.eval(args[1])
+        else:
+            vec = self.eval(args[0])
+        if not isinstance(vec, Vector):
+            raise PromQLError(f"{op}() espera un instant vector")
+
+        mode, names = grouping or ("by", [])
+        group_index = {}
+        group_labels = []
+        gidx = np.empty(len(vec.labels), dtype=np.intp)
+        for row, labels in enumerate(vec.labels):
+            if mode == "by":
+                key_labels = {k: labels[k] for k in names if labels.get(k)}
+            else:
+                key_labels = {k: v for k, v in labels.items() if k not in names and k != "__name__"}
+            key = _key(key_labels)
+            if key not in group_index:
+                group_index[key] = len(group_labels)
+                group_labels.append(key_labels)
+            gidx[row] = group_index[key]
+
+        values = vec.values
+        valid = ~np.isnan(values)
+        ngroups = len(group_labels)
+
+        if op in ("topk", "bottomk"):
+            k = np.nan_to_num(param)
+            keep = np.zeros_like(valid)
+            sign = -1.0 if op == "topk" else 1.0
+            for g in range(ngroups):
+                rows = np.flatnonzero(gidx == g)
+                sub = np.where(valid[rows], sign * values[rows], np.inf)
+                order = np.argsort(sub, axis=0, kind="stable")
+                ranks = np.empty_like(order)
+                np.put_along_axis(ranks, order, np.arange(len(rows))[:, None], axis=0)
+                keep[rows] = (ranks < k[None, :]) & valid[rows]
+            return Vector(list(vec.labels), np.where(keep, values, np.nan))
+
+        counts = np.zeros((ngroups, self.nsteps))
+        np.add.at(counts, gidx, valid)
+        if op in ("sum", "avg"):
+            out = np.zeros((ngroups, self.nsteps))
+            np.add.at(out, gidx, np.where(valid, values, 0.0))
+            if op == "avg":
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    out = out / counts
+        elif op == "count":
+            out = counts.copy()
+        else:
+            out = np.full((ngroups, self.nsteps), np.nan)
+            (np.fmin if op == "min" else np.fmax).at(out, gidx, values)
+        out[counts == 0] = np.nan
+        return Vector(group_labels, out)
+
+    # --- Operadores binarios ---
+
+    def eval_binary(self, op, lhs, rhs, return_bool, matching):
+        left = self.eval(lhs)
+        right = self.eval(rhs)
+        if op in _SET_OPS:
+            if not (isinstance(left, Vector) and isinstance(right, Vector)):
+                raise PromQLError(f"'{op}' solo opera entre instant vectors")
+            return self._set_op(op, left, right, matching)
+
+        if isinstance(left, Scalar) and isinstance(right, Scalar):
+            return Scalar(_apply(op, left.values, right.values, True))
+        if isinstance(left, Vector) and isinstance(right, Scalar):
+            return self._vector_scalar(op, left, right.values[None, :], return_bool, swap=False)
+        if isinstance(left, Scalar) and isinstance(right, Vector):
+            return self._vector_scalar(op, right, left.values[None, :], return_bool, swap=True)
+
+        keep_name = op in _COMPARISONS and not return_bool
+        right_rows = {}
+        for row, labels in enumerate(right.labels):
+            sig = _signature(labels, matching)
+            if sig in right_rows:
+                merged = right_rows[sig]
+                if (~np.isnan(merged) & ~np.isnan(right.values[row])).any():
+                    raise PromQLError("matching many-to-many no soportado: hay series duplicadas a la derecha")
+                right_rows[sig] = np.where(np.isnan(merged), right.values[row], merged)
+            else:
+                right_rows[sig] = right.values[row]
+
+        out_labels = []
+        out_values = []
+        for row, labels in enumerate(left.labels):
+            rvals = right_rows.get(_signature(labels, matching))
+            if rvals is None:
+                continue
+            lvals = left.values[row]
+            result = _apply(op, lvals, rvals, return_bool)
+            if op in _COMPARISONS and not return_bool:
+                result = np.where(result == 1.0, lvals, np.nan)
+            out_labels.append(_result_labels(labels, matching, keep_name))
+            out_values.append(np.where(np.isnan(lvals) | np.isnan(rvals), np.nan, result))
+        values = np.array(out_values) if out_values else np.empty((0, self.nsteps))
+        return Vector(out_labels, values)
+
+    def _vector_scalar(self, op, vec, scalar, return_bool, swap):
+        lhs, rhs = (scalar, vec.values) if swap else (vec.values, scalar)
+        result = _apply(op, lhs, rhs, return_bool)
+        if op in _COMPARISONS and not return_bool:
+            result = np.where(result == 1.0, vec.values, np.nan)
+            labels = list(vec.labels)
+        else:
+            labels = [_drop_name(l) for l in vec.labels]
+        return Vector(labels, np.where(np.isnan(vec.values), np.nan, result))
+
+    def _set_op(self, op, left, right, matching):
+        def present(vec):
+            seen = {}
+            for row, labels in enumerate(vec.labels):
+                sig = _signature(labels, matching)
+                mask = ~np.isnan(vec.values[row])
+                seen[sig] = seen[sig] | mask if sig in seen else mask
+            return seen
+
+        if op == "or":
+            left_present = present(left)
+            labels = list(left.labels)
+            rows = [left.values]
+            for row, lbl in enumerate(right.labels):
+                mask = left_present.get(_signature(lbl, matching))
+                vals = right.values[row]
+                if mask is not None:
+                    vals = np.where(mask, np.nan, vals)
+                labels.append(lbl)
+                rows.append(vals[None, :])
+            values = np.concatenate(rows, axis=0)
+            # Filas con los mismos labels (p. ej. ``sum(...) or on() vector(0)``) son una sola serie
+            merged = {}
+            keep = []
+            for row, lbl in enumerate(labels):
+                first = merged.setdefault(_key(lbl), row)
+                if first == row:
+                    keep.append(row)
+                else:
+                    values[first] = np.where(np.isnan(values[first]), values[row], values[first])
+            if len(keep) < len(labels):
+                return Vector([labels[row] for row in keep], values[keep])
+            return Vector(labels, values)
+
+        right_present = present(right)
+        values = left.values.copy()
+        for row, lbl in enumerate(left.labels):
+            mask = right_present.get(_signature(lbl, matching), np.zeros(self.nsteps, dtype=bool))
+            values[row] = np.where(mask if op == "and" else ~mask, values[row], np.nan)
+        return Vector(list(left.labels), values)
+
+
+def _signature(labels, matching):
+    if matching is None:
+        return _key(_drop_name(labels))
+    mode, names = matching
+    if mode == "on":
+        return tuple((k, labels.get(k, "")) for k in sorted(names))
+    return _key({k: v for k, v in labels.items() if k != "__name__" and k not in names})
+
+
+def _result_labels(labels, matching, keep_name):
+    out = dict(labels) if keep_name else _drop_name(labels)
+    if matching is not None:
+        mode, names = matching
+        if mode == "on":
+            out = {k: v for k, v in out.items() if k in names or (keep_name and k == "__name__")}
+        else:
+            out = {k: v for k, v in out.items() if k not in names}
+    return out
+
+
+def _apply(op, a, b, return_bool):
+    with np.errstate(all="ignore"):
+        if op == "+":
+            return a + b
+        if op == "-":
+            return a - b
+        if op == "*":
+            return a * b
+        if op == "/":
+            return np.true_divide(a, b)
+        if op == "%":
+            return np.fmod(a, b)
+        if op == "^":
+            return np.power(a, b)
+        result = {
+            "==": np.equal, "!=": np.not_equal, "<": np.less,
+            ">": np.greater, "<=": np.less_equal, ">=": np.greater_equal,
+        }[op](a, b)
+        return result.astype(float)
+
+
+# ---------------------------------------------------------------------------
+# API pública
+# ---------------------------------------------------------------------------
+
+def query_range(db, expr, start, end, step):
+    """Evalúa ``expr`` en ``start, start+step, ..., end``. Devuelve Vector o Scalar."""
+    steps = np.arange(start, end + step / 2, step)
+    result = Evaluator(db, steps).eval(parse(expr) if isinstance(expr, str) else expr)
+    if isinstance(result, Vector) and len(result):
+        # Como en Prometheus, una serie sin ninguna muestra en el rango no aparece
+        keep = ~np.isnan(result.values).all(axis=1)
+        if not keep.all():
+            result = Vector([l for l, k in zip(result.labels, keep) if k], result.values[keep])
+    return result
+
+
+def query(db, expr, at):
+    return query_range(db, expr, at, at, 1.0)
+
+
+def expand_variables(expr, variables, interval, scrape_interval=15.0, range_seconds=None):
+    """
+    Reemplaza las variables de Grafana (``$job``, ``${instance}``,
+    ``$__rate_interval``, ``$__interval``, ``$__range``) como lo haría el panel.
+    """
+    rate_interval = max(interval + scrape_interval, 4 * scrape_interval)
+    builtins = {
+        "__rate_interval": f"{int(rate_interval)}s",
+        "__interval": f"{int(interval)}s",
+    }
+    if range_seconds is not None:
+        builtins["__range"] = f"{int(range_seconds)}s"
+
+    def replace(m):
+        name = m.group(1) or m.group(2)
+        if name in builtins:
+            return builtins[name]
+        if name in variables:
+            return str(variables[name])
+        return m.group(0)
+
+    return re.sub(r"\$\{(\w+)\}|\$(\w+)", replace, expr)
@@ -0,0 +1,254 @@
+"""
+Exposición en protobuf delimitado (``io.prometheus.client.MetricFamily``),
+el formato binario que aceptan el Pushgateway y Prometheus además del texto.
+
+    MetricFamily { name = 1; help = 2; MetricType type = 3; repeated Metric metric = 4; }
+    Metric       { repeated LabelPair label = 1; Gauge gauge = 2; Counter counter = 3;
+                   Summary summary = 4; Untyped untyped = 5; int64 timestamp_ms = 6;
+                   Histogram histogram = 7; }
+    Histogram    { uint64 sample_count = 1; double sample_sum = 2; repeated Bucket bucket = 3;
+                   Timestamp created_timestamp = 15; }
+
+Cada familia va con su largo como prefijo varint, una detrás de otra. Se
+arma directamente desde ``registry.collect()``, sin pasar por el texto:
+
+* counters con el nombre ``_total`` (como en la exposición de texto) y el
+  ``_created`` como ``created_timestamp`` en lugar de una serie aparte;
+* histogramas sin el bucket ``+Inf`` (lo deduce el receptor de
+  ``sample_count``, igual que client_golang);
+* gauges, info, stateset y enum como ``GAUGE``; ``unknown`` como ``UNTYPED``.
+
+``decode`` lee el formato de vuelta (para el benchmark y para pruebas).
+"""
+
+import math
+
+from obslab.protowire import (
+    as_double, as_int64, delimited, field_bytes, field_double, field_string, field_varint, iter_delimited,
+    iter_fields,
+)
+
+CONTENT_TYPE = "application/vnd.google.protobuf; proto=io.prometheus.client.MetricFamily; encoding=delimited"
+
+COUNTER, GAUGE, SUMMARY, UNTYPED, HISTOGRAM, GAUGE_HISTOGRAM = range(6)
+TYPE_NAMES = {COUNTER: "counter", GAUGE: "gauge", SUMMARY: "summary", UNTYPED: "untyped",
+              HISTOGRAM: "histogram", GAUGE_HISTOGRAM: "gaugehistogram"}
+
+
+def _timestamp(seconds):
+    """``google.protobuf.Timestamp``."""
+    whole = math.floor(seconds)
+    return field_varint(1, whole) + field_varint(2, int(round((seconds - whole) * 1e9)))
+
+
+class ProtobufEncoder:
+    """
+    Codifica registries en protobuf delimitado. Los labels ya codificados (y
+    los límites de los buckets) se reutilizan entre snapshots, a lo sumo
+    ``max_cached`` entradas.
+    """
+
+    def __init__(self, max_cached=100000):
+        self.max_cached = max_cached
+        self._label_blocks = {}
+        self._bounds = {}
+
+    def _labels(self, labels, skip=None):
+        items = tuple(labels.items())
+        encoded = self._label_blocks.get((items, skip))
+        if encoded is None:
+            if len(self._label_blocks) >= self.max_cached:
+                self._label_blocks.clear()
+            encoded = self._label_blocks[(items, skip)] = b"".join(
+                field_bytes(1, field_string(1, name) + field_string(2, value)) for name, value in items if name != skip)
+        return encoded
+
+    def _bucket(self, count, le):
+        bound = self._bounds.get(le)
+        if bound is None:
+            if len(self._bounds) >= self.max_cached:
+                self._bounds.clear()
+            bound = self._bounds[le] = field_double(2, float(le))
+        return field_bytes(3, field_varint(1, int(count)) + bound)
+
+    @staticmethod
+    def _family(name, documentation, kind, metrics):
+        return delimited(field_string(1, name) + field_string(2, documentation) + field_varint(3, kind)
+                         + b"".join(field_bytes(4, metric) for metric in metrics))
+
+    @staticmethod
+    def _timestamp_ms(sample):
+        return field_varint(6, int(float(sample.timestamp) * 1000)) if sample.timestamp is not None else b""
+
+    def encode(self, registry):
+        """Todas las familias de ``registry`` (o de cualquier objeto con ``collect()``)."""
+        return b"".join(self.encode_family(metric) for metric in registry.collect())
+
+    def encode_family(self, metric):
+        kind = metric.type
+        if kind == "counter":
+            return self._counter(metric)
+        if kind in ("histogram", "gaugehistogram"):
+            return self._histogram(metric, kind == "gaugehistogram")
+        if kind == "summary":
+            return self._summary(metric)
+        return self._simple(metric, UNTYPED if kind == "unknown" else GAUGE)
+
+    def _simple(self, metric, kind):
+        # info/stateset/enum tienen muestras con sufijo: una familia por nombre de muestra
+        field = 5 if kind == UNTYPED else 2
+        by_name = {}
+        for sample in metric.samples:
+            by_name.setdefault(sample.name, []).append(
+                self._labels(sample.labels) + field_bytes(field, field_double(1, sample.value))
+                + self._timestamp_ms(sample))
+        return b"".join(self._family(name, metric.documentation, kind, metrics)
+                        for name, metrics in by_name.items())
+
+    def _counter(self, metric):
+        values = {}
+        created = {}
+        for sample in metric.samples:
+            key = tuple(sample.labels.items())
+            if sample.name.endswith("_created"):
+                created[key] = sample.value
+            else:
+                values[key] = sample
+        metrics = []
+        for key, sample in values.items():
+            counter = field_double(1, sample.value)
+            if key in created:
+                counter += field_bytes(3, _timestamp(created[key]))
+            metrics.append(self._labels(sample.labels) + field_bytes(3, counter) + self._timestamp_ms(sample))
+        return self._family(metric.name + "_total", metric.documentation, COUNTER, metrics)
+
+    def _histogram(self, metric, gauge):
+        series = {}  # labels sin le -> [labels, buckets, count, sum, created, timestamp]
+        name = metric.name
+        for sample in metric.samples:
+            suffix = sample.name[len(name):]
+            labels = sample.labels
+            key = tuple(item for item in labels.items() if item[0] != "le")
+            entry = series.get(key)
+            if entry is None:
+                entry = series[key] = [labels, [], 0.0, 0.0, None, sample]
+            if suffix == "_bucket":
+                le = labels["le"]
+                if le != "+Inf":
+                    entry[1].append(self._bucket(sample.value, le))
+            elif suffix in ("_count", "_gcount"):
+                entry[2] = sample.value
+            elif suffix in ("_sum", "_gsum"):
+                entry[3] = sample.value
+            elif suffix == "_created":
+                entry[4] = sample.value
+        metrics = []
+        for labels, buckets, count, total, created, sample in series.values():
+            histogram = field_varint(1, int(count)) + field_double(2, total) + b"".join(buckets)
+            if created is not None:
+                histogram += field_bytes(15, _timestamp(created))
+            metrics.append(self._labels(labels, skip="le") + field_bytes(7, histogram) + self._timestamp_ms(sample))
+        return self._family(name, metric.documentation, GAUGE_HISTOGRAM if gauge else HISTOGRAM, metrics)
+
+    def _summary(self, metric):
+        series = {}  # labels sin quantile -> [labels, quantiles, count, sum, created, timestamp]
+        name = metric.name
+        for sample in metric.samples:
+            suffix = sample.name[len(name):]
+            labels = sample.labels
+            key = tuple(item for item in labels.items() if item[0] != "quantile")
+            entry = series.get(key)
+            if entry is None:
+                entry = series[key] = [labels, [], 0.0, 0.0, None, sample]
+            if suffix == "":
+                entry[1].append(field_bytes(3, field_double(1, float(labels["quantile"]))
+                                            + field_double(2, sample.value)))
+            elif suffix == "_count":
+                entry[2] = sample.value
+            elif suffix == "_sum":
+                entry[3] = sample.value
+            elif suffix == "_created":
+                entry[4] = sample.value
+        metrics = []
+        for labels, quantiles, count, total, created, sample in series.values():
+            summary = field_varint(1, int(count)) + field_double(2, total) + b"".join(quantiles)
+            if created is not None:
+                summary += field_bytes(4, _timestamp(created))
+            metrics.append(self._labels(labels, skip="quantile") + field_bytes(4, summary)
+                           + self._timestamp_ms(sample))
+        return self._family(name, metric.documentation, SUMMARY, metrics)
+
+
+_default_encoder = ProtobufEncoder()
+
+
+def encode_registry(registry):
+    """Atajo con un encoder compartido (como ``generate_latest``)."""
+    return _default_encoder.encode(registry)
+
+
+# --- Decodificación ---
+
+def _decode_labels(data):
+    name = value = ""
+    for f, _, v in iter_fields(data):
+        if f == 1:
+            name = bytes(v).decode()
+        elif f == 2:
+            value = bytes(v).decode()
+    return name, value
+
+
+def _decode_histogram(data, field_count, field_sum, field_items, item):
+    result = {"count": 0, "sum": 0.0, item: []}
+    for f, _, v in iter_fields(data):
+        if f == field_count:
+            result["count"] = v
+        elif f == field_sum:
+            result["sum"] = as_double(v)
+        elif f == field_items:
+            pair = {}
+            for bf, _, bv in iter_fields(v):
+                pair[bf] = bv
+            if item == "buckets":
+                result[item].append((as_double(pair[2]), pair.get(1, 0)))
+            else:
+                result[item].append((as_double(pair[1]), as_double(pair[2])))
+    return result
+
+
+def _decode_metric(data):
+    metric = {"labels": {}}
+    for f, _, v in iter_fields(data):
+        if f == 1:
+            name, value = _decode_labels(v)
+            metric["labels"][name] = value
+        elif f in (2, 3, 5):
+            metric["value"] = next((as_double(x) for xf, _, x in iter_fields(v) if xf == 1), 0.0)
+        elif f == 4:
+            metric.update(_decode_histogram(v, 1, 2, 3, "quantiles"))
+        elif f == 7:
+            metric.update(_decode_histogram(v, 1, 2, 3, "buckets"))
+        elif f == 6:
+            metric["timestamp_ms"] = as_int64(v)
+    return metric
+
+
+def decode(data):
+    """Lista de ``{"name", "help", "type", "metrics"}`` de un cuerpo delimitado."""
+    families = []
+    for message in iter_delimited(data):
+        family = {"name": "", "help": "", "type": TYPE_NAMES[GAUGE], "metrics": []}
+        kind = COUNTER
+        for f, _, v in iter_fields(message):
+            if f == 1:
+                family["name"] = bytes(v).decode()
+            elif f == 2:
+                family["help"] = bytes(v).decode()
+            elif f == 3:
+                kind = v
+            elif f == 4:
+                family["metrics"].append(_decode_metric(v))
+        family["type"] = TYPE_NAMES.get(kind, "untyped")
+        families.append(family)
+    return families
@@ -0,0 +1,135 @@
+"""
+Codificación mínima del formato de cable de Protocol Buffers.
+
+Alcanza para los mensajes que usamos (remote_write, OTLP, exposición
+delimitada de Prometheus) sin depender de clases generadas por ``protoc``:
+los mensajes se arman concatenando campos ya codificados.
+"""
+
+import struct
+
+VARINT = 0
+FIXED64 = 1
+LEN = 2
+FIXED32 = 5
+
+_double = struct.Struct("<d")
+_fixed64 = struct.Struct("<Q")
+_fixed32 = struct.Struct("<I")
+
+
+def varint(value):
+    if value < 0:
+        value += 1 << 64  # int64 negativo: complemento a dos en 10 bytes
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def key(field, wire_type):
+    return varint((field << 3) | wire_type)
+
+
+def field_varint(field, value):
+    return key(field, VARINT) + varint(value)
+
+
+def field_bytes(field, data):
+    return key(field, LEN) + varint(len(data)) + data
+
+
+def field_string(field, text):
+    return field_bytes(field, text.encode("utf-8"))
+
+
+def field_double(field, value):
+    return key(field, FIXED64) + _double.pack(value)
+
+
+def field_fixed64(field, value):
+    return key(field, FIXED64) + _fixed64.pack(value)
+
+
+def packed_fixed64(field, values):
+    return field_bytes(field, struct.pack(f"<{len(values)}Q", *values))
+
+
+def packed_double(field, values):
+    return field_bytes(field, struct.pack(f"<{len(values)}d", *values))
+
+
+def delimited(message):
+    """Prefijo de largo varint, como en ``writeDelimitedTo`` de Java/Go."""
+    return varint(len(message)) + message
+
+
+# --- Decodificación (para receptores de prueba y proxies) ---
+
+def read_varint(data, pos):
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def iter_fields(data):
+    """Entrega ``(campo, tipo, valor)``; los LEN se devuelven como ``memoryview``."""
+    data = memoryview(data)
+    pos = 0
+    end = len(data)
+    while pos < end:
+        tag, pos = read_varint(data, pos)
+        field, wire_type = tag >> 3, tag & 7
+        if wire_type == VARINT:
+            value, pos = read_varint(data, pos)
+        elif wire_type == FIXED64:
+            value = data[pos:pos + 8]
+            pos += 8
+        elif wire_type == LEN:
+            length, pos = read_varint(data, pos)
+            value = data[pos:pos + length]
+            pos += length
+        elif wire_type == FIXED32:
+            value = data[pos:pos + 4]
+            pos += 4
+        else:
+            raise ValueError(f"wire type no soportado: {wire_type}")
+        yield field, wire_type, value
+
+
+def as_double(value):
+    return _double.unpack(value)[0]
+
+
+def as_fixed64(value):
+    return _fixed64.unpack(value)[0]
+
+
+def as_int64(value):
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def unpack_fixed64(value):
+    return list(struct.unpack(f"<{len(value) // 8}Q", value))
+
+
+def unpack_double(value):
+    return list(struct.unpack(f"<{len(value) // 8}d", value))
+
+
+def iter_delimited(data):
+    """Recorre mensajes con prefijo de largo varint."""
+    data = memoryview(data)
+    pos = 0
+    while pos < len(data):
+        length, pos = read_varint(data, pos)
+        yield data[pos:pos + length]
+        pos += length
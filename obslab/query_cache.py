@@ -0,0 +1,335 @@
+"""
+Caché de ``/api/v1/query_range`` alineada al step, para poner delante de
+Prometheus (o de cualquier API compatible).
+
+Los dashboards de LAB4 refrescan cada 5 s y cada panel vuelve a pedir su
+rango completo (``now-1h`` .. ``now``): sin caché Prometheus recalcula la
+misma hora de datos en cada refresh de cada espectador. Acá:
+
+* ``start`` y ``end`` se redondean hacia abajo a múltiplos del step, así dos
+  espectadores que refrescan en distintos momentos del mismo step piden
+  exactamente los mismos puntos;
+* el rango se parte en slices de ``slice_seconds`` (múltiplo del step,
+  alineados al tiempo absoluto). Un slice cuyo último punto es más viejo que
+  ``max_freshness`` ya no cambia: se pide una vez (completo) y queda en caché
+  (LRU de a lo sumo ``max_slices``);
+* al backend solo se le pide lo que falta, en general el slice más nuevo
+  (slices faltantes contiguos van en un solo request);
+* requests idénticos en vuelo se hacen una sola vez: los demás esperan el
+  resultado del primero. Con ``head_ttl`` > 0 el slice más nuevo además se
+  reutiliza durante esos segundos.
+
+``stats`` cuenta slices servidos desde la caché y puntos (steps) pedidos por
+los clientes frente a los que evaluó el backend, de donde salen el hit ratio y
+la reducción de carga.
+"""
+
+import collections
+import datetime
+import json
+import threading
+import time
+import urllib.parse
+from concurrent.futures import Future
+
+from obslab.promql import parse_duration
+from obslab.transport import HTTPTarget
+
+QUERY_RANGE_PATH = "/api/v1/query_range"
+
+
+class BackendError(Exception):
+    """Respuesta de error del backend; el proxy la devuelve tal cual al cliente."""
+
+    def __init__(self, status, body):
+        super().__init__(f"HTTP {status}: {body[:200]!r}")
+        self.status = status
+        self.body = body
+
+
+def parse_time(value):
+    """Timestamp Unix o RFC 3339, como los acepta la API de Prometheus."""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+def parse_step(value):
+    """Segundos (``15``, ``0.5``) o duración de PromQL (``15s``, ``1m``)."""
+    try:
+        return float(value)
+    except ValueError:
+        return float(parse_duration(value))
+
+
+def align(start, end, step):
+    """Redondea ``start`` y ``end`` hacia abajo a múltiplos de ``step``."""
+    return start // step * step, end // step * step
+
+
+def _points(start, end, step):
+    return int(round((end - start) / step)) + 1 if end >= start else 0
+
+
+class PrometheusBackend:
+    """``backend(query, start, end, step)`` -> ``data`` de la respuesta JSON (una conexión por hilo)."""
+
+    def __init__(self, url, timeout=30.0):
+        self.url = url
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def target(self):
+        target = getattr(self._local, "target", None)
+        if target is None:
+            target = self._local.target = HTTPTarget(self.url, timeout=self.timeout)
+        return target
+
+    def __call__(self, query, start, end, step):
+        body = urllib.parse.urlencode({"query": query, "start": f"{start:.3f}", "end": f"{end:.3f}",
+                                       "step": f"{step:g}"}).encode()
+        status, data = self.target().request("POST", QUERY_RANGE_PATH, body,
+                                             {"Content-Type": "application/x-www-form-urlencoded"})
+        if status != 200:
+            raise BackendError(status, data)
+        return json.loads(data)["data"]
+
+    def __str__(self):
+        return self.url
+
+
+def _split_matrix(result, bounds):
+    """
+    Reparte un resultado ``matrix`` entre ``bounds`` (``[(desde, hasta)]``):
+    una lista de series por slice, sin las series que no tienen puntos en él.
+    """
+    parts = [[] for _ in bounds]
+    eps = 1e-6
+    for series in result:
+        values = series["values"]
+        i = 0
+        for k, (lo, hi) in enumerate(bounds):
+            j = i
+            while j < len(values) and values[j][0] <= hi + eps:
+                j += 1
+            chosen = [v for v in values[i:j] if v[0] >= lo - eps]
+            if chosen:
+                parts[k].append({"metric": series["metric"], "values": chosen})
+            i = j
+    return parts
+
+
+def _merge(parts, start, end):
+    """Une las series de varios slices (por labels) recortando a ``[start, end]``."""
+    merged = {}
+    for part in parts:
+        for series in part:
+            values = [v for v in series["values"] if start - 1e-6 <= v[0] <= end + 1e-6]
+            if not values:
+                continue
+            key = json.dumps(series["metric"], sort_keys=True)
+            if key in merged:
+                merged[key]["values"].extend(values)
+            else:
+                merged[key] = {"metric": series["metric"], "values": values}
+    return list(merged.values())
+
+
+class QueryCache:
+    def __init__(self, backend, slice_seconds=600.0, max_freshness=60.0, max_slices=20000,
+                 head_ttl=0.0, clock=time.time):
+        self.backend = backend
+        self.slice_seconds = slice_seconds
+        self.max_freshness = max_freshness
+        self.max_slices = max_slices
+        self.head_ttl = head_ttl
+        self.clock = clock
+        self.stats = collections.Counter()
+        self._slices = collections.OrderedDict()  # (query, step, inicio) -> series
+        self._heads = {}                          # (query, step, inicio, fin) -> (vence, series)
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def width(self, step):
+        """Ancho de slice: múltiplo de ``step`` más cercano por encima de ``slice_seconds``."""
+        return max(1, -int(-self.slice_seconds // step)) * step
+
+    def _fetch(self, key, query, start, end, step):
+        """Un request al backend por ``key`` a la vez; los demás esperan el mismo resultado."""
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self.stats["deduplicated"] += 1
+        if not leader:
+            return future.result()
+        try:
+            data = self.backend(query, start, end, step)
+            if data.get("resultType") != "matrix":
+                raise BackendError(422, f"resultType inesperado: {data.get('resultType')}".encode())
+            future.set_result(data["result"])
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                del self._inflight[key]
+                if future.exception() is None:
+                    self.stats["backend_requests"] += 1
+                    self.stats["points_fetched"] += _points(start, end, step)
+        return future.result()
+
+    def query_range(self, query, start, end, step):
+        """Lista de series (formato ``matrix`` de Prometheus) para el rango alineado."""
+        if step <= 0:
+            raise ValueError("step debe ser positivo")
+        start, end = align(start, end, step)
+        width = self.width(step)
+        immutable_until = self.clock() - self.max_freshness
+
+        # (inicio, último punto, cacheable, series o None) por slice
+        slices = []
+        first = start // width * width
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["points_requested"] += _points(start, end, step)
+            for lo in _frange(first, end, width):
+                hi = lo + width - step
+                cacheable = hi <= immutable_until
+                series = None
+                if cacheable:
+                    series = self._slices.get((query, step, lo))
+                    if series is not None:
+                        self._slices.move_to_end((query, step, lo))
+                else:
+                    expires, cached = self._heads.get((query, step, lo, end), (0.0, None))
+                    if expires > self.clock():
+                        series = cached
+                slices.append([lo, hi, cacheable, series])
+            self.stats["slices"] += len(slices)
+            self.stats["slice_hits"] += sum(1 for entry in slices if entry[3] is not None)
+
+        # Slices faltantes contiguos en un solo request
+        runs = []
+        for entry in slices:
+            if entry[3] is not None:
+                continue
+            if runs and runs[-1][-1][0] + width == entry[0]:
+                runs[-1].append(entry)
+            else:
+                runs.append([entry])
+        for run in runs:
+            lo = run[0][0] if run[0][2] else max(run[0][0], start)
+            hi = run[-1][1] if run[-1][2] else min(run[-1][1], end)
+            result = self._fetch((query, step, lo, hi), query, lo, hi, step)
+            bounds = [(entry[0], entry[1]) for entry in run]
+            for entry, part in zip(run, _split_matrix(result, bounds)):
+                entry[3] = part
+            with self._lock:
+                for entry in run:
+                    if entry[2]:
+                        self._slices[(query, step, entry[0])] = entry[3]
+                    elif self.head_ttl > 0:
+                        self._heads[(query, step, entry[0], end)] = (self.clock() + self.head_ttl, entry[3])
+                while len(self._slices) > self.max_slices:
+                    self._slices.popitem(last=False)
+                    self.stats["evicted"] += 1
+                if self._heads:
+                    now = self.clock()
+                    self._heads = {k: v for k, v in self._heads.items() if v[0] > now}
+        return _merge([entry[3] for entry in slices], start, end)
+
+    def hit_ratio(self):
+        return self.stats["slice_hits"] / self.stats["slices"] if self.stats["slices"] else 0.0
+
+    def load_reduction(self):
+        """Fracción de los puntos pedidos por los clientes que el backend no tuvo que evaluar."""
+        requested = self.stats["points_requested"]
+        return 1 - self.stats["points_fetched"] / requested if requested else 0.0
+
+    def summary(self):
+        s = self.stats
+        return (f"{s['requests']} queries, {s['slices']} slices ({self.hit_ratio():.1%} desde la caché), "
+                f"{s['backend_requests']} requests al backend ({s['deduplicated']} deduplicados en vuelo), "
+                f"{s['points_fetched']}/{s['points_requested']} puntos evaluados "
+                f"(carga -{self.load_reduction():.1%}), {len(self._slices)} slices en caché")
+
+
+def _frange(start, stop, step):
+    k = 0
+    while start + k * step <= stop:
+        yield start + k * step
+        k += 1
+
+
+def proxy_server(cache, upstream, host, port, verbose=False):
+    """
+    ``ThreadingHTTPServer`` del proxy (sin arrancar): ``query_range`` pasa por la caché, ``/proxy/stats`` devuelve
+    las estadísticas en JSON y el resto de las rutas (``/api/v1/query``,
+    labels, series...) se reenvían a ``upstream`` sin tocar.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    local = threading.local()
+
+    def passthrough_target():
+        if getattr(local, "target", None) is None:
+            local.target = HTTPTarget(upstream, timeout=30.0)
+        return local.target
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self, status, body, content_type="application/json"):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _handle(self, method):
+            path, _, query_string = self.path.partition("?")
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0) or 0))
+            if path == "/proxy/stats":
+                stats = dict(cache.stats, hit_ratio=cache.hit_ratio(), load_reduction=cache.load_reduction())
+                return self._reply(200, json.dumps(stats).encode())
+            if path != QUERY_RANGE_PATH:
+                headers = {"Content-Type": self.headers["Content-Type"]} if self.headers.get("Content-Type") else {}
+                try:
+                    status, data = passthrough_target().request(method, self.path, body or None, headers)
+                except OSError as e:
+                    return self._reply(502, json.dumps({"status": "error", "error": str(e)}).encode())
+                return self._reply(status, data)
+
+            params = dict(urllib.parse.parse_qsl(query_string))
+            if method == "POST":
+                params.update(urllib.parse.parse_qsl(body.decode()))
+            t0 = time.perf_counter()
+            try:
+                result = cache.query_range(params["query"], parse_time(params["start"]),
+                                           parse_time(params["end"]), parse_step(params["step"]))
+            except BackendError as e:
+                return self._reply(e.status, e.body)
+            except (KeyError, ValueError) as e:
+                error = {"status": "error", "errorType": "bad_data", "error": f"parámetro inválido: {e}"}
+                return self._reply(400, json.dumps(error).encode())
+            except OSError as e:
+                return self._reply(502, json.dumps({"status": "error", "error": str(e)}).encode())
+            payload = {"status": "success", "data": {"resultType": "matrix", "result": result}}
+            self._reply(200, json.dumps(payload, separators=(",", ":")).encode())
+            if verbose:
+                print(f"{time.strftime('%H:%M:%S')} {params['query'][:60]!r} step={params['step']} "
+                      f"{len(result)} series en {(time.perf_counter() - t0) * 1000:.1f} ms", flush=True)
+
+        def do_GET(self):
+            self._handle("GET")
+
+        def do_POST(self):
+            self._handle("POST")
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
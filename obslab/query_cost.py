@@ -0,0 +1,294 @@
+"""
+Costo estimado de las queries de un dashboard y ajuste de resolución y
+refresh para que entre en un presupuesto.
+
+El costo de un target es lo que Prometheus lee para evaluarlo en un
+refresh: por cada step, cada serie de cada selector aporta las muestras de
+su ventana (``[5m]`` a 15 s de scrape = 20 muestras; un selector instantáneo,
+1). La cantidad de series sale de los registries de los business cases
+(``ScenarioSeries``: los labels que generan tras unos ciclos, repetidos por
+cada instancia) y los steps de ``rango / step`` con el step que elegiría
+Grafana (``rango / maxDataPoints``, no menos que el ``interval`` del panel o,
+si está vacío, que el intervalo de scrape del datasource: 15 s por omisión).
+Por minuto se multiplica por los refreshes por minuto. Los panels dentro de
+rows colapsadas no consultan hasta que se expanden y se informan aparte.
+
+``tune_dashboard`` reescribe ``interval``, ``maxDataPoints`` y ``refresh``:
+
+1. sin pérdida: ``interval`` explícito y refresh no por debajo del
+   intervalo de scrape (más resolución que los datos no agrega nada);
+2. con cada refresh posible, del más rápido a ``max_refresh`` (opciones
+   estándar de Grafana), divide a la mitad ``maxDataPoints`` del panel más
+   caro mientras se pase del presupuesto, sin recortar más de
+   ``max_reduction`` veces los puntos que muestra con el interval de scrape
+   ni bajar de ``min_points``; se queda con el primer refresh con el que
+   entra;
+3. devuelve resolución a los panels recortados mientras siga entrando.
+"""
+
+import copy
+import math
+import random
+
+from obslab.dashboards import iter_panels, refresh_seconds, time_range_seconds
+from obslab.promql import PromQLError, expand_variables, parse, parse_duration
+from obslab.tsdb import labels_match, parse_matchers
+
+# Opciones de auto-refresh por defecto del time picker de Grafana
+REFRESH_OPTIONS = ["5s", "10s", "30s", "1m", "5m", "15m", "30m", "1h", "2h", "1d"]
+# Steps "redondos" a los que Grafana lleva el intervalo calculado (aprox.)
+_NICE_STEPS = [1, 2, 5, 10, 15, 20, 30, 60, 120, 300, 600, 900, 1200, 1800, 3600, 7200, 21600, 43200, 86400]
+# Grafana usa el ancho del panel en píxeles como maxDataPoints: 24 columnas en ~1920 px
+_PIXELS_PER_COLUMN = 80
+
+
+def format_duration(seconds):
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= size and seconds % size == 0:
+            return f"{int(seconds // size)}{unit}"
+    return f"{seconds:g}s"
+
+
+def grafana_step(range_seconds, max_data_points, min_interval):
+    """Step de una query de rango como lo calcula Grafana (redondeado hacia arriba)."""
+    raw = max(range_seconds / max(max_data_points, 1), min_interval, 1.0)
+    return next((step for step in _NICE_STEPS if step >= raw), math.ceil(raw))
+
+
+class ScenarioSeries:
+    """
+    Label sets de ``instances`` instancias de un business case, para contar
+    cuántas series trae cada selector.
+    """
+
+    def __init__(self, case, instances=1, warmup=30, seed=0):
+        from obslab.scenarios import CASES, Scenario
+
+        state = random.getstate()
+        random.seed(seed)
+        try:
+            scenario = Scenario(case)
+            for _ in range(warmup):
+                scenario.step()
+            template = [(name, labels) for name, labels, _ in scenario.samples()]
+        finally:
+            random.setstate(state)
+        self.job = CASES[case][0]
+        self.instances = instances
+        self._by_name = {}
+        for n in range(1, instances + 1):
+            instance = f"{CASES[case][1]}-{n}"
+            for name, labels in template:
+                self._by_name.setdefault(name, []).append(dict(labels, instance=instance, __name__=name))
+        self._counts = {}
+
+    def count(self, name, matchers):
+        """Series que matchea ``name{matchers}`` (matchers como los da el parser)."""
+        key = (name, tuple(matchers))
+        if key not in self._counts:
+            parsed = parse_matchers(matchers)
+            candidates = self._by_name.get(name, []) if name else [
+                labels for group in self._by_name.values() for labels in group]
+            self._counts[key] = sum(1 for labels in candidates if labels_match(labels, parsed))
+        return self._counts[key]
+
+
+def _selectors(node, window=None):
+    """``(nombre, matchers, ventana en segundos o None)`` de cada selector del AST."""
+    kind = node[0]
+    if kind == "selector":
+        yield node[1], node[2], window
+    elif kind == "range":
+        yield from _selectors(node[1], node[2])
+    elif kind == "paren":
+        yield from _selectors(node[1], window)
+    elif kind in ("call", "aggregate"):
+        for arg in node[2]:
+            yield from _selectors(arg, window)
+    elif kind == "binary":
+        yield from _selectors(node[2], window)
+        yield from _selectors(node[3], window)
+
+
+class TargetCost:
+    __slots__ = ("panel", "target", "collapsed", "max_data_points", "step", "steps", "series", "samples", "missing",
+                 "error")
+
+    def __init__(self, panel, target, collapsed):
+        self.panel = panel
+        self.target = target
+        self.collapsed = collapsed
+        self.max_data_points = self.step = self.steps = self.series = self.samples = 0
+        self.missing = []
+        self.error = None
+
+    @property
+    def title(self):
+        return f"#{self.panel.get('id')} {self.panel.get('title', '')} [{self.target.get('refId', 'A')}]"
+
+
+def _collapsed_panels(dashboard):
+    """Ids de los panels que están dentro de rows colapsadas."""
+    hidden = set()
+    for panel in iter_panels(dashboard):
+        if panel.get("type") == "row" and panel.get("collapsed"):
+            hidden.update(id(child) for child in iter_panels({"panels": panel.get("panels", [])}))
+    return hidden
+
+
+def default_max_data_points(panel):
+    return int(panel.get("maxDataPoints") or panel.get("gridPos", {}).get("w", 12) * _PIXELS_PER_COLUMN)
+
+
+def _min_interval(panel, target, default=0.0):
+    value = (target.get("interval") or panel.get("interval") or "").lstrip(">")
+    try:
+        return parse_duration(value) if value else default
+    except PromQLError:
+        return default
+
+
+def estimate(dashboard, series, scrape_interval=15.0, variables=None, datasource_interval=15.0):
+    """Un ``TargetCost`` por target del dashboard."""
+    span = time_range_seconds(dashboard)
+    variables = dict({"job": series.job, "instance": ".*", "region": ".*"}, **(variables or {}))
+    hidden = _collapsed_panels(dashboard)
+    costs = []
+    for panel in iter_panels(dashboard):
+        for target in panel.get("targets", []):
+            if not target.get("expr"):
+                continue
+            cost = TargetCost(panel, target, id(panel) in hidden)
+            costs.append(cost)
+            range_seconds = parse_duration(panel["timeFrom"]) if panel.get("timeFrom") else span
+            cost.max_data_points = default_max_data_points(panel)
+            cost.step = grafana_step(range_seconds, cost.max_data_points,
+                                     _min_interval(panel, target, datasource_interval))
+            instant = target.get("instant") and not target.get("range")
+            cost.steps = 1 if instant else int(range_seconds // cost.step) + 1
+            expr = expand_variables(target["expr"], variables, cost.step, scrape_interval, range_seconds)
+            try:
+                node = parse(expr)
+            except PromQLError as e:
+                cost.error = str(e)
+                continue
+            per_step = 0
+            for name, matchers, window in _selectors(node):
+                count = series.count(name, matchers)
+                if count == 0:
+                    cost.missing.append(name)
+                cost.series += count
+                per_step += count * (max(1, int(window // scrape_interval)) if window else 1)
+            cost.samples = per_step * cost.steps
+    return costs
+
+
+def per_minute(costs, refresh):
+    """Muestras leídas por minuto por un espectador (sin las rows colapsadas)."""
+    per_refresh = sum(cost.samples for cost in costs if not cost.collapsed)
+    return per_refresh * 60.0 / refresh if refresh else float(per_refresh)
+
+
+def tune_dashboard(dashboard, series, budget, scrape_interval=15.0, min_points=10, max_refresh=300.0,
+                   datasource_interval=15.0, max_reduction=4):
+    """
+    Devuelve ``(dashboard ajustado, reporte)``; el reporte tiene el costo
+    por minuto antes/después, los cambios hechos y si entra en ``budget``.
+    """
+    tuned = copy.deepcopy(dashboard)
+    changes = []
+    before = estimate(dashboard, series, scrape_interval, datasource_interval=datasource_interval)
+    refresh = refresh_seconds(dashboard)
+
+    def cost_per_minute(candidate):
+        return per_minute(estimate(tuned, series, scrape_interval, datasource_interval=datasource_interval),
+                          candidate)
+
+    # 1. Sin pérdida: no pedir más resolución que la de los datos
+    min_interval = format_duration(scrape_interval)
+    fixed = 0
+    for panel in iter_panels(tuned):
+        if panel.get("targets") and _min_interval(panel, {}) < scrape_interval:
+            panel["interval"] = min_interval
+            fixed += 1
+    if fixed:
+        changes.append(f"interval {min_interval} en {fixed} panels")
+    if refresh and refresh < scrape_interval:
+        refresh = scrape_interval
+
+    # 2. Para cada refresh posible, de más rápido a más lento: menos puntos en
+    #    los panels más caros (a lo sumo max_reduction veces menos de los que
+    #    muestran con el interval de scrape)
+    panels = [panel for panel in iter_panels(tuned) if panel.get("targets")]
+    original = {id(panel): panel.get("maxDataPoints") for panel in panels}
+    costs = estimate(tuned, series, scrape_interval, datasource_interval=datasource_interval)
+    full = {}
+    for cost in costs:
+        full[id(cost.panel)] = max(full.get(id(cost.panel), 0), cost.steps)
+    floors = {key: max(points // max_reduction, min_points) for key, points in full.items()}
+
+    def restore():
+        for panel in panels:
+            if original[id(panel)] is None:
+                panel.pop("maxDataPoints", None)
+            else:
+                panel["maxDataPoints"] = original[id(panel)]
+
+    if refresh:
+        options = [refresh] + [parse_duration(option) for option in REFRESH_OPTIONS
+                               if refresh < parse_duration(option) <= max_refresh]
+        for candidate in options:
+            restore()
+            costs = estimate(tuned, series, scrape_interval, datasource_interval=datasource_interval)
+            while per_minute(costs, candidate) > budget:
+                reducible = [cost for cost in costs if not cost.collapsed and cost.steps // 2 >= floors[id(cost.panel)]]
+                if not reducible:
+                    break
+                worst = max(reducible, key=lambda cost: cost.samples)
+                worst.panel["maxDataPoints"] = worst.steps // 2
+                costs = estimate(tuned, series, scrape_interval, datasource_interval=datasource_interval)
+            refresh = candidate
+            if per_minute(costs, candidate) <= budget:
+                break
+
+        # 3. Devolver resolución a los panels recortados mientras siga entrando
+        for panel in sorted((p for p in panels if p.get("maxDataPoints") != original[id(p)]),
+                            key=lambda p: p["maxDataPoints"] / full[id(p)]):
+            while panel.get("maxDataPoints") != original[id(panel)]:
+                reduced = panel["maxDataPoints"]
+                if reduced * 2 >= full[id(panel)]:
+                    if original[id(panel)] is None:
+                        panel.pop("maxDataPoints")
+                    else:
+                        panel["maxDataPoints"] = original[id(panel)]
+                else:
+                    panel["maxDataPoints"] = reduced * 2
+                if cost_per_minute(refresh) > budget:
+                    panel["maxDataPoints"] = reduced
+                    break
+
+    if refresh and format_duration(refresh) != dashboard.get("refresh"):
+        tuned["refresh"] = format_duration(refresh)
+        changes.append(f"refresh {dashboard.get('refresh')} -> {tuned['refresh']}")
+        # Grafana solo acepta refreshes que estén en la lista del time picker
+        intervals = tuned.setdefault("timepicker", {}).setdefault("refresh_intervals", list(REFRESH_OPTIONS))
+        if tuned["refresh"] not in intervals:
+            intervals.append(tuned["refresh"])
+            intervals.sort(key=parse_duration)
+
+    costs = estimate(tuned, series, scrape_interval, datasource_interval=datasource_interval)
+    for cost, previous in zip(costs, before):
+        if cost.max_data_points != previous.max_data_points and cost.target is cost.panel["targets"][0]:
+            changes.append(f"#{cost.panel.get('id')} {cost.panel.get('title', '')}: maxDataPoints "
+                           f"{previous.max_data_points} -> {cost.max_data_points} "
+                           f"(step {previous.step:g}s -> {cost.step:g}s)")
+    after_per_minute = per_minute(costs, refresh)
+    report = {
+        "before": before,
+        "after": costs,
+        "before_per_minute": per_minute(before, refresh_seconds(dashboard)),
+        "after_per_minute": after_per_minute,
+        "within_budget": after_per_minute <= budget,
+        "changes": changes,
+    }
+    return tuned, report
@@ -0,0 +1,313 @@
+"""
+Deduplicación de queries entre los panels de un dashboard de Grafana.
+
+Cada target con ``expr`` es una consulta a Prometheus por refresh. Cuando un
+panel pide exactamente lo mismo que otro, o algo que se obtiene de otro con
+una transformación de Grafana, se reescribe para leer los datos de ese panel
+con el datasource ``-- Dashboard --``:
+
+- **idéntica**: la misma expresión (ignorando espacios, paréntesis de más,
+  orden de matchers y de labels de agrupación).
+- **subsumida**: ``sum(E)`` (o ``min``/``max``/``count``) cuando otro panel
+  ya pide ``sum by (...) (E)``; se suma por fila con ``calculateField``.
+- en ambos casos, operaciones con escalares por fuera (``... / 100``) se
+  pasan a ``calculateField`` en modo binario.
+
+Con ``unify_windows=True`` además se consideran iguales expresiones que solo
+difieren en la ventana de rango (``[1h]`` vs ``[5m]``): el panel reescrito
+pasa a usar la ventana del origen, lo que cambia lo que muestra, por eso es
+opcional. Aparte, el reporte lista las subexpresiones (``rate(métrica)``)
+que se repiten entre panels con distintas ventanas o agrupaciones.
+
+Solo se reescriben panels de una sola query y con opciones compatibles
+(mismo datasource, ``format``, ``interval`` y ``legendFormat``; una query
+instantánea puede salir de una de rango solo en paneles que reducen a un
+valor: stat, gauge, bargauge).
+"""
+
+import copy
+import json
+import re
+
+from obslab.dashboards import iter_panels
+from obslab.promql import PromQLError, parse
+
+DASHBOARD_DATASOURCE = {"type": "datasource", "uid": "-- Dashboard --"}
+REDUCING_PANELS = {"stat", "gauge", "bargauge"}
+DECOMPOSABLE = {"sum": "sum", "min": "min", "max": "max", "count": "sum"}
+_SCALAR_OPS = {"+", "-", "*", "/"}
+
+# Las variables de intervalo de Grafana no son duraciones válidas para el
+# parser; se reemplazan por duraciones centinela que no aparecen en la práctica
+_BUILTIN_RANGES = {"__rate_interval": "999999991s", "__interval": "999999992s", "__range": "999999993s"}
+
+
+def prepare_expr(expr):
+    """``expr`` con las variables de intervalo de Grafana reemplazadas, lista para ``parse``."""
+    def replace(m):
+        return _BUILTIN_RANGES.get(m.group(1) or m.group(2), m.group(0))
+    return re.sub(r"\$\{(__\w+)\}|\$(__\w+)", replace, expr)
+
+
+def canonical(node, windows=True):
+    """
+    Forma canónica (texto) de un AST de ``obslab.promql``. Con
+    ``windows=False`` las ventanas de rango se omiten.
+    """
+    kind = node[0]
+    if kind == "paren":
+        return canonical(node[1], windows)
+    if kind == "number":
+        return repr(node[1])
+    if kind == "string":
+        return json.dumps(node[1])
+    if kind == "selector":
+        matchers = ",".join(f"{label}{op}{json.dumps(value)}" for label, op, value in sorted(node[2]))
+        return f"{node[1] or ''}{{{matchers}}}"
+    if kind == "range":
+        return f"{canonical(node[1])}[{node[2]:g}]" if windows else f"{canonical(node[1])}[·]"
+    if kind == "call":
+        return f"{node[1]}({','.join(canonical(a, windows) for a in node[2])})"
+    if kind == "aggregate":
+        _, op, args, grouping = node
+        group = f" {grouping[0]}({','.join(sorted(grouping[1]))})" if grouping else ""
+        return f"{op}{group}({','.join(canonical(a, windows) for a in args)})"
+    if kind == "binary":
+        _, op, lhs, rhs, return_bool, matching = node
+        modifiers = " bool" if return_bool else ""
+        if matching:
+            modifiers += f" {matching[0]}({','.join(sorted(matching[1]))})"
+        return f"({canonical(lhs, windows)} {op}{modifiers} {canonical(rhs, windows)})"
+    raise PromQLError(f"nodo desconocido {kind!r}")
+
+
+def _strip(node):
+    while node[0] == "paren":
+        node = node[1]
+    return node
+
+
+def _split_scalar_ops(node):
+    """
+    Separa ``Q op c`` / ``c op Q`` (con ``c`` número) en ``(Q, [(op, c, c_a_la_izquierda)])``,
+    de adentro hacia afuera.
+    """
+    ops = []
+    node = _strip(node)
+    while node[0] == "binary" and node[1] in _SCALAR_OPS and not node[4]:
+        lhs, rhs = _strip(node[2]), _strip(node[3])
+        if rhs[0] == "number":
+            ops.append((node[1], rhs[1], False))
+            node = lhs
+        elif lhs[0] == "number":
+            ops.append((node[1], lhs[1], True))
+            node = rhs
+        else:
+            break
+    ops.reverse()
+    return node, ops
+
+
+def _linear(ops):
+    """``sum(x) * c == sum(x * c)``: solo multiplicar/dividir por una constante positiva conmuta con la suma."""
+    return all(op in ("*", "/") and not left and number > 0 for op, number, left in ops)
+
+
+def _range_calls(node):
+    """Subexpresiones ``función(selector[rango])`` de un AST."""
+    node = _strip(node)
+    if node[0] == "call" and node[2] and _strip(node[2][-1])[0] == "range":
+        yield node
+    children = {"call": lambda n: n[2], "aggregate": lambda n: n[2], "binary": lambda n: n[2:4]}
+    for child in children.get(node[0], lambda n: ())(node):
+        yield from _range_calls(child)
+
+
+class QueryInfo:
+    """Lo que interesa de un target para compararlo con otros."""
+
+    def __init__(self, panel, target):
+        self.panel = panel
+        self.target = target
+        self.expr = target["expr"]
+        datasource = target.get("datasource") or panel.get("datasource") or {}
+        self.datasource = datasource.get("uid") if isinstance(datasource, dict) else datasource
+        self.instant = bool(target.get("instant")) and not target.get("range")
+        self.format = target.get("format") or "time_series"
+        self.interval = target.get("interval") or panel.get("interval") or ""
+        legend = target.get("legendFormat") or ""
+        self.legend = "" if legend == "__auto" else legend
+        self.node = None
+        try:
+            self.node = parse(prepare_expr(self.expr))
+        except PromQLError:
+            pass
+        self.post_ops = []
+        self.core = None
+
+    @property
+    def parsed(self):
+        return self.node is not None
+
+    def shape(self, windows):
+        """``(canónica, núcleo, agregación)`` comparando con o sin ventanas."""
+        core, self.post_ops = _split_scalar_ops(self.node)
+        aggregate = None
+        if core[0] == "aggregate" and core[1] in DECOMPOSABLE and len(core[2]) == 1:
+            # (operador, agrupación, argumento) si el núcleo es una agregación descomponible
+            aggregate = (core[1], core[3], canonical(core[2][0], windows))
+        return canonical(self.node, windows), canonical(core, windows), aggregate
+
+    def compatible_source(self, source):
+        """``None`` si ``source`` puede alimentar a este target, o el motivo por el que no."""
+        if source.datasource != self.datasource:
+            return "otro datasource"
+        if source.format != self.format:
+            return "distinto format"
+        if source.interval != self.interval:
+            return "distinto interval"
+        if source.instant and not self.instant:
+            return "el origen es instantáneo"
+        if not source.instant and self.instant and self.panel.get("type") not in REDUCING_PANELS:
+            return "instantánea en un panel que no reduce"
+        return None
+
+
+def _panel_label(panel):
+    return f"#{panel.get('id')} {panel.get('title', '')!r}"
+
+
+def _reduce_step(reducer, alias):
+    return {"id": "calculateField", "options": {
+        "mode": "reduceRow", "reduce": {"reducer": reducer}, "alias": alias, "replaceFields": True}}
+
+
+def _binary_step(op, number, number_left, alias):
+    value = f"{number:g}"
+    left, right = (value, alias) if number_left else (alias, value)
+    return {"id": "calculateField", "options": {
+        "mode": "binary", "binary": {"left": left, "operator": op, "right": right},
+        "alias": alias, "replaceFields": True}}
+
+
+def _match(consumer, sources, windows):
+    """Busca un origen para ``consumer``; devuelve ``(origen, tipo, transformaciones)`` o ``None``."""
+    full, core, aggregate = consumer.shape(windows)
+    post_ops = consumer.post_ops
+    alias = consumer.legend if consumer.legend and "{{" not in consumer.legend else consumer.target.get("refId", "A")
+    for source in sources:
+        if consumer.compatible_source(source) is not None:
+            continue
+        source_full, source_core, source_aggregate = source.shape(windows)
+        if source_full == full and source.legend == consumer.legend:
+            return source, "idéntica", []
+        if aggregate is None or source_aggregate is None:
+            continue
+        op, grouping, argument = aggregate
+        source_op, source_grouping, source_argument = source_aggregate
+        if (source_core == core and source_grouping is None and len(post_ops) > len(source.post_ops)
+                and post_ops[:len(source.post_ops)] == source.post_ops):
+            # Una sola serie: el reduce solo le da nombre al campo para el paso binario
+            steps = [_reduce_step("sum", alias)]
+            remaining = post_ops[len(source.post_ops):]
+            kind = "idéntica + escalar"
+        elif (grouping is None and source_grouping is not None and source_grouping[0] == "by"
+              and source_op == op and source_argument == argument):
+            if source.post_ops:
+                # sum by (g) (E) / 100 alimenta a sum(E) / 100 si la operación conmuta con la suma
+                if source.post_ops != post_ops[:len(source.post_ops)] or not _linear(source.post_ops) \
+                        or op not in ("sum", "min", "max"):
+                    continue
+                remaining = post_ops[len(source.post_ops):]
+            else:
+                remaining = post_ops
+            steps = [_reduce_step(DECOMPOSABLE[op], alias)]
+            kind = f"subsumida por {source_op} by ({', '.join(source_grouping[1])})"
+        else:
+            continue
+        steps += [_binary_step(o, n, left, alias) for o, n, left in remaining]
+        return source, kind, steps
+    return None
+
+
+def shared_subexpressions(infos):
+    """
+    ``{función(selector): [(panel, ventana), ...]}`` para las que aparecen en
+    más de un panel: candidatas a unificar ventanas o agrupaciones.
+    """
+    uses = {}
+    for info in infos:
+        if not info.parsed:
+            continue
+        for call in _range_calls(info.node):
+            range_node = _strip(call[2][-1])
+            key = f"{call[1]}({canonical(range_node[1])})"
+            window = _window_label(info.expr, range_node[2])
+            uses.setdefault(key, []).append((info.panel, window))
+    return {key: found for key, found in uses.items() if len({id(p) for p, _ in found}) > 1}
+
+
+def _window_label(expr, seconds):
+    for name, sentinel in _BUILTIN_RANGES.items():
+        if seconds == float(sentinel[:-1]):
+            return f"${name}"
+    for unit, size in (("h", 3600), ("m", 60)):
+        if seconds % size == 0:
+            return f"{seconds / size:g}{unit}"
+    return f"{seconds:g}s"
+
+
+def _grouped_last(info):
+    if not info.parsed:
+        return 1
+    aggregate = info.shape(windows=True)[2]
+    return 0 if aggregate is not None and aggregate[1] is not None else 1
+
+
+def optimize_dashboard(dashboard, unify_windows=False):
+    """
+    Devuelve ``(dashboard_reescrito, reporte)``. El dashboard original no se
+    modifica. ``reporte`` tiene ``before``/``after`` (queries por refresh),
+    ``rewrites`` y ``shared`` (subexpresiones repetidas entre panels).
+    """
+    dashboard = copy.deepcopy(dashboard)
+    infos = []
+    per_panel = {}
+    for panel in iter_panels(dashboard):
+        for target in panel.get("targets", []):
+            if target.get("expr") and not target.get("hide"):
+                infos.append(QueryInfo(panel, target))
+                per_panel[id(panel)] = per_panel.get(id(panel), 0) + 1
+    before = len(infos)
+    shared = shared_subexpressions(infos)
+
+    sources = []  # un panel reescrito no puede ser origen de otro (Grafana no encadena)
+    rewrites = []
+    # Primero las queries agrupadas (by ...), que son las que pueden alimentar a otras
+    for info in sorted(infos, key=_grouped_last):
+        panel = info.panel
+        found = None
+        if per_panel[id(panel)] == 1 and info.parsed:
+            found = _match(info, sources, windows=True)
+            if found is None and unify_windows:
+                found = _match(info, sources, windows=False)
+                if found is not None:
+                    found = (found[0], f"{found[1]}, con la ventana del origen", found[2])
+        if found is None:
+            if info.parsed:
+                sources.append(info)
+            continue
+        source, kind, steps = found
+        source_panel = source.panel
+        if per_panel[id(source_panel)] > 1:
+            steps = [{"id": "filterByRefId", "options": {"include": source.target.get("refId", "A")}}] + steps
+        panel["datasource"] = dict(DASHBOARD_DATASOURCE)
+        panel["targets"] = [{"datasource": dict(DASHBOARD_DATASOURCE), "panelId": source_panel.get("id"),
+                             "withTransforms": False, "refId": "A"}]
+        panel["transformations"] = steps + panel.get("transformations", [])
+        rewrites.append({"panel": _panel_label(panel), "source": _panel_label(source_panel),
+                         "kind": kind, "expr": info.expr})
+
+    shared_report = {key: [(_panel_label(p), w) for p, w in found] for key, found in shared.items()}
+    report = {"before": before, "after": before - len(rewrites), "rewrites": rewrites, "shared": shared_report}
+    return dashboard, report
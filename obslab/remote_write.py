@@ -0,0 +1,96 @@
+"""
+Protocolo remote_write de Prometheus (v1): ``WriteRequest`` en protobuf
+comprimido con snappy.
+
+    message WriteRequest { repeated TimeSeries timeseries = 1; }
+    message TimeSeries   { repeated Label labels = 1; repeated Sample samples = 2; }
+    message Label        { string name = 1; string value = 2; }
+    message Sample       { double value = 1; int64 timestamp = 2; }  // ms
+"""
+
+from obslab import snappy
+from obslab.protowire import (
+    as_double, as_int64, field_bytes, field_double, field_string, field_varint, iter_fields,
+)
+from obslab.transport import HTTPTarget
+
+HEADERS = {
+    "Content-Type": "application/x-protobuf",
+    "Content-Encoding": "snappy",
+    "X-Prometheus-Remote-Write-Version": "0.1.0",
+}
+
+
+def encode_labels(labels):
+    """Labels ya codificados (campo 1 de TimeSeries), ordenados por nombre como exige el protocolo."""
+    return b"".join(
+        field_bytes(1, field_string(1, name) + field_string(2, str(value)))
+        for name, value in sorted(labels.items())
+    )
+
+
+def encode_sample(value, timestamp_ms):
+    return field_bytes(2, field_double(1, value) + field_varint(2, int(timestamp_ms)))
+
+
+def encode_timeseries(encoded_labels, samples):
+    """``samples``: ``[(valor, timestamp_ms)]``."""
+    body = encoded_labels + b"".join(encode_sample(v, t) for v, t in samples)
+    return field_bytes(1, body)
+
+
+def encode_write_request(series):
+    """``series``: iterable de ``(labels_dict_o_bytes, [(valor, ts_ms)])``. Devuelve el protobuf sin comprimir."""
+    out = []
+    for labels, samples in series:
+        encoded = labels if isinstance(labels, bytes) else encode_labels(labels)
+        out.append(encode_timeseries(encoded, samples))
+    return b"".join(out)
+
+
+def decode_write_request(data):
+    """Inversa de ``encode_write_request``: lista de ``(labels, [(valor, ts_ms)])``."""
+    result = []
+    for field, _, ts_data in iter_fields(data):
+        if field != 1:
+            continue
+        labels = {}
+        samples = []
+        for f, _, value in iter_fields(ts_data):
+            if f == 1:
+                name = val = ""
+                for lf, _, lv in iter_fields(value):
+                    if lf == 1:
+                        name = bytes(lv).decode("utf-8")
+                    elif lf == 2:
+                        val = bytes(lv).decode("utf-8")
+                labels[name] = val
+            elif f == 2:
+                sample_value = 0.0
+                timestamp = 0
+                for sf, _, sv in iter_fields(value):
+                    if sf == 1:
+                        sample_value = as_double(sv)
+                    elif sf == 2:
+                        timestamp = as_int64(sv)
+                samples.append((sample_value, timestamp))
+        result.append((labels, samples))
+    return result
+
+
+class RemoteWriteClient:
+    def __init__(self, url, timeout=10.0, basic_auth=None):
+        self.target = HTTPTarget(url, timeout=timeout, headers=HEADERS, basic_auth=basic_auth)
+
+    def send_raw(self, payload):
+        """Envía un WriteRequest ya serializado (sin comprimir)."""
+        self.target.send("POST", body=snappy.compress(payload))
+
+    def send(self, series):
+        self.send_raw(encode_write_request(series))
+
+    def close(self):
+        self.target.close()
+
+    def __str__(self):
+        return f"remote_write:{self.target.url}"
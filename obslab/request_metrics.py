@@ -0,0 +1,174 @@
+"""
+Instrumentación de requests HTTP para apps Flask con costo de microsegundos.
+
+Usar ``Counter``/``Histogram`` de ``prometheus_client`` en cada request
+implica resolver ``.labels(...)`` (armar la tupla, tomar un lock) y un lock
+más por cada ``observe``. Aquí cada hilo acumula en su propio buffer, sin
+locks, con la fila de cada combinación (route, method, status) resuelta la
+primera vez que aparece; el ``collect`` del registry suma los buffers de
+todos los hilos solo cuando alguien hace scrape.
+
+Métricas:
+    http_requests_total{route, method, status}
+    http_request_duration_seconds{route, method, status}   (histogram)
+    http_requests_in_flight{route, method}
+"""
+
+import bisect
+import threading
+import time
+
+from prometheus_client import Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
+from prometheus_client.utils import floatToGoString
+
+ENVIRON_KEY = "obslab.request_metrics"
+UNMATCHED = "<unmatched>"
+
+
+class _ThreadBuffer:
+    """Buffer de un hilo: solo lo escribe su dueño, el collector solo lo lee."""
+
+    __slots__ = ("thread", "rows", "in_flight")
+
+    def __init__(self, thread):
+        self.thread = thread
+        self.rows = {}       # (route, method, status) -> [bucket_0, ..., bucket_inf, suma]
+        self.in_flight = {}  # (route, method) -> requests en curso iniciados por este hilo
+
+
+class RequestMetrics:
+    """
+    ``RequestMetrics(app, registry)`` envuelve ``app.wsgi_app`` (tiempo y
+    status) y registra un ``before_request`` que solo anota la ruta ya
+    resuelta por Flask (``request.url_rule``).
+    """
+
+    def __init__(self, app=None, registry=None, buckets=Histogram.DEFAULT_BUCKETS, prefix="http"):
+        self.bounds = tuple(float(b) for b in buckets if b != float("inf"))
+        self.prefix = prefix
+        self._local = threading.local()
+        self._buffers = []
+        self._buffers_lock = threading.Lock()
+        self._retired = _ThreadBuffer(None)  # totales de hilos que ya terminaron
+        if registry is not None:
+            registry.register(self)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        from flask import request
+
+        wsgi_app = app.wsgi_app
+
+        @app.before_request
+        def _mark_route():
+            rule = request.url_rule
+            key = (rule.rule if rule is not None else UNMATCHED, request.method)
+            request.environ[ENVIRON_KEY] = key
+            in_flight = self._buffer().in_flight
+            in_flight[key] = in_flight.get(key, 0) + 1
+
+        def instrumented(environ, start_response):
+            status = []
+
+            def capture(status_line, headers, exc_info=None):
+                status.append(status_line[:3])
+                return start_response(status_line, headers, exc_info)
+
+            start = time.perf_counter()
+            try:
+                return wsgi_app(environ, capture)
+            finally:
+                self._observe(environ, status[-1] if status else "500", time.perf_counter() - start)
+
+        app.wsgi_app = instrumented
+        return app
+
+    def _buffer(self):
+        try:
+            return self._local.buffer
+        except AttributeError:
+            buffer = self._local.buffer = _ThreadBuffer(threading.current_thread())
+            with self._buffers_lock:
+                # Servidores con un hilo por request (werkzeug threaded): se
+                # fusionan los buffers de hilos muertos antes de que se acumulen
+                if len(self._buffers) >= 64:
+                    self._reap()
+                self._buffers.append(buffer)
+            return buffer
+
+    def _reap(self):
+        alive = []
+        for buffer in self._buffers:
+            if buffer.thread.is_alive():
+                alive.append(buffer)
+            else:
+                _merge(self._retired, buffer)
+        self._buffers = alive
+
+    def _observe(self, environ, status, duration):
+        buffer = self._buffer()
+        key = environ.get(ENVIRON_KEY)
+        if key is None:  # la app respondió antes de los before_request
+            key = (UNMATCHED, environ.get("REQUEST_METHOD", ""))
+        else:
+            buffer.in_flight[key] -= 1
+        row_key = key + (status,)
+        row = buffer.rows.get(row_key)
+        if row is None:
+            row = buffer.rows[row_key] = [0] * (len(self.bounds) + 1) + [0.0]
+        row[bisect.bisect_left(self.bounds, duration)] += 1
+        row[-1] += duration
+
+    def _snapshot(self):
+        """Suma los buffers; los de hilos muertos se fusionan en ``_retired`` y se descartan."""
+        with self._buffers_lock:
+            self._reap()
+            buffers = [self._retired] + self._buffers
+        rows = {}
+        in_flight = {}
+        for buffer in buffers:
+            _merge_rows(rows, list(buffer.rows.items()))
+            for key, value in list(buffer.in_flight.items()):
+                in_flight[key] = in_flight.get(key, 0) + value
+        return rows, in_flight
+
+    def collect(self):
+        rows, in_flight = self._snapshot()
+        labels = ["route", "method", "status"]
+        requests = CounterMetricFamily(f"{self.prefix}_requests", "Requests HTTP atendidos", labels=labels)
+        durations = HistogramMetricFamily(f"{self.prefix}_request_duration_seconds",
+                                          "Latencia de los requests HTTP", labels=labels)
+        bounds = [floatToGoString(b) for b in self.bounds] + ["+Inf"]
+        for key, row in sorted(rows.items()):
+            buckets = []
+            total = 0
+            for bound, count in zip(bounds, row[:-1]):
+                total += count
+                buckets.append((bound, total))
+            requests.add_metric(list(key), total)
+            durations.add_metric(list(key), buckets, row[-1])
+        yield requests
+        yield durations
+        gauge = GaugeMetricFamily(f"{self.prefix}_requests_in_flight", "Requests HTTP en curso",
+                                  labels=["route", "method"])
+        for key, value in sorted(in_flight.items()):
+            gauge.add_metric(list(key), value)
+        yield gauge
+
+
+def _merge_rows(target, items):
+    for key, row in items:
+        current = target.get(key)
+        if current is None:
+            target[key] = list(row)
+        else:
+            for i, value in enumerate(row):
+                current[i] += value
+
+
+def _merge(target, buffer):
+    _merge_rows(target.rows, buffer.rows.items())
+    for key, value in buffer.in_flight.items():
+        target.in_flight[key] = target.in_flight.get(key, 0) + value
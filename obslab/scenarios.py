@@ -0,0 +1,134 @@
+"""
+Carga de los business cases de LAB4 como módulos reutilizables.
+
+Los scripts ``LAB4/business-case-N.py`` tienen guiones en el nombre y no se
+pueden importar directamente; este módulo los carga por ruta y les da una
+interfaz común: crear el registry, avanzar un ciclo de simulación y leer las
+muestras tal como quedarían en el Pushgateway (con ``job`` e ``instance``).
+"""
+
+import importlib.util
+import os
+
+from prometheus_client import CollectorRegistry, generate_latest
+
+LAB4_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LAB4")
+
+# Valores por defecto de --job / --instance de cada business case
+CASES = {
+    1: ("ecommerce_job", "ecommerce-sim-1"),
+    2: ("banking_core_job", "bank-sim-core-1"),
+    3: ("hospital_job", "hospital-sim-1"),
+    4: ("telecom_job", "telecom-sim-1"),
+    5: ("saas_job", "saas-sim-app-1"),
+}
+
+# Simulación por agregados de los casos que la implementan (ver Scenario.step)
+AGGREGATE_CASES = {
+    1: lambda s: s.module.simulate_ecommerce_aggregate(s.registry, s.job, s.instance, s.rng, s.scale),
+    5: lambda s: s.module.simulate_aggregate(s.registry, s.rng, s.scale),
+}
+
+# Sufijos que el formato de texto no expone (prometheus_client los genera igual)
+_HIDDEN_SUFFIXES = ("_created", "_gsum", "_gcount")
+
+_modules = {}
+
+
+def load_case(case):
+    """Importa ``LAB4/business-case-<case>.py`` (una sola vez por proceso)."""
+    if case not in CASES:
+        raise ValueError(f"business case desconocido: {case}")
+    if case not in _modules:
+        path = os.path.join(LAB4_DIR, f"business-case-{case}.py")
+        spec = importlib.util.spec_from_file_location(f"business_case_{case}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _modules[case] = module
+    return _modules[case]
+
+
+def dashboard_path(case):
+    return os.path.join(LAB4_DIR, f"business-case-{case}.json")
+
+
+def registry_samples(registry, job, grouping_key=None):
+    """
+    Recorre las muestras del registry como las vería Prometheus al scrapear el
+    Pushgateway: ``job`` y el grouping key se agregan (o pisan) como labels.
+
+    Entrega tuplas ``(nombre, labels, valor)``.
+    """
+    extra = {"job": job}
+    extra.update(grouping_key or {})
+    for metric in registry.collect():
+        hidden = tuple(metric.name + suffix for suffix in _HIDDEN_SUFFIXES)
+        for sample in metric.samples:
+            if sample.name in hidden:
+                continue
+            labels = dict(sample.labels)
+            labels.update(extra)
+            yield sample.name, labels, sample.value
+
+
+class Scenario:
+    """
+    Una instancia simulada de un business case con su propio registry. Con
+    ``store="array"`` las métricas se guardan en arrays de NumPy
+    (ver obslab.array_metrics) en lugar de los objetos de prometheus_client.
+    Con ``engine="aggregate"`` cada ciclo se sortea por agregados
+    (obslab.aggregate_sim) con ``scale`` veces el tráfico del caso; solo en
+    los casos que lo implementan (``AGGREGATE_CASES``).
+    """
+
+    def __init__(self, case, job=None, instance=None, store="client", engine="events", scale=1.0, seed=None):
+        default_job, default_instance = CASES[case]
+        self.case = case
+        self.module = load_case(case)
+        self.job = job or default_job
+        self.instance = instance or default_instance
+        self.collector = None
+        self.engine = engine
+        self.scale = scale
+        self.rng = None
+        if engine == "aggregate":
+            if case not in AGGREGATE_CASES:
+                raise ValueError(f"business case {case} no tiene simulación por agregados")
+            import numpy as np
+
+            self.rng = np.random.default_rng(seed)
+        elif engine != "events":
+            raise ValueError(f"engine desconocido: {engine}")
+        if store == "array":
+            from obslab.array_metrics import build_case_registry
+
+            self.registry, self.collector = build_case_registry(self.module, CollectorRegistry())
+        elif store == "client":
+            self.registry = self.module.build_registry(CollectorRegistry())
+        else:
+            raise ValueError(f"store desconocido: {store}")
+
+    @property
+    def grouping_key(self):
+        return {"instance": self.instance}
+
+    def step(self):
+        """Avanza un ciclo de simulación (lo que hace cada vuelta del loop)."""
+        if self.rng is not None:
+            AGGREGATE_CASES[self.case](self)
+        elif self.case == 1:
+            self.module.simulate_ecommerce_traffic(self.registry, self.job, self.instance)
+        else:
+            self.module.simulate(self.registry)
+
+    def samples(self):
+        return registry_samples(self.registry, self.job, self.grouping_key)
+
+    def exposition(self):
+        """Formato de texto del registry (directo desde los arrays si ``store="array"``)."""
+        if self.collector is not None:
+            return self.collector.exposition()
+        return generate_latest(self.registry)
+
+    def __repr__(self):
+        return f"Scenario(case={self.case}, job={self.job!r}, instance={self.instance!r}, engine={self.engine!r})"
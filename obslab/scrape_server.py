@@ -0,0 +1,187 @@
+"""
+Modo pull para los simuladores de LAB4: un solo proceso asyncio sirve
+muchas instancias virtuales de los business cases para que Prometheus las
+scrapee directamente, sin Pushgateway de por medio.
+
+Cada instancia es un ``Scenario`` con su registry. La simulación avanza en
+forma perezosa: al llegar un scrape se ejecutan los ciclos que correspondan
+al tiempo transcurrido (``interval`` segundos por ciclo, a lo sumo
+``max_catchup`` seguidos) y la exposición se renderiza una vez por ciclo; los
+scrapes siguientes (p. ej. un par de Prometheus en HA) reciben los bytes
+cacheados, también en gzip. El costo es proporcional a lo que se scrapea,
+no a la cantidad de instancias.
+
+Rutas:
+    /targets/<instance>/metrics   una instancia (o /metrics en su puerto propio)
+    /sd                           http_sd_configs de Prometheus (JSON)
+    /metrics                      métricas del propio servidor
+"""
+
+import asyncio
+import functools
+import gzip
+import json
+import time
+
+from prometheus_client import CollectorRegistry, Counter, Gauge, generate_latest
+
+from obslab.scenarios import CASES, Scenario
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class VirtualTarget:
+    """Una instancia simulada con su exposición cacheada."""
+
+    __slots__ = ("scenario", "path", "port", "stepped_at", "exposition", "_gzip")
+
+    def __init__(self, scenario, path, port=None):
+        self.scenario = scenario
+        self.path = path
+        self.port = port
+        self.stepped_at = None
+        self.exposition = b""
+        self._gzip = None
+
+    def advance(self, now, interval, max_catchup):
+        """Corre los ciclos pendientes; devuelve cuántos corrió."""
+        if self.stepped_at is None:
+            steps = 1
+            self.stepped_at = now
+        else:
+            steps = int((now - self.stepped_at) // interval)
+            if steps <= 0:
+                return 0
+            if steps > max_catchup:
+                # Estuvo mucho sin scrapes: no se recupera todo, se retoma desde ahora
+                steps = max_catchup
+                self.stepped_at = now
+            else:
+                self.stepped_at += steps * interval
+        for _ in range(steps):
+            self.scenario.step()
+        self.exposition = self.scenario.exposition()
+        self._gzip = None
+        return steps
+
+    def body(self, accept_gzip):
+        if not accept_gzip:
+            return self.exposition
+        if self._gzip is None:
+            self._gzip = gzip.compress(self.exposition, compresslevel=1)
+        return self._gzip
+
+
+class ScrapeServer:
+    """
+    ``ScrapeServer({case: cantidad}, interval)`` crea las instancias
+    ``<instance por defecto del caso>-<n>``. Con ``port_base`` cada instancia
+    escucha además en su propio puerto (``port_base``, ``port_base + 1``, ...).
+    ``store="array"`` guarda las métricas de cada instancia en arrays de NumPy.
+    """
+
+    def __init__(self, instances, interval=15.0, max_catchup=4, port_base=None, store="client"):
+        self.interval = interval
+        self.max_catchup = max_catchup
+        self.targets = []
+        self.by_path = {}
+        for case, count in sorted(instances.items()):
+            job, default_instance = CASES[case]
+            for n in range(1, count + 1):
+                instance = f"{default_instance}-{n}"
+                port = port_base + len(self.targets) if port_base is not None else None
+                target = VirtualTarget(Scenario(case, job=job, instance=instance, store=store),
+                                       f"/targets/{instance}/metrics", port)
+                self.targets.append(target)
+                self.by_path[target.path] = target
+
+        self.registry = CollectorRegistry()
+        Gauge("obslab_scrape_server_targets", "Instancias virtuales servidas",
+              registry=self.registry).set(len(self.targets))
+        self.scrapes = Counter("obslab_scrape_server_scrapes", "Scrapes atendidos",
+                               ["cached"], registry=self.registry)
+        self.steps = Counter("obslab_scrape_server_steps", "Ciclos de simulación ejecutados",
+                             registry=self.registry)
+        self.step_seconds = Counter("obslab_scrape_server_step_seconds",
+                                    "Tiempo en simular y renderizar", registry=self.registry)
+
+    def target_groups(self, host):
+        """Lista para ``http_sd_configs``: un grupo por instancia con ``job``/``instance`` como labels."""
+        groups = []
+        for target in self.targets:
+            scenario = target.scenario
+            labels = {"job": scenario.job, "instance": scenario.instance, "business_case": str(scenario.case)}
+            if target.port is None:
+                address = host
+                labels["__metrics_path__"] = target.path
+            else:
+                address = f"{host.rsplit(':', 1)[0]}:{target.port}"
+            groups.append({"targets": [address], "labels": labels})
+        return groups
+
+    def scrape(self, target, accept_gzip):
+        start = time.perf_counter()
+        steps = target.advance(time.monotonic(), self.interval, self.max_catchup)
+        if steps:
+            self.steps.inc(steps)
+            self.step_seconds.inc(time.perf_counter() - start)
+        self.scrapes.labels("false" if steps else "true").inc()
+        return target.body(accept_gzip)
+
+    def _respond(self, path, host, accept_gzip, own_target):
+        """``(status, content_type, body, gzip)`` para una ruta."""
+        path = path.split("?", 1)[0]
+        target = own_target if own_target is not None and path == "/metrics" else self.by_path.get(path)
+        if target is not None:
+            return "200 OK", CONTENT_TYPE, self.scrape(target, accept_gzip), accept_gzip
+        if path == "/metrics":
+            return "200 OK", CONTENT_TYPE, generate_latest(self.registry), False
+        if path == "/sd":
+            return "200 OK", "application/json", json.dumps(self.target_groups(host)).encode(), False
+        return "404 Not Found", "text/plain", b"Not Found\n", False
+
+    async def handle_http(self, reader, writer, own_target=None, default_host="localhost"):
+        """HTTP/1.1 mínimo con keep-alive (Prometheus reutiliza las conexiones)."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                parts = request_line.split()
+                if len(parts) < 3:
+                    break
+                keep_alive = parts[2] == b"HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                status, content_type, body, gzipped = self._respond(
+                    parts[1].decode("latin-1"), headers.get("host", default_host),
+                    "gzip" in headers.get("accept-encoding", ""), own_target)
+                head = f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                if gzipped:
+                    head += "Content-Encoding: gzip\r\n"
+                head += f"Content-Length: {len(body)}\r\n"
+                head += "\r\n" if keep_alive else "Connection: close\r\n\r\n"
+                writer.write(head.encode() + body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host, port):
+        """Abre el puerto principal y, si corresponde, uno por instancia."""
+        default_host = f"{host if host not in ('', '0.0.0.0') else 'localhost'}:{port}"
+        handler = functools.partial(self.handle_http, default_host=default_host)
+        servers = [await asyncio.start_server(handler, host, port)]
+        for target in self.targets:
+            if target.port is not None:
+                handler = functools.partial(self.handle_http, own_target=target, default_host=default_host)
+                servers.append(await asyncio.start_server(handler, host, target.port))
+        return servers
@@ -0,0 +1,446 @@
+"""
+Destinos ("sinks") a los que los simuladores envían cada snapshot del registry.
+
+Cada sink implementa ``push(registry, job, grouping_key)``, ``close()`` y,
+si el destino guarda grupos (Pushgateway, textfile), ``delete(job,
+grouping_key)`` para retirar los de una instancia que ya no existe. El
+loop de cada business case recorre la lista que arma ``build_sinks`` a partir
+de los argumentos de línea de comandos, así que agregar un destino nuevo no
+requiere tocar los simuladores.
+"""
+
+import hashlib
+import os
+import re
+import time
+
+from prometheus_client import delete_from_gateway, generate_latest, push_to_gateway, pushadd_to_gateway
+from prometheus_client.metrics_core import Metric
+
+from obslab.fanout import TEXT_CONTENT_TYPE, FanoutPusher, grouping_path
+from obslab.otlp import OTLPExporter, RegistryConverter, encode_resource_metrics
+from obslab.proto_exposition import CONTENT_TYPE as PROTOBUF_CONTENT_TYPE, ProtobufEncoder
+from obslab.spool import Spool
+from obslab.transport import HTTPTarget
+
+
+def serializer(push_format):
+    """``(content_type, función registry -> bytes)`` para ``text`` o ``protobuf``."""
+    if push_format == "protobuf":
+        return PROTOBUF_CONTENT_TYPE, ProtobufEncoder().encode
+    if push_format != "text":
+        raise ValueError(f"formato de push desconocido: {push_format}")
+    return TEXT_CONTENT_TYPE, generate_latest
+
+
+class Sink:
+    def push(self, registry, job, grouping_key):
+        raise NotImplementedError
+
+    def delete(self, job, grouping_key):
+        """Retira el grupo; por omisión nada (las series simplemente dejan de llegar)."""
+
+    def close(self):
+        pass
+
+
+class PushgatewaySink(Sink):
+    """
+    Push HTTP al Pushgateway: POST (pushadd) o PUT si ``replace=True``.
+
+    Con ``spool`` (un ``obslab.spool.Spool``) los snapshots que no se pudieron
+    enviar quedan en disco y se reenvían cuando el gateway vuelve. El
+    Pushgateway solo guarda el último valor de cada grupo (counters
+    acumulados, gauges al último valor), así que al reenviar gana el snapshot
+    más nuevo de cada grupo y se descartan los de grupos que ya recibieron
+    un push posterior: el backlog se resume sin tenerlo en memoria.
+
+    ``push_format="protobuf"`` envía protobuf delimitado
+    (``obslab.proto_exposition``) en lugar de texto.
+    """
+
+    def __init__(self, url, replace=False, timeout=30, spool=None, push_format="text"):
+        self.url = url
+        self.replace = replace
+        self.timeout = timeout
+        self.spool = spool
+        self.push_format = push_format
+        self.content_type, self.serialize = serializer(push_format)
+        self._target = None
+        self._fresh = set()  # grupos con un push exitoso posterior a lo que hay en el spool
+
+    def push(self, registry, job, grouping_key):
+        if self.spool is None and self.push_format == "text":
+            push = push_to_gateway if self.replace else pushadd_to_gateway
+            push(self.url, job=job, registry=registry, grouping_key=grouping_key, timeout=self.timeout)
+            return
+        path = grouping_path(job, grouping_key)
+        body = self.serialize(registry)
+        try:
+            self._send(path, body, self.content_type)
+        except Exception as e:
+            if self.spool is None:
+                raise
+            # Cada registro lleva su Content-Type: el spool sobrevive a un cambio de --push-format
+            self.spool.append(f"{path}\t{self.content_type}".encode() + b"\n" + body)
+            raise IOError(f"{e} (snapshot guardado en {self.spool})")
+        self._fresh.add(path)
+        if self.spool:
+            try:
+                self.spool.replay(self._replay_batch)
+            except Exception as e:
+                raise IOError(f"reenvío del spool interrumpido: {e}")
+            self._fresh.clear()
+
+    def _send(self, path, body, content_type):
+        if self._target is None:
+            self._target = HTTPTarget(self.url, timeout=self.timeout)
+        self._target.send("PUT" if self.replace else "POST", path, body, {"Content-Type": content_type})
+
+    def delete(self, job, grouping_key):
+        # Lo que quede en el spool de ese grupo no debe resucitarlo, aunque el DELETE falle
+        self._fresh.add(grouping_path(job, grouping_key))
+        delete_from_gateway(self.url, job=job, grouping_key=grouping_key, timeout=self.timeout)
+
+    def _replay_batch(self, payloads):
+        latest = {}
+        for payload in payloads:
+            head, _, body = payload.partition(b"\n")
+            path, _, content_type = head.decode().partition("\t")
+            if path not in self._fresh:
+                latest[path] = (body, content_type or TEXT_CONTENT_TYPE)
+        for path, (body, content_type) in latest.items():
+            self._send(path, body, content_type)
+
+    def close(self):
+        if self.spool is not None:
+            self.spool.close()
+            if self.spool:
+                print(f"{self.spool}: {self.spool.pending_bytes()} bytes pendientes para el próximo arranque")
+        if self._target is not None:
+            self._target.close()
+
+    def __str__(self):
+        return self.url
+
+
+class FanoutPushSink(Sink):
+    """
+    Push a varios Pushgateways a la vez (``obslab.fanout``): el registry se
+    serializa una vez y cada gateway lo recibe desde su propio hilo, así que
+    uno lento o caído no demora a los demás ni al ciclo siguiente. ``push``
+    falla (después de encolar) si algún gateway está caído, para que el loop
+    lo informe.
+    """
+
+    def __init__(self, urls, replace=False, timeout=5.0, max_retries=2, push_format="text"):
+        self.urls = list(urls)
+        content_type, self.serialize = serializer(push_format)
+        self.pusher = FanoutPusher(self.urls, "PUT" if replace else "POST", timeout, max_retries, content_type)
+
+    def push(self, registry, job, grouping_key):
+        self.pusher.push(self.serialize(registry), job, grouping_key)
+        down = self.pusher.unhealthy()
+        if down:
+            raise IOError("; ".join(worker.status() for worker in down))
+
+    def delete(self, job, grouping_key):
+        # Por la cola de cada gateway, detrás del push en vuelo y en lugar del pendiente
+        self.pusher.delete(job, grouping_key)
+        down = self.pusher.unhealthy()
+        if down:
+            raise IOError("; ".join(worker.status() for worker in down))
+
+    def close(self):
+        self.pusher.close()
+        for worker in self.pusher.workers:
+            print(f"Pushgateway {worker.status()}")
+
+    def __str__(self):
+        return " + ".join(self.urls)
+
+
+class TSDBSink(Sink):
+    """
+    Modo captura: agrega cada snapshot a un TSDB en memoria (``obslab.tsdb``)
+    y lo guarda en ``path`` cada ``save_every`` pushes y al salir. Si el
+    archivo ya existe se continúa sobre él.
+    """
+
+    def __init__(self, path, save_every=12):
+        from obslab.tsdb import TSDB
+
+        if not path.endswith(".npz"):
+            path += ".npz"  # np.savez lo agrega igual
+        self.path = path
+        self.save_every = save_every
+        self.tsdb = TSDB.load(path) if os.path.exists(path) else TSDB()
+        self._pending = 0
+
+    def push(self, registry, job, grouping_key):
+        self.tsdb.append_registry(time.time(), registry, job, grouping_key)
+        self._pending += 1
+        if self._pending >= self.save_every:
+            self.flush()
+
+    def flush(self):
+        self.tsdb.save(self.path)
+        self._pending = 0
+
+    def close(self):
+        if self._pending:
+            self.flush()
+
+    def __str__(self):
+        return f"tsdb:{self.path}"
+
+
+class CaptureSink(Sink):
+    """Registra cada snapshot en una captura columnar (``obslab.capture``)."""
+
+    def __init__(self, path, segment_mb=64):
+        from obslab.capture import CaptureWriter
+
+        self.path = path
+        self.writer = CaptureWriter(path, segment_bytes=int(segment_mb * 1024 * 1024))
+
+    def push(self, registry, job, grouping_key):
+        self.writer.append_registry(time.time(), registry, job, grouping_key)
+
+    def close(self):
+        writer = self.writer
+        if writer.snapshots:
+            avg_ms = writer.write_seconds / writer.snapshots * 1000
+            print(f"Captura {self.path}: {writer.snapshots} snapshots, {avg_ms:.2f} ms promedio por escritura")
+        writer.close()
+
+    def __str__(self):
+        return f"capture:{self.path}"
+
+
+class _Relabeled:
+    """Vista de un registry con labels fijos agregados (o pisados) en cada muestra."""
+
+    def __init__(self, registry, labels):
+        self.registry = registry
+        self.labels = labels
+
+    def collect(self):
+        for metric in self.registry.collect():
+            relabeled = Metric(metric.name, metric.documentation, metric.type, metric.unit)
+            relabeled.samples = [sample._replace(labels={**sample.labels, **self.labels})
+                                 for sample in metric.samples]
+            yield relabeled
+
+
+class TextfileSink(Sink):
+    """
+    Escribe cada snapshot como ``<job>[_<label>-<valor>...].prom`` en el
+    directorio del textfile collector de node_exporter. La escritura es
+    atómica (archivo temporal que no termina en ``.prom`` + ``os.replace``)
+    y se omite si el contenido no cambió desde la anterior.
+
+    ``job`` y el grouping key van como labels en cada muestra para que varias
+    instancias en el mismo host no choquen (node_exporter rechaza series
+    duplicadas entre archivos). Sin ``fsync`` no se fuerza nada a disco: el
+    archivo se regenera en cada ciclo y a node_exporter solo le importa no
+    leerlo a medio escribir. Con ``fsync`` se sincroniza cada archivo, y el
+    directorio a lo sumo una vez por ``dir_fsync_interval`` segundos.
+    """
+
+    def __init__(self, directory, fsync=False, dir_fsync_interval=5.0, remove_on_close=True):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.fsync = fsync
+        self.dir_fsync_interval = dir_fsync_interval
+        self.remove_on_close = remove_on_close
+        self._digests = {}  # ruta -> hash del último contenido escrito
+        self._dir_synced_at = 0.0
+        self.writes = 0
+        self.skipped = 0
+
+    def path_for(self, job, grouping_key):
+        parts = [job] + [f"{k}-{v}" for k, v in sorted((grouping_key or {}).items())]
+        return os.path.join(self.directory, re.sub(r"[^A-Za-z0-9_.-]", "_", "_".join(parts)) + ".prom")
+
+    def push(self, registry, job, grouping_key):
+        labels = {"job": job}
+        labels.update(grouping_key or {})
+        body = generate_latest(_Relabeled(registry, labels))
+        path = self.path_for(job, grouping_key)
+        digest = hashlib.blake2b(body, digest_size=16).digest()
+        if self._digests.get(path) == digest:
+            self.skipped += 1
+            return
+        directory, name = os.path.split(path)
+        tmp = os.path.join(directory, f".{name}.{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            f.write(body)
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, path)
+        self._digests[path] = digest
+        self.writes += 1
+        if self.fsync and time.monotonic() - self._dir_synced_at >= self.dir_fsync_interval:
+            self._fsync_directory()
+
+    def delete(self, job, grouping_key):
+        path = self.path_for(job, grouping_key)
+        self._digests.pop(path, None)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _fsync_directory(self):
+        fd = os.open(self.directory, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        self._dir_synced_at = time.monotonic()
+
+    def close(self):
+        # A diferencia del Pushgateway, al terminar las series desaparecen
+        if self.remove_on_close:
+            for path in self._digests:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        elif self.fsync and self.writes:
+            self._fsync_directory()
+        if self.writes or self.skipped:
+            print(f"Textfile {self.directory}: {self.writes} escrituras, {self.skipped} omitidas sin cambios")
+
+    def __str__(self):
+        return f"textfile:{self.directory}"
+
+
+class CheckpointSink(Sink):
+    """
+    Checkpoint continuo en un archivo mapeado en memoria (``obslab.checkpoint``).
+    En el primer push de cada grupo suma al registry lo que había guardado el
+    proceso anterior, así que los counters siguen desde donde estaban; por
+    eso ``build_sinks`` lo pone primero, antes de que otro destino publique
+    el snapshot.
+    """
+
+    def __init__(self, path, fsync_interval=0.0):
+        from obslab.checkpoint import Checkpointer
+
+        self.path = path
+        self.checkpointer = Checkpointer(path, fsync_interval=fsync_interval)
+        if self.checkpointer.pending:
+            print(f"Checkpoint {path}: {len(self.checkpointer.pending)} grupos para restaurar")
+
+    def push(self, registry, job, grouping_key):
+        if self.checkpointer.pending and self.checkpointer.restore_into(registry, job, grouping_key):
+            print(f"Checkpoint {self.path}: {job} {grouping_key} restaurado")
+        self.checkpointer.save(registry, job, grouping_key)
+
+    def delete(self, job, grouping_key):
+        self.checkpointer.forget(job, grouping_key)
+
+    def close(self):
+        self.checkpointer.close()
+
+    def __str__(self):
+        return f"checkpoint:{self.path}"
+
+
+class OTLPSink(Sink):
+    """
+    Exporta cada snapshot por OTLP/HTTP (``obslab.otlp``). ``job`` e
+    ``instance`` pasan a ``service.name`` / ``service.instance.id`` del
+    resource; el envío ocurre en un hilo aparte, en lotes con gzip.
+    """
+
+    def __init__(self, endpoint, temporality="cumulative", headers=None, max_batch_points=8192):
+        self.converter = RegistryConverter(temporality)
+        self.exporter = OTLPExporter(endpoint, headers=headers, max_batch_points=max_batch_points)
+
+    def push(self, registry, job, grouping_key):
+        resource = {"service.name": job}
+        for key, value in (grouping_key or {}).items():
+            resource["service.instance.id" if key == "instance" else key] = value
+        metrics, points = self.converter.convert(registry.collect(), resource=resource)
+        if not self.exporter.submit(encode_resource_metrics(resource, metrics), points):
+            raise IOError("cola OTLP llena: snapshot descartado")
+
+    def close(self):
+        self.exporter.close()
+        print(f"OTLP {self.exporter.target.url}: {self.exporter.stats()}")
+
+    def __str__(self):
+        return str(self.exporter)
+
+
+def add_sink_arguments(parser):
+    group = parser.add_argument_group(
+        "destinos adicionales",
+        "--pushgateway acepta varias URLs separadas por coma (p. ej. un Pushgateway por par de Prometheus en HA)")
+    group.add_argument("--push-format", choices=["text", "protobuf"], default="text",
+                       help="Formato del push al Pushgateway: texto o protobuf delimitado (más compacto)")
+    group.add_argument("--push-timeout", type=float, default=5.0,
+                       help="Timeout en segundos de cada push al Pushgateway (uno o varios)")
+    group.add_argument("--push-retries", type=int, default=2,
+                       help="Reintentos de un push fallido cuando hay varios Pushgateways")
+    group.add_argument("--spool", metavar="DIR",
+                       help="Con un solo Pushgateway, guarda en disco los snapshots que fallen y los reenvía al volver")
+    group.add_argument("--spool-mb", type=float, default=64, help="Tamaño máximo del spool en MB")
+    group.add_argument("--tsdb-capture", metavar="ARCHIVO.npz",
+                       help="Guarda cada snapshot en un TSDB NumPy para LAB4/dashboard-check.py")
+    group.add_argument("--capture", metavar="DIR",
+                       help="Registra cada snapshot en una captura columnar append-only (obslab.capture)")
+    group.add_argument("--capture-segment-mb", type=float, default=64,
+                       help="Tamaño en MB a partir del cual se abre un segmento nuevo de la captura")
+    group.add_argument("--textfile-dir", metavar="DIR",
+                       help="Escribe cada snapshot como .prom para el textfile collector de node_exporter")
+    group.add_argument("--textfile-fsync", action="store_true",
+                       help="Fuerza a disco cada .prom (por omisión solo se garantiza la escritura atómica)")
+    group.add_argument("--textfile-keep", action="store_true",
+                       help="No borra el .prom al terminar (las series quedan hasta que se borre a mano)")
+    group.add_argument("--checkpoint", metavar="ARCHIVO",
+                       help="Guarda el estado de las métricas en cada ciclo y lo restaura al arrancar "
+                            "(counters monotónicos entre reinicios; requiere NumPy)")
+    group.add_argument("--checkpoint-fsync", type=float, default=0.0, metavar="SEGUNDOS",
+                       help="Fuerza el checkpoint a disco cada tantos segundos (0 = lo decide el kernel)")
+    group.add_argument("--otlp-endpoint", metavar="URL",
+                       help="Exporta por OTLP/HTTP a un Collector (p. ej. http://localhost:4318)")
+    group.add_argument("--otlp-temporality", choices=["cumulative", "delta"], default="cumulative",
+                       help="Temporalidad de counters e histogramas en OTLP")
+    group.add_argument("--otlp-header", action="append", default=[], metavar="NOMBRE=VALOR",
+                       help="Header extra para el endpoint OTLP (repetible, p. ej. autenticación)")
+    group.add_argument("--otlp-batch-points", type=int, default=8192,
+                       help="Puntos máximos por request OTLP")
+    return group
+
+
+def build_sinks(args, replace=False):
+    sinks = []
+    if args.checkpoint:
+        sinks.append(CheckpointSink(args.checkpoint, args.checkpoint_fsync))
+    urls = [url.strip() for url in (args.pushgateway or "").split(",") if url.strip()]
+    if args.spool and len(urls) != 1:
+        raise ValueError("--spool necesita exactamente un Pushgateway (con varios, cada uno tiene su cola en memoria)")
+    if len(urls) == 1:
+        spool = None
+        if args.spool:
+            spool = Spool(args.spool, max_bytes=int(args.spool_mb * 1024 * 1024))
+        sinks.append(PushgatewaySink(urls[0], replace=replace, timeout=args.push_timeout, spool=spool,
+                                     push_format=args.push_format))
+    elif urls:
+        sinks.append(FanoutPushSink(urls, replace, args.push_timeout, args.push_retries, args.push_format))
+    if args.tsdb_capture:
+        sinks.append(TSDBSink(args.tsdb_capture))
+    if args.capture:
+        sinks.append(CaptureSink(args.capture, args.capture_segment_mb))
+    if args.textfile_dir:
+        sinks.append(TextfileSink(args.textfile_dir, fsync=args.textfile_fsync,
+                                  remove_on_close=not args.textfile_keep))
+    if args.otlp_endpoint:
+        headers = dict(header.split("=", 1) for header in args.otlp_header)
+        sinks.append(OTLPSink(args.otlp_endpoint, args.otlp_temporality, headers, args.otlp_batch_points))
+    return sinks
@@ -0,0 +1,76 @@
+"""
+Compresión snappy (formato *block*) para remote_write.
+
+Si está instalado ``python-snappy`` se usa esa implementación. Si no, se
+recurre a una versión en Python puro: ``compress`` emite solo literales (un
+stream snappy válido, sin reducir tamaño) y ``decompress`` entiende el
+formato completo.
+"""
+
+try:
+    import snappy as _snappy
+except ImportError:  # dependencia opcional
+    _snappy = None
+
+from obslab.protowire import read_varint, varint
+
+_MAX_LITERAL = 65536
+
+
+def compress(data):
+    if _snappy is not None:
+        return _snappy.compress(data)
+    out = bytearray(varint(len(data)))
+    view = memoryview(data)
+    for start in range(0, len(data), _MAX_LITERAL):
+        chunk = view[start:start + _MAX_LITERAL]
+        n = len(chunk) - 1
+        if n < 60:
+            out.append(n << 2)
+        elif n < 1 << 8:
+            out += bytes([60 << 2, n])
+        else:
+            out += bytes([61 << 2, n & 0xFF, n >> 8])
+        out += chunk
+    return bytes(out)
+
+
+def decompress(data):
+    if _snappy is not None:
+        return _snappy.decompress(data)
+    length, pos = read_varint(data, 0)
+    out = bytearray()
+    while pos < len(data):
+        tag = data[pos]
+        pos += 1
+        kind = tag & 3
+        if kind == 0:
+            n = tag >> 2
+            if n >= 60:
+                extra = n - 59
+                n = int.from_bytes(data[pos:pos + extra], "little")
+                pos += extra
+            n += 1
+            out += data[pos:pos + n]
+            pos += n
+            continue
+        if kind == 1:
+            n = ((tag >> 2) & 7) + 4
+            offset = ((tag >> 5) << 8) | data[pos]
+            pos += 1
+        elif kind == 2:
+            n = (tag >> 2) + 1
+            offset = int.from_bytes(data[pos:pos + 2], "little")
+            pos += 2
+        else:
+            n = (tag >> 2) + 1
+            offset = int.from_bytes(data[pos:pos + 4], "little")
+            pos += 4
+        if offset == 0 or offset > len(out):
+            raise ValueError("stream snappy inválido")
+        start = len(out) - offset
+        for i in range(n):  # las copias pueden solaparse con lo que se escribe
+            out.append(out[start + i])
+    if len(out) != length:
+        raise ValueError("largo de snappy inconsistente")
+    return bytes(out)
@@ -0,0 +1,177 @@
+"""
+Cola en disco acotada para lo que no se pudo enviar (snapshots o datapoints).
+
+Estructura del directorio::
+
+    spool/
+      seg-000001.log     registros [largo u32][crc32 u32][payload]
+      seg-000002.log     ... se abre uno nuevo al superar segment_bytes
+      cursor             "<segmento> <offset>" del primer registro sin confirmar
+
+Los segmentos solo se escriben al final. Si el total supera ``max_bytes`` se
+borra el segmento más viejo entero (``dropped_bytes``): el disco queda
+acotado por más que dure el corte. Un registro cortado por una caída (largo o
+CRC que no cierran) marca el fin del segmento.
+
+``replay(handler)`` recorre la cola del más viejo al más nuevo de a
+``batch_records`` registros: ``handler(payloads)`` los envía y, si no lanza
+excepción, el cursor avanza (entrega al menos una vez). Solo hay en memoria un
+lote a la vez, así que la memoria no depende del largo del corte. Cómo se
+resume un lote (quedarse con el último snapshot de cada grupo, juntar
+datapoints en estadísticas) lo decide el handler.
+"""
+
+import glob
+import os
+import struct
+import zlib
+
+_HEADER = struct.Struct("<II")
+
+
+def _segment_paths(directory):
+    return sorted(glob.glob(os.path.join(directory, "seg-*.log")))
+
+
+def _segment_number(path):
+    return int(os.path.basename(path)[4:-4])
+
+
+def read_records(path, offset=0):
+    """Entrega ``(offset_siguiente, payload)`` desde ``offset`` hasta el primer registro inválido."""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while True:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return
+            size, crc = _HEADER.unpack(header)
+            payload = f.read(size)
+            if len(payload) < size or zlib.crc32(payload) != crc:
+                return
+            offset += _HEADER.size + size
+            yield offset, payload
+
+
+class Spool:
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024, segment_bytes=4 * 1024 * 1024, fsync=False):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = min(segment_bytes, max_bytes)
+        self.fsync = fsync
+        self.dropped_bytes = 0
+        self.replayed = 0
+        self._file = None
+        self._file_size = 0
+        self._cursor_path = os.path.join(directory, "cursor")
+
+    def _cursor(self):
+        try:
+            with open(self._cursor_path) as f:
+                segment, offset = f.read().split()
+            return int(segment), int(offset)
+        except (OSError, ValueError):
+            return 0, 0
+
+    def _save_cursor(self, segment, offset):
+        tmp = self._cursor_path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(f"{segment} {offset}")
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, self._cursor_path)
+
+    def _roll(self):
+        self._close_segment()
+        segments = _segment_paths(self.directory)
+        number = _segment_number(segments[-1]) + 1 if segments else 1
+        self._file = open(os.path.join(self.directory, f"seg-{number:06d}.log"), "ab")
+        self._file_size = 0
+
+    def _close_segment(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def append(self, payload):
+        if self._file is None or self._file_size >= self.segment_bytes:
+            self._roll()
+        self._file.write(_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._file_size += _HEADER.size + len(payload)
+        self._enforce_limit()
+
+    def _enforce_limit(self):
+        segments = _segment_paths(self.directory)
+        total = sum(os.path.getsize(path) for path in segments)
+        # Nunca se borra el segmento que se está escribiendo
+        while total > self.max_bytes and len(segments) > 1:
+            oldest = segments.pop(0)
+            size = os.path.getsize(oldest)
+            segment, offset = self._cursor()
+            if segment == _segment_number(oldest):
+                size -= offset  # lo anterior al cursor ya se había entregado
+            self.dropped_bytes += size
+            total -= os.path.getsize(oldest)
+            os.remove(oldest)
+
+    def pending_bytes(self):
+        segment, offset = self._cursor()
+        total = 0
+        for path in _segment_paths(self.directory):
+            total += os.path.getsize(path) - (offset if _segment_number(path) == segment else 0)
+        return total
+
+    def __bool__(self):
+        return self.pending_bytes() > 0
+
+    def replay(self, handler, batch_records=500):
+        """
+        Entrega todo lo pendiente en lotes (un lote puede abarcar varios
+        segmentos); devuelve la cantidad de registros confirmados. Si
+        ``handler`` lanza, se detiene y la excepción sigue de largo.
+        """
+        self._close_segment()  # lo que se agregue durante el replay va a un segmento nuevo
+        delivered = 0
+        batch = []
+        consumed = []  # segmentos leídos por completo cuyos registros están en el lote
+
+        def commit(number, offset):
+            handler(batch)
+            for path in consumed:
+                os.remove(path)
+            self._save_cursor(number, offset)
+            batch.clear()
+            consumed.clear()
+
+        segment, offset = self._cursor()
+        for path in _segment_paths(self.directory):
+            number = _segment_number(path)
+            for end, payload in read_records(path, offset if segment == number else 0):
+                batch.append(payload)
+                if len(batch) >= batch_records:
+                    delivered += len(batch)
+                    commit(number, end)
+                    segment, offset = number, end
+            consumed.append(path)
+            if not batch:  # todo lo del segmento ya se confirmó
+                for done in consumed:
+                    os.remove(done)
+                consumed.clear()
+                self._save_cursor(number + 1, 0)
+            last = number
+        if batch or consumed:
+            delivered += len(batch)
+            commit(last + 1, 0)
+        self.replayed += delivered
+        return delivered
+
+    def close(self):
+        self._close_segment()
+
+    def __str__(self):
+        return f"spool:{self.directory}"
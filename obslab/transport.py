@@ -0,0 +1,69 @@
+"""
+Cliente HTTP mínimo con conexión persistente (keep-alive).
+
+``prometheus_client`` abre una conexión nueva por cada push; cuando se envían
+muchos requests por segundo (replay, fan-out) reutilizar la conexión evita el
+handshake TCP en cada uno.
+"""
+
+import base64
+import http.client
+import urllib.parse
+
+
+class HTTPTarget:
+    def __init__(self, url, timeout=10.0, headers=None, basic_auth=None):
+        parsed = urllib.parse.urlsplit(url if "://" in url else f"http://{url}")
+        self.url = url
+        self.scheme = parsed.scheme
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.base_path = parsed.path.rstrip("/")
+        self.timeout = timeout
+        self.headers = dict(headers or {})
+        if basic_auth:
+            token = base64.b64encode(f"{basic_auth[0]}:{basic_auth[1]}".encode()).decode()
+            self.headers["Authorization"] = f"Basic {token}"
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+            self._conn = cls(self.host, self.port, timeout=self.timeout)
+        return self._conn
+
+    def request(self, method, path="", body=None, headers=None):
+        """Envía el request y devuelve ``(status, body)``; reintenta una vez si la conexión se cayó."""
+        all_headers = dict(self.headers)
+        all_headers.update(headers or {})
+        for attempt in (1, 2):
+            conn = self._connection()
+            try:
+                conn.request(method, self.base_path + path, body=body, headers=all_headers)
+                response = conn.getresponse()
+                data = response.read()
+                if response.getheader("Connection", "").lower() == "close":
+                    self.close()
+                return response.status, data
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                self.close()
+                if attempt == 2:
+                    raise
+            except Exception:
+                self.close()
+                raise
+
+    def send(self, method, path="", body=None, headers=None):
+        """Como ``request`` pero lanza ``IOError`` si el status no es 2xx."""
+        status, data = self.request(method, path, body, headers)
+        if status >= 300:
+            raise IOError(f"{method} {self.url}{path}: HTTP {status} {data[:200]!r}")
+        return data
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __str__(self):
+        return self.url
@@ -0,0 +1,147 @@
+"""
+TSDB columnar en memoria respaldado por NumPy.
+
+Cada snapshot del registry (lo que Prometheus obtendría en un scrape) se guarda
+como una columna: ``times[j]`` es el timestamp del snapshot y
+``values[i, j]`` el valor de la serie ``i`` en ese momento (``NaN`` si la serie
+no existía). Como todas las series comparten el eje de tiempo, el evaluador de
+PromQL (``obslab.promql``) puede operar sobre todas las series y todos los
+steps con operaciones vectorizadas.
+
+Uso típico (backfill)::
+
+    db = TSDB()
+    for i in range(240):
+        scenario.step()
+        db.append(start + i * 15, scenario.samples())
+"""
+
+import json
+import re
+
+import numpy as np
+
+from obslab.scenarios import registry_samples
+
+
+def parse_matchers(matchers):
+    """Normaliza ``[(label, op, valor)]`` compilando las regex (anclas completas)."""
+    parsed = []
+    for label, op, value in matchers:
+        if op in ("=~", "!~"):
+            value = re.compile(f"(?:{value})\\Z")
+        elif op not in ("=", "!="):
+            raise ValueError(f"operador de matcher desconocido: {op}")
+        parsed.append((label, op, value))
+    return parsed
+
+
+def labels_match(labels, matchers):
+    for label, op, value in matchers:
+        actual = labels.get(label, "")
+        if op == "=":
+            ok = actual == value
+        elif op == "!=":
+            ok = actual != value
+        elif op == "=~":
+            ok = value.match(actual) is not None
+        else:
+            ok = value.match(actual) is None
+        if not ok:
+            return False
+    return True
+
+
+class TSDB:
+    def __init__(self, series_capacity=256, time_capacity=256):
+        self.labels = []  # labels de cada serie (incluye __name__)
+        self._ids = {}  # tupla ordenada de labels -> id de serie
+        self._by_name = {}  # __name__ -> lista de ids
+        self._times = np.empty(time_capacity)
+        self._values = np.full((series_capacity, time_capacity), np.nan)
+        self._nt = 0
+
+    # --- Escritura ---
+
+    def series_id(self, name, labels):
+        """Interna el label set y devuelve su id (creando la fila si es nueva)."""
+        key = (name,) + tuple(sorted(labels.items()))
+        sid = self._ids.get(key)
+        if sid is None:
+            sid = len(self.labels)
+            if sid == self._values.shape[0]:
+                grow = np.full((sid, self._values.shape[1]), np.nan)
+                self._values = np.vstack([self._values, grow])
+            full = dict(labels)
+            full["__name__"] = name
+            self.labels.append(full)
+            self._ids[key] = sid
+            self._by_name.setdefault(name, []).append(sid)
+        return sid
+
+    def append(self, timestamp, samples):
+        """Agrega un snapshot: ``samples`` entrega ``(nombre, labels, valor)``."""
+        if self._nt and timestamp <= self._times[self._nt - 1]:
+            raise ValueError("los snapshots deben llegar en orden de tiempo")
+        ids = []
+        vals = []
+        for name, labels, value in samples:
+            ids.append(self.series_id(name, labels))
+            vals.append(value)
+        if self._nt == self._times.shape[0]:
+            capacity = self._times.shape[0]
+            self._times = np.concatenate([self._times, np.empty(capacity)])
+            grow = np.full((self._values.shape[0], capacity), np.nan)
+            self._values = np.hstack([self._values, grow])
+        self._times[self._nt] = timestamp
+        self._values[ids, self._nt] = vals
+        self._nt += 1
+
+    def append_registry(self, timestamp, registry, job, grouping_key=None):
+        self.append(timestamp, registry_samples(registry, job, grouping_key))
+
+    # --- Lectura ---
+
+    @property
+    def times(self):
+        return self._times[:self._nt]
+
+    @property
+    def values(self):
+        return self._values[:len(self.labels), :self._nt]
+
+    def __len__(self):
+        return len(self.labels)
+
+    def select(self, name=None, matchers=()):
+        """Ids de las series que cumplen ``name`` y los matchers (ya parseados)."""
+        if name is not None:
+            candidates = self._by_name.get(name, [])
+        else:
+            candidates = range(len(self.labels))
+        return np.array([sid for sid in candidates if labels_match(self.labels[sid], matchers)], dtype=np.intp)
+
+    # --- Persistencia ---
+
+    def save(self, path):
+        np.savez_compressed(
+            path,
+            times=self.times,
+            values=self.values,
+            labels=np.array(json.dumps(self.labels)),
+        )
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        labels = json.loads(str(data["labels"]))
+        values = data["values"]
+        db = cls(series_capacity=max(len(labels), 1), time_capacity=max(values.shape[1], 1))
+        for full in labels:
+            labels_ = dict(full)
+            name = labels_.pop("__name__")
+            db.series_id(name, labels_)
+        db._nt = values.shape[1]
+        db._times[:db._nt] = data["times"]
+        db._values[:len(labels), :db._nt] = values
+        return db
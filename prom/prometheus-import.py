@@ -1,5 +1,8 @@
-from prometheus_client import CollectorRegistry, Gauge, push_to_gateway
-import random, time
+from prometheus_client import CollectorRegistry, Gauge
+import argparse, os, random, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from obslab.sinks import add_sink_arguments, build_sinks  # noqa: E402
 
 # Dirección del Pushgateway local
 PUSHGATEWAY_URL = "http://localhost:9091"
@@ -11,10 +14,22 @@ registry = CollectorRegistry()
 temperature = Gauge('app_temperature_celsius', 'Temperatura del sistema', registry=registry)
 cpu_usage = Gauge('app_cpu_usage_percent', 'Uso de CPU', registry=registry)
 
+# Destinos: Pushgateway y, opcionalmente, capturas u otros sinks de obslab
+parser = argparse.ArgumentParser(description="Demo de métricas hacia el Pushgateway")
+parser.add_argument("--pushgateway", default=PUSHGATEWAY_URL, help="Pushgateway URL ('' para desactivar el push)")
+add_sink_arguments(parser)
+args = parser.parse_args()
+sinks = build_sinks(args, replace=True)
+
 # Simulamos enviar métricas en un loop
-while True:
-    temperature.set(random.uniform(20.0, 35.0))
-    cpu_usage.set(random.uniform(0, 100))
-    push_to_gateway(PUSHGATEWAY_URL, job='python_demo_app', registry=registry)
-    print("📤 Métricas enviadas al Pushgateway")
-    time.sleep(15)
+try:
+    while True:
+        temperature.set(random.uniform(20.0, 35.0))
+        cpu_usage.set(random.uniform(0, 100))
+        for sink in sinks:
+            sink.push(registry, 'python_demo_app', None)
+        print(f"📤 Métricas enviadas a {', '.join(str(sink) for sink in sinks)}")
+        time.sleep(15)
+finally:
+    for sink in sinks:
+        sink.close()